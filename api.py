@@ -1,12 +1,17 @@
 # api.py (Previously api/main.py)
 
-import subprocess
+import asyncio
+import json
+import threading
+import time
 import uuid
 import os
 import datetime
-from fastapi import FastAPI, BackgroundTasks, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Any, Dict, Optional, List
 
 # 导入我们的数据库操作模块和ORM模型
 import sys
@@ -14,7 +19,8 @@ import sys
 project_root = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, project_root)
 
-from core import db_handler
+from core import audit_payloads, db_handler, result_writer
+from core.job_scheduler import JobScheduler, priority_for_tags
 from models.tables import AutoProgress
 from dotenv import load_dotenv
 
@@ -30,7 +36,7 @@ try:
         # 如果找不到 .env 文件,服务将无法连接数据库,直接抛出异常
         raise FileNotFoundError(f"启动TaaS服务失败: 找不到根目录下的 .env 配置文件。")
 
-    db_handler.initialize_session()
+    SessionFactory = db_handler.initialize_session()
     print("--- TaaS: Database session initialized successfully. ---")
 except Exception as e:
     print(f"--- TaaS FATAL ERROR: Could not initialize database session: {e} ---")
@@ -38,10 +44,37 @@ except Exception as e:
     exit(1)
 
 
+# 同时执行的测试运行数量上限，超出的运行在队列中等待
+MAX_CONCURRENT_RUNS = int(os.getenv('TAAS_MAX_CONCURRENT_RUNS', '2'))
+
+# 状态查询缓存时间 (秒)：大量 CI 轮询同一个 run_id 时，只有缓存过期后才访问数据库
+STATUS_CACHE_TTL = float(os.getenv('TAAS_STATUS_CACHE_TTL', '2'))
+# 已结束的运行状态不再变化，缓存更久
+FINISHED_STATUS_CACHE_TTL = 60.0
+FINISHED_STATUSES = {'PASSED', 'FAILED', 'CANCELLED', 'INTERRUPTED'}
+# 实时推送时查询新结果的间隔 (秒)
+EVENT_POLL_INTERVAL = float(os.getenv('TAAS_EVENT_POLL_INTERVAL', '1'))
+
+scheduler = JobScheduler(
+    SessionFactory, project_root,
+    max_concurrent_runs=MAX_CONCURRENT_RUNS,
+    log_dir=os.getenv('TAAS_LOG_DIR')
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 启动时恢复 auto_progress 中遗留的 PENDING 任务，并启动调度线程
+    scheduler.start()
+    print(f"--- TaaS: Job scheduler started (max concurrent runs: {MAX_CONCURRENT_RUNS}) ---")
+    yield
+    scheduler.stop()
+
+
 app = FastAPI(
     title="API Automation Test as a Service",
     description="一个用于远程触发、监控自动化测试的API服务",
-    version="2.0"
+    version="2.0",
+    lifespan=lifespan
 )
 
 # =================================================================
@@ -60,7 +93,14 @@ class TestRunRequest(BaseModel):
     tags: Optional[str] = Field(None, description="按标签筛选, e.g., 'P0,smoke'")
     jira: Optional[str] = Field(None, description="按Jira ID筛选")
     id: Optional[int] = Field(None, description="按用例模板ID筛选")
+    shared_action: Optional[str] = Field(None, description="只运行引用了指定共享动作的用例")
+    changed_only: Optional[bool] = Field(False, description="跳过定义未变化且上一次已通过的场景")
+    since_run: Optional[str] = Field(None, description="与指定 run_id 的结果比较进行增量选择")
+    report_level: Optional[str] = Field(None, description="Allure 报告级别: full / failures / summary")
+    action_cache: Optional[str] = Field(None, description="可缓存共享动作的结果复用: worker / shared / off")
+    batch_db_validations: Optional[bool] = Field(False, description="把一个步骤的多条 dbValidation 查询合并为一次往返")
     debug_mode: Optional[bool] = Field(False, description="是否开启Debug模式")
+    debug_storage: Optional[str] = Field(None, description="Debug 载荷存储方式: jsonb / compressed")
 
 
 class TestRunResponse(BaseModel):
@@ -73,64 +113,85 @@ class RunStatusResponse(BaseModel):
     """查询测试状态的响应体"""
     run_id: str
     status: Optional[str] = None
+    planned_cases: Optional[int] = None
     total_cases: Optional[int] = None
     passes: Optional[int] = None
     failures: Optional[int] = None
     skips: Optional[int] = None
     begin_time: Optional[datetime.datetime] = None
     end_time: Optional[datetime.datetime] = None
+    update_time: Optional[datetime.datetime] = None
+    throughput: Optional[float] = Field(None, description="已完成用例的吞吐量 (cases/sec)")
+    eta_seconds: Optional[float] = Field(None, description="按当前吞吐量估算的剩余时间 (秒)")
+    phase_timings: Optional[Dict[str, Any]] = Field(None, description="按阶段累计的步骤耗时 (毫秒)，运行中随结果写入更新")
     allure_report_url: Optional[str] = None # 假设的报告URL
 
+class QueueStatusResponse(BaseModel):
+    """调度队列的状态"""
+    max_concurrent_runs: int
+    running: List[str]
+    queued: List[str]
+
 # =================================================================
-# 2. 后台任务执行函数
+# 2. 运行状态缓存 (Run Status Cache)
 # =================================================================
 
-def execute_pytest_in_background(run_id: str, command: list):
-    """在后台线程中执行 pytest 命令,并更新数据库状态"""
+class RunStatusCache:
+    """按 run_id 缓存状态查询结果的短 TTL 内存缓存，同一 run_id 的并发查询只会访问一次数据库。"""
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._entries = {}
+        self._key_locks = {}
+        self._lock = threading.Lock()
 
-    # 更新状态为 RUNNING
-    try:
-        with db_handler.Session() as session:
-            progress_record = session.query(AutoProgress).filter_by(runid=run_id).first()
-            if progress_record:
-                progress_record.task_status = 'RUNNING'
-                progress_record.begin_time = datetime.datetime.now()
-                session.commit()
-    except Exception as e:
-        print(f"Error updating status to RUNNING for run_id {run_id}: {e}")
-
-    # 执行测试
-    process = subprocess.Popen(
-        command,
-        cwd=project_root, # 在项目根目录下执行
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True
-    )
-    stdout, stderr = process.communicate()
-
-    # 测试结束后,conftest.py 中的 sessionfinish 钩子会自动更新最终状态
-    # 这里可以打印日志用于调试
-    print(f"--- Test run {run_id} finished ---")
-    print(f"STDOUT:\n{stdout}")
-    if stderr:
-        print(f"STDERR:\n{stderr}")
+    def get(self, run_id, loader):
+        entry = self._entries.get(run_id)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(run_id, threading.Lock())
+        with key_lock:
+            # 等锁期间可能已被其他请求加载
+            entry = self._entries.get(run_id)
+            now = time.monotonic()
+            if entry and entry[0] > now:
+                return entry[1]
+            value = loader(run_id)
+            ttl = FINISHED_STATUS_CACHE_TTL if value and value.get("status") in FINISHED_STATUSES else self.ttl
+            self._entries[run_id] = (now + ttl, value)
 
+        # 顺便清理过期条目，避免无限增长
+        if len(self._entries) > 1000:
+            with self._lock:
+                now = time.monotonic()
+                expired = [k for k, v in list(self._entries.items()) if v[0] <= now]
+                for k in expired:
+                    self._entries.pop(k, None)
+                    self._key_locks.pop(k, None)
+        return value
+
+
+def _load_run_progress(run_id):
+    with SessionFactory() as session:
+        return result_writer.get_run_progress(session, run_id)
+
+status_cache = RunStatusCache(STATUS_CACHE_TTL)
 
 # =================================================================
 # 3. API 端点 (Endpoints)
 # =================================================================
 
 @app.post("/run-tests/", response_model=TestRunResponse, status_code=202)
-async def trigger_test_run(request: TestRunRequest, background_tasks: BackgroundTasks):
+async def trigger_test_run(request: TestRunRequest):
     """
     触发一次新的自动化测试运行。
-    这是一个异步接口,会立即返回一个 run_id 供后续查询。
+    这是一个异步接口,运行会进入调度队列,并立即返回一个 run_id 供后续查询。
     """
     run_id = str(uuid.uuid4())
 
     # 智能构建命令行参数,忽略占位符
-    command = ['python', 'run.py']
+    command = ['python', 'run.py', '--run-id', run_id]
     # 定义需要忽略的、由API工具自动生成的占位符值
     placeholders_to_ignore = ["string", 0]
 
@@ -143,9 +204,10 @@ async def trigger_test_run(request: TestRunRequest, background_tasks: Background
             else:
                 command.extend([arg_name, str(value)])
 
-    # 在数据库中预创建一条 PENDING 记录
+    # 在数据库中预创建一条 PENDING 记录,连同命令行和优先级一起持久化,作为调度队列
+    priority = priority_for_tags(request.tags)
     try:
-        with db_handler.Session() as session:
+        with SessionFactory() as session:
             progress_record = AutoProgress(
                 runid=run_id,
                 task_status='PENDING',
@@ -153,6 +215,8 @@ async def trigger_test_run(request: TestRunRequest, background_tasks: Background
                 label=request.tags,
                 component=request.component,
                 run_by='TaaS_API',
+                run_args=command,
+                priority=priority,
                 update_time=datetime.datetime.now()
             )
             session.add(progress_record)
@@ -160,8 +224,7 @@ async def trigger_test_run(request: TestRunRequest, background_tasks: Background
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create progress record in database: {e}")
 
-    # 使用 FastAPI 的 BackgroundTasks 来安全地执行后台任务
-    background_tasks.add_task(execute_pytest_in_background, run_id, command)
+    scheduler.submit(run_id, priority)
 
     return {
         "message": "Test run accepted and scheduled.",
@@ -169,3 +232,103 @@ async def trigger_test_run(request: TestRunRequest, background_tasks: Background
         "status_url": app.url_path_for("get_run_status", run_id=run_id)
     }
 
+
+@app.post("/runs/{run_id}/cancel")
+async def cancel_test_run(run_id: str):
+    """取消一个排队中或运行中的测试运行。"""
+    if not scheduler.cancel(run_id):
+        raise HTTPException(status_code=404, detail=f"Run '{run_id}' is not queued or running.")
+    return {"message": "Test run cancelled.", "run_id": run_id}
+
+
+@app.get("/runs/{run_id}/log")
+async def get_run_log(run_id: str):
+    """下载测试运行的控制台日志 (运行中也可以读取已写入的部分)。"""
+    log_path = scheduler.log_path(run_id)
+    if not os.path.exists(log_path):
+        raise HTTPException(status_code=404, detail=f"No log found for run '{run_id}'.")
+    return FileResponse(log_path, media_type="text/plain")
+
+
+@app.get("/queue", response_model=QueueStatusResponse)
+async def get_queue_status():
+    """查看调度队列：运行中的任务以及按执行顺序排列的排队任务。"""
+    snapshot = scheduler.queue_snapshot()
+    return {"max_concurrent_runs": MAX_CONCURRENT_RUNS, **snapshot}
+
+
+@app.get("/runs/{run_id}", response_model=RunStatusResponse)
+def get_run_status(run_id: str):
+    """
+    查询一次测试运行的实时状态、进度和吞吐量。
+    结果在内存中缓存几秒，大量轮询不会直接打到数据库。
+    """
+    progress = status_cache.get(run_id, _load_run_progress)
+    if not progress:
+        raise HTTPException(status_code=404, detail=f"Run '{run_id}' not found.")
+    return progress
+
+
+@app.get("/case-audits/{audit_case_id}/steps")
+def get_case_debug_steps(audit_case_id: int):
+    """读取一个场景的 Debug 步骤日志；压缩存储的请求/响应详情会被透明解压。"""
+    with SessionFactory() as session:
+        steps = audit_payloads.get_debug_logs(session, audit_case_id)
+    if not steps:
+        raise HTTPException(status_code=404, detail=f"No debug logs found for case audit '{audit_case_id}'.")
+    return steps
+
+
+def _format_event(event, data, event_id=None):
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data, default=str, ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
+
+
+@app.get("/runs/{run_id}/events")
+async def stream_run_events(run_id: str, request: Request):
+    """
+    以 Server-Sent Events 推送一次运行的实时结果：
+    - event: case      每条新写入 auto_case_audit 的用例结果 (id 为记录主键，支持 Last-Event-ID 断点续传)
+    - event: progress  运行进度有变化时推送
+    - event: end       运行结束后推送最终状态并关闭连接
+    """
+    if not await asyncio.to_thread(status_cache.get, run_id, _load_run_progress):
+        raise HTTPException(status_code=404, detail=f"Run '{run_id}' not found.")
+
+    try:
+        last_id = int(request.headers.get("last-event-id", 0))
+    except ValueError:
+        last_id = 0
+
+    def poll(after_id):
+        with SessionFactory() as session:
+            return (
+                result_writer.get_case_audits_since(session, run_id, after_id),
+                result_writer.get_run_progress(session, run_id)
+            )
+
+    async def event_generator():
+        nonlocal last_id
+        last_counters = None
+        while not await request.is_disconnected():
+            cases, progress = await asyncio.to_thread(poll, last_id)
+            for case_row in cases:
+                last_id = case_row["id"]
+                yield _format_event("case", case_row, event_id=case_row["id"])
+
+            counters = progress and (progress["status"], progress["total_cases"], progress["planned_cases"])
+            if counters != last_counters:
+                last_counters = counters
+                yield _format_event("progress", progress)
+
+            # 运行已结束且没有更多结果时结束推送
+            if progress and progress["status"] in FINISHED_STATUSES and not cases:
+                yield _format_event("end", progress)
+                return
+            if not cases:
+                await asyncio.sleep(EVENT_POLL_INTERVAL)
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
@@ -0,0 +1,85 @@
+# benchmarks/bench_assertions.py
+"""
+大数组响应的断言微基准：对比逐元素递归的部分匹配与 utils.json_match，
+以及 containsText 在 str(body) 与原始响应字节中查找的耗时。
+
+用法: python benchmarks/bench_assertions.py [--elements 50000]
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.json_match import partial_match_failure
+
+
+# -----------------------------------------------------------------
+# 旧实现 (仅用于对比)：逐层递归，每个节点都构造一次路径字符串
+# -----------------------------------------------------------------
+def _legacy_partial_match(actual, expected, path="body"):
+    if isinstance(expected, dict):
+        assert isinstance(actual, dict), f"Type mismatch at path '{path}': expected dict, got {type(actual).__name__}"
+        for key, expected_value in expected.items():
+            current_path = f"{path}.{key}"
+            assert key in actual, f"Missing key at path '{current_path}'"
+            _legacy_partial_match(actual[key], expected_value, path=current_path)
+    elif isinstance(expected, list):
+        assert isinstance(actual, list), f"Type mismatch at path '{path}': expected list, got {type(actual).__name__}"
+        assert len(actual) >= len(expected), f"Length mismatch at path '{path}': expected at least {len(expected)}, got {len(actual)}"
+        for i, expected_item in enumerate(expected):
+            _legacy_partial_match(actual[i], expected_item, path=f"{path}[{i}]")
+    else:
+        assert actual == expected, f"Value mismatch at path '{path}': expected '{expected}', got '{actual}'"
+
+
+def _legacy_failure(actual, expected):
+    try:
+        _legacy_partial_match(actual, expected)
+        return None
+    except AssertionError as e:
+        return str(e)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--elements", type=int, default=50000, help="响应数组的元素数量")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    # 实际响应的每个元素比期望多出若干字段 (典型的部分匹配场景)
+    raw_body = json.dumps({"data": [
+        {"id": i, "name": f"item_{i}", "status": "ACTIVE", "tags": ["a", "b"], "meta": {"rev": i % 5, "owner": "qa"}}
+        for i in range(args.elements)
+    ]}).encode('utf-8')
+    body = json.loads(raw_body)
+    expected = {"data": [{"id": i, "name": f"item_{i}", "tags": ["a", "b"]} for i in range(args.elements)]}
+    mismatch = json.loads(raw_body)
+    mismatch["data"][-1]["tags"][1] = "x"
+
+    # 先校验两个实现的结论和错误信息一致
+    assert _legacy_failure(body, expected) is None and partial_match_failure(body, expected) is None
+    assert _legacy_failure(mismatch, expected) == partial_match_failure(mismatch, expected)
+
+    needle = f"item_{args.elements - 1}"
+
+    def best(func):
+        return min(timeit.repeat(func, number=1, repeat=args.repeat))
+
+    cases = [
+        ("partial match (pass)    ", lambda: _legacy_failure(body, expected), lambda: partial_match_failure(body, expected)),
+        ("partial match (fail)    ", lambda: _legacy_failure(mismatch, expected), lambda: partial_match_failure(mismatch, expected)),
+        ("containsText (last item)", lambda: needle in str(body), lambda: needle.encode('utf-8') in raw_body),
+    ]
+    print(f"elements: {args.elements}, raw body: {len(raw_body) / 1024 / 1024:.1f} MB")
+    for name, legacy, optimized in cases:
+        legacy_time, optimized_time = best(legacy), best(optimized)
+        print(f"{name}: legacy {legacy_time * 1000:8.1f} ms, optimized {optimized_time * 1000:8.1f} ms "
+              f"({legacy_time / optimized_time:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+# benchmarks/bench_audit_payloads.py
+"""
+对比 Debug 审计载荷的两种存储方式: auto_test_audit 中的 JSONB 列 与 压缩去重的 audit_payloads。
+
+生成模拟的审计轨迹 (响应体从一个有限的池中抽取，模拟不同数据集/运行之间重复的响应)，
+先离线统计编码吞吐和压缩去重后的字节数；提供数据库时 (--db，使用 .env / DB_* 环境变量)，
+再分别在两个临时 schema 中用真实的表结构批量写入，比较写入吞吐和表的磁盘占用，结束后删除临时 schema。
+
+用法: python benchmarks/bench_audit_payloads.py [--cases 5000] [--steps 5] [--distinct-bodies 200] [--db]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.audit_payloads import PayloadEncoder, _canonical_json, zstandard
+from core.result_writer import build_debug_log_rows
+
+BATCH_SIZE = 200
+
+
+def _make_trails(cases, steps, distinct_bodies, items, seed=42):
+    rng = random.Random(seed)
+    bodies = [{
+        "code": 0,
+        "data": {"items": [{"id": i, "name": f"item_{variant}_{i}", "status": "ACTIVE", "owner": "qa"} for i in range(items)]},
+    } for variant in range(distinct_bodies)]
+    trails = []
+    for case_index in range(cases):
+        trail = []
+        for step_order in range(1, steps + 1):
+            trail.append({
+                "step_order": step_order,
+                "action_description": f"Step {step_order}",
+                "request_details": {
+                    "method": "POST", "url": f"http://svc.local/api/v1/step{step_order}",
+                    "headers": {"Content-Type": "application/json", "X-Trace": f"case-{case_index % 50}"},
+                    "params": None, "body": {"user": f"user_{case_index % 100}", "step": step_order},
+                },
+                "response_details": {
+                    "status_code": 200, "headers": {"Content-Type": "application/json"},
+                    "body": bodies[rng.randrange(distinct_bodies)],
+                },
+                "step_status": "passed",
+            })
+        trails.append(trail)
+    return trails
+
+
+def _offline(trails):
+    started = time.perf_counter()
+    raw_bytes = sum(len(_canonical_json(log["request_details"])) + len(_canonical_json(log["response_details"]))
+                    for trail in trails for log in trail)
+    serialize_time = time.perf_counter() - started
+
+    encoder = PayloadEncoder()
+    started = time.perf_counter()
+    for start in range(0, len(trails), BATCH_SIZE):
+        pending = {}
+        for case_index, trail in enumerate(trails[start:start + BATCH_SIZE], start):
+            build_debug_log_rows(case_index, trail, encoder, pending)
+        encoder.mark_stored(pending)
+    encode_time = time.perf_counter() - started
+
+    stats = encoder.stats
+    print(f"codec: {'zstd' if zstandard is not None else 'zlib'}")
+    print(f"payloads: {stats['payloads']}, distinct: {stats['new_payloads']}")
+    print(f"json bytes: {raw_bytes / 1024 / 1024:8.2f} MB (serialize {serialize_time:.2f} s)")
+    print(f"stored bytes: {stats['stored_bytes'] / 1024 / 1024:8.2f} MB (encode {encode_time:.2f} s, "
+          f"{stats['payloads'] / encode_time:,.0f} payloads/s)")
+
+
+def _database(trails):
+    from sqlalchemy import insert, text
+    from core.audit_payloads import insert_payloads
+    from core.db_handler import get_db_engine
+    from models.tables import AuditPayload, AutoCaseAudit, AutoTestAudit, Base
+
+    base_engine = get_db_engine()
+    tables = [AutoCaseAudit.__table__, AutoTestAudit.__table__, AuditPayload.__table__]
+    for mode in ("jsonb", "compressed"):
+        schema = f"bench_audit_{mode}_{os.getpid()}"
+        with base_engine.begin() as conn:
+            conn.execute(text(f'CREATE SCHEMA "{schema}"'))
+        engine = base_engine.execution_options(schema_translate_map={None: schema})
+        try:
+            with engine.begin() as conn:
+                Base.metadata.create_all(conn, tables=tables)
+            encoder = PayloadEncoder() if mode == "compressed" else None
+            started = time.perf_counter()
+            debug_row_count = 0
+            for start in range(0, len(trails), BATCH_SIZE):
+                batch = trails[start:start + BATCH_SIZE]
+                with engine.begin() as conn:
+                    audit_ids = conn.scalars(
+                        insert(AutoCaseAudit).returning(AutoCaseAudit.id, sort_by_parameter_order=True),
+                        [{"runid": "bench", "case_id": i, "data_set_id": i, "run_status": "passed"} for i in range(len(batch))]
+                    ).all()
+                    pending = {}
+                    debug_rows = []
+                    for audit_case_id, trail in zip(audit_ids, batch):
+                        debug_rows.extend(build_debug_log_rows(audit_case_id, trail, encoder, pending))
+                    insert_payloads(conn, list(pending.values()))
+                    conn.execute(insert(AutoTestAudit), debug_rows)
+                    debug_row_count += len(debug_rows)
+                if encoder is not None:
+                    encoder.mark_stored(pending)
+            elapsed = time.perf_counter() - started
+
+            with engine.begin() as conn:
+                # 包含 TOAST 和索引
+                sizes = {
+                    table: conn.execute(text(f"SELECT pg_total_relation_size('\"{schema}\".{table}')")).scalar()
+                    for table in ("auto_test_audit", "audit_payloads")
+                }
+            total = sizes["auto_test_audit"] + sizes["audit_payloads"]
+            print(f"{mode:<10}: {debug_row_count / elapsed:10,.0f} step rows/s, "
+                  f"auto_test_audit {sizes['auto_test_audit'] / 1024 / 1024:8.2f} MB, "
+                  f"audit_payloads {sizes['audit_payloads'] / 1024 / 1024:8.2f} MB, total {total / 1024 / 1024:8.2f} MB")
+        finally:
+            with base_engine.begin() as conn:
+                conn.execute(text(f'DROP SCHEMA "{schema}" CASCADE'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--cases", type=int, default=5000)
+    parser.add_argument("--steps", type=int, default=5, help="每个用例的步骤数")
+    parser.add_argument("--distinct-bodies", type=int, default=200, help="不同响应体的数量 (越少重复越多)")
+    parser.add_argument("--items", type=int, default=40, help="每个响应体中的元素数量")
+    parser.add_argument("--db", action="store_true", help="同时在框架数据库的临时 schema 中测量写入吞吐和磁盘占用")
+    args = parser.parse_args()
+
+    trails = _make_trails(args.cases, args.steps, args.distinct_bodies, args.items)
+    print(f"cases: {args.cases}, steps per case: {args.steps}, distinct response bodies: {args.distinct_bodies}")
+    _offline(trails)
+    if args.db:
+        _database(trails)
+
+
+if __name__ == '__main__':
+    main()
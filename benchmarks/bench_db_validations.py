@@ -0,0 +1,110 @@
+# benchmarks/bench_db_validations.py
+"""
+dbValidation 查询基准：在框架数据库的临时 schema 中 (使用 .env / DB_* 环境变量) 生成一张订单表，
+对 N 个数据集各执行一个带 3 条校验查询的步骤，对比:
+  legacy     单个连接，占位符的值拼进 SQL 文本 (每个数据集的 SQL 都不同)
+  bound      连接池 + 绑定参数
+  prepared   连接池 + 绑定参数 + PREPARE/EXECUTE
+  batched    在 prepared 的基础上把一个步骤的 3 条查询合并为一次往返
+本地数据库的往返延迟很小，跨网络访问被测库时 batched 的收益更明显。
+
+用法: python benchmarks/bench_db_validations.py [--data-sets 2000] [--rows 200000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
+
+from core.app_db import AppDatabase, BoundQuery
+from core.context_manager import TestContext
+from core.db_handler import get_db_engine
+from utils.placeholder_parser import compile_sql_template, resolve_placeholders
+
+_SEED_SQL = """
+CREATE TABLE orders (id integer PRIMARY KEY, user_name text NOT NULL, status text NOT NULL, amount numeric(12, 2));
+INSERT INTO orders SELECT i, 'user_' || mod(i, 5000), CASE WHEN mod(i, 7) = 0 THEN 'CANCELLED' ELSE 'PAID' END, mod(i, 1000) + 0.5
+FROM generate_series(1, {rows}) i;
+CREATE INDEX ix_orders_user_name ON orders (user_name);
+ANALYZE orders;
+"""
+
+_RULES = [
+    {"query": "SELECT status, amount FROM orders WHERE id = {{@order_id}}"},
+    {"query": "SELECT count(*) AS orders FROM orders WHERE user_name = '{{@user}}' AND status = 'PAID'"},
+    {"query": "SELECT sum(amount) AS total FROM orders WHERE user_name = '{{@user}}'"},
+]
+
+
+def _data_sets(args):
+    return [{"order_id": i + 1, "user": f"user_{i % 5000}"} for i in range(args.data_sets)]
+
+
+def _legacy(conn, data_sets):
+    results = []
+    for variables in data_sets:
+        context = TestContext()
+        for rule in _RULES:
+            query = resolve_placeholders(rule["query"], context, variables)
+            results.append([dict(row._mapping) for row in conn.execute(text(query))])
+    return results
+
+
+def _current(database, data_sets):
+    results = []
+    for variables in data_sets:
+        context = TestContext()
+        queries = []
+        for rule in _RULES:
+            template = compile_sql_template(rule["query"])
+            queries.append(BoundQuery(template.fragments, tuple(template.bind(context, variables))))
+        results.extend(database.run_queries(queries))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--data-sets", type=int, default=2000, help="数据集数量")
+    parser.add_argument("--rows", type=int, default=200000, help="订单表行数")
+    args = parser.parse_args()
+
+    load_dotenv()
+    base_engine = get_db_engine()
+    scratch = f"bench_db_validations_{os.getpid()}"
+    with base_engine.begin() as conn:
+        conn.execute(text(f'CREATE SCHEMA "{scratch}"'))
+    engine = create_engine(base_engine.url, pool_size=5, connect_args={"options": f"-csearch_path={scratch}"})
+    data_sets = _data_sets(args)
+    try:
+        with engine.begin() as conn:
+            conn.exec_driver_sql(_SEED_SQL.format(rows=int(args.rows)))
+
+        timings = {}
+        with engine.connect() as conn:
+            started = time.perf_counter()
+            expected = _legacy(conn, data_sets)
+            timings["legacy"] = (time.perf_counter() - started, len(expected))
+        for label, options in (("bound", {"prepare": False}), ("prepared", {}), ("batched", {"batch": True})):
+            database = AppDatabase(engine, **options)
+            started = time.perf_counter()
+            results = _current(database, data_sets)
+            timings[label] = (time.perf_counter() - started, database.stats["round_trips"])
+            assert results == expected, f"{label} returned different rows"
+
+        baseline = timings["legacy"][0]
+        print(f"{args.data_sets} data sets x {len(_RULES)} queries over {args.rows:,} orders")
+        for label, (seconds, round_trips) in timings.items():
+            print(f"{label:<10} {seconds * 1000:9.1f} ms  {round_trips:6d} round trips  ({baseline / seconds:.1f}x)")
+    finally:
+        engine.dispose()
+        with base_engine.begin() as conn:
+            conn.execute(text(f'DROP SCHEMA "{scratch}" CASCADE'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+# benchmarks/bench_load_mode.py
+"""
+压测模式 (core.load_runner) 的自检：不需要框架数据库，对本地桩服务执行一个两步场景，
+输出汇总表，并对比实际启动的迭代数与按到达率、ramp-up 计算出的期望值。
+桩服务的 delay_ms 让第二步有固定的服务端延迟，可以据此确认 p50 的量级。
+
+用法: python benchmarks/bench_load_mode.py [--rate 200] [--ramp-up 2] [--duration 5] [--delay-ms 20]
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_server import start_stub_server
+from core.load_runner import LoadProfile, run_load
+
+
+def _scenarios(args, count=10):
+    steps = [
+        {"step_order": 1, "description": "login", "http_method": "POST", "api_url_path": "/echo",
+         "body": {"username": "{{@user}}"},
+         "validations": {"expectedStatusCode": 200, "body": {"method": "POST"}},
+         "outputs": [{"variable_name": "user", "source": "response_body", "json_path": "body.username"}]},
+        {"step_order": 2, "description": "list items", "http_method": "GET",
+         "api_url_path": f"/items?count=20&delay_ms={args.delay_ms}", "headers": {"X-User": "{{user}}"},
+         "validations": {"expectedStatusCode": 200, "body": {"data": {"total": 20}}}},
+    ]
+    return [((1, index), {"name": f"bench [{index}]", "steps": steps, "data_set_variables": {"user": f"user_{index}"}})
+            for index in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--rate", type=float, default=200, help="稳定阶段每秒开始的迭代数")
+    parser.add_argument("--ramp-up", type=float, default=2, help="ramp-up 秒数")
+    parser.add_argument("--duration", type=float, default=5, help="稳定阶段秒数")
+    parser.add_argument("--delay-ms", type=int, default=20, help="第二步的服务端延迟 (毫秒)")
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server()
+    try:
+        profile = LoadProfile(arrival_rate=args.rate, duration=args.duration, ramp_up=args.ramp_up)
+        result = run_load(base_url, _scenarios(args), profile)
+    finally:
+        server.shutdown()
+
+    for line in result.report_lines():
+        print(line)
+    expected = int(args.rate * args.ramp_up / 2 + args.rate * args.duration)
+    started = result.iterations.count + result.dropped_iterations + result.interrupted_iterations
+    print(f"iterations started: {started} (expected {expected} from the arrival profile)")
+
+
+if __name__ == '__main__':
+    main()
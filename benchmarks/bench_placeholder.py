@@ -0,0 +1,141 @@
+# benchmarks/bench_placeholder.py
+"""
+占位符解析器微基准：对比旧的多轮 re.sub 解析器与编译模板解析器。
+
+用法: python benchmarks/bench_placeholder.py [--data-sets 2000]
+"""
+
+import argparse
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.context_manager import TestContext
+from utils import placeholder_parser
+from utils.placeholder_parser import resolve_placeholders
+
+
+# -----------------------------------------------------------------
+# 旧实现 (仅用于对比)：每个字符串最多10轮、每轮三次 re.sub
+# -----------------------------------------------------------------
+def _legacy_resolve_single_string(data, context, data_set_vars):
+    if not isinstance(data, str):
+        return data
+    for _ in range(10):
+        original_data = data
+
+        def replace_dynamic_var(match):
+            placeholder = match.group(0)
+            memoized_value = context.get_variable(placeholder)
+            if memoized_value is not None:
+                return str(memoized_value)
+            func_match = re.match(r'(\$\w+)(?:\((\d*)\))?', match.group(1))
+            if not func_match: return placeholder
+            func_name, arg_str = func_match.groups()
+            generated_value = None
+            if func_name == '$randomUser': generated_value = placeholder_parser._generate_random_user()
+            elif func_name == '$randomPhone': generated_value = placeholder_parser._generate_random_phone()
+            elif func_name in ('$randomInt', '$randomID', '$randomId'): generated_value = str(placeholder_parser._generate_random_int(int(arg_str) if arg_str else 6))
+            if generated_value is not None:
+                context.set_variable(placeholder, generated_value)
+                return str(generated_value)
+            return placeholder
+
+        data = re.sub(r'\{\{(\$\w+(?:\(\d*\))?)\}\}', replace_dynamic_var, data)
+
+        def replace_dataset_var(match):
+            value = data_set_vars.get(match.group(1))
+            return str(value) if value is not None else f"{{{{@{match.group(1)}}}}}"
+
+        data = re.sub(r'\{\{@(\w+)\}\}', replace_dataset_var, data)
+
+        def replace_step_var(match):
+            value = context.get_value_by_path(match.group(1))
+            return str(value) if value is not None else f"{{{{{match.group(1)}}}}}"
+
+        data = re.sub(r'\{\{([^@$}][^}]+)\}\}', replace_step_var, data)
+        if data == original_data:
+            break
+    return data
+
+
+def _legacy_resolve_placeholders(data_structure, context, data_set_vars):
+    if isinstance(data_structure, dict):
+        return {k: _legacy_resolve_placeholders(v, context, data_set_vars) for k, v in data_structure.items()}
+    elif isinstance(data_structure, list):
+        return [_legacy_resolve_placeholders(i, context, data_set_vars) for i in data_structure]
+    return _legacy_resolve_single_string(data_structure, context, data_set_vars)
+
+
+# -----------------------------------------------------------------
+# 贴近真实场景的步骤模板 (JSONB headers / params / body)
+# -----------------------------------------------------------------
+STEP_TEMPLATE = {
+    "headers": {
+        "Content-Type": "application/json",
+        "Authorization": "Bearer {{auth_token}}",
+        "X-Request-Id": "{{$randomId(12)}}",
+    },
+    "params": {"tenant": "{{@tenant}}", "page": 1, "size": 50},
+    "body": {
+        "customer": {
+            "name": "{{@customer_name}}",
+            "phone": "{{$randomPhone}}",
+            "address": {"city": "{{@city}}", "street": "Main Street 1", "zip": "200000"},
+        },
+        "items": [
+            {"sku": "SKU-{{@sku}}-{{idx}}", "qty": idx, "price": 19.9, "tags": ["a", "b", "c"]}
+            for idx in range(20)
+        ],
+        "remark": "created by {{@customer_name}} for order {{order_id}}",
+        "flags": {"express": True, "gift": False, "note": "static text without placeholders"},
+    },
+}
+
+
+def _make_context():
+    context = TestContext()
+    context.set_variable("auth_token", "eyJhbGciOiJIUzI1NiJ9.payload.signature")
+    context.set_variable("order_id", 987654)
+    context.set_variable("idx", 3)
+    return context
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--data-sets", type=int, default=2000, help="模拟的数据集数量")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    data_sets = [
+        {"tenant": f"t{i % 7}", "customer_name": f"customer_{i}", "city": "Shanghai", "sku": str(i)}
+        for i in range(args.data_sets)
+    ]
+
+    # 先校验两个实现的输出一致 (除随机值外)
+    for variables in data_sets[:50]:
+        context = _make_context()
+        context.set_variable("{{$randomPhone}}", "13800000000")
+        context.set_variable("{{$randomId(12)}}", "123456789012")
+        assert _legacy_resolve_placeholders(STEP_TEMPLATE, context, variables) == \
+            resolve_placeholders(STEP_TEMPLATE, context, variables)
+
+    def run(resolver):
+        for variables in data_sets:
+            resolver(STEP_TEMPLATE, _make_context(), variables)
+
+    legacy = min(timeit.repeat(lambda: run(_legacy_resolve_placeholders), number=1, repeat=args.repeat))
+    compiled = min(timeit.repeat(lambda: run(resolve_placeholders), number=1, repeat=args.repeat))
+
+    print(f"data sets: {args.data_sets}")
+    print(f"legacy re.sub resolver : {legacy * 1000:8.1f} ms ({legacy / args.data_sets * 1e6:7.1f} us/step)")
+    print(f"compiled templates     : {compiled * 1000:8.1f} ms ({compiled / args.data_sets * 1e6:7.1f} us/step)")
+    print(f"speedup                : {legacy / compiled:.1f}x")
+    print(f"template cache         : {placeholder_parser.template_cache_info()}")
+
+
+if __name__ == '__main__':
+    main()
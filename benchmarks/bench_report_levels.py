@@ -0,0 +1,105 @@
+# benchmarks/bench_report_levels.py
+"""
+对比 --report-level full / failures / summary 的执行耗时和 allure 结果目录的磁盘占用。
+每个级别在独立的 pytest 子进程中 (带 --alluredir) 执行相同的一组用例，请求发往本地桩服务。
+
+用法: python benchmarks/bench_report_levels.py [--cases 2000] [--items 50] [--fail-every 20]
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.stub_server import start_stub_server
+from core.reporter import REPORT_LEVELS
+
+# 子进程中执行的测试模块：每个用例三个步骤，每隔 fail_every 个用例最后一步断言失败
+_TEST_MODULE = '''
+import os
+import pytest
+import requests
+from core.api_client import ApiClient
+from core.reporter import create_reporter
+
+BASE_URL = os.environ["BENCH_BASE_URL"]
+LEVEL = os.environ["BENCH_REPORT_LEVEL"]
+CASES = int(os.environ["BENCH_CASES"])
+ITEMS = int(os.environ["BENCH_ITEMS"])
+FAIL_EVERY = int(os.environ["BENCH_FAIL_EVERY"])
+SESSION = requests.Session()
+SESSION.trust_env = False
+
+
+def _steps(index):
+    expected_status = 201 if FAIL_EVERY and index % FAIL_EVERY == 0 else 200
+    return [
+        {"step_order": 1, "http_method": "POST", "api_url_path": "/echo",
+         "body": {"username": "user_{{@index}}", "password": "secret"},
+         "validations": {"expectedStatusCode": 200, "body": {"method": "POST"}},
+         "outputs": [{"variable_name": "user", "source": "response_body", "json_path": "body.username"}]},
+        {"step_order": 2, "http_method": "GET", "api_url_path": f"/items?count={ITEMS}",
+         "headers": {"X-User": "{{user}}"},
+         "validations": {"expectedStatusCode": 200, "body": {"code": 0, "data": {"total": ITEMS}}, "notNull": ["$.data.items[0].id"]}},
+        {"step_order": 3, "http_method": "GET", "api_url_path": "/status/200",
+         "validations": {"expectedStatusCode": expected_status}},
+    ]
+
+
+@pytest.mark.parametrize("index", range(CASES))
+def test_case(index):
+    client = ApiClient(BASE_URL, reporter=create_reporter(LEVEL), session=SESSION)
+    client.execute_steps({"name": f"case {index}", "steps": _steps(index), "data_set_variables": {"index": index}})
+'''
+
+
+def _directory_size(path):
+    total, files = 0, 0
+    for directory, _, names in os.walk(path):
+        for name in names:
+            total += os.path.getsize(os.path.join(directory, name))
+            files += 1
+    return total, files
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--cases", type=int, default=2000, help="用例数量")
+    parser.add_argument("--items", type=int, default=50, help="第二步响应中的元素数量")
+    parser.add_argument("--fail-every", type=int, default=20, help="每隔多少个用例有一个失败 (0 表示全部通过)")
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server()
+    workdir = tempfile.mkdtemp(prefix="bench_report_levels_")
+    try:
+        test_file = os.path.join(workdir, "test_bench_report.py")
+        with open(test_file, "w", encoding="utf-8") as f:
+            f.write(_TEST_MODULE)
+
+        print(f"cases: {args.cases}, items per response: {args.items}, "
+              f"failing cases: {args.cases // args.fail_every + 1 if args.fail_every else 0}")
+        for level in REPORT_LEVELS:
+            results_dir = os.path.join(workdir, f"allure-{level}")
+            env = dict(os.environ, PYTHONPATH=ROOT, BENCH_BASE_URL=base_url, BENCH_REPORT_LEVEL=level,
+                       BENCH_CASES=str(args.cases), BENCH_ITEMS=str(args.items), BENCH_FAIL_EVERY=str(args.fail_every))
+            started = time.perf_counter()
+            subprocess.run(
+                [sys.executable, "-m", "pytest", test_file, "-q", "-p", "no:cacheprovider", "--alluredir", results_dir],
+                cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            elapsed = time.perf_counter() - started
+            size, files = _directory_size(results_dir)
+            print(f"{level:<9}: {elapsed:7.2f} s, allure results {size / 1024 / 1024:8.2f} MB in {files:6d} files")
+    finally:
+        server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+# benchmarks/bench_result_queries.py
+"""
+结果表查询基准：在框架数据库的临时 schema 中 (使用 .env / DB_* 环境变量) 生成 runs x cases 行
+auto_case_audit 数据，先在原有索引 (只有 runid) 下计时运行汇总、实时推送和旧的窗口函数历史查询，
+再在 models/tables.py 声明的索引下计时当前实现；可选再转换为按月分区后计时一次。结束后删除临时 schema。
+
+用法: python benchmarks/bench_result_queries.py [--runs 400] [--cases 5000] [--history-cases 2000] [--partitioned]
+"""
+
+import argparse
+import contextlib
+import datetime
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, func, select, text
+from sqlalchemy.orm import sessionmaker
+
+from core import schema
+from core.db_handler import BULK_QUERY_CHUNK_SIZE, get_db_engine
+from core.result_writer import get_case_audits_since, update_run_summary
+from core.run_plan import get_last_results, get_recent_statuses
+from core.scheduling import get_recent_durations
+from models.tables import AutoCaseAudit, AutoProgress, AutoTestAudit, Base
+
+_SEED_SQL = """
+INSERT INTO auto_case_audit (runid, case_id, data_set_id, scenario, run_status, duration, update_at)
+SELECT 'bench-run-' || r, c, c, 'scenario ' || c,
+       CASE WHEN random() < 0.05 THEN 'failed' WHEN random() < 0.02 THEN 'skipped' ELSE 'passed' END,
+       (random() * 5)::real,
+       now() - (:runs - r) * interval '6 hours'
+FROM generate_series(1, :runs) r CROSS JOIN generate_series(1, :cases) c
+ORDER BY r, c
+"""
+
+
+# -----------------------------------------------------------------
+# 旧实现 (仅用于对比)：对这些场景的全部历史做 row_number() 窗口排序后取前几名
+# -----------------------------------------------------------------
+def _legacy_ranked(session, case_pairs, columns, conditions, runs):
+    wanted = set(case_pairs)
+    case_ids = sorted({case_id for case_id, _ in wanted})
+    rows = []
+    for start in range(0, len(case_ids), BULK_QUERY_CHUNK_SIZE):
+        ranked = select(
+            AutoCaseAudit.case_id, AutoCaseAudit.data_set_id, *columns,
+            func.row_number().over(
+                partition_by=(AutoCaseAudit.case_id, AutoCaseAudit.data_set_id),
+                order_by=AutoCaseAudit.id.desc()
+            ).label('rn')
+        ).where(AutoCaseAudit.case_id.in_(case_ids[start:start + BULK_QUERY_CHUNK_SIZE]), *conditions).subquery()
+        rows.extend(session.execute(
+            select(*[c for c in ranked.c if c.name != 'rn'])
+            .where(ranked.c.rn <= runs)
+            .order_by(ranked.c.case_id, ranked.c.data_set_id, ranked.c.rn)
+        ).all())
+    return [row for row in rows if (row[0], row[1]) in wanted]
+
+
+def _legacy_recent_statuses(session, case_pairs, runs=10):
+    statuses = {}
+    for case_id, data_set_id, run_status in _legacy_ranked(
+            session, case_pairs, [AutoCaseAudit.run_status], [AutoCaseAudit.run_status.in_(('passed', 'failed'))], runs):
+        statuses.setdefault((case_id, data_set_id), []).append(run_status)
+    return statuses
+
+
+def _legacy_last_results(session, case_pairs):
+    return {(case_id, data_set_id): (run_status, last_hash) for case_id, data_set_id, run_status, last_hash in
+            _legacy_ranked(session, case_pairs, [AutoCaseAudit.run_status, AutoCaseAudit.definition_hash], [], 1)}
+
+
+def _legacy_recent_durations(session, case_pairs, runs=5):
+    grouped = {}
+    for case_id, data_set_id, duration in _legacy_ranked(
+            session, case_pairs, [AutoCaseAudit.duration],
+            [AutoCaseAudit.run_status != 'skipped', AutoCaseAudit.duration != None], runs):
+        grouped.setdefault((case_id, data_set_id), []).append(duration)
+    return {pair: sum(values) / len(values) for pair, values in grouped.items()}
+
+
+def _timed(func, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def _history_pairs(args):
+    return [(case_id, case_id) for case_id in range(1, args.history_cases + 1)]
+
+
+def _check_equivalent(Session, args):
+    """当前实现与旧实现的结果必须一致 (耗时按 float32 列求平均，允许舍入误差)。"""
+    pairs = _history_pairs(args)
+    with Session() as session:
+        assert get_recent_statuses(session, pairs) == _legacy_recent_statuses(session, pairs)
+        assert get_last_results(session, pairs) == _legacy_last_results(session, pairs)
+        current, legacy = get_recent_durations(session, pairs), _legacy_recent_durations(session, pairs)
+        assert current.keys() == legacy.keys()
+        assert all(abs(current[pair] - legacy[pair]) < 1e-4 for pair in current)
+
+
+def _measure(Session, args, legacy=False):
+    run_id = f"bench-run-{args.runs // 2}"
+    pairs = _history_pairs(args)
+
+    def recount():
+        with Session() as session, contextlib.redirect_stdout(io.StringIO()):
+            update_run_summary(session, run_id, datetime.datetime.now(), 'PASSED', recount=True)
+
+    def call(func, *func_args, **kwargs):
+        def run():
+            with Session() as session:
+                func(session, *func_args, **kwargs)
+        return run
+
+    queries = [
+        ("summary recount        ", recount),
+        ("case audits since (500)", call(get_case_audits_since, run_id, 0)),
+        ("recent statuses        ", call(_legacy_recent_statuses if legacy else get_recent_statuses, pairs)),
+        ("last results           ", call(_legacy_last_results if legacy else get_last_results, pairs)),
+        ("recent durations       ", call(_legacy_recent_durations if legacy else get_recent_durations, pairs)),
+    ]
+    return {name: _timed(func, args.repeat) for name, func in queries}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--runs", type=int, default=400, help="运行次数")
+    parser.add_argument("--cases", type=int, default=5000, help="每次运行的场景数")
+    parser.add_argument("--history-cases", type=int, default=2000, help="历史查询涉及的场景数")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--partitioned", action="store_true", help="再转换为按月分区后计时一次")
+    args = parser.parse_args()
+
+    load_dotenv()
+    base_engine = get_db_engine()
+    scratch = f"bench_results_{os.getpid()}"
+    with base_engine.begin() as conn:
+        conn.execute(text(f'CREATE SCHEMA "{scratch}"'))
+    # 通过 search_path 而不是 schema_translate_map 指向临时 schema，core.schema 中的原生 SQL 同样生效
+    engine = create_engine(base_engine.url, connect_args={"options": f"-csearch_path={scratch}"})
+    Session = sessionmaker(bind=engine)
+    model_indexes = sorted(AutoCaseAudit.__table__.indexes, key=lambda index: index.name)
+    try:
+        with engine.begin() as conn:
+            Base.metadata.create_all(conn, tables=[AutoProgress.__table__, AutoCaseAudit.__table__, AutoTestAudit.__table__])
+            for index in model_indexes:
+                index.drop(conn)
+            conn.execute(text("CREATE INDEX ix_auto_case_audit_runid ON auto_case_audit (runid)"))
+
+        started = time.perf_counter()
+        with engine.begin() as conn:
+            conn.execute(text(_SEED_SQL), {"runs": args.runs, "cases": args.cases})
+            conn.execute(text(
+                "INSERT INTO auto_progress (runid, task_status, begin_time, update_time) "
+                "SELECT 'bench-run-' || r, 'PASSED', now(), now() FROM generate_series(1, :runs) r"
+            ), {"runs": args.runs})
+            conn.execute(text("ANALYZE"))
+        print(f"seeded {args.runs * args.cases:,} auto_case_audit rows in {time.perf_counter() - started:.1f} s "
+              f"(history queries over {args.history_cases} cases)")
+
+        results = {"legacy": _measure(Session, args, legacy=True)}
+
+        started = time.perf_counter()
+        with engine.begin() as conn:
+            conn.execute(text("DROP INDEX ix_auto_case_audit_runid"))
+            for index in model_indexes:
+                index.create(conn)
+            conn.execute(text("ANALYZE auto_case_audit"))
+        print(f"created model indexes in {time.perf_counter() - started:.1f} s")
+        _check_equivalent(Session, args)
+        results["model indexes"] = _measure(Session, args)
+
+        if args.partitioned:
+            with contextlib.redirect_stdout(io.StringIO()):
+                schema.partition_tables(engine)
+            with engine.begin() as conn:
+                conn.execute(text("ANALYZE"))
+            results["partitioned"] = _measure(Session, args)
+
+        labels = list(results)
+        print(f"{'query':<24} " + " ".join(f"{label:>18}" for label in labels))
+        for name in results[labels[0]]:
+            timings = [results[label][name] for label in labels]
+            print(f"{name:<24} " + " ".join(f"{seconds * 1000:15.1f} ms" for seconds in timings)
+                  + f"  ({timings[0] / timings[1]:.1f}x)")
+    finally:
+        engine.dispose()
+        with base_engine.begin() as conn:
+            conn.execute(text(f'DROP SCHEMA "{scratch}" CASCADE'))
+
+
+if __name__ == '__main__':
+    main()
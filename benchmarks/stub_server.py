@@ -0,0 +1,101 @@
+# benchmarks/stub_server.py
+"""
+基准测试和本地调试用的桩服务 (不依赖被测系统)。
+
+接口:
+  GET  /items?count=N&size=M   返回 {"code": 0, "data": {"total": N, "items": [...]}}，每个元素约 M 字节
+  GET  /status/<code>          返回指定状态码，body 为 {"status": <code>}
+  *    /echo                   原样返回请求的方法、路径、查询参数和 JSON 请求体
+  GET  /eventually/<key>?after_ms=N
+                               模拟异步写入：同一个 key 第一次请求后的 N 毫秒内返回 {"key", "ready": false}，之后返回 true
+  可选查询参数 delay_ms=N 让响应延迟 N 毫秒。
+
+用法: python benchmarks/stub_server.py [--port 8765]
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+# /eventually/<key> 第一次被请求的时间
+_first_seen = {}
+_first_seen_lock = threading.Lock()
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # 支持 keep-alive，连接复用与真实服务一致
+    disable_nagle_algorithm = True  # 响应头和响应体分两次写出，避免 Nagle + 延迟 ACK 带来的 40ms 停顿
+
+    def log_message(self, format, *args):
+        pass
+
+    def _handle(self):
+        url = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        length = int(self.headers.get('Content-Length') or 0)
+        raw_body = self.rfile.read(length) if length else b''
+
+        if query.get('delay_ms'):
+            time.sleep(int(query['delay_ms']) / 1000)
+
+        status = 200
+        if url.path == '/items':
+            count, size = int(query.get('count', 10)), int(query.get('size', 50))
+            payload = {"code": 0, "data": {"total": count, "items": [
+                {"id": i, "name": f"item_{i}", "payload": "x" * size} for i in range(count)
+            ]}}
+        elif url.path.startswith('/status/'):
+            status = int(url.path.rsplit('/', 1)[-1])
+            payload = {"status": status}
+        elif url.path.startswith('/eventually/'):
+            key = url.path.rsplit('/', 1)[-1]
+            with _first_seen_lock:
+                first = _first_seen.setdefault(key, time.monotonic())
+            ready = (time.monotonic() - first) * 1000 >= int(query.get('after_ms', 1000))
+            payload = {"key": key, "ready": ready}
+        elif url.path == '/echo':
+            payload = {
+                "method": self.command, "path": url.path, "params": query,
+                "body": json.loads(raw_body) if raw_body else None,
+            }
+        else:
+            status, payload = 404, {"error": f"unknown path {url.path}"}
+
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = do_PUT = do_DELETE = do_PATCH = _handle
+
+
+def start_stub_server(host='127.0.0.1', port=0):
+    """在后台线程中启动桩服务，返回 (server, base_url)；用完后调用 server.shutdown()。"""
+    server = ThreadingHTTPServer((host, port), _StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='stub-server', daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), _StubHandler)
+    print(f"Stub server listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+# core/action_cache.py
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+# =================================================================
+# 可缓存共享动作 (shared_actions.cacheable) 的结果缓存
+# - 键是解析占位符后的完整请求 + 生效的验证规则 + outputs 定义：同一个账号的登录只执行一次，
+#   不同账号、不同校验规则各自缓存；流式模式下只保存了被引用字段的子集，引用的字段集合也计入键中
+# - 值是该步骤的响应、提取出的变量和响应设置的 cookie；后续用例命中时直接复用，不再发送请求
+# - 每个条目按共享动作的 cache_ttl 过期；复用了缓存的用例失败时删除用到的条目 (token 可能已失效)
+# - 默认每个进程 (xdist worker) 一份；指定 path 时存放在本地 SQLite 文件中，由同一次运行的所有 worker 共享
+# =================================================================
+
+CACHE_ENV_VAR = 'FRAMEWORK_ACTION_CACHE_PATH'
+# shared_actions.cache_ttl 为空时的过期时间 (秒)
+DEFAULT_TTL = 300
+# 进程内缓存的条目上限，超过时先清理过期条目，再淘汰最早写入的条目
+MAX_ENTRIES = 10000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS action_cache (
+    key TEXT PRIMARY KEY,
+    entry TEXT NOT NULL,
+    stored_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+)
+"""
+
+
+def _dumps(value):
+    return json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+
+
+def cache_key(step, request_details, validations, body_paths=None):
+    """
+    按共享动作名、解析后的请求、生效的验证规则和 outputs 定义计算缓存键。
+    :param body_paths: 流式模式下该步骤只读取了响应体中的这些路径 (step_analysis.referenced_body_paths)；
+                       缓存的只是这个子集，只能被引用相同路径的用例复用，因此计入键中。None 表示完整响应体。
+    """
+    content = {
+        "shared_action": step.get('shared_action_ref'),
+        "request": request_details,
+        "validations": validations,
+        "outputs": step.get('outputs'),
+    }
+    if body_paths is not None:
+        content["body_paths"] = sorted((list(path) for path in body_paths), key=_dumps)
+    return hashlib.sha256(_dumps(content).encode('utf-8')).hexdigest()
+
+
+class ActionCache:
+    """
+    共享动作结果缓存，线程安全。
+    条目以 JSON 保存，取出的是独立的副本，用例对响应的修改不会影响缓存。
+    """
+    def __init__(self, path=None, clock=time.time):
+        self.path = path
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(_SCHEMA)
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "invalidations": 0}
+
+    def get(self, key):
+        """:return: {'response', 'variables', 'cookies', 'body_size', 'stored_at', 'expires_at'}；未命中或已过期时返回 None"""
+        now = self.clock()
+        with self._lock:
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT entry, stored_at, expires_at FROM action_cache WHERE key = ? AND expires_at > ?", (key, now)
+                ).fetchone()
+            else:
+                row = self._entries.get(key)
+                if row is not None and row[2] <= now:
+                    del self._entries[key]
+                    row = None
+            self.stats["hits" if row else "misses"] += 1
+        if row is None:
+            return None
+        entry, stored_at, expires_at = row
+        return dict(json.loads(entry), stored_at=stored_at, expires_at=expires_at)
+
+    def put(self, key, entry, ttl=None):
+        now = self.clock()
+        row = (_dumps(entry), now, now + (ttl or DEFAULT_TTL))
+        with self._lock:
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO action_cache (key, entry, stored_at, expires_at) VALUES (?, ?, ?, ?)",
+                    (key, *row)
+                )
+            else:
+                self._entries.pop(key, None)
+                self._entries[key] = row
+                if len(self._entries) > MAX_ENTRIES:
+                    self._evict(now)
+            self.stats["stores"] += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            if self._db is not None:
+                removed = self._db.execute("DELETE FROM action_cache WHERE key = ?", (key,)).rowcount
+            else:
+                removed = self._entries.pop(key, None) is not None
+            if removed:
+                self.stats["invalidations"] += 1
+
+    def _evict(self, now):
+        for key in [key for key, row in self._entries.items() if row[2] <= now]:
+            del self._entries[key]
+        while len(self._entries) > MAX_ENTRIES:
+            # dict 保持插入顺序，最早写入的条目在最前面
+            del self._entries[next(iter(self._entries))]
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+def merge_cache_stats(stats_list):
+    """合并多个进程的缓存统计。"""
+    merged = {"hits": 0, "misses": 0, "stores": 0, "invalidations": 0}
+    for stats in stats_list:
+        for key in merged:
+            merged[key] += stats.get(key, 0)
+    return merged
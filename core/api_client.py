@@ -1,36 +1,66 @@
 # core/api_client.py
 
+import copy
+import time
 import requests
+import pytest
 import allure
 import json
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from typing import Dict, Any
 
+from core.action_cache import cache_key
 from core.context_manager import TestContext
-from core.assertion_engine import AssertionEngine
+from core.assertion_engine import DB_KEYWORDS, RESPONSE_KEYWORDS, AssertionEngine
+from core.eventually import EventualCheck, parse_policy
+from core.phase_timer import PhaseTimer
+from core.reporter import AllureReporter, RecordingReporter, TimedReporter
+from core.response_stream import CountingReader, ijson, read_json_subset
+from core.step_analysis import (
+    analyze_steps, build_dependency_graph, has_parallelism, referenced_body_paths, response_readers, response_release_plan
+)
+from utils.payload_limits import cap_json_value
 from utils.placeholder_parser import resolve_placeholders
 
 
-
 class ApiClient:
     """
     API 客户端，是框架的执行引擎。
     负责驱动测试流程：解析参数、发送请求、调用断言、提取变量，并生成详细报告。
     """
-    def __init__(self, base_url: str):
+    def __init__(self, base_url: str, reporter=None, session=None, max_step_workers: int = 1,
+                 stream_responses: bool = False, max_audit_bytes: int = None,
+                 release_responses: bool = True, audit_response_bodies: bool = True, action_cache=None):
         """
         初始化客户端。
 
         :param base_url: API的基础URL，从环境中获取。
+        :param reporter: (可选) 报告器，默认直接写入 allure。
+        :param session: (可选) 外部创建的 HTTP 会话，例如挂载了共享连接池的 Session。
+        :param max_step_workers: 用例内并发执行互不依赖步骤的线程数，1 表示严格顺序执行。
+        :param stream_responses: 流式读取 JSON 响应，只保留 validations、outputs 和后续占位符引用到的字段。
+        :param max_audit_bytes: (可选) 审计轨迹中单个响应体的大小上限，超过时只保留预览。
+        :param release_responses: 步骤响应在最后一次被引用后立即从上下文中释放。
+        :param audit_response_bodies: 审计轨迹是否保留响应体 (只有 Debug 模式会把审计轨迹写入数据库)。
+        :param action_cache: (可选) 可缓存共享动作的结果缓存 (core.action_cache.ActionCache)，由同一进程的所有用例共享。
         """
         if not base_url:
             raise ValueError("API base_url 不能为空")
         self.base_url = base_url
-        self.session = requests.Session()
-        
-        # 禁用环境变量代理，避免localhost请求通过代理导致502错误
-        self.session.trust_env = False
-        
-        self.assertion_engine = AssertionEngine()
+        self.session = session or self._create_session()
+        self.max_step_workers = max_step_workers
+        self.stream_responses = stream_responses
+        self.max_audit_bytes = max_audit_bytes
+        self.release_responses = release_responses
+        self.audit_response_bodies = audit_response_bodies
+        self.action_cache = action_cache
+        self._cache_hits = []  # 本用例命中的缓存键，用例失败时作废
+        self._body_paths = None
+        self.peak_context_bytes = None
+        # 当前步骤的阶段耗时 (core.phase_timer)，随审计信息一起记录
+        self.timer = PhaseTimer()
+        self.reporter = TimedReporter(reporter or AllureReporter(), self.timer)
+        self.assertion_engine = AssertionEngine(self.reporter, timer=self.timer)
         self.audit_trail = [] # 用于存储本次用例执行的审计轨迹
         # 用于存储本次用例使用的、已解析的数据集变量
         self.resolved_data_set_variables = {}
@@ -48,102 +78,455 @@ class ApiClient:
         case_name = case_details.get('name', 'Unknown Case')
         all_steps = case_details.get('steps', [])
 
-        allure.dynamic.title(case_name)
+        self.reporter.title(case_name)
+
+        # 流式模式下预先算出每个步骤的响应体中会被用到的路径
+        self._body_paths = referenced_body_paths(all_steps, validations_override) if self.stream_responses else None
+
+        infos = analyze_steps(all_steps, validations_override) if self.release_responses or self.max_step_workers > 1 else None
+        release_plan = response_release_plan(infos) if self.release_responses else {}
+        self._cache_hits = []
+
+        failed = False
+        try:
+            if self.max_step_workers > 1:
+                graph = build_dependency_graph(infos)
+                if has_parallelism(graph):
+                    self._execute_steps_in_parallel(all_steps, graph, context, data_set_variables, validations_override,
+                                                    app_db_conn, response_readers(infos) if self.release_responses else None)
+                    return
+
+            for step in all_steps:
+                self._execute_step(step, context, data_set_variables, validations_override, app_db_conn)
+                self._release_responses(context, release_plan, step.get('step_order'))
+        except BaseException:
+            failed = True
+            self._invalidate_cache_hits()
+            raise
+        finally:
+            self._report_context_size(context, len(all_steps))
+            # failures 级别的报告器在这里决定是否写入附件
+            self.reporter.flush(failed)
+
+    def _execute_step(self, step, context, data_set_variables, validations_override, app_db_conn):
+        """执行单个步骤：解析 -> 请求 -> 断言 -> 提取，并记录审计信息。"""
+        step_order = step.get('step_order')
+        step_description = step.get('description', f'Step {step_order}')
+
+        with self.reporter.step(f"Step {step_order}: {step_description}"):
+            step_status = 'passed'
+            request_details_dict = {}
+            response_data = {}
+            body_size = None
+            key = None
+            check = None
+            self.timer.take()
+
+            try:
+                # 1. 解析请求数据中的所有占位符
+                request_details_dict = self._build_request(step, context, data_set_variables)
+
+                # 可缓存的共享动作命中缓存时不再发送请求
+                key = self._cache_key(step, request_details_dict, validations_override)
+                cached = self._cache_lookup(key, step, context)
+                if cached is not None:
+                    step_status = 'cached'
+                    response_data, body_size = cached['response'], cached.get('body_size')
+                    return
+
+                # 2 - 3. 发送 HTTP 请求，读取并标准化响应数据
+                response, response_data, raw_body, body_size = self._send_request(request_details_dict, step_order)
+
+                # 4 - 7. 存入上下文、执行断言、提取输出变量；配置了 eventually 时断言失败会按退避重试
+                check = self._eventual_check(step, validations_override)
+                if check is None:
+                    self._process_response(step, response_data, context, data_set_variables, validations_override,
+                                           app_db_conn, raw_body=raw_body, body_size=body_size)
+                else:
+                    response, response_data, body_size = self._process_eventually(
+                        check, step, (response, response_data, raw_body, body_size), context, data_set_variables,
+                        validations_override, app_db_conn, request_details_dict
+                    )
+                self._cache_store(step, key, response_data, response.cookies.get_dict(), body_size, context)
+
+            except (Exception, pytest.fail.Exception) as e:
+                # 断言失败由 pytest.fail 抛出 (继承自 BaseException)，同样记为 failed
+                step_status = 'failed'
+                self._report_step_error(e)
+                raise
+            finally:
+                # 无论成功失败,都记录审计信息
+                self._record_audit(step_order, step_description, request_details_dict, response_data, step_status, body_size,
+                                   eventually=check)
+
+    def _send_request(self, request_details_dict, step_order):
+        """:return: (response, response_data, raw_body, body_size)"""
+        started = self.timer.clock()
+        # 建立连接的耗时由共享连接池 (core.http_pool) 单独计入 connect 阶段
+        with self.timer.phase('ttfb'):
+            response = self.session.request(
+                method=request_details_dict['method'], url=request_details_dict['url'],
+                headers=request_details_dict['headers'], params=request_details_dict['params'],
+                json=request_details_dict['body'], timeout=30, stream=self.stream_responses
+            )
+        if not self.stream_responses:
+            # response.elapsed 截止到收到响应头，之后读取响应体的时间属于 download
+            download = max(self.timer.clock() - started - response.elapsed.total_seconds(), 0.0)
+            self.timer.add('ttfb', -download)
+            self.timer.add('download', download)
+        return (response, *self._read_response(response, step_order))
+
+    def _process_eventually(self, check, step, sent, context, data_set_variables, validations_override, app_db_conn,
+                            request_details_dict):
+        """
+        按 eventually 策略评估断言：失败时按退避等待后重新评估 (request 模式先重新发送请求)，
+        直到通过或超过期限，然后提取输出变量。
+        :param sent: 第一次请求的 (response, response_data, raw_body, body_size)
+        :return: 最后一次的 (response, response_data, body_size)
+        """
+        response, response_data, raw_body, body_size = sent
+        self._store_response(step, response_data, context, body_size)
+        failures, keywords = self._first_evaluation(check, step, response_data, context, data_set_variables,
+                                                    validations_override, app_db_conn, raw_body)
+        while failures and keywords:
+            delay = check.next_delay()
+            if delay is None:
+                break
+            with self.timer.phase('wait'):
+                time.sleep(delay)
+            with self.reporter.step(f"Eventually: attempt {check.attempts} after waiting {delay:.2f}s"):
+                if check.policy.mode == 'request':
+                    response, response_data, raw_body, body_size = self._send_request(request_details_dict, step.get('step_order'))
+                    self._store_response(step, response_data, context, body_size)
+                failures = self._evaluate_validations(step, response_data, context, data_set_variables, validations_override,
+                                                      app_db_conn, raw_body, keywords=keywords)
+        self._finish_eventually(check, failures)
+        self._extract_outputs(step, context)
+        return response, response_data, body_size
+
+    def _read_response(self, response, step_order):
+        """
+        读取响应体，返回 (response_data, raw_body, body_size)。
+        流式模式下，对 JSON 响应只构建被引用到的字段 (此时 raw_body 为 None)；
+        需要完整响应体的步骤 (containsText、非简单 JSONPath 等) 和非 JSON 响应仍完整读取。
+        """
+        paths = self._body_paths.get(step_order) if self._body_paths else None
+        content_type = response.headers.get('Content-Type', '').lower()
+        if paths is None or ijson is None or 'json' not in content_type:
+            with self.timer.phase('download'):
+                raw_body = response.content
+            return self._normalize_response(response), raw_body, len(raw_body)
+
+        reader = CountingReader(response.raw)
+        response.raw.decode_content = True
+        try:
+            # 边读取边解析，两者无法分开计时，都计入 download
+            with self.timer.phase('download'):
+                response_body = read_json_subset(reader, paths)
+        except ijson.JSONError as e:
+            raise ValueError(f"流式读取响应体失败 (Content-Type: {content_type}): {e}") from e
+        finally:
+            response.close()
+        response_data = {'status_code': response.status_code, 'headers': dict(response.headers), 'body': response_body}
+
+        self.reporter.attach_json(response_data, name=f"Response Details (streamed subset of {reader.bytes_read} bytes)", ensure_ascii=False)
+        # 上下文和审计中保存的只是子集，按子集的大小计
+        return response_data, None, len(json.dumps(response_body, ensure_ascii=False))
+
+    def _execute_steps_in_parallel(self, all_steps, graph, context, data_set_variables, validations_override, app_db_conn,
+                                   readers=None):
+        """
+        按依赖图并发执行步骤：依赖已全部完成的步骤立即提交到线程池。
+        readers ({step_order: {读取该响应的 step_order}}，见 response_readers) 中某个响应的读取步骤全部完成后才释放它，
+        不按 step_order 判断最后一次读取 (并发的读取步骤可能晚于序号更大的步骤完成)。
+        每个步骤在独立的记录型报告器中执行，结束后按 step_order 回放到报告并写入审计轨迹，
+        因此 allure 层级和 audit_trail 的顺序与顺序执行时一致。
+        任一步骤失败后不再提交新步骤，等待已提交的步骤结束后抛出 step_order 最小的失败。
+        """
+        step_clients = {}
+        errors = {}
+        completed = set()
+        pending = list(all_steps)
+        unfinished_readers = {order: set(orders) for order, orders in (readers or {}).items()}
+
+        def run(step, step_client):
+            try:
+                step_client._execute_step(step, context, data_set_variables, validations_override, app_db_conn)
+            except BaseException as e:
+                # pytest.fail 抛出的 Failed 继承自 BaseException
+                errors[step.get('step_order')] = e
+
+        with ThreadPoolExecutor(max_workers=self.max_step_workers) as pool:
+            futures = {}
+            while pending or futures:
+                if not errors:
+                    ready = [step for step in pending if graph[step.get('step_order')] <= completed]
+                    for step in ready:
+                        pending.remove(step)
+                        step_client = self._fork_for_step()
+                        step_clients[step.get('step_order')] = step_client
+                        futures[pool.submit(run, step, step_client)] = step.get('step_order')
+                if not futures:
+                    break
+                finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    step_order = futures.pop(future)
+                    completed.add(step_order)
+                    for order in [order for order, orders in unfinished_readers.items() if step_order in orders]:
+                        unfinished_readers[order].discard(step_order)
+                        if not unfinished_readers[order]:
+                            del unfinished_readers[order]
+                            context.release_step_response(f"step_{order}")
 
         for step in all_steps:
-            step_order = step.get('step_order')
-            step_description = step.get('description', f'Step {step_order}')
-            step_name = f"step_{step_order}"
-
-            with allure.step(f"Step {step_order}: {step_description}"):
-                step_status = 'passed'
-                request_details_dict = {}
-                response_data = {}
-
-                try:
-                    # 1. 解析请求数据中的所有占位符
-                    api_url_path = resolve_placeholders(step.get('api_url_path', ''), context, data_set_variables)
-                    full_url = self.base_url + api_url_path
-
-                    headers = resolve_placeholders(step.get('headers'), context, data_set_variables)
-                    params = resolve_placeholders(step.get('params'), context, data_set_variables)
-                    body = resolve_placeholders(step.get('body'), context, data_set_variables)
-
-                    request_details_dict = {
-                        "method": step.get('http_method'), "url": full_url,
-                        "headers": headers, "params": params, "body": body
-                    }
-                    allure.attach(json.dumps(request_details_dict, indent=2, ensure_ascii=False), name="Request Details", attachment_type=allure.attachment_type.JSON)
-
-                    # 2. 发送 HTTP 请求
-                    response = self.session.request(
-                        method=step.get('http_method'), url=full_url, headers=headers,
-                        params=params, json=body, timeout=30
+            step_client = step_clients.get(step.get('step_order'))
+            if step_client is None: continue
+            step_client.reporter.replay(self.reporter)
+            self.audit_trail.extend(step_client.audit_trail)
+
+        if errors:
+            raise errors[min(errors)]
+
+    def _fork_for_step(self):
+        """复制出一个共享 HTTP 会话、但拥有独立报告器和审计轨迹的客户端，用于在线程中执行单个步骤。"""
+        step_client = copy.copy(self)
+        step_client.timer = PhaseTimer()
+        step_client.reporter = TimedReporter(RecordingReporter(), step_client.timer)
+        step_client.assertion_engine = AssertionEngine(step_client.reporter, log=self.assertion_engine.log,
+                                                       timer=step_client.timer)
+        step_client.audit_trail = []
+        return step_client
+
+    def _create_session(self):
+        session = requests.Session()
+        # 禁用环境变量代理，避免localhost请求通过代理导致502错误
+        session.trust_env = False
+        return session
+
+    # --- 单步执行的各个阶段 (同步与异步引擎共用) ---
+
+    def _build_request(self, step, context, data_set_variables):
+        """解析请求中的所有占位符，返回完整的请求参数字典，并附加到报告中。"""
+        with self.timer.phase('resolve'):
+            api_url_path = resolve_placeholders(step.get('api_url_path', ''), context, data_set_variables)
+            full_url = self.base_url + api_url_path
+
+            headers = resolve_placeholders(step.get('headers'), context, data_set_variables)
+            params = resolve_placeholders(step.get('params'), context, data_set_variables)
+            body = resolve_placeholders(step.get('body'), context, data_set_variables)
+
+        request_details_dict = {
+            "method": step.get('http_method'), "url": full_url,
+            "headers": headers, "params": params, "body": body
+        }
+        self.reporter.attach_json(request_details_dict, name="Request Details", ensure_ascii=False)
+        return request_details_dict
+
+    def _normalize_response(self, response):
+        """把 HTTP 响应标准化为 {'status_code', 'headers', 'body'}，并附加到报告中。"""
+        response_body = None
+        with self.timer.phase('decode'):
+            try:
+                response_body = response.json()
+            except json.JSONDecodeError:
+                response_body = response.text
+        response_data = {'status_code': response.status_code, 'headers': dict(response.headers), 'body': response_body}
+
+        self.reporter.attach_json(response_data, name="Response Details", ensure_ascii=False)
+        return response_data
+
+    def _process_response(self, step, response_data, context, data_set_variables, validations_override, app_db_conn,
+                          raw_body=None, body_size=None):
+        """将响应存入上下文，执行断言，并提取输出变量。"""
+        # 4. 将响应存入上下文
+        self._store_response(step, response_data, context, body_size)
+
+        # 5 - 6. 决定使用哪个验证规则（覆盖或默认）并执行断言
+        failures = self._evaluate_validations(step, response_data, context, data_set_variables, validations_override,
+                                              app_db_conn, raw_body)
+        if failures:
+            pytest.fail("\n".join(failures), pytrace=False)
+
+        # 7. 提取并存储输出变量
+        self._extract_outputs(step, context)
+
+    def _store_response(self, step, response_data, context, body_size):
+        context.add_step_response(f"step_{step.get('step_order')}", response_data, size=body_size or 0)
+
+    def _evaluate_validations(self, step, response_data, context, data_set_variables, validations_override, app_db_conn,
+                              raw_body=None, keywords=None):
+        """:return: 断言失败信息列表"""
+        final_validations, source_message = self._final_validations(step, validations_override)
+        if not final_validations:
+            return []
+        self.reporter.attach(source_message, name="Validation Source")
+
+        # 将原始的验证规则和解析所需的上下文一起传递给断言引擎
+        return self.assertion_engine.evaluate_assertions(
+            response_data,
+            final_validations,
+            app_db_conn=app_db_conn,
+            context=context,
+            data_set_vars=data_set_variables,
+            raw_body=raw_body,
+            keywords=keywords
+        )
+
+    def _extract_outputs(self, step, context):
+        step_name = f"step_{step.get('step_order')}"
+        outputs = step.get('outputs')
+        if outputs:
+            for output in outputs:
+                variable_name = output.get('variable_name')
+                if not variable_name: continue
+
+                with self.timer.phase('extract'):
+                    context.extract_and_set_variable(
+                        step_name, variable_name, output.get('source'), output.get('json_path')
                     )
+                    extracted_value = context.get_variable(variable_name)
+                self.reporter.attach(f"Extracted '{variable_name}' with value: {json.dumps(extracted_value)}", name="Variable Extraction", attachment_type=allure.attachment_type.TEXT)
+
+    # --- 最终一致性断言 (eventually) ---
+
+    def _eventual_check(self, step, validations_override):
+        """:return: 步骤配置了 eventually 时的 EventualCheck，否则为 None"""
+        final_validations, _ = self._final_validations(step, validations_override)
+        policy = parse_policy(final_validations)
+        if policy is None:
+            return None
+        return EventualCheck(policy, (step.get('http_method'), step.get('api_url_path'), policy.mode))
+
+    def _first_evaluation(self, check, step, response_data, context, data_set_variables, validations_override, app_db_conn,
+                          raw_body):
+        """
+        第一次评估全部断言。
+        :return: (失败信息, 重试时需要重新评估的关键字)；db 模式下响应断言失败时不再重试，关键字为 None
+        """
+        if check.policy.mode == 'request':
+            failures = self._evaluate_validations(step, response_data, context, data_set_variables, validations_override,
+                                                  app_db_conn, raw_body)
+            return failures, RESPONSE_KEYWORDS + DB_KEYWORDS
+        failures = self._evaluate_validations(step, response_data, context, data_set_variables, validations_override,
+                                              app_db_conn, raw_body, keywords=RESPONSE_KEYWORDS)
+        if failures:
+            return failures, None
+        failures = self._evaluate_validations(step, response_data, context, data_set_variables, validations_override,
+                                              app_db_conn, raw_body, keywords=DB_KEYWORDS)
+        return failures, DB_KEYWORDS
+
+    def _finish_eventually(self, check, failures):
+        """记录尝试次数和收敛时间并写入报告；超过期限仍失败时报告最后一次的失败信息。"""
+        check.finish(not failures)
+        summary = check.summary()
+        if failures:
+            message = (f"Validations did not converge within {check.policy.timeout}s "
+                       f"after {check.attempts} attempts ({check.policy.mode} mode).")
+        else:
+            message = (f"Validations converged after {check.attempts} attempts in "
+                       f"{summary['time_to_consistency']}s ({check.policy.mode} mode, waited {summary['waited']}s).")
+        self.reporter.attach(message + "\n" + json.dumps(summary), name="Eventual Consistency",
+                             attachment_type=allure.attachment_type.TEXT)
+        if failures:
+            pytest.fail(message + "\n" + "\n".join(failures), pytrace=False)
+
+    def _final_validations(self, step, validations_override):
+        """:return: (生效的验证规则, 来源说明)；数据集中的覆盖优先于步骤的默认规则"""
+        step_validations_override = validations_override.get(str(step.get('step_order')))
+        if step_validations_override is not None:
+            return step_validations_override, "Using validation rules from 'case_data_sets' (override)."
+        return step.get('validations'), "Using default validation rules from 'api_actions' or 'shared_actions'."
+
+    # --- 可缓存共享动作 ---
+
+    def _cache_key(self, step, request_details_dict, validations_override):
+        """:return: 可缓存共享动作的缓存键；未启用缓存或步骤不可缓存时为 None"""
+        if self.action_cache is None or not step.get('cacheable'):
+            return None
+        validations, _ = self._final_validations(step, validations_override)
+        body_paths = self._body_paths.get(step.get('step_order')) if self._body_paths else None
+        return cache_key(step, request_details_dict, validations, body_paths)
+
+    def _cache_lookup(self, key, step, context):
+        """
+        查找可缓存共享动作的结果。命中时把缓存的响应、提取的变量和 cookie 放回当前用例，并写入报告。
+        :return: 缓存条目；步骤不可缓存或未命中时为 None
+        """
+        if key is None:
+            return None
+        entry = self.action_cache.get(key)
+        if entry is None:
+            return None
+
+        context.add_step_response(f"step_{step.get('step_order')}", entry['response'], size=entry.get('body_size') or 0)
+        for variable_name, value in entry['variables'].items():
+            context.set_variable(variable_name, value)
+        if entry.get('cookies'):
+            self.session.cookies.update(entry['cookies'])
+        self._cache_hits.append(key)
+
+        now = self.action_cache.clock()
+        self.reporter.attach(
+            f"Reused the result of shared action '{step.get('shared_action_ref')}' without sending the request "
+            f"(cached {now - entry['stored_at']:.1f}s ago, expires in {entry['expires_at'] - now:.1f}s).\n"
+            f"Variables: {json.dumps(entry['variables'], ensure_ascii=False, default=str)}\n"
+            f"Cache key: {key}",
+            name="Shared Action Cache Hit", attachment_type=allure.attachment_type.TEXT
+        )
+        self.reporter.attach_json(entry['response'], name="Response Details (cached)", ensure_ascii=False)
+        return entry
+
+    def _cache_store(self, step, key, response_data, cookies, body_size, context):
+        """步骤执行并通过断言后，缓存其响应、提取出的变量和响应设置的 cookie。"""
+        if key is None:
+            return
+        variables = {
+            output['variable_name']: context.get_variable(output['variable_name'])
+            for output in step.get('outputs') or [] if output.get('variable_name')
+        }
+        self.action_cache.put(key, {
+            "response": response_data, "variables": variables, "cookies": cookies, "body_size": body_size
+        }, ttl=step.get('cache_ttl'))
+
+    def _invalidate_cache_hits(self):
+        """复用了缓存结果的用例失败时作废用到的条目 (例如 token 已失效)，后续用例重新执行该共享动作。"""
+        for key in self._cache_hits:
+            self.action_cache.invalidate(key)
+        self._cache_hits = []
+
+    def _release_responses(self, context, release_plan, step_order):
+        """释放在 step_order 之后不再被任何步骤引用的响应。"""
+        for released_order in (release_plan or {}).get(step_order, ()):
+            context.release_step_response(f"step_{released_order}")
+
+    def _report_context_size(self, context, step_count):
+        self.peak_context_bytes = context.peak_response_bytes
+        self.reporter.attach(
+            f"Peak size of step responses held in context: {context.peak_response_bytes} bytes\n"
+            f"Responses released after their last reference: {context.released_responses}/{step_count}",
+            name="Context Size", attachment_type=allure.attachment_type.TEXT
+        )
+
+    def _report_step_error(self, e):
+        self.reporter.attach(f"An error occurred during step execution:\n{type(e).__name__}: {e}", name="Step Execution Error", attachment_type=allure.attachment_type.TEXT)
 
-                    # 3. 标准化响应数据
-                    response_body = None
-                    try:
-                        response_body = response.json()
-                    except json.JSONDecodeError:
-                        response_body = response.text
-                    response_data = {'status_code': response.status_code, 'headers': dict(response.headers), 'body': response_body}
-
-                    allure.attach(json.dumps(response_data, indent=2, ensure_ascii=False), name="Response Details", attachment_type=allure.attachment_type.JSON)
-
-                    # 4. 将响应存入上下文
-                    context.add_step_response(step_name, response_data)
-
-                    # 5. 决定使用哪个验证规则（覆盖或默认）
-                    final_validations = None
-                    step_validations_override = validations_override.get(str(step_order))
-                    default_validations = step.get('validations')
-
-                    if step_validations_override is not None:
-                        final_validations = step_validations_override
-                        source_message = "Using validation rules from 'case_data_sets' (override)."
-                    else:
-                        final_validations = default_validations
-                        source_message = "Using default validation rules from 'api_actions' or 'shared_actions'."
-
-                    # 6. 执行断言
-                    if final_validations:
-                        allure.attach(source_message, name="Validation Source")
-                        
-
-
-                        # 将原始的验证规则和解析所需的上下文一起传递给断言引擎
-                        self.assertion_engine.execute_assertions(
-                            response_data,
-                            final_validations,
-                            app_db_conn=app_db_conn,
-                            context=context,
-                            data_set_vars=data_set_variables
-                        )
-
-                    # 7. 提取并存储输出变量
-                    outputs = step.get('outputs')
-                    if outputs:
-                        for output in outputs:
-                            variable_name = output.get('variable_name')
-                            if not variable_name: continue
-
-                            context.extract_and_set_variable(
-                                step_name, variable_name, output.get('source'), output.get('json_path')
-                            )
-                            extracted_value = context.get_variable(variable_name)
-                            allure.attach(f"Extracted '{variable_name}' with value: {json.dumps(extracted_value)}", name="Variable Extraction", attachment_type=allure.attachment_type.TEXT)
-
-                except Exception as e:
-                    step_status = 'failed'
-                    allure.attach(f"An error occurred during step execution:\n{type(e).__name__}: {e}", name="Step Execution Error", attachment_type=allure.attachment_type.TEXT)
-                    raise
-                finally:
-                    # 无论成功失败,都记录审计信息
-                    self.audit_trail.append({
-                        "step_order": step_order,
-                        "action_description": step_description,
-                        "request_details": request_details_dict,
-                        "response_details": response_data,
-                        "step_status": step_status
-                    })
+    def _record_audit(self, step_order, step_description, request_details_dict, response_data, step_status, body_size=None,
+                      eventually=None):
+        if not self.audit_response_bodies:
+            response_data = {key: value for key, value in response_data.items() if key != 'body'}
+        elif self.max_audit_bytes and response_data.get('body') is not None:
+            capped_body = cap_json_value(response_data['body'], self.max_audit_bytes, size_hint=body_size)
+            if capped_body is not response_data['body']:
+                response_data = dict(response_data, body=capped_body)
+        entry = {
+            "step_order": step_order,
+            "action_description": step_description,
+            "request_details": request_details_dict,
+            "response_details": response_data,
+            "step_status": step_status
+        }
+        if eventually is not None and eventually.converged is not None:
+            entry["attempts"] = eventually.attempts
+            entry["time_to_consistency"] = eventually.time_to_consistency
+        entry["timings"] = self.timer.take()
+        self.audit_trail.append(entry)
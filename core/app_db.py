@@ -0,0 +1,252 @@
+# core/app_db.py
+
+import contextlib
+import datetime
+import json
+import threading
+from decimal import Decimal
+from typing import NamedTuple
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+
+# =================================================================
+# 被测应用数据库 (test_environments.app_db_connection_string) 的连接池与 dbValidation 查询执行
+# - 同一连接串的引擎在进程内 (即每个 xdist worker) 只创建一次；每次校验从池中借出连接、用完归还，
+#   步骤并发和异步引擎中的校验不再共用同一个连接
+# - 默认按原来的方式把占位符的值拼进 SQL；开启 bind_params (或规则中 "bindParams": true) 时以绑定参数执行
+#   (占位符由 utils.placeholder_parser.compile_sql_template 编译)，
+#   PostgreSQL 上每条查询文本在每个物理连接上只 PREPARE 一次，之后以 EXECUTE 执行，复用服务端的解析和计划
+# - 开启批量时，一个步骤的多条绑定参数查询合并为一条语句，一次往返完成；结果与逐条执行时的 Python 类型一致
+# =================================================================
+
+DEFAULT_POOL_OPTIONS = {
+    "pool_size": 5,         # 每个连接串常驻的连接数
+    "max_overflow": 10,     # 高峰时允许额外创建的连接数
+    "pool_recycle": 1800,   # 连接使用超过该秒数后重建，避免被服务端或中间设备断开的空闲连接
+}
+# 每个物理连接上最多保留的预备语句数，超过时 DEALLOCATE ALL 后重新开始
+MAX_PREPARED_PER_CONNECTION = 256
+
+_engines = {}
+_engines_lock = threading.Lock()
+# PREPARE 失败的查询 (例如参数类型无法推断)，之后直接以绑定参数执行
+_unpreparable = set()
+# 批量执行时用到的每条查询的结果列类型 {SQL 片段: {列名: 类型 OID}}，每条查询在每个进程中只查询一次
+_column_types = {}
+
+
+def _infinity_aware(parse, minimum, maximum):
+    """psycopg2 把 'infinity' / '-infinity' 日期时间还原为对应类型的最大 / 最小值"""
+    def convert(value):
+        return {'infinity': maximum, '-infinity': minimum}.get(value) or parse(value)
+    return convert
+
+
+def _json_floats(value):
+    """json / jsonb 列：驱动按 float 解码其中的小数"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, list):
+        return [_json_floats(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _json_floats(item) for key, item in value.items()}
+    return value
+
+
+_UTC = datetime.timezone.utc
+# 合并执行的结果经 JSON 传回；按列类型 OID 还原为逐条执行时驱动 (psycopg2) 返回的类型
+_JSON_TYPE_CONVERTERS = {
+    700: float,             # real
+    701: float,             # double precision
+    1700: Decimal,          # numeric (整数值在 JSON 中没有小数部分)
+    1083: datetime.time.fromisoformat,  # time
+    1266: datetime.time.fromisoformat,  # timetz
+    1082: _infinity_aware(datetime.date.fromisoformat, datetime.date.min, datetime.date.max),
+    1114: _infinity_aware(datetime.datetime.fromisoformat, datetime.datetime.min, datetime.datetime.max),
+    1184: _infinity_aware(datetime.datetime.fromisoformat,
+                          datetime.datetime.min.replace(tzinfo=_UTC), datetime.datetime.max.replace(tzinfo=_UTC)),
+    114: _json_floats,      # json
+    3802: _json_floats,     # jsonb
+}
+
+
+class BoundQuery(NamedTuple):
+    """一条待执行的校验查询：SQL 片段之间依次是 values 中的参数。"""
+    fragments: tuple
+    values: tuple
+    prepare: bool = True
+
+
+def get_app_db_engine(conn_string: str, **pool_options) -> Engine:
+    """获取 (或首次创建) 连接串对应的带连接池的引擎。"""
+    options = {**DEFAULT_POOL_OPTIONS, **{k: v for k, v in pool_options.items() if v is not None}}
+    with _engines_lock:
+        engine = _engines.get(conn_string)
+        if engine is None:
+            engine = create_engine(conn_string, **options)
+            _engines[conn_string] = engine
+    return engine
+
+
+def dispose_all_engines():
+    """关闭本进程中所有应用数据库连接池 (会话结束时调用)。"""
+    with _engines_lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+
+
+def _join(fragments, markers):
+    return ''.join(fragment + marker for fragment, marker in zip(fragments, list(markers) + ['']))
+
+
+class AppDatabase:
+    """
+    dbValidation 使用的应用数据库入口，线程安全。
+    bind 可以是引擎 (每次查询从池中借出连接) 或单个连接 (直接使用，兼容旧的调用方式)。
+    """
+    def __init__(self, bind, prepare: bool = True, batch: bool = False, bind_params: bool = False):
+        self.bind = bind
+        self.prepare = prepare
+        self.batch = batch
+        # 规则中没有 "bindParams" 时是否以绑定参数执行 (默认把值拼进 SQL，与旧版本一致)
+        self.bind_params = bind_params
+        self._lock = threading.Lock()
+        self.stats = {"queries": 0, "round_trips": 0, "prepared": 0, "prepared_executions": 0}
+
+    def _count(self, **increments):
+        with self._lock:
+            for key, value in increments.items():
+                self.stats[key] += value
+
+    @contextlib.contextmanager
+    def _connection(self):
+        if isinstance(self.bind, Engine):
+            with self.bind.connect() as conn:
+                yield conn
+        else:
+            yield self.bind
+
+    def run_queries(self, queries):
+        """
+        在同一个连接上执行一个步骤的校验查询。开启批量、是 PostgreSQL 且都是绑定参数查询时合并为一次往返
+        (拼接了值的查询每次 SQL 文本都不同，无法缓存其结果列类型，仍逐条执行)。
+        :param queries: [BoundQuery]
+        :return: 每条查询的结果行 [[{列名: 值}, ...], ...]
+        """
+        with self._connection() as conn:
+            postgres = conn.dialect.name == 'postgresql'
+            self._count(queries=len(queries))
+            if self.batch and postgres and len(queries) > 1 and all(query.prepare for query in queries):
+                return self._run_batched(conn, queries)
+            return [self._execute(conn, query, postgres) for query in queries]
+
+    def _execute(self, conn, query, postgres):
+        self._count(round_trips=1)
+        name = self._prepared_name(conn, query) if postgres and self.prepare and query.prepare else None
+        if name is not None:
+            self._count(prepared_executions=1)
+            markers = ', '.join(['%s'] * len(query.values))
+            result = conn.exec_driver_sql(f"EXECUTE {name}({markers})" if markers else f"EXECUTE {name}",
+                                          tuple(query.values))
+        else:
+            names = [f"_p{index}" for index in range(len(query.values))]
+            result = conn.execute(text(_join(query.fragments, [f":{name}" for name in names])),
+                                  dict(zip(names, query.values)))
+        return [dict(row._mapping) for row in result]
+
+    def _prepared_name(self, conn, query):
+        """:return: 该查询在当前物理连接上的预备语句名；无法 PREPARE 时为 None"""
+        if query.fragments in _unpreparable:
+            return None
+        # conn.info 跟随底层 DBAPI 连接，连接归还连接池后仍然保留
+        prepared = conn.info.setdefault('framework_prepared', {})
+        name = prepared.get(query.fragments)
+        if name is not None:
+            return name
+        if len(prepared) >= MAX_PREPARED_PER_CONNECTION:
+            conn.exec_driver_sql("DEALLOCATE ALL")
+            prepared.clear()
+        sequence = conn.info.get('framework_prepared_seq', 0) + 1
+        conn.info['framework_prepared_seq'] = sequence
+        name = f"framework_q{sequence}"
+        statement = _join(query.fragments, [f"${index + 1}" for index in range(len(query.values))])
+        try:
+            # PREPARE 不受事务回滚影响；放在保存点中，失败时不会中断外层事务
+            with conn.begin_nested():
+                conn.exec_driver_sql(f"PREPARE {name} AS {statement.replace('%', '%%')}")
+        except DBAPIError:
+            _unpreparable.add(query.fragments)
+            return None
+        prepared[query.fragments] = name
+        self._count(prepared=1)
+        return name
+
+    def _run_batched(self, conn, queries):
+        """
+        把多条查询合并为一条 SELECT，每条查询的结果聚合为一个 JSON 文本列，
+        再按该查询的结果列类型还原为与逐条执行相同的 Python 类型 (Decimal、float、date、datetime 等)。
+        """
+        column_types = [self._column_types(conn, query) for query in queries]
+        fragments, values = [], []
+        for index, query in enumerate(queries):
+            parts = list(query.fragments[:-1]) + [_strip_terminator(query.fragments[-1])]
+            prefix = "SELECT " if index == 0 else ", "
+            parts[0] = f"{prefix}(SELECT COALESCE(json_agg(q), '[]'::json)::text FROM ({parts[0]}"
+            parts[-1] = f"{parts[-1]}) q) AS r{index}"
+            if fragments:
+                fragments[-1] += parts[0]
+                fragments.extend(parts[1:])
+            else:
+                fragments.extend(parts)
+            values.extend(query.values)
+        row = self._execute(conn, BoundQuery(tuple(fragments), tuple(values)), True)[0]
+        return [_restore_types(json.loads(row[f"r{index}"], parse_float=Decimal), types)
+                for index, types in enumerate(column_types)]
+
+    def _column_types(self, conn, query):
+        """:return: {列名: 类型 OID}；首次遇到该查询时以 LIMIT 0 执行一次取得 (不返回数据行)"""
+        types = _column_types.get(query.fragments)
+        if types is None:
+            self._count(round_trips=1)
+            names = [f"_p{index}" for index in range(len(query.values))]
+            fragments = list(query.fragments[:-1]) + [_strip_terminator(query.fragments[-1])]
+            statement = f"SELECT * FROM ({_join(fragments, [f':{name}' for name in names])}) q LIMIT 0"
+            result = conn.execute(text(statement), dict(zip(names, query.values)))
+            types = {column[0]: column[1] for column in result.cursor.description}
+            result.close()
+            _column_types[query.fragments] = types
+        return types
+
+
+def _strip_terminator(fragment):
+    return fragment.rstrip().rstrip(';')
+
+
+def _restore_types(rows, column_types):
+    """把 JSON 解码后的行按列类型还原；无法还原的值 (例如 'infinity') 保持原样。"""
+    for row in rows:
+        for column, value in row.items():
+            converter = _JSON_TYPE_CONVERTERS.get(column_types.get(column))
+            if converter is not None and value is not None:
+                try:
+                    row[column] = converter(value)
+                except (TypeError, ValueError, ArithmeticError):
+                    pass
+    return rows
+
+
+def as_app_database(db):
+    """兼容直接传入连接或引擎的调用方。"""
+    return db if db is None or isinstance(db, AppDatabase) else AppDatabase(db)
+
+
+def merge_statistics(stats_list):
+    """合并多个进程的查询统计。"""
+    merged = {"queries": 0, "round_trips": 0, "prepared": 0, "prepared_executions": 0}
+    for stats in stats_list:
+        for key in merged:
+            merged[key] += stats.get(key, 0)
+    return merged
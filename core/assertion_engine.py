@@ -1,12 +1,19 @@
 # core/assertion_engine.py
 
 import pytest
-import json
 import allure
 from typing import Dict, List, Any
-from jsonpath_ng import parse
-from sqlalchemy import text
-from utils.placeholder_parser import resolve_placeholders # 导入解析器
+from utils.jsonpath_cache import find_values
+from utils.placeholder_parser import compile_sql_template, resolve_placeholders # 导入解析器
+from core.app_db import BoundQuery, as_app_database
+from utils.json_match import partial_match_failure
+from core.reporter import AllureReporter
+from core.phase_timer import timed_phase
+
+
+# 只依赖响应的断言关键字；eventually 的 db 模式下这些断言不会因为等待而改变结果
+RESPONSE_KEYWORDS = ("expectedStatusCode", "body", "containsText", "notNull", "notExist")
+DB_KEYWORDS = ("dbValidation",)
 
 
 class AssertionEngine:
@@ -14,60 +21,85 @@ class AssertionEngine:
     统一的、关键字驱动的智能断言引擎。
     它接收原始的验证规则，并在内部对每个关键字进行“即时解析”。
     """
-    def __init__(self):
-        pass
+    def __init__(self, reporter=None, log=print, timer=None):
+        """
+        :param reporter: (可选) 报告器，默认直接写入 allure。
+        :param log: 断言通过时输出说明的函数 (pytest 捕获到用例输出中)；压测模式下不输出。
+        :param timer: (可选) core.phase_timer.PhaseTimer，每个关键字的耗时计入 assert.<关键字> 阶段。
+        """
+        self.reporter = reporter or AllureReporter()
+        self.log = log
+        self.timer = timer
+
+    def execute_assertions(self, response: Dict[str, Any], validation_rules: Dict[str, Any], app_db_conn=None, context=None, data_set_vars=None, raw_body: bytes = None):
+        failures = self.evaluate_assertions(response, validation_rules, app_db_conn, context, data_set_vars, raw_body)
+        if failures:
+            pytest.fail("\n".join(failures), pytrace=False)
 
-    def execute_assertions(self, response: Dict[str, Any], validation_rules: Dict[str, Any], app_db_conn=None, context=None, data_set_vars=None):
+    def evaluate_assertions(self, response: Dict[str, Any], validation_rules: Dict[str, Any], app_db_conn=None, context=None,
+                            data_set_vars=None, raw_body: bytes = None, keywords=None) -> List[str]:
+        """
+        执行断言但不抛出异常，返回失败信息列表 (eventually 重试时据此决定是否继续)。
+        :param keywords: (可选) 只评估这些关键字，例如只重新执行 dbValidation
+        """
         if not isinstance(validation_rules, dict):
-            pytest.fail(f"Validation rules must be a JSON object, but got {type(validation_rules).__name__}", pytrace=False)
+            return [f"Validation rules must be a JSON object, but got {type(validation_rules).__name__}"]
 
         failures = []
 
+        def wanted(keyword):
+            return keyword in validation_rules and (keywords is None or keyword in keywords)
+
         # --- 调度中心：将解析所需的上下文传递给每个 dispatcher ---
-        if "expectedStatusCode" in validation_rules:
-            self._dispatch_status_code(response, validation_rules, failures, context, data_set_vars)
+        if wanted("expectedStatusCode"):
+            with timed_phase(self.timer, "assert.expectedStatusCode"):
+                self._dispatch_status_code(response, validation_rules, failures, context, data_set_vars)
 
-        if "body" in validation_rules:
-            self._dispatch_body_match(response, validation_rules, failures, context, data_set_vars)
+        if wanted("body"):
+            with timed_phase(self.timer, "assert.body"):
+                self._dispatch_body_match(response, validation_rules, failures, context, data_set_vars)
 
-        if "containsText" in validation_rules:
-            self._dispatch_contains_text(response, validation_rules, failures, context, data_set_vars)
+        if wanted("containsText"):
+            with timed_phase(self.timer, "assert.containsText"):
+                self._dispatch_contains_text(response, validation_rules, failures, context, data_set_vars, raw_body)
 
-        if "notNull" in validation_rules:
-            self._dispatch_not_null(response, validation_rules, failures, context, data_set_vars)
+        if wanted("notNull"):
+            with timed_phase(self.timer, "assert.notNull"):
+                self._dispatch_not_null(response, validation_rules, failures, context, data_set_vars)
 
-        if "notExist" in validation_rules:
-            self._dispatch_not_exist(response, validation_rules, failures, context, data_set_vars)
+        if wanted("notExist"):
+            with timed_phase(self.timer, "assert.notExist"):
+                self._dispatch_not_exist(response, validation_rules, failures, context, data_set_vars)
 
-        if "dbValidation" in validation_rules:
-            self._dispatch_db_validation(response, validation_rules, app_db_conn, failures, context, data_set_vars)
+        if wanted("dbValidation"):
+            with timed_phase(self.timer, "assert.dbValidation"):
+                self._dispatch_db_validation(response, validation_rules, app_db_conn, failures, context, data_set_vars)
 
-        if failures:
-            pytest.fail("\n".join(failures), pytrace=False)
+        return failures
 
     # --- Dispatcher Methods ---
 
     def _dispatch_status_code(self, response, rules, failures, context, data_set_vars):
         resolved_status_code = resolve_placeholders(rules["expectedStatusCode"], context, data_set_vars)
-        with allure.step(f"Assert: Status Code equals [{resolved_status_code}]"):
+        with self.reporter.step(f"Assert: Status Code equals [{resolved_status_code}]"):
             try:
                 self._assert_status_code(response['status_code'], resolved_status_code)
             except AssertionError as e: failures.append(str(e))
 
     def _dispatch_body_match(self, response, rules, failures, context, data_set_vars):
-        with allure.step("Assert: Body partially matches expected JSON"):
+        with self.reporter.step("Assert: Body partially matches expected JSON"):
             try:
                 resolved_expected_json = resolve_placeholders(rules["body"], context, data_set_vars)
                 if resolved_expected_json:
-                    allure.attach(json.dumps(resolved_expected_json, indent=2, ensure_ascii=False), name="Expected Partial JSON (Resolved)", attachment_type=allure.attachment_type.JSON)
+                    self.reporter.attach_json(resolved_expected_json, name="Expected Partial JSON (Resolved)", ensure_ascii=False)
                     self._assert_partial_json_match(response['body'], resolved_expected_json)
             except AssertionError as e: failures.append(str(e))
 
-    def _dispatch_contains_text(self, response, rules, failures, context, data_set_vars):
+    def _dispatch_contains_text(self, response, rules, failures, context, data_set_vars, raw_body=None):
         resolved_text = resolve_placeholders(rules["containsText"], context, data_set_vars)
-        with allure.step(f"Assert: Body contains text [{resolved_text[:50]}...]"):
+        with self.reporter.step(f"Assert: Body contains text [{resolved_text[:50]}...]"):
             try:
-                self._assert_body_contains_text(response['body'], resolved_text)
+                self._assert_body_contains_text(response['body'], resolved_text, raw_body)
             except AssertionError as e: failures.append(str(e))
 
     def _dispatch_not_null(self, response, rules, failures, context, data_set_vars):
@@ -75,7 +107,7 @@ class AssertionEngine:
         if not isinstance(json_paths, list):
             failures.append("Assertion Failed: 'notNull' value must be an array of JSONPaths.")
             return
-        with allure.step(f"Assert: Paths are not null {json_paths}"):
+        with self.reporter.step(f"Assert: Paths are not null {json_paths}"):
             for path in json_paths:
                 try:
                     self._assert_json_path_not_null(response['body'], path)
@@ -86,7 +118,7 @@ class AssertionEngine:
         if not isinstance(json_paths, list):
             failures.append("Assertion Failed: 'notExist' value must be an array of JSONPaths.")
             return
-        with allure.step(f"Assert: Paths do not exist {json_paths}"):
+        with self.reporter.step(f"Assert: Paths do not exist {json_paths}"):
             for path in json_paths:
                 try:
                     self._assert_json_path_not_exist(response['body'], path)
@@ -97,90 +129,107 @@ class AssertionEngine:
             allure.step("⚠️ SKIPPED: DB Validation (no application DB connection available)")
             return
 
-        db_validation_rule = rules["dbValidation"]
-        query = db_validation_rule.get("query")
-        if not query:
+        # dbValidation 可以是一条规则，也可以是多条规则组成的列表
+        db_rules = rules["dbValidation"]
+        db_rules = db_rules if isinstance(db_rules, list) else [db_rules]
+        if not all(isinstance(rule, dict) and rule.get("query") for rule in db_rules):
             failures.append("Assertion Failed: 'dbValidation' is missing the 'query' key.")
             return
 
-        resolved_query = resolve_placeholders(query, context, data_set_vars)
-        with allure.step(f"Assert: Database validation with query [{resolved_query[:100]}...]"):
-            try:
-                self._assert_db_query(db_conn, resolved_query, db_validation_rule, response, context, data_set_vars)
-            except Exception as e:
-                failures.append(f"DB query or validation failed: {e}")
+        app_db = as_app_database(db_conn)
+        queries = [self._bind_db_query(rule, context, data_set_vars, app_db.bind_params) for rule in db_rules]
+
+        results = None
+        if app_db.batch and len(queries) > 1:
+            with self.reporter.step(f"Database validation batch ({len(queries)} queries)"):
+                try:
+                    results = app_db.run_queries(queries)
+                except Exception as e:
+                    failures.append(f"DB query or validation failed: {e}")
+                    return
+
+        for index, (rule, query) in enumerate(zip(db_rules, queries)):
+            with self.reporter.step(f"Assert: Database validation with query [{rule['query'][:100]}...]"):
+                try:
+                    if query.values:
+                        self.reporter.attach_json(list(query.values), name="DB Query Parameters", default=str)
+                    actual_rows = results[index] if results is not None else app_db.run_queries([query])[0]
+                    self._assert_db_query(actual_rows, rule, response, context, data_set_vars)
+                except Exception as e:
+                    failures.append(f"DB query or validation failed: {e}")
+
+    def _bind_db_query(self, rule, context, data_set_vars, bind_params=False):
+        """
+        默认按原来的方式把占位符的值拼进 SQL (占位符可以用作表名、IN 列表、LIMIT 等 SQL 片段)；
+        规则中 "bindParams": true (或 --bind-db-params 且规则未指定) 时编译为绑定参数。
+        """
+        if rule.get("bindParams", bind_params):
+            template = compile_sql_template(rule["query"])
+            return BoundQuery(template.fragments, tuple(template.bind(context, data_set_vars)))
+        return BoundQuery((resolve_placeholders(rule["query"], context, data_set_vars),), (), prepare=False)
 
     # --- Helper Assertion Methods ---
 
-    def _assert_db_query(self, db_conn, query, rule, response, context, data_set_vars):
-        result = db_conn.execute(text(query))
-        actual_rows = [dict(row._mapping) for row in result]
-        allure.attach(json.dumps(actual_rows, indent=2, default=str), name="Actual DB Query Result", attachment_type=allure.attachment_type.JSON)
+    def _assert_db_query(self, actual_rows, rule, response, context, data_set_vars):
+        self.reporter.attach_json(actual_rows, name="Actual DB Query Result", default=str)
 
         if "expected" in rule:
             resolved_expected_rows = resolve_placeholders(rule["expected"], context, data_set_vars)
-            allure.attach(json.dumps(resolved_expected_rows, indent=2), name="Expected DB Rows (Resolved)", attachment_type=allure.attachment_type.JSON)
+            self.reporter.attach_json(resolved_expected_rows, name="Expected DB Rows (Resolved)")
             assert actual_rows == resolved_expected_rows, f"DB query result mismatch. Expected: {resolved_expected_rows}, Actual: {actual_rows}"
-            print("DB query result matches expected static values.")
+            self.log("DB query result matches expected static values.")
 
         elif "expectedFromResponse" in rule:
             expected_mappings = rule["expectedFromResponse"]
             assert len(actual_rows) > 0, "DB query returned no rows to validate against response."
             db_row = actual_rows[0]
 
+            # 每个 JSONPath 只求值一次，同时用于报告和断言
+            api_values = {}
             expected_from_response = {}
             for db_column, response_json_path in expected_mappings.items():
-                matches = parse(response_json_path).find(response['body'])
+                matches = find_values(response_json_path, response['body'])
                 if matches:
-                    expected_from_response[db_column] = matches[0].value
+                    api_values[db_column] = matches[0]
+                    expected_from_response[db_column] = matches[0]
                 else:
                     expected_from_response[db_column] = f"ERROR: JSONPath '{response_json_path}' not found!"
-            allure.attach(json.dumps([expected_from_response], indent=2, default=str), name="Expected DB Rows (from API Response)", attachment_type=allure.attachment_type.JSON)
+            self.reporter.attach_json([expected_from_response], name="Expected DB Rows (from API Response)", default=str)
 
             for db_column, response_json_path in expected_mappings.items():
                 assert db_column in db_row, f"Column '{db_column}' not found in DB query result."
-                matches = parse(response_json_path).find(response['body'])
-                assert len(matches) > 0, f"JSONPath '{response_json_path}' not found in API response."
-                api_value = matches[0].value
+                assert db_column in api_values, f"JSONPath '{response_json_path}' not found in API response."
+                api_value = api_values[db_column]
                 db_value = db_row[db_column]
                 assert str(api_value) == str(db_value), f"Mismatch for DB column '{db_column}'. DB Value: '{db_value}', API Value (from {response_json_path}): '{api_value}'"
-                print(f"DB column '{db_column}' value '{db_value}' matches API response.")
+                self.log(f"DB column '{db_column}' value '{db_value}' matches API response.")
 
     def _assert_status_code(self, actual, expected):
         assert str(actual) == str(expected), f"Expected status code '{expected}', but got '{actual}'."
-        print(f"Status code is '{actual}' as expected.")
+        self.log(f"Status code is '{actual}' as expected.")
 
     def _assert_partial_json_match(self, actual, expected, path="body"):
-        if isinstance(expected, dict):
-            assert isinstance(actual, dict), f"Type mismatch at path '{path}': expected dict, got {type(actual).__name__}"
-            for key, expected_value in expected.items():
-                current_path = f"{path}.{key}"
-                assert key in actual, f"Missing key at path '{current_path}'"
-                self._assert_partial_json_match(actual[key], expected_value, path=current_path)
-        elif isinstance(expected, list):
-            assert isinstance(actual, list), f"Type mismatch at path '{path}': expected list, got {type(actual).__name__}"
-            assert len(actual) >= len(expected), f"Length mismatch at path '{path}': expected at least {len(expected)}, got {len(actual)}"
-            for i, expected_item in enumerate(expected):
-                current_path = f"{path}[{i}]"
-                self._assert_partial_json_match(actual[i], expected_item, path=current_path)
-        else:
-            assert actual == expected, f"Value mismatch at path '{path}': expected '{expected}', got '{actual}'"
+        # 成功时不生成任何路径字符串，只有失败时才定位第一个不匹配的位置
+        failure = partial_match_failure(actual, expected, root=path)
+        assert failure is None, failure
 
         if path == "body":
-            print("Body partially matches the expectation.")
+            self.log("Body partially matches the expectation.")
 
-    def _assert_body_contains_text(self, body, text):
-        assert text in str(body), f"Expected text '{text}' not found in response body."
-        print(f"Response body contains the text '{text}'.")
+    def _assert_body_contains_text(self, body, text, raw_body=None):
+        # 先在原始响应字节中查找，避免把解析后的大对象重新序列化；找不到时再按解析后的内容确认
+        found = raw_body is not None and text.encode('utf-8') in raw_body
+        assert found or text in str(body), f"Expected text '{text}' not found in response body."
+        self.log(f"Response body contains the text '{text}'.")
 
     def _assert_json_path_not_null(self, body, json_path):
-        matches = parse(json_path).find(body)
+        matches = find_values(json_path, body)
         assert len(matches) > 0, f"Path '{json_path}' not found (expected not null)."
-        actual_value = matches[0].value
+        actual_value = matches[0]
         assert actual_value is not None, f"Path '{json_path}' exists but its value is null."
-        print(f"Path '{json_path}' exists and is not null.")
+        self.log(f"Path '{json_path}' exists and is not null.")
 
     def _assert_json_path_not_exist(self, body, json_path):
-        matches = parse(json_path).find(body)
+        matches = find_values(json_path, body)
         assert len(matches) == 0, f"Path '{json_path}' was found, but was expected not to exist."
-        print(f"Path '{json_path}' does not exist as expected.")
+        self.log(f"Path '{json_path}' does not exist as expected.")
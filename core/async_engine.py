@@ -0,0 +1,231 @@
+# core/async_engine.py
+
+import asyncio
+import contextlib
+import time
+from typing import Dict, Any
+
+import httpx
+import pytest
+
+from core.api_client import ApiClient
+from core.context_manager import TestContext
+from core.phase_timer import HttpxTrace
+from core.reporter import RecordingReporter
+from core.step_analysis import analyze_steps, response_release_plan
+
+
+class AsyncApiClient(ApiClient):
+    """
+    异步执行引擎。
+    每个数据集使用一个独立的实例 (独立的 cookie、上下文和审计轨迹)，
+    但所有实例共享同一个 httpx 传输层，即同一个连接池。
+    步骤之间仍严格按 step_order 顺序执行；报告事件先记录，稍后在测试函数中回放。
+    响应体总是完整读取 (不支持流式模式)，审计记录的大小上限仍然生效。
+    """
+    # 是否通过 httpx 的 trace 扩展区分 connect / ttfb / download；关闭时整个请求计入 ttfb
+    trace_requests = True
+
+    def __init__(self, base_url: str, transport: httpx.AsyncBaseTransport, max_audit_bytes: int = None,
+                 release_responses: bool = True, audit_response_bodies: bool = True, action_cache=None,
+                 action_locks: Dict[str, asyncio.Lock] = None, reporter=None):
+        self._transport = transport
+        # 同一事件循环内所有用例共享的 {缓存键: 锁}，同一个可缓存动作同时只执行一次
+        self._action_locks = action_locks if action_locks is not None else {}
+        super().__init__(base_url, reporter=reporter or RecordingReporter(), max_audit_bytes=max_audit_bytes,
+                         release_responses=release_responses, audit_response_bodies=audit_response_bodies,
+                         action_cache=action_cache)
+
+    def _create_session(self):
+        return httpx.AsyncClient(transport=self._transport, trust_env=False, timeout=30)
+
+    def _action_lock(self, key):
+        if key is None:
+            return contextlib.nullcontext()
+        return self._action_locks.setdefault(key, asyncio.Lock())
+
+    async def execute_steps_async(self, case_details: Dict[str, Any], app_db_conn=None):
+        """execute_steps 的异步版本，执行流程和报告结构完全一致。"""
+        context = TestContext()
+        data_set_variables = case_details.get('data_set_variables', {})
+        validations_override = case_details.get('validations_override') or {}
+        case_name = case_details.get('name', 'Unknown Case')
+        all_steps = case_details.get('steps', [])
+
+        self.reporter.title(case_name)
+        release_plan = response_release_plan(analyze_steps(all_steps, validations_override)) if self.release_responses else {}
+        self._cache_hits = []
+
+        try:
+            for step in all_steps:
+                await self._execute_step_async(step, context, data_set_variables, validations_override, app_db_conn)
+                self._release_responses(context, release_plan, step.get('step_order'))
+        except BaseException:
+            self._invalidate_cache_hits()
+            raise
+        finally:
+            self._report_context_size(context, len(all_steps))
+
+    async def _execute_step_async(self, step, context, data_set_variables, validations_override, app_db_conn):
+        step_order = step.get('step_order')
+        step_description = step.get('description', f'Step {step_order}')
+
+        with self.reporter.step(f"Step {step_order}: {step_description}"):
+            step_status = 'passed'
+            request_details_dict = {}
+            response_data = {}
+            body_size = None
+            key = None
+            check = None
+            self.timer.take()
+
+            try:
+                request_details_dict = self._build_request(step, context, data_set_variables)
+
+                key = self._cache_key(step, request_details_dict, validations_override)
+                # 并发的用例同时遇到未缓存的动作时只由第一个执行，其余等待后直接命中缓存
+                async with self._action_lock(key):
+                    cached = self._cache_lookup(key, step, context)
+                    if cached is not None:
+                        step_status = 'cached'
+                        response_data, body_size = cached['response'], cached.get('body_size')
+                        return
+
+                    response, response_data, raw_body, body_size = await self._send_request_async(request_details_dict)
+
+                    check = self._eventual_check(step, validations_override)
+                    if check is None:
+                        await self._validate(self._uses_app_db(step, validations_override, app_db_conn),
+                                             self._process_response, step, response_data, context, data_set_variables,
+                                             validations_override, app_db_conn, raw_body=raw_body, body_size=body_size)
+                    else:
+                        response, response_data, body_size = await self._process_eventually_async(
+                            check, step, (response, response_data, raw_body, body_size), context, data_set_variables,
+                            validations_override, app_db_conn, request_details_dict
+                        )
+                    self._cache_store(step, key, response_data, dict(response.cookies), body_size, context)
+
+            except (Exception, pytest.fail.Exception) as e:
+                step_status = 'failed'
+                self._report_step_error(e)
+                raise
+            finally:
+                self._record_audit(step_order, step_description, request_details_dict, response_data, step_status, body_size,
+                                   eventually=check)
+
+    async def _send_request_async(self, request_details_dict):
+        """:return: (response, response_data, raw_body, body_size)"""
+        # connect / ttfb / download 来自 httpcore 的 trace 事件
+        trace = HttpxTrace(self.timer.clock)
+        started = self.timer.clock()
+        response = await self.session.request(
+            method=request_details_dict['method'], url=request_details_dict['url'],
+            headers=request_details_dict['headers'], params=request_details_dict['params'],
+            json=request_details_dict['body'], extensions={"trace": trace} if self.trace_requests else None
+        )
+        trace.apply(self.timer, self.timer.clock() - started)
+        return response, self._normalize_response(response), response.content, len(response.content)
+
+    async def _process_eventually_async(self, check, step, sent, context, data_set_variables, validations_override,
+                                        app_db_conn, request_details_dict):
+        """与 ApiClient._process_eventually 相同，等待期间让出事件循环，其他用例继续执行。"""
+        response, response_data, raw_body, body_size = sent
+        uses_app_db = self._uses_app_db(step, validations_override, app_db_conn)
+        self._store_response(step, response_data, context, body_size)
+        failures, keywords = await self._validate(uses_app_db, self._first_evaluation, check, step, response_data, context,
+                                                  data_set_variables, validations_override, app_db_conn, raw_body)
+        while failures and keywords:
+            delay = check.next_delay()
+            if delay is None:
+                break
+            with self.timer.phase('wait'):
+                await asyncio.sleep(delay)
+            with self.reporter.step(f"Eventually: attempt {check.attempts} after waiting {delay:.2f}s"):
+                if check.policy.mode == 'request':
+                    response, response_data, raw_body, body_size = await self._send_request_async(request_details_dict)
+                    self._store_response(step, response_data, context, body_size)
+                failures = await self._validate(uses_app_db, self._evaluate_validations, step, response_data, context,
+                                                data_set_variables, validations_override, app_db_conn, raw_body,
+                                                keywords=keywords)
+        self._finish_eventually(check, failures)
+        self._extract_outputs(step, context)
+        return response, response_data, body_size
+
+
+    def _uses_app_db(self, step, validations_override, app_db_conn):
+        validations, _ = self._final_validations(step, validations_override)
+        return app_db_conn is not None and isinstance(validations, dict) and 'dbValidation' in validations
+
+    @staticmethod
+    async def _validate(uses_app_db, function, *args, **kwargs):
+        """
+        执行步骤的断言。应用数据库 (dbValidation) 是同步的连接池，查询期间会阻塞事件循环中的所有用例，
+        因此这类步骤的断言放到线程中执行；其余断言很快，直接在事件循环中执行。
+        """
+        if uses_app_db:
+            return await asyncio.to_thread(function, *args, **kwargs)
+        return function(*args, **kwargs)
+
+
+class AsyncCaseOutcome:
+    """一个数据集在异步引擎中的执行结果，用于在对应的 pytest 用例中回放。"""
+    def __init__(self, client: AsyncApiClient, error: BaseException = None, duration: float = 0.0):
+        self.reporter = client.reporter
+        self.audit_trail = client.audit_trail
+        self.resolved_data_set_variables = client.resolved_data_set_variables
+        self.peak_context_bytes = client.peak_context_bytes
+        self.error = error
+        self.duration = duration
+
+    def replay(self, api_client: ApiClient):
+        """把报告事件写入当前 allure 用例，并把审计信息交给 api_client；失败时重新抛出原异常。"""
+        api_client.audit_trail = self.audit_trail
+        api_client.resolved_data_set_variables = self.resolved_data_set_variables
+        api_client.peak_context_bytes = self.peak_context_bytes
+        self.reporter.replay(api_client.reporter)
+        api_client.reporter.flush(self.error is not None)
+        if self.error is not None:
+            raise self.error
+
+
+async def _run_all(base_url, cases: Dict[Any, Dict[str, Any]], concurrency: int, app_db_conn=None, **client_options):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+    action_locks = {}
+
+    async with httpx.AsyncHTTPTransport(limits=limits) as transport:
+        async def run_one(key, case_details):
+            async with semaphore:
+                client = AsyncApiClient(base_url, transport, action_locks=action_locks, **client_options)
+                started = time.perf_counter()
+                error = None
+                try:
+                    await client.execute_steps_async(case_details, app_db_conn=app_db_conn)
+                except (KeyboardInterrupt, SystemExit, asyncio.CancelledError):
+                    raise
+                except BaseException as e:
+                    # pytest.fail 抛出的 Failed 继承自 BaseException，这里一并记录
+                    error = e
+                return key, AsyncCaseOutcome(client, error, time.perf_counter() - started)
+
+        results = await asyncio.gather(*(run_one(key, details) for key, details in cases.items()))
+    return dict(results)
+
+
+def run_cases_concurrently(base_url: str, cases: Dict[Any, Dict[str, Any]], concurrency: int = 100, app_db_conn=None,
+                           **client_options):
+    """
+    在一个事件循环中并发执行多个数据集，最多同时有 concurrency 个用例在途。
+
+    :param cases: {key: case_details}，key 通常是 (case_id, data_set_id)。
+    :param client_options: 传给每个 AsyncApiClient 的选项 (max_audit_bytes、release_responses、audit_response_bodies、
+                           action_cache)。
+    :return: {key: AsyncCaseOutcome}
+    """
+    if not cases:
+        return {}
+    print(f"--- Async engine: executing {len(cases)} data sets with concurrency {concurrency} ---")
+    started = time.perf_counter()
+    outcomes = asyncio.run(_run_all(base_url, cases, concurrency, app_db_conn=app_db_conn, **client_options))
+    print(f"--- Async engine: finished in {time.perf_counter() - started:.2f}s ---")
+    return outcomes
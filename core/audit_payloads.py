@@ -0,0 +1,148 @@
+# core/audit_payloads.py
+
+import hashlib
+import json
+import threading
+import zlib
+from collections import OrderedDict
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from models.tables import AuditPayload, AutoTestAudit
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖：未安装时退回到标准库 zlib
+    zstandard = None
+
+# =================================================================
+# Debug 审计载荷的压缩与去重存储
+# - 每个 request_details / response_details 序列化为规范化 JSON，按 sha256 去重，
+#   压缩后只在 audit_payloads 中保存一份；auto_test_audit 只记录哈希
+# - 不同数据集、不同运行之间完全相同的响应体只存一次
+# - 读取时通过 get_debug_logs / load_payloads 透明地解压，旧的 JSONB 行照常返回
+# =================================================================
+
+ZSTD_LEVEL = 3
+# 本进程已确认写入数据库的哈希数量上限，命中时无需再压缩和插入
+KNOWN_HASH_CACHE_SIZE = 100000
+
+# zstd 的压缩/解压上下文不是线程安全的，每个线程各自复用一份
+_local = threading.local()
+
+
+def _canonical_json(value) -> bytes:
+    return json.dumps(value, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str).encode('utf-8')
+
+
+def compress(data: bytes):
+    """返回 (codec, compressed)；优先使用 zstd。"""
+    if zstandard is not None:
+        compressor = getattr(_local, 'compressor', None)
+        if compressor is None:
+            compressor = _local.compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+        return 'zstd', compressor.compress(data)
+    return 'zlib', zlib.compress(data, 6)
+
+
+def decompress(codec: str, data: bytes) -> bytes:
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("读取 zstd 压缩的审计载荷需要安装 zstandard")
+        decompressor = getattr(_local, 'decompressor', None)
+        if decompressor is None:
+            decompressor = _local.decompressor = zstandard.ZstdDecompressor()
+        return decompressor.decompress(data)
+    if codec == 'zlib':
+        return zlib.decompress(data)
+    raise ValueError(f"未知的审计载荷编码: {codec}")
+
+
+def decode_payload(codec: str, data: bytes):
+    return json.loads(decompress(codec, bytes(data)))
+
+
+class PayloadEncoder:
+    """
+    把审计载荷编码为 (哈希, audit_payloads 行)。
+    同一批次内以及本进程已写入过的相同内容只产生一次压缩和插入。
+    """
+    def __init__(self, known_cache_size=KNOWN_HASH_CACHE_SIZE):
+        self.known_cache_size = known_cache_size
+        self._known = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"payloads": 0, "new_payloads": 0, "raw_bytes": 0, "stored_bytes": 0}
+
+    def encode(self, value, pending: dict):
+        """
+        :param pending: 本批次待插入的 {hash: audit_payloads 行}，新内容会加入其中
+        :return: 载荷的哈希；value 为 None 时返回 None
+        """
+        if value is None:
+            return None
+        serialized = _canonical_json(value)
+        digest = hashlib.sha256(serialized).hexdigest()
+        self.stats["payloads"] += 1
+        self.stats["raw_bytes"] += len(serialized)
+        if digest in pending or self._is_known(digest):
+            return digest
+        codec, data = compress(serialized)
+        pending[digest] = {"hash": digest, "codec": codec, "raw_size": len(serialized), "data": data}
+        self.stats["new_payloads"] += 1
+        self.stats["stored_bytes"] += len(data)
+        return digest
+
+    def mark_stored(self, digests):
+        """事务提交成功后调用，之后相同内容直接复用已有的行。"""
+        with self._lock:
+            for digest in digests:
+                self._known[digest] = None
+                self._known.move_to_end(digest)
+            while len(self._known) > self.known_cache_size:
+                self._known.popitem(last=False)
+
+    def _is_known(self, digest):
+        with self._lock:
+            if digest in self._known:
+                self._known.move_to_end(digest)
+                return True
+            return False
+
+
+def insert_payloads(session, payload_rows):
+    """批量写入 audit_payloads，已存在的哈希直接跳过 (不提交)。"""
+    if payload_rows:
+        session.execute(insert(AuditPayload).on_conflict_do_nothing(index_elements=['hash']), payload_rows)
+
+
+def load_payloads(session, digests):
+    """批量读取并解压载荷。:return: {hash: 解压后的 JSON 值}"""
+    wanted = {digest for digest in digests if digest}
+    if not wanted:
+        return {}
+    rows = session.execute(
+        select(AuditPayload.hash, AuditPayload.codec, AuditPayload.data).where(AuditPayload.hash.in_(wanted))
+    ).all()
+    return {digest: decode_payload(codec, data) for digest, codec, data in rows}
+
+
+def get_debug_logs(session, audit_case_id):
+    """
+    读取一个场景的 Debug 步骤日志，按 step_order 排序。
+    压缩存储的载荷会被透明解压，返回结构与 JSONB 存储时完全一致。
+    """
+    records = session.execute(
+        select(AutoTestAudit).where(AutoTestAudit.audit_case_id == audit_case_id).order_by(AutoTestAudit.step_order, AutoTestAudit.id)
+    ).scalars().all()
+    payloads = load_payloads(session, [r.request_hash for r in records] + [r.response_hash for r in records])
+    return [{
+        "id": record.id,
+        "step_order": record.step_order,
+        "action_description": record.action_description,
+        "request_details": payloads.get(record.request_hash) if record.request_hash else record.request_details,
+        "response_details": payloads.get(record.response_hash) if record.response_hash else record.response_details,
+        "step_status": record.step_status,
+        "attempts": record.attempts,
+        "time_to_consistency": record.time_to_consistency,
+    } for record in records]
@@ -1,10 +1,19 @@
 # core/context_manager.py
 import re
-from jsonpath_ng import parse
+import threading
+from utils.jsonpath_cache import find_values
 
 class TestContext:
     def __init__(self):
         self.storage = {}
+        # 动态变量的 "读取-生成-写入" 需要原子完成，步骤并发执行时由锁保护
+        self._variable_lock = threading.Lock()
+        # 上下文中步骤响应的大小统计 (按响应体序列化后的长度估算)，步骤并发执行时由锁保护
+        self._size_lock = threading.Lock()
+        self._response_sizes = {}
+        self.response_bytes = 0
+        self.peak_response_bytes = 0
+        self.released_responses = 0
 
     def set(self, key, value):
         self.storage[key] = value
@@ -20,11 +29,37 @@ class TestContext:
         """直接设置变量值"""
         self.storage[variable_name] = value
 
-    def add_step_response(self, step_name, response_data):
+    def setdefault_variable(self, variable_name, factory):
+        """
+        变量不存在 (或为 None) 时调用 factory 生成并存储，返回最终生效的值。
+        整个过程在锁内完成，并发步骤对同一变量只会生成一次。
+        """
+        with self._variable_lock:
+            value = self.storage.get(variable_name)
+            if value is None:
+                value = factory()
+                if value is not None:
+                    self.storage[variable_name] = value
+            return value
+
+    def add_step_response(self, step_name, response_data, size=0):
         """
         将一个步骤的完整响应数据存入上下文。
+        :param size: 响应体大小的估计值，用于统计上下文的峰值大小
         """
         self.storage[step_name] = {'response': response_data}
+        with self._size_lock:
+            self.response_bytes += size - self._response_sizes.get(step_name, 0)
+            self._response_sizes[step_name] = size
+            self.peak_response_bytes = max(self.peak_response_bytes, self.response_bytes)
+
+    def release_step_response(self, step_name):
+        """后续步骤不再引用某个步骤的响应时，把它从上下文中移除 (已提取的变量不受影响)。"""
+        if self.storage.pop(step_name, None) is None:
+            return
+        with self._size_lock:
+            self.response_bytes -= self._response_sizes.pop(step_name, 0)
+            self.released_responses += 1
 
     def get_value_by_path(self, path_string):
         """
@@ -40,10 +75,9 @@ class TestContext:
 
             data = self.storage[step_name][source_type][data_source]
 
-            json_path_expr = parse('.'.join(json_path_parts))
-            match = json_path_expr.find(data)
+            matches = find_values('.'.join(json_path_parts), data)
 
-            return match[0].value if match else None
+            return matches[0] if matches else None
         except (KeyError, IndexError) as e:
             print(f"Error resolving path '{path_string}': {e}")
             return None
@@ -76,8 +110,7 @@ class TestContext:
                 response_data = self.get(f"{step_name}.{source_type}")
                 
                 # 使用 jsonpath 提取值
-                jsonpath_expression = parse(json_path_expr)
-                extracted_value = jsonpath_expression.find(response_data[data_source])[0].value
+                extracted_value = find_values(json_path_expr, response_data[data_source])[0]
                 
                 # 替换占位符
                 data_structure = data_structure.replace(f"{{{{{match}}}}}", str(extracted_value))
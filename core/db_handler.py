@@ -1,9 +1,14 @@
 # core/db_handler.py
 
+import hashlib
+import json
 import os
-from sqlalchemy import create_engine, or_
+from sqlalchemy import create_engine, or_, select
 from sqlalchemy.orm import sessionmaker, joinedload
-from models.tables import ApiAutoCase, CaseDataSet, SharedAction, Environment
+from models.tables import ApiAutoCase, ApiAction, CaseDataSet, SharedAction, Environment
+
+# 批量查询时 IN 列表的最大长度，避免生成过长的 SQL
+BULK_QUERY_CHUNK_SIZE = 1000
 
 def get_db_engine():
     """从环境变量创建并返回数据库引擎。"""
@@ -22,7 +27,7 @@ def initialize_session():
     engine = get_db_engine()
     return sessionmaker(bind=engine)
 
-def get_test_cases_by_filter(session, env: str, service=None, module=None, component=None, tags=None, jira_id=None, case_id=None):
+def get_test_cases_by_filter(session, env: str, service=None, module=None, component=None, tags=None, jira_id=None, case_id=None, shared_action=None):
     """根据所有筛选条件，获取需要运行的测试场景列表。"""
     query = session.query(
         ApiAutoCase.id,
@@ -48,43 +53,123 @@ def get_test_cases_by_filter(session, env: str, service=None, module=None, compo
         query = query.filter(ApiAutoCase.tags.contains(tag_list))
     if jira_id: query = query.filter(CaseDataSet.jira_id == jira_id)
     if case_id: query = query.filter(ApiAutoCase.id == case_id)
+    if shared_action:
+        # 引用了任一指定共享动作的用例模板 (多个名称用逗号隔开)
+        shared_names = [name.strip() for name in shared_action.split(',')]
+        query = query.filter(ApiAutoCase.id.in_(
+            select(ApiAction.case_id).where(ApiAction.shared_action_ref.in_(shared_names))
+        ))
 
-    results = query.all()
+    # 固定顺序：xdist 主进程与各工作进程必须得到完全相同的收集顺序
+    results = query.order_by(ApiAutoCase.id, CaseDataSet.id).all()
     return [(row[0], row[1], f"{row[2]} [{row[3]}]", row[4]) for row in results]
 
-def get_case_details(session, case_id, data_set_id):
-    """获取单个测试场景的完整详细信息。"""
-    shared_actions_list = session.query(SharedAction).all()
-    shared_actions_map = {sa.name: sa for sa in shared_actions_list}
-
-    test_case = session.query(ApiAutoCase).options(
-        joinedload(ApiAutoCase.actions)
-    ).filter(ApiAutoCase.id == case_id).first()
-
-    data_set = session.query(CaseDataSet).filter(CaseDataSet.id == data_set_id).first()
-
-    if not test_case or not data_set: return None
+def _orm_to_dict(obj):
+    """把 ORM 对象的已加载列转换成普通字典 (忽略 SQLAlchemy 内部属性)。"""
+    return {key: getattr(obj, key) for key in obj.__dict__ if not key.startswith('_')}
 
+def _merge_case_actions(actions, shared_actions_map):
+    """按 step_order 排序，并把引用了共享动作的步骤展开为完整的步骤定义。"""
     resolved_actions = []
-    for action_ref in sorted(test_case.actions, key=lambda a: a.step_order):
+    for action_ref in sorted(actions, key=lambda a: a.step_order):
         final_action_data = {}
         template = None
         if action_ref.shared_action_ref:
             template = shared_actions_map.get(action_ref.shared_action_ref)
             if not template:
                 raise ValueError(f"共享动作 '{action_ref.shared_action_ref}' 未在 shared_actions 表中找到")
-            final_action_data = {key: getattr(template, key) for key in template.__dict__ if not key.startswith('_')}
+            final_action_data = _orm_to_dict(template)
         else:
-            final_action_data = {key: getattr(action_ref, key) for key in action_ref.__dict__ if not key.startswith('_')}
+            final_action_data = _orm_to_dict(action_ref)
         final_action_data["description"] = action_ref.description or (template.description if template else '')
         final_action_data["step_order"] = action_ref.step_order
+        final_action_data["shared_action_ref"] = action_ref.shared_action_ref
         resolved_actions.append(final_action_data)
+    return resolved_actions
+
+def definition_hash(case_details):
+    """
+    计算合并后的完整场景定义 (用例模板、步骤、展开的共享动作、数据集变量和校验覆盖) 的内容哈希。
+    任何会影响执行的定义变化都会改变哈希值。
+    """
+    content = {key: value for key, value in case_details.items() if key != "definition_hash"}
+    canonical = json.dumps(content, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
 
-    case_details = {
+def _build_case_details(test_case, data_set, resolved_actions):
+    details = {
         "id": test_case.id,
         "name": test_case.name,
         "data_set_variables": data_set.variables,
         "validations_override": data_set.validations_override,
         "steps": resolved_actions
     }
-    return case_details
+    details["definition_hash"] = definition_hash(details)
+    return details
+
+def get_case_details(session, case_id, data_set_id):
+    """获取单个测试场景的完整详细信息。"""
+    shared_actions_list = session.query(SharedAction).all()
+    shared_actions_map = {sa.name: sa for sa in shared_actions_list}
+
+    test_case = session.query(ApiAutoCase).options(
+        joinedload(ApiAutoCase.actions)
+    ).filter(ApiAutoCase.id == case_id).first()
+
+    data_set = session.query(CaseDataSet).filter(CaseDataSet.id == data_set_id).first()
+
+    if not test_case or not data_set: return None
+
+    resolved_actions = _merge_case_actions(test_case.actions, shared_actions_map)
+    return _build_case_details(test_case, data_set, resolved_actions)
+
+def _chunked(values, size=BULK_QUERY_CHUNK_SIZE):
+    values = list(values)
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+def get_case_details_bulk(session, case_pairs):
+    """
+    批量获取多个测试场景的完整详细信息。
+
+    与逐个调用 get_case_details 不同，这里用少量基于集合的查询 (IN 列表，按块拆分)
+    一次性取回所有用例模板、步骤、数据集和被引用的共享动作，然后在内存中完成合并。
+
+    :param case_pairs: (case_id, data_set_id) 元组的可迭代对象。
+    :return: {(case_id, data_set_id): case_details} 字典，找不到的场景不会出现在结果中。
+    """
+    case_pairs = list(case_pairs)
+    if not case_pairs: return {}
+    case_ids = {case_id for case_id, _ in case_pairs}
+    data_set_ids = {data_set_id for _, data_set_id in case_pairs}
+
+    test_cases = {}
+    actions_by_case = {case_id: [] for case_id in case_ids}
+    data_sets = {}
+    for chunk in _chunked(case_ids):
+        for test_case in session.query(ApiAutoCase).filter(ApiAutoCase.id.in_(chunk)):
+            test_cases[test_case.id] = test_case
+        for action in session.query(ApiAction).filter(ApiAction.case_id.in_(chunk)):
+            actions_by_case[action.case_id].append(action)
+    for chunk in _chunked(data_set_ids):
+        for data_set in session.query(CaseDataSet).filter(CaseDataSet.id.in_(chunk)):
+            data_sets[data_set.id] = data_set
+
+    # 只加载真正被引用到的共享动作
+    shared_refs = {a.shared_action_ref for actions in actions_by_case.values() for a in actions if a.shared_action_ref}
+    shared_actions_map = {}
+    for chunk in _chunked(shared_refs):
+        for sa in session.query(SharedAction).filter(SharedAction.name.in_(chunk)):
+            shared_actions_map[sa.name] = sa
+
+    # 同一个用例模板的所有数据集共享同一份合并后的步骤列表
+    merged_steps_by_case = {}
+    details_map = {}
+    for case_id, data_set_id in case_pairs:
+        test_case = test_cases.get(case_id)
+        data_set = data_sets.get(data_set_id)
+        if not test_case or not data_set: continue
+        if case_id not in merged_steps_by_case:
+            merged_steps_by_case[case_id] = _merge_case_actions(actions_by_case[case_id], shared_actions_map)
+        details_map[(case_id, data_set_id)] = _build_case_details(test_case, data_set, merged_steps_by_case[case_id])
+    return details_map
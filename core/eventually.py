@@ -0,0 +1,122 @@
+# core/eventually.py
+
+import random
+import threading
+import time
+from typing import NamedTuple
+
+# =================================================================
+# 最终一致性断言 (validations 中的 "eventually" 块，也可以写作 "retry")
+# 被测服务异步写入时，断言在第一次执行时经常失败。配置了 eventually 的步骤在断言失败后
+# 按指数退避重新评估，直到通过或超过期限 (timeout)：
+#   mode = "request"  重新发送请求并重新评估全部断言 (默认)
+#   mode = "db"       只重新执行 dbValidation 查询；其他断言基于同一个响应，失败时不再重试
+# 退避按同一步骤之前观测到的收敛时间自适应：数据通常在 X 秒后一致时，第一次重试就等待接近 X，
+# 之后再从 initialDelay 开始指数退避，而不是从很短的间隔开始多次无效轮询、或在 X 附近翻倍等过头。
+#
+#   "eventually": {"timeout": 30, "initialDelay": 0.2, "maxDelay": 5, "factor": 2, "mode": "request"}
+# =================================================================
+
+POLICY_KEYS = ('eventually', 'retry')
+MODES = ('request', 'db')
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_INITIAL_DELAY = 0.2
+DEFAULT_MAX_DELAY = 5.0
+DEFAULT_FACTOR = 2.0
+# 按历史收敛时间决定第一次等待时取其多少比例 (略早于预期，避免等过头)
+LEARNED_DELAY_RATIO = 0.8
+# 收敛时间的指数移动平均系数
+LEARNING_RATE = 0.3
+
+_learned = {}
+_learned_lock = threading.Lock()
+
+
+class EventuallyPolicy(NamedTuple):
+    timeout: float
+    initial_delay: float
+    max_delay: float
+    factor: float
+    mode: str
+
+
+def parse_policy(validations):
+    """:return: EventuallyPolicy；验证规则中没有 eventually/retry 块时为 None"""
+    if not isinstance(validations, dict):
+        return None
+    block = next((validations[key] for key in POLICY_KEYS if validations.get(key)), None)
+    if block is None:
+        return None
+    if block is True:
+        block = {}
+    if not isinstance(block, dict):
+        raise ValueError(f"'eventually' must be an object, but got {type(block).__name__}")
+    mode = block.get('mode', 'request')
+    if mode not in MODES:
+        raise ValueError(f"'eventually.mode' must be one of {MODES}, but got '{mode}'")
+    return EventuallyPolicy(
+        timeout=float(block.get('timeout', DEFAULT_TIMEOUT)),
+        initial_delay=float(block.get('initialDelay', DEFAULT_INITIAL_DELAY)),
+        max_delay=float(block.get('maxDelay', DEFAULT_MAX_DELAY)),
+        factor=max(float(block.get('factor', DEFAULT_FACTOR)), 1.0),
+        mode=mode,
+    )
+
+
+def learned_convergence(key):
+    """:return: 该步骤之前观测到的收敛时间 (秒，指数移动平均)；没有记录时为 None"""
+    with _learned_lock:
+        return _learned.get(key)
+
+
+def record_convergence(key, seconds):
+    with _learned_lock:
+        previous = _learned.get(key)
+        _learned[key] = seconds if previous is None else previous + LEARNING_RATE * (seconds - previous)
+
+
+class EventualCheck:
+    """一个步骤的一次最终一致性评估：计算每次重试前的等待时间，并记录尝试次数和收敛时间。"""
+    def __init__(self, policy: EventuallyPolicy, key, clock=time.monotonic):
+        self.policy = policy
+        self.key = key
+        self.clock = clock
+        self.started = clock()
+        self.attempts = 1
+        self.waited = 0.0
+        self.converged = None
+        self.time_to_consistency = None
+        self._next_delay = policy.initial_delay
+        learned = learned_convergence(key)
+        self._learned_delay = min(learned * LEARNED_DELAY_RATIO, policy.max_delay) if learned else None
+
+    def next_delay(self):
+        """:return: 下一次重试前的等待秒数 (指数退避带 ±15% 抖动，不超过剩余期限)；已超过期限时为 None"""
+        remaining = self.started + self.policy.timeout - self.clock()
+        if remaining <= 0:
+            return None
+        if self._learned_delay and self._learned_delay > self._next_delay:
+            delay, self._learned_delay = self._learned_delay, None
+        else:
+            delay = self._next_delay * random.uniform(0.85, 1.15)
+            self._next_delay = min(self._next_delay * self.policy.factor, self.policy.max_delay)
+        delay = min(delay, remaining)
+        self.attempts += 1
+        self.waited += delay
+        return delay
+
+    def finish(self, passed):
+        self.converged = passed
+        if passed:
+            self.time_to_consistency = self.clock() - self.started
+            record_convergence(self.key, self.time_to_consistency)
+
+    def summary(self):
+        return {
+            "mode": self.policy.mode,
+            "attempts": self.attempts,
+            "converged": self.converged,
+            "time_to_consistency": round(self.time_to_consistency, 3) if self.time_to_consistency is not None else None,
+            "waited": round(self.waited, 3),
+            "timeout": self.policy.timeout,
+        }
@@ -0,0 +1,146 @@
+# core/http_pool.py
+
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from core.phase_timer import current_timer, timed_phase
+
+# =================================================================
+# 进程级 (即每个 xdist worker 一份) 的共享 HTTP 连接池
+# 每个用例仍使用独立的 requests.Session (cookie、请求头互不影响)，
+# 但同一 base_url 的 Session 都挂载同一个适配器，从而复用底层的 TCP/TLS 连接。
+# =================================================================
+
+DEFAULT_POOL_OPTIONS = {
+    "pool_connections": 10,  # 缓存的主机连接池数量
+    "pool_maxsize": 10,      # 每个主机最多保留的空闲连接数
+    "pool_block": False,     # True 时严格限制每个主机的并发连接数
+    "keep_alive": True,      # False 时每个请求都带 Connection: close
+}
+
+_adapters = {}
+_adapters_lock = threading.Lock()
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    """建立连接的耗时计入当前步骤的 connect 阶段 (core.phase_timer)。"""
+    def connect(self):
+        with timed_phase(current_timer(), 'connect'):
+            super().connect()
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        with timed_phase(current_timer(), 'connect'):
+            super().connect()
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """可被多个 Session 共享的适配器；记录请求数，用于计算连接复用率，并记录建立连接的耗时。"""
+    def __init__(self, **kwargs):
+        self.request_count = 0
+        self._count_lock = threading.Lock()
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _TimedHTTPConnectionPool, "https": _TimedHTTPSConnectionPool}
+
+    def send(self, request, **kwargs):
+        with self._count_lock:
+            self.request_count += 1
+        return super().send(request, **kwargs)
+
+    def close(self):
+        # Session.close() 会关闭其挂载的所有适配器；共享适配器只能由 close_all_pools 关闭
+        pass
+
+    def close_pool(self):
+        super().close()
+
+    def connection_count(self):
+        """当前连接池中累计新建的连接数。"""
+        pools = self.poolmanager.pools
+        return sum(pools[key].num_connections for key in pools.keys())
+
+
+def _pool_key(base_url: str) -> str:
+    parts = urlsplit(base_url)
+    return f"{parts.scheme}://{parts.netloc}/"
+
+
+def get_pooled_adapter(base_url: str, **pool_options) -> PooledHTTPAdapter:
+    """获取 (或首次创建) base_url 对应的共享适配器。"""
+    options = {**DEFAULT_POOL_OPTIONS, **{k: v for k, v in pool_options.items() if v is not None}}
+    key = _pool_key(base_url)
+    with _adapters_lock:
+        adapter = _adapters.get(key)
+        if adapter is None:
+            adapter = PooledHTTPAdapter(
+                pool_connections=options["pool_connections"],
+                pool_maxsize=options["pool_maxsize"],
+                pool_block=options["pool_block"],
+            )
+            _adapters[key] = adapter
+    return adapter
+
+
+def create_pooled_session(base_url: str, **pool_options) -> requests.Session:
+    """为单个用例创建一个新的 Session，并挂载 base_url 的共享适配器。"""
+    keep_alive = pool_options.get("keep_alive")
+    session = requests.Session()
+    # 禁用环境变量代理，避免localhost请求通过代理导致502错误
+    session.trust_env = False
+    session.mount(_pool_key(base_url), get_pooled_adapter(base_url, **pool_options))
+    if keep_alive is False:
+        session.headers["Connection"] = "close"
+    return session
+
+
+def pool_statistics() -> dict:
+    """返回每个 base_url 的请求数、新建连接数和连接复用率。"""
+    stats = {}
+    with _adapters_lock:
+        adapters = dict(_adapters)
+    for key, adapter in adapters.items():
+        requests_sent = adapter.request_count
+        connections = adapter.connection_count()
+        stats[key] = {
+            "requests": requests_sent,
+            "connections": connections,
+            "reuse_ratio": (1 - connections / requests_sent) if requests_sent else 0.0,
+        }
+    return stats
+
+
+def merge_pool_statistics(stats_list) -> dict:
+    """合并多个进程 (xdist workers) 的统计结果。"""
+    merged = {}
+    for stats in stats_list:
+        for key, item in (stats or {}).items():
+            total = merged.setdefault(key, {"requests": 0, "connections": 0})
+            total["requests"] += item["requests"]
+            total["connections"] += item["connections"]
+    for item in merged.values():
+        item["reuse_ratio"] = (1 - item["connections"] / item["requests"]) if item["requests"] else 0.0
+    return merged
+
+
+def close_all_pools():
+    with _adapters_lock:
+        for adapter in _adapters.values():
+            adapter.close_pool()
+        _adapters.clear()
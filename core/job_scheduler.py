@@ -0,0 +1,274 @@
+# core/job_scheduler.py
+
+import datetime
+import heapq
+import itertools
+import os
+import signal
+import socket
+import subprocess
+import threading
+import uuid
+
+from sqlalchemy import or_, update
+from models.tables import AutoProgress
+
+# =================================================================
+# TaaS 任务调度器
+# - 运行请求先以 PENDING 状态持久化到 auto_progress (包括命令参数和优先级)，服务重启后可恢复队列
+# - 固定数量的调度线程按优先级取出任务，原子地把状态从 PENDING 改为 RUNNING 后启动 pytest 子进程
+# - 子进程的 stdout/stderr 直接写入日志文件，不在内存中缓冲
+# - 认领任务时记录所属的服务实例 (主机:进程号:实例 ID)，并定期刷新心跳；
+#   多个进程或副本共用同一个数据库时，只把所属实例已不存在 (同一主机上进程已退出，或心跳超时) 的任务标记为 INTERRUPTED
+# - 每个运行使用独立的 allure 结果目录 (run.py --run-id)，并发的运行不会互相清理结果
+# =================================================================
+
+DEFAULT_PRIORITY = 9
+# 运行中任务的心跳间隔 (秒)
+HEARTBEAT_INTERVAL = 30
+# 心跳超过该秒数未更新时认为所属实例已经不在
+STALE_AFTER = 5 * HEARTBEAT_INTERVAL
+
+
+def priority_for_tags(tags):
+    """根据标签计算优先级：P0 最先执行，其次 P1、P2 ...；没有优先级标签的排在最后。"""
+    priorities = []
+    for tag in (tags or '').split(','):
+        tag = tag.strip().upper()
+        if len(tag) > 1 and tag[0] == 'P' and tag[1:].isdigit():
+            priorities.append(int(tag[1:]))
+    return min(priorities) if priorities else DEFAULT_PRIORITY
+
+
+class JobScheduler:
+    """带并发上限、优先级队列和取消功能的测试运行调度器。"""
+    def __init__(self, session_factory, project_root, max_concurrent_runs=2, log_dir=None):
+        self.session_factory = session_factory
+        self.project_root = project_root
+        self.max_concurrent_runs = max_concurrent_runs
+        self.log_dir = log_dir or os.path.join(project_root, 'logs', 'taas')
+        self._queue = []
+        self._sequence = itertools.count()
+        self._queued_ids = set()
+        self._running = {}
+        self._cancelled = set()
+        self._condition = threading.Condition()
+        self._workers = []
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._stopped = threading.Event()
+
+    # --- 生命周期 ---
+
+    def start(self):
+        """恢复数据库中遗留的任务，并启动调度线程。"""
+        os.makedirs(self.log_dir, exist_ok=True)
+        self._recover()
+        for i in range(self.max_concurrent_runs):
+            worker = threading.Thread(target=self._worker_loop, name=f"taas-runner-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        heartbeat = threading.Thread(target=self._heartbeat_loop, name="taas-heartbeat", daemon=True)
+        heartbeat.start()
+        self._workers.append(heartbeat)
+
+    def stop(self):
+        """停止心跳线程 (调度线程是守护线程，随服务退出)。"""
+        self._stopped.set()
+
+    def _recover(self):
+        with self.session_factory() as session:
+            interrupted = self._interrupt_orphaned_runs(session)
+            session.commit()
+            if interrupted:
+                print(f"--- TaaS: Marked {interrupted} orphaned runs as INTERRUPTED ---")
+            pending = session.query(AutoProgress).filter(
+                AutoProgress.task_status == 'PENDING', AutoProgress.run_args != None
+            ).order_by(AutoProgress.update_time).all()
+            for record in pending:
+                self._enqueue(record.runid, record.priority if record.priority is not None else DEFAULT_PRIORITY)
+        if pending:
+            print(f"--- TaaS: Recovered {len(pending)} pending runs from auto_progress ---")
+
+    def _interrupt_orphaned_runs(self, session):
+        """
+        把所属实例已经不在的 RUNNING 任务标记为 INTERRUPTED (不提交)：
+        - 同一主机上所属进程已经退出 (例如本服务重启前的进程)
+        - 心跳超过 STALE_AFTER 秒未更新 (其他主机上的实例崩溃或失联)
+        其他仍然存活的进程或副本正在执行的任务保持不变。
+        :return: 标记的任务数
+        """
+        running = session.query(AutoProgress.runid, AutoProgress.owner).filter(
+            AutoProgress.task_status == 'RUNNING', AutoProgress.run_by == 'TaaS_API'
+        ).all()
+        dead_owners = {owner for _, owner in running if owner and _owner_is_dead(owner)}
+        stale_before = datetime.datetime.now() - datetime.timedelta(seconds=STALE_AFTER)
+        now = datetime.datetime.now()
+        return session.execute(
+            update(AutoProgress).where(
+                AutoProgress.task_status == 'RUNNING', AutoProgress.run_by == 'TaaS_API',
+                or_(AutoProgress.owner.in_(dead_owners),
+                    AutoProgress.heartbeat_at < stale_before,
+                    # 没有心跳记录的旧任务按最后更新时间判断
+                    (AutoProgress.heartbeat_at == None) & (AutoProgress.update_time < stale_before))
+            ).values(task_status='INTERRUPTED', end_time=now, update_time=now)
+        ).rowcount
+
+    def _heartbeat_loop(self):
+        while not self._stopped.wait(HEARTBEAT_INTERVAL):
+            try:
+                with self.session_factory() as session:
+                    with self._condition:
+                        running = [run_id for run_id, process in self._running.items() if process is not None]
+                    if running:
+                        session.execute(
+                            update(AutoProgress).where(AutoProgress.runid.in_(running), AutoProgress.owner == self.owner,
+                                                       AutoProgress.task_status == 'RUNNING')
+                            .values(heartbeat_at=datetime.datetime.now())
+                        )
+                    # 顺带回收其他实例崩溃后遗留的任务
+                    interrupted = self._interrupt_orphaned_runs(session)
+                    session.commit()
+                if interrupted:
+                    print(f"--- TaaS: Marked {interrupted} orphaned runs as INTERRUPTED ---")
+            except Exception as e:
+                print(f"--- TaaS ERROR: Heartbeat failed: {e} ---")
+
+    # --- 对外接口 ---
+
+    def submit(self, run_id, priority=DEFAULT_PRIORITY):
+        """把一个已持久化为 PENDING 的运行加入队列。"""
+        self._enqueue(run_id, priority)
+
+    def cancel(self, run_id):
+        """
+        取消一个运行：排队中的直接标记为 CANCELLED；运行中的终止其进程组。
+        :return: True 表示已取消，False 表示该运行不在队列中也不在运行。
+        """
+        with self._condition:
+            running = run_id in self._running
+            process = self._running.get(run_id)
+            queued = run_id in self._queued_ids
+            if not running and not queued:
+                return False
+            self._cancelled.add(run_id)
+            self._queued_ids.discard(run_id)
+
+        if process:
+            self._terminate(process)
+        self._set_status(run_id, 'CANCELLED', from_status=('PENDING', 'RUNNING'))
+        return True
+
+    def queue_snapshot(self):
+        """返回当前排队 (按执行顺序) 和运行中的任务。"""
+        with self._condition:
+            queued = [run_id for _, _, run_id in sorted(self._queue) if run_id in self._queued_ids]
+            return {"queued": queued, "running": list(self._running)}
+
+    def log_path(self, run_id):
+        return os.path.join(self.log_dir, f"{run_id}.log")
+
+    # --- 内部实现 ---
+
+    def _enqueue(self, run_id, priority):
+        with self._condition:
+            heapq.heappush(self._queue, (priority, next(self._sequence), run_id))
+            self._queued_ids.add(run_id)
+            self._condition.notify()
+
+    def _next_run_id(self):
+        with self._condition:
+            while True:
+                while self._queue:
+                    _, _, run_id = heapq.heappop(self._queue)
+                    if run_id in self._queued_ids:
+                        self._queued_ids.discard(run_id)
+                        # 进程启动前先占位，保证这段时间内的取消请求也能生效
+                        self._running[run_id] = None
+                        return run_id
+                self._condition.wait()
+
+    def _worker_loop(self):
+        while True:
+            run_id = self._next_run_id()
+            try:
+                self._execute(run_id)
+            except Exception as e:
+                print(f"--- TaaS ERROR: Run {run_id} failed to execute: {e} ---")
+                self._set_status(run_id, 'FAILED', from_status=('PENDING', 'RUNNING'))
+            finally:
+                with self._condition:
+                    self._running.pop(run_id, None)
+                    self._cancelled.discard(run_id)
+
+    def _execute(self, run_id):
+        # 原子地认领任务：只有仍处于 PENDING 的任务才会被执行
+        with self.session_factory() as session:
+            claimed = session.execute(
+                update(AutoProgress).where(AutoProgress.runid == run_id, AutoProgress.task_status == 'PENDING')
+                .values(task_status='RUNNING', begin_time=datetime.datetime.now(), update_time=datetime.datetime.now(),
+                        owner=self.owner, heartbeat_at=datetime.datetime.now())
+            ).rowcount
+            record = session.query(AutoProgress).filter_by(runid=run_id).first()
+            command = list(record.run_args) if record and record.run_args else None
+            session.commit()
+        if not claimed or not command:
+            return
+
+        with open(self.log_path(run_id), 'w', encoding='utf-8') as log_file:
+            process = subprocess.Popen(
+                command,
+                cwd=self.project_root,
+                stdout=log_file,
+                stderr=subprocess.STDOUT,
+                start_new_session=True  # 独立进程组，取消时可一并终止 xdist 工作进程
+            )
+            with self._condition:
+                self._running[run_id] = process
+                cancelled = run_id in self._cancelled
+            if cancelled:
+                self._terminate(process)
+            return_code = process.wait()
+
+        print(f"--- Test run {run_id} finished with exit code {return_code} (log: {self.log_path(run_id)}) ---")
+        if run_id in self._cancelled:
+            self._set_status(run_id, 'CANCELLED', from_status=('RUNNING',))
+        else:
+            # 正常情况下 conftest.py 的 sessionfinish 钩子会写入最终状态；进程异常退出时由这里兜底
+            self._set_status(run_id, 'FAILED', from_status=('RUNNING',))
+
+    def _terminate(self, process):
+        try:
+            if hasattr(os, 'killpg'):
+                os.killpg(process.pid, signal.SIGTERM)
+            else:
+                process.terminate()
+        except ProcessLookupError:
+            pass
+
+    def _set_status(self, run_id, status, from_status):
+        try:
+            with self.session_factory() as session:
+                session.execute(
+                    update(AutoProgress).where(AutoProgress.runid == run_id, AutoProgress.task_status.in_(from_status))
+                    .values(task_status=status, end_time=datetime.datetime.now(), update_time=datetime.datetime.now())
+                )
+                session.commit()
+        except Exception as e:
+            print(f"Error updating status to {status} for run_id {run_id}: {e}")
+
+
+def _owner_is_dead(owner):
+    """:return: 所属实例在本机且其进程已经退出时为 True；其他主机上的实例只能通过心跳判断"""
+    host, _, rest = owner.partition(':')
+    pid = rest.split(':', 1)[0]
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    if int(pid) == os.getpid():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        return False
+    return False
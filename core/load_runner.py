@@ -0,0 +1,321 @@
+# core/load_runner.py
+
+import asyncio
+import datetime
+import itertools
+import math
+import time
+from collections import Counter
+from typing import NamedTuple
+
+import httpx
+
+from core.async_engine import AsyncApiClient
+from core.reporter import NullReporter
+
+# =================================================================
+# 压测模式 (run.py --load)
+# 复用 api_auto_cases / shared_actions 中的用例定义，把筛选出的场景当作虚拟用户反复执行：
+# - 开放模型：按到达率 (每秒开始的迭代数) 启动迭代，不等待之前的迭代结束。到达率在 ramp_up 秒内
+#   从 0 线性增加到 arrival_rate，之后保持 duration 秒。被测服务变慢时在途迭代增多，
+#   而不是像固定用户数的闭环模型那样自动降低压力、把排队时间藏在统计之外
+# - 每次迭代按顺序取下一个场景 (轮询所有数据集)，用独立的客户端 (独立的 cookie 和上下文) 执行全部步骤；
+#   占位符解析、断言、dbValidation 和 eventually 与功能测试完全一致，但不生成 allure 报告
+# - 在途迭代达到 max_in_flight 时，新的到达计为 dropped，不排队
+# - 按 (用例, 步骤) 统计请求延迟直方图 (p50/p95/p99)、吞吐量和错误率
+# =================================================================
+
+# 延迟直方图的分桶：第一个桶的上界 (毫秒) 和相邻桶上界的比例 (分位数的相对误差不超过 2%)
+HISTOGRAM_MIN_MS = 0.1
+HISTOGRAM_GROWTH = 1.02
+_LOG_GROWTH = math.log(HISTOGRAM_GROWTH)
+# 到达结束后等待在途迭代完成的最长秒数，超时的迭代被取消并计为 interrupted
+GRACEFUL_STOP = 30.0
+# 每个步骤最多记录的不同错误信息数，其余计入 "(other)"
+MAX_ERROR_KINDS = 20
+PERCENTILES = (50, 95, 99)
+
+
+class LoadProfile(NamedTuple):
+    arrival_rate: float          # 稳定阶段每秒开始的迭代数
+    duration: float = 60.0       # 稳定阶段的秒数 (不含 ramp_up)
+    ramp_up: float = 0.0         # 到达率从 0 线性增加到 arrival_rate 的秒数
+    max_in_flight: int = 1000    # 同时在途的迭代上限
+
+
+def arrival_offset(index, profile: LoadProfile):
+    """
+    第 index 次 (从 0 开始) 迭代相对开始时间的启动时刻 (秒)。
+    累计到达数 N(t) 在 ramp_up 内为 rate * t² / (2 * ramp_up)，之后每秒增加 rate，取 N(t) = index 的解。
+    """
+    rate, ramp_up = profile.arrival_rate, profile.ramp_up
+    ramp_arrivals = rate * ramp_up / 2
+    if index < ramp_arrivals:
+        return math.sqrt(2 * ramp_up * index / rate)
+    return ramp_up + (index - ramp_arrivals) / rate
+
+
+class LatencyHistogram:
+    """对数分桶的延迟直方图 (毫秒)：内存与样本数无关，分位数的相对误差不超过 2%。"""
+    def __init__(self):
+        self.buckets = Counter()
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, ms):
+        index = 0 if ms <= HISTOGRAM_MIN_MS else math.ceil(math.log(ms / HISTOGRAM_MIN_MS) / _LOG_GROWTH)
+        self.buckets[index] += 1
+        self.count += 1
+        self.total += ms
+        self.min = ms if self.min is None else min(self.min, ms)
+        self.max = ms if self.max is None else max(self.max, ms)
+
+    @staticmethod
+    def upper_bound(index):
+        return HISTOGRAM_MIN_MS * HISTOGRAM_GROWTH ** index
+
+    def percentile(self, p):
+        """:return: 第 p 百分位的延迟 (所在桶的上界，不超过实际最大值)；没有样本时为 None"""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(self.count * p / 100))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return max(min(self.upper_bound(index), self.max), self.min)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def to_dict(self):
+        """:return: {桶上界 (毫秒，字符串): 样本数}，只包含非空的桶"""
+        return {f"{self.upper_bound(index):.3f}": count for index, count in sorted(self.buckets.items())}
+
+
+class StepStats:
+    """一个 (用例, 步骤) 在整个压测中的统计。"""
+    def __init__(self, case_id, step_order, description):
+        self.case_id = case_id
+        self.step_order = step_order
+        self.description = description
+        self.latency = LatencyHistogram()
+        self.executions = 0
+        self.requests = 0
+        self.errors = 0
+        self.error_messages = Counter()
+
+    def record_request(self, ms):
+        self.requests += 1
+        self.latency.record(ms)
+
+    def record_execution(self, error=None):
+        self.executions += 1
+        if error is None:
+            return
+        self.errors += 1
+        message = f"{type(error).__name__}: {str(error).strip().splitlines()[0] if str(error).strip() else ''}"[:200]
+        if message not in self.error_messages and len(self.error_messages) >= MAX_ERROR_KINDS:
+            message = "(other)"
+        self.error_messages[message] += 1
+
+    @property
+    def error_rate(self):
+        return self.errors / self.executions if self.executions else 0.0
+
+
+class LoadResult:
+    """一次压测的结果：每个步骤的统计和迭代 (完整场景) 的统计。"""
+    def __init__(self, profile: LoadProfile, scenarios: int):
+        self.profile = profile
+        self.scenarios = scenarios
+        self.steps = {}
+        self.iterations = LatencyHistogram()
+        self.failed_iterations = 0
+        self.dropped_iterations = 0
+        self.interrupted_iterations = 0
+        self.begin_time = None
+        self.end_time = None
+        self.elapsed = 0.0
+
+    def step(self, case_id, step):
+        key = (case_id, step.get('step_order'))
+        stats = self.steps.get(key)
+        if stats is None:
+            stats = self.steps[key] = StepStats(case_id, step.get('step_order'), step.get('description'))
+        return stats
+
+    def throughput(self, count):
+        return count / self.elapsed if self.elapsed else 0.0
+
+    def report_lines(self):
+        """控制台输出的汇总表。"""
+        lines = [
+            f"--- Load test finished in {self.elapsed:.1f}s: {self.iterations.count} iterations "
+            f"({self.throughput(self.iterations.count):.1f}/s), {self.failed_iterations} failed, "
+            f"{self.dropped_iterations} dropped, {self.interrupted_iterations} interrupted ---",
+            f"{'case':>6} {'step':>4}  {'requests':>8} {'errors':>7} {'err%':>6} {'req/s':>8} "
+            f"{'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}  (ms)",
+        ]
+        for (case_id, step_order), stats in sorted(self.steps.items()):
+            latency = [stats.latency.percentile(p) for p in PERCENTILES] + [stats.latency.max]
+            lines.append(
+                f"{case_id:>6} {step_order:>4}  {stats.requests:>8} {stats.errors:>7} {stats.error_rate:>6.1%} "
+                f"{self.throughput(stats.requests):>8.1f} " + " ".join(_ms(value) for value in latency)
+                + f"  {stats.description or ''}"
+            )
+            for message, count in stats.error_messages.most_common(3):
+                lines.append(f"{'':>13}{count} x {message}")
+        return lines
+
+
+def _discard(*args):
+    pass
+
+
+def _ms(value):
+    return f"{value:>8.1f}" if value is not None else f"{'-':>8}"
+
+
+class LoadClient(AsyncApiClient):
+    """压测中的一次迭代：不生成报告、不保留响应体，按步骤记录每个请求的延迟和步骤的执行结果。"""
+    # 压测只统计请求总延迟，不记录阶段耗时；省去每个请求的 trace 回调
+    trace_requests = False
+
+    def __init__(self, base_url, transport, result: LoadResult, case_id, **client_options):
+        self._result = result
+        self._case_id = case_id
+        self._current_step = None
+        super().__init__(base_url, transport, reporter=NullReporter(), audit_response_bodies=False, **client_options)
+        self.assertion_engine.log = _discard
+
+    async def _execute_step_async(self, step, context, data_set_variables, validations_override, app_db_conn):
+        stats = self._current_step = self._result.step(self._case_id, step)
+        try:
+            await super()._execute_step_async(step, context, data_set_variables, validations_override, app_db_conn)
+        except asyncio.CancelledError:
+            raise
+        except BaseException as e:
+            stats.record_execution(e)
+            raise
+        stats.record_execution()
+
+    async def _send_request_async(self, request_details_dict):
+        started = time.perf_counter()
+        sent = await super()._send_request_async(request_details_dict)
+        # eventually 的每次重试都是一个独立的请求样本
+        self._current_step.record_request((time.perf_counter() - started) * 1000)
+        return sent
+
+
+async def _run_load(base_url, scenarios, profile: LoadProfile, app_db_conn=None, **client_options):
+    result = LoadResult(profile, len(scenarios))
+    limits = httpx.Limits(max_connections=profile.max_in_flight, max_keepalive_connections=profile.max_in_flight)
+    action_locks = {}
+    in_flight = set()
+
+    async with httpx.AsyncHTTPTransport(limits=limits) as transport:
+        async def run_iteration(case_id, case_details):
+            client = LoadClient(base_url, transport, result, case_id, action_locks=action_locks, **client_options)
+            started = time.perf_counter()
+            try:
+                await client.execute_steps_async(case_details, app_db_conn=app_db_conn)
+            except (KeyboardInterrupt, SystemExit, asyncio.CancelledError):
+                raise
+            except BaseException:
+                # 失败的步骤已在 LoadClient 中计数，后续步骤不再执行
+                result.failed_iterations += 1
+            result.iterations.record((time.perf_counter() - started) * 1000)
+
+        loop = asyncio.get_running_loop()
+        result.begin_time = datetime.datetime.now()
+        started = loop.time()
+        end = profile.ramp_up + profile.duration
+        for index in itertools.count():
+            offset = arrival_offset(index, profile)
+            if offset >= end:
+                break
+            delay = started + offset - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if len(in_flight) >= profile.max_in_flight:
+                result.dropped_iterations += 1
+                continue
+            (case_id, _), case_details = scenarios[index % len(scenarios)]
+            task = asyncio.create_task(run_iteration(case_id, case_details))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+
+        if in_flight:
+            _, pending = await asyncio.wait(set(in_flight), timeout=GRACEFUL_STOP)
+            for task in pending:
+                task.cancel()
+            result.interrupted_iterations = len(pending)
+            if pending:
+                await asyncio.wait(pending)
+        result.elapsed = loop.time() - started
+        result.end_time = datetime.datetime.now()
+    return result
+
+
+def run_load(base_url: str, scenarios, profile: LoadProfile, app_db_conn=None, **client_options):
+    """
+    按 profile 对 scenarios 施加负载。
+
+    :param scenarios: [((case_id, data_set_id), case_details)]，迭代按顺序轮流执行其中的场景。
+    :param client_options: 传给每个 LoadClient 的选项 (max_audit_bytes、action_cache)。
+    :return: LoadResult
+    """
+    if not scenarios:
+        raise ValueError("没有可执行的场景")
+    if profile.arrival_rate <= 0:
+        raise ValueError(f"arrival_rate 必须大于 0，当前为 {profile.arrival_rate}")
+    print(f"--- Load test: {len(scenarios)} scenarios at {profile.arrival_rate}/s for {profile.duration}s "
+          f"(ramp-up {profile.ramp_up}s, max in flight {profile.max_in_flight}) ---")
+    return asyncio.run(_run_load(base_url, scenarios, profile, app_db_conn=app_db_conn, **client_options))
+
+
+def run_load_test(env: str, profile: LoadProfile, selection: dict, run_id: str, action_cache: str = 'worker',
+                  app_db_options: dict = None, max_audit_bytes: int = None):
+    """
+    run.py --load 的入口：按与功能测试相同的筛选条件从框架数据库选出场景，施加负载，
+    在控制台输出汇总表并把结果写入 load_test_runs / load_step_stats。
+    :param selection: get_test_cases_by_filter 的筛选条件 (service、module、component、tags、jira_id、case_id、shared_action)
+    :param action_cache: 可缓存共享动作的结果复用: worker/shared (整个压测共用一份) 或 off (每次迭代都重新执行)
+    :return: 进程退出码，有失败的迭代时为 1
+    """
+    from core import app_db, db_handler, result_writer
+    from core.action_cache import ActionCache
+    from models.tables import Environment
+
+    session_factory = db_handler.initialize_session()
+    with session_factory() as session:
+        rows = db_handler.get_test_cases_by_filter(session, env=env, **selection)
+        case_details = db_handler.get_case_details_bulk(session, [(row[0], row[1]) for row in rows])
+        environment = session.query(Environment).filter(Environment.name == env, Environment.is_active == True).first()
+    if environment is None:
+        raise ValueError(f"在 test_environments 表中未找到名为 '{env}' 的活动环境配置")
+    scenarios = [((row[0], row[1]), case_details[(row[0], row[1])]) for row in rows if (row[0], row[1]) in case_details]
+
+    database = None
+    if environment.app_db_connection_string:
+        options = app_db_options or {}
+        engine = app_db.get_app_db_engine(environment.app_db_connection_string, pool_size=options.get('pool_size'))
+        database = app_db.AppDatabase(engine, prepare=options.get('prepare', True), batch=options.get('batch', False),
+                                      bind_params=options.get('bind_params', False))
+
+    try:
+        result = run_load(environment.base_url, scenarios, profile, app_db_conn=database, max_audit_bytes=max_audit_bytes,
+                          action_cache=ActionCache() if action_cache != 'off' else None)
+    finally:
+        app_db.dispose_all_engines()
+    for line in result.report_lines():
+        print(line)
+
+    with session_factory() as session:
+        result_writer.write_load_results(session, run_id, env, selection, result)
+    print(f"--- Load test results stored under run_id {run_id} ---")
+    return 1 if result.failed_iterations else 0
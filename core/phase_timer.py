@@ -0,0 +1,130 @@
+# core/phase_timer.py
+
+import contextlib
+import contextvars
+import time
+
+# =================================================================
+# 步骤的阶段耗时
+# 每个步骤记录各阶段的独占耗时 (毫秒，嵌套在其中的阶段不重复计入)：
+#   resolve               解析请求中的占位符
+#   connect               建立 TCP/TLS 连接 (复用连接时为 0)
+#   ttfb                  发出请求到收到响应头
+#   download              读取响应体 (流式模式下包含按需解析)
+#   decode                JSON 解码
+#   assert.<keyword>      每个断言关键字 (assert.dbValidation 包含查询应用数据库)
+#   extract               提取 outputs
+#   report                写入 allure 附件
+#   wait                  eventually 重试前的等待
+# connect / ttfb / download 是被测服务 (及网络) 的时间，其余是框架自身的时间。
+# 结果写入 audit_trail、auto_case_audit.phase_timings，并由结果写入器按阶段累加到 auto_progress.phase_timings。
+# =================================================================
+
+SERVICE_PHASES = ('connect', 'ttfb', 'download')
+WAIT_PHASES = ('wait',)
+# 写入数据库时保留的小数位 (毫秒)
+PRECISION = 3
+
+_current = contextvars.ContextVar('phase_timer', default=None)
+
+
+def current_timer():
+    """:return: 当前线程 / 协程中正在计时的 PhaseTimer；没有时为 None"""
+    return _current.get()
+
+
+class PhaseTimer:
+    """一个步骤内各阶段的独占耗时；同一时刻只在一个线程或协程中使用。"""
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.timings = {}
+        self._stack = []
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        started = self.clock()
+        frame = [0.0]  # 嵌套阶段的耗时
+        self._stack.append(frame)
+        token = _current.set(self)
+        try:
+            yield
+        finally:
+            _current.reset(token)
+            self._stack.pop()
+            elapsed = self.clock() - started
+            self.add(name, elapsed - frame[0])
+            if self._stack:
+                self._stack[-1][0] += elapsed
+
+    def add(self, name, seconds):
+        """直接计入一段耗时 (秒)，例如从 HTTP 库的事件中得到的连接时间。"""
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def take(self):
+        """:return: {阶段: 毫秒}，并清空已记录的耗时 (开始下一个步骤)"""
+        timings, self.timings = self.timings, {}
+        return {name: round(seconds * 1000, PRECISION) for name, seconds in timings.items()}
+
+
+def timed_phase(timer, name):
+    """timer 为 None 时不计时。"""
+    return timer.phase(name) if timer is not None else contextlib.nullcontext()
+
+
+class HttpxTrace:
+    """
+    httpx 的 trace 扩展回调：从 httpcore 的连接和 HTTP/1.1 事件中得到 connect / ttfb / download。
+    用法: client.request(..., extensions={"trace": trace})，请求结束后调用 apply(timer, total)。
+    """
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self._started = {}
+        self.spans = {}
+
+    async def __call__(self, event_name, info):
+        name, _, state = event_name.rpartition('.')
+        now = self.clock()
+        if state == 'started':
+            self._started[name] = now
+        elif state in ('complete', 'failed') and name in self._started:
+            self.spans[name] = self.spans.get(name, 0.0) + now - self._started.pop(name)
+
+    def apply(self, timer, total):
+        """把请求总耗时 total (秒) 分到 connect / ttfb / download；事件缺失的部分计入 ttfb。"""
+        connect = self.spans.get('connection.connect_tcp', 0.0) + self.spans.get('connection.start_tls', 0.0)
+        download = self.spans.get('http11.receive_response_body', 0.0)
+        if connect:
+            timer.add('connect', connect)
+        timer.add('download', download)
+        timer.add('ttfb', max(total - connect - download, 0.0))
+
+
+def step_timings(audit_trail):
+    """:return: {step_order (字符串): {阶段: 毫秒}}，写入 auto_case_audit.phase_timings；没有记录时为 None"""
+    timings = {str(entry.get('step_order')): entry['timings'] for entry in audit_trail if entry.get('timings')}
+    return timings or None
+
+
+def phase_category(name):
+    if name in SERVICE_PHASES:
+        return 'service'
+    if name in WAIT_PHASES:
+        return 'wait'
+    return 'framework'
+
+
+def format_phase_totals(totals):
+    """:param totals: {阶段: 毫秒} (整次运行的合计) :return: 控制台输出的多行说明"""
+    overall = sum(totals.values())
+    if not overall:
+        return []
+    lines = []
+    for category, label in (('service', 'Target service'), ('framework', 'Framework'), ('wait', 'Eventually waits')):
+        phases = sorted(((name, ms) for name, ms in totals.items() if phase_category(name) == category),
+                        key=lambda item: item[1], reverse=True)
+        if not phases:
+            continue
+        subtotal = sum(ms for _, ms in phases)
+        details = ", ".join(f"{name} {ms:.1f}" for name, ms in phases)
+        lines.append(f"--- {label}: {subtotal:.1f} ms ({subtotal / overall:.1%}) [{details}] ---")
+    return lines
@@ -0,0 +1,217 @@
+# core/reporter.py
+
+import json
+
+import allure
+from contextlib import contextmanager, nullcontext
+
+from utils.payload_limits import truncate_text
+
+# =================================================================
+# 报告级别
+# - full: 所有步骤和附件都实时写入 allure (默认)
+# - failures: 先记录报告事件，附件在记录时序列化并截断到 RECORDED_ATTACHMENT_LIMIT (不保留响应等原始对象)；
+#   用例结束时回放步骤结构，只有失败的用例才写入附件
+# - summary: 只写入标题和步骤结构，不生成任何附件
+# =================================================================
+
+REPORT_LEVELS = ('full', 'failures', 'summary')
+# failures 级别记录的单个附件的大小上限 (字符数)；--max-attachment-size 更小时以它为准
+RECORDED_ATTACHMENT_LIMIT = 64 * 1024
+
+
+class AllureReporter:
+    """
+    默认报告器：直接把标题、步骤和附件写入当前 allure 测试。
+    ApiClient 和 AssertionEngine 只通过报告器与 allure 交互，方便替换成记录型报告器。
+    """
+    def __init__(self, max_attachment_bytes: int = None, attachments: bool = True):
+        """
+        :param max_attachment_bytes: (可选) 单个附件的大小上限，超过时截断并注明原始长度。
+        :param attachments: 为 False 时不写入任何附件 (summary 级别)。
+        """
+        self.max_attachment_bytes = max_attachment_bytes
+        self.attachments = attachments
+
+    def title(self, title: str):
+        allure.dynamic.title(title)
+
+    def step(self, title: str):
+        return allure.step(title)
+
+    def attach(self, body, name: str, attachment_type=allure.attachment_type.TEXT):
+        if self.attachments:
+            allure.attach(truncate_text(body, self.max_attachment_bytes), name=name, attachment_type=attachment_type)
+
+    def attach_json(self, value, name: str, **dumps_options):
+        """把 value 序列化为缩进的 JSON 附件；不写附件时不做序列化。"""
+        if self.attachments:
+            self.attach(json.dumps(value, indent=2, **dumps_options), name, allure.attachment_type.JSON)
+
+    def flush(self, failed: bool):
+        """用例结束时调用；实时写入的报告器无需处理。"""
+
+
+class _RecordedStep:
+    __slots__ = ('title', 'events', 'error')
+
+    def __init__(self, title):
+        self.title = title
+        self.events = []
+        self.error = None
+
+
+class RecordingReporter:
+    """
+    记录型报告器：在非测试线程/协程中执行用例时先把报告事件记录下来，
+    之后在 pytest 的测试函数中调用 replay()，按原有的层级结构写入 allure。
+    """
+    def __init__(self):
+        self._root = _RecordedStep(None)
+        self._stack = [self._root]
+
+    def title(self, title: str):
+        self._stack[-1].events.append(('title', title))
+
+    @contextmanager
+    def step(self, title: str):
+        node = _RecordedStep(title)
+        self._stack[-1].events.append(('step', node))
+        self._stack.append(node)
+        try:
+            yield
+        except BaseException as e:
+            node.error = e
+            raise
+        finally:
+            self._stack.pop()
+
+    def attach(self, body, name: str, attachment_type=allure.attachment_type.TEXT):
+        self._stack[-1].events.append(('attach', (body, name, attachment_type)))
+
+    def attach_json(self, value, name: str, **dumps_options):
+        # 只记录对象本身，序列化推迟到回放时 (不需要附件时完全跳过)
+        self._stack[-1].events.append(('attach_json', (value, name, dumps_options)))
+
+    def flush(self, failed: bool):
+        """记录型报告器由调用方显式回放。"""
+
+    def replay(self, target=None, attachments: bool = True):
+        """
+        把记录的事件按顺序回放到目标报告器 (默认直接写入 allure)。
+        :param attachments: 为 False 时只回放标题和步骤结构。
+        """
+        _replay_events(self._root.events, target or AllureReporter(), attachments)
+
+
+class FailureOnlyReporter(RecordingReporter):
+    """
+    failures 级别的报告器：用例执行期间只记录事件，flush() 时回放到 target。
+    通过的用例只写入步骤结构，失败的用例才写入全部附件。
+    附件在记录时就序列化并截断，不持有请求、响应等原始对象，已从上下文中释放的响应不会因为报告而一直保留到用例结束；
+    JSON 附件超过上限后不再继续序列化，大响应的开销也有上限。
+    """
+    def __init__(self, target, limit: int = RECORDED_ATTACHMENT_LIMIT):
+        super().__init__()
+        self.target = target
+        self.limit = min(filter(None, (limit, getattr(target, 'max_attachment_bytes', None))), default=None)
+
+    def attach(self, body, name: str, attachment_type=allure.attachment_type.TEXT):
+        super().attach(truncate_text(body, self.limit), name, attachment_type)
+
+    def attach_json(self, value, name: str, **dumps_options):
+        super().attach(_dumps_capped(value, self.limit, dumps_options), name, allure.attachment_type.JSON)
+
+    def flush(self, failed: bool):
+        events, self._root = self._root.events, _RecordedStep(None)
+        self._stack = [self._root]
+        _replay_events(events, self.target, attachments=failed)
+        self.target.flush(failed)
+
+
+def _dumps_capped(value, limit, dumps_options):
+    """与 AllureReporter.attach_json 相同的缩进 JSON；超过 limit 个字符时停止序列化并注明已截断。"""
+    if not limit:
+        return json.dumps(value, indent=2, **dumps_options)
+    chunks, size = [], 0
+    for chunk in json.JSONEncoder(indent=2, **dumps_options).iterencode(value):
+        chunks.append(chunk)
+        size += len(chunk)
+        if size > limit:
+            return f"{''.join(chunks)[:limit]}\n... [truncated at {limit} characters]"
+    return ''.join(chunks)
+
+
+class TimedReporter:
+    """
+    把写入附件的耗时计入当前步骤的 report 阶段 (core.phase_timer)，其余调用原样转发给被包装的报告器。
+    async 引擎和 --step-parallelism 下附件在回放时才序列化，那部分耗时不计入步骤。
+    """
+    def __init__(self, target, timer):
+        self.target = target
+        self.timer = timer
+
+    def attach(self, body, name: str, attachment_type=allure.attachment_type.TEXT):
+        with self.timer.phase('report'):
+            self.target.attach(body, name, attachment_type)
+
+    def attach_json(self, value, name: str, **dumps_options):
+        with self.timer.phase('report'):
+            self.target.attach_json(value, name, **dumps_options)
+
+    def __getattr__(self, name):
+        return getattr(self.target, name)
+
+
+class NullReporter:
+    """不产生任何报告的报告器 (压测模式)：步骤和附件都直接丢弃，也不做任何序列化。"""
+    def title(self, title: str):
+        pass
+
+    def step(self, title: str):
+        return nullcontext()
+
+    def attach(self, body, name: str, attachment_type=None):
+        pass
+
+    def attach_json(self, value, name: str, **dumps_options):
+        pass
+
+    def flush(self, failed: bool):
+        pass
+
+
+def create_reporter(level: str = 'full', max_attachment_bytes: int = None):
+    """按报告级别创建用例使用的报告器。"""
+    if level not in REPORT_LEVELS:
+        raise ValueError(f"未知的报告级别: {level}")
+    reporter = AllureReporter(max_attachment_bytes=max_attachment_bytes, attachments=level != 'summary')
+    return FailureOnlyReporter(reporter) if level == 'failures' else reporter
+
+
+def _replay_events(events, target, attachments=True):
+    for kind, payload in events:
+        if kind == 'title':
+            target.title(payload)
+        elif kind == 'attach':
+            if attachments:
+                body, name, attachment_type = payload
+                target.attach(body, name, attachment_type)
+        elif kind == 'attach_json':
+            if attachments:
+                value, name, dumps_options = payload
+                target.attach_json(value, name, **dumps_options)
+        else:
+            _replay_step(payload, target, attachments)
+
+
+def _replay_step(node, target, attachments=True):
+    # 失败的步骤在回放时重新抛出原异常，让 allure 得到相同的步骤状态，然后在外层吞掉
+    try:
+        with target.step(node.title):
+            _replay_events(node.events, target, attachments)
+            if node.error is not None:
+                raise node.error
+    except BaseException as e:
+        if e is not node.error:
+            raise
@@ -0,0 +1,120 @@
+# core/response_stream.py
+
+from typing import Any, Iterable, Tuple
+
+try:
+    import ijson
+except ImportError:  # 可选依赖：未安装时流式模式退回到完整解析
+    ijson = None
+
+# =================================================================
+# 流式读取 JSON 响应
+# 用增量解析器逐个事件读取响应体，只构建被引用到的路径 (字段名/下标组成的元组) 对应的子树，
+# 其余内容读过即丢弃。得到的是原响应体的一个"子集"：
+# - 被引用路径上的字典只保留被引用的键；
+# - 被引用路径上的列表保持原长度，未被引用的元素用 None 占位，保证下标和长度语义不变。
+# =================================================================
+
+_IGNORE = object()
+_CAPTURE = object()
+
+
+class _TrieNode:
+    __slots__ = ('children', 'capture')
+
+    def __init__(self):
+        self.children = {}
+        self.capture = False
+
+
+def build_path_trie(paths: Iterable[Tuple]) -> _TrieNode:
+    root = _TrieNode()
+    for path in paths:
+        node = root
+        for segment in path:
+            node = node.children.setdefault(segment, _TrieNode())
+        node.capture = True
+    return root
+
+
+def _child_mode(parent_mode, slot):
+    if parent_mode is _CAPTURE:
+        return _CAPTURE
+    if parent_mode is _IGNORE:
+        return _IGNORE
+    child = parent_mode.children.get(slot)
+    if child is None:
+        return _IGNORE
+    return _CAPTURE if child.capture else child
+
+
+class _Frame:
+    __slots__ = ('container', 'mode', 'is_list', 'key', 'index')
+
+    def __init__(self, container, mode, is_list):
+        self.container = container
+        self.mode = mode
+        self.is_list = is_list
+        self.key = None
+        self.index = 0
+
+
+class CountingReader:
+    """包装一个类文件对象，统计读取的字节数。"""
+    def __init__(self, raw):
+        self.raw = raw
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = self.raw.read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+def read_json_subset(fp, paths: Iterable[Tuple]) -> Any:
+    """
+    从类文件对象 fp 中增量解析 JSON，只保留 paths 指向的子树。
+    :param paths: 字段名 (str) / 下标 (int) 组成的路径元组；空元组表示需要整个响应体。
+    """
+    if ijson is None:
+        raise RuntimeError("流式读取需要安装 ijson")
+    root = build_path_trie(paths)
+    root_mode = _CAPTURE if root.capture else root
+    stack = []
+    result = None
+
+    def current_slot_mode():
+        if not stack:
+            return root_mode
+        parent = stack[-1]
+        return _child_mode(parent.mode, parent.index if parent.is_list else parent.key)
+
+    def place(value, mode):
+        nonlocal result
+        if not stack:
+            result = None if mode is _IGNORE else value
+            return
+        parent = stack[-1]
+        if parent.mode is _IGNORE:
+            return
+        if parent.is_list:
+            # 被引用路径上的列表保持原长度
+            parent.container.append(None if mode is _IGNORE else value)
+            parent.index += 1
+        elif mode is not _IGNORE:
+            parent.container[parent.key] = value
+
+    for _, event, value in ijson.parse(fp, use_float=True):
+        if event == 'map_key':
+            stack[-1].key = value
+        elif event in ('start_map', 'start_array'):
+            mode = current_slot_mode()
+            container = None if mode is _IGNORE else ({} if event == 'start_map' else [])
+            stack.append(_Frame(container, mode, event == 'start_array'))
+        elif event in ('end_map', 'end_array'):
+            frame = stack.pop()
+            place(frame.container, frame.mode)
+        else:
+            mode = current_slot_mode()
+            place(value, mode)
+    return result
@@ -2,33 +2,147 @@
 
 import datetime
 import os
-from sqlalchemy import func, case
-from models.tables import AutoProgress, AutoCaseAudit, AutoTestAudit
+import queue
+import threading
+import time
+from sqlalchemy import func, case, insert, select, update
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+from core.audit_payloads import PayloadEncoder, insert_payloads
+from models.tables import AutoProgress, AutoCaseAudit, AutoTestAudit, LoadTestRun, LoadStepStat
 
 def create_run_progress(session, run_id, env_info):
     """
     在测试开始时，创建一条初始的总览记录。
+    如果该 run_id 的记录已由 TaaS 服务预先创建，则只把它更新为 RUNNING。
     :param session: SQLAlchemy session object.
     :param run_id: The unique ID for this test run.
     :param env_info: A dict containing env, component, tags.
     """
-    progress_record = AutoProgress(
-        runid=run_id,
-        task_status='RUNNING',
-        begin_time=datetime.datetime.now(),
-        profile=env_info.get("env"),
-        label=env_info.get("tags"),
-        component=env_info.get("component"),
-        run_by=os.getenv('USER', os.getenv('USERNAME', 'unknown')),
-        update_time=datetime.datetime.now()
-    )
     try:
-        session.add(progress_record)
+        progress_record = session.query(AutoProgress).filter_by(runid=run_id).first()
+        if progress_record:
+            progress_record.task_status = 'RUNNING'
+            progress_record.begin_time = progress_record.begin_time or datetime.datetime.now()
+            progress_record.update_time = datetime.datetime.now()
+        else:
+            session.add(AutoProgress(
+                runid=run_id,
+                task_status='RUNNING',
+                begin_time=datetime.datetime.now(),
+                profile=env_info.get("env"),
+                label=env_info.get("tags"),
+                component=env_info.get("component"),
+                run_by=os.getenv('USER', os.getenv('USERNAME', 'unknown')),
+                update_time=datetime.datetime.now()
+            ))
         session.commit()
     except Exception as e:
         print(f"\nERROR: Failed to create initial progress record: {e}")
         session.rollback()
 
+def build_case_audit_row(run_id, case_id, data_set_id, jira_id, display_name, variables, report, definition_hash=None,
+                         peak_context_bytes=None, phase_timings=None):
+    """把单个测试场景的结果转换为 auto_case_audit 的一行数据 (字典)。"""
+    return {
+        "runid": run_id,
+        "case_id": case_id,
+        "data_set_id": data_set_id,
+        "issue_key": jira_id,
+        "scenario": display_name,
+        "variables": variables,
+        "definition_hash": definition_hash,
+        "peak_context_bytes": peak_context_bytes,
+        "phase_timings": phase_timings,
+        "run_status": report.outcome, # 'passed', 'failed', 'skipped'
+        "duration": report.duration,
+        "error_message": report.longreprtext if report.failed else None,
+    }
+
+def build_load_run_row(run_id, env, filters, result):
+    """把压测结果 (core.load_runner.LoadResult) 转换为 load_test_runs 的一行数据 (字典)。"""
+    profile = result.profile
+    return {
+        "runid": run_id,
+        "profile": env,
+        "filters": {key: value for key, value in filters.items() if value is not None},
+        "scenarios": result.scenarios,
+        "arrival_rate": profile.arrival_rate,
+        "ramp_up": profile.ramp_up,
+        "duration": profile.duration,
+        "max_in_flight": profile.max_in_flight,
+        "iterations": result.iterations.count,
+        "failed_iterations": result.failed_iterations,
+        "dropped_iterations": result.dropped_iterations,
+        "interrupted_iterations": result.interrupted_iterations,
+        "throughput": result.throughput(result.iterations.count),
+        "iteration_p50": result.iterations.percentile(50),
+        "iteration_p95": result.iterations.percentile(95),
+        "iteration_p99": result.iterations.percentile(99),
+        "begin_time": result.begin_time,
+        "end_time": result.end_time,
+    }
+
+def build_load_step_rows(run_id, result):
+    """把压测中每个步骤的统计转换为 load_step_stats 的多行数据。"""
+    return [{
+        "runid": run_id,
+        "case_id": stats.case_id,
+        "step_order": stats.step_order,
+        "action_description": stats.description,
+        "executions": stats.executions,
+        "requests": stats.requests,
+        "errors": stats.errors,
+        "error_rate": stats.error_rate,
+        "throughput": result.throughput(stats.requests),
+        "latency_min": stats.latency.min,
+        "latency_mean": stats.latency.mean,
+        "latency_p50": stats.latency.percentile(50),
+        "latency_p95": stats.latency.percentile(95),
+        "latency_p99": stats.latency.percentile(99),
+        "latency_max": stats.latency.max,
+        "histogram": stats.latency.to_dict(),
+        "error_messages": dict(stats.error_messages),
+    } for _, stats in sorted(result.steps.items())]
+
+def write_load_results(session, run_id, env, filters, result):
+    """在一个事务中写入一次压测的运行记录和步骤统计。"""
+    try:
+        session.execute(insert(LoadTestRun), [build_load_run_row(run_id, env, filters, result)])
+        step_rows = build_load_step_rows(run_id, result)
+        if step_rows:
+            session.execute(insert(LoadStepStat), step_rows)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+
+def build_debug_log_rows(audit_case_id, audit_trail, encoder=None, pending_payloads=None):
+    """
+    把 ApiClient 的审计轨迹转换为 auto_test_audit 的多行数据。
+    :param encoder: (可选) PayloadEncoder；提供时请求/响应详情压缩去重后放入 pending_payloads，行中只记录哈希
+    """
+    if encoder is not None:
+        return [{
+            "audit_case_id": audit_case_id,
+            "step_order": step_log.get("step_order"),
+            "action_description": step_log.get("action_description"),
+            "request_hash": encoder.encode(step_log.get("request_details"), pending_payloads),
+            "response_hash": encoder.encode(step_log.get("response_details"), pending_payloads),
+            "step_status": step_log.get("step_status"),
+            "attempts": step_log.get("attempts"),
+            "time_to_consistency": step_log.get("time_to_consistency"),
+        } for step_log in audit_trail]
+    return [{
+        "audit_case_id": audit_case_id,
+        "step_order": step_log.get("step_order"),
+        "action_description": step_log.get("action_description"),
+        "request_details": step_log.get("request_details"),
+        "response_details": step_log.get("response_details"),
+        "step_status": step_log.get("step_status"),
+        "attempts": step_log.get("attempts"),
+        "time_to_consistency": step_log.get("time_to_consistency"),
+    } for step_log in audit_trail]
+
 def write_case_audit(session, run_id, case_id, data_set_id, jira_id, display_name, variables, report):
     """
     为单个测试场景写入结果到 auto_case_audit 表。
@@ -36,19 +150,7 @@ def write_case_audit(session, run_id, case_id, data_set_id, jira_id, display_nam
     :param report: Pytest TestReport object.
     :return: The ID of the newly created audit record, or None on failure.
     """
-    error_message = report.longreprtext if report.failed else None
-
-    audit_record = AutoCaseAudit(
-        runid=run_id,
-        case_id=case_id,
-        data_set_id=data_set_id,
-        issue_key=jira_id,
-        scenario=display_name,
-        variables=variables,
-        run_status=report.outcome, # 'passed', 'failed', 'skipped'
-        duration=report.duration,
-        error_message=error_message
-    )
+    audit_record = AutoCaseAudit(**build_case_audit_row(run_id, case_id, data_set_id, jira_id, display_name, variables, report))
     try:
         session.add(audit_record)
         session.commit()
@@ -58,57 +160,84 @@ def write_case_audit(session, run_id, case_id, data_set_id, jira_id, display_nam
         session.rollback()
         return None
 
-def write_debug_log(session, audit_case_id, audit_trail):
+def write_debug_log(session, audit_case_id, audit_trail, encoder=None):
     """
     将详细的步骤审计日志写入 auto_test_audit 表。
     :param session: SQLAlchemy session object.
     :param audit_case_id: The primary key of the parent auto_case_audit record.
     :param audit_trail: A list of step dictionaries from ApiClient.
+    :param encoder: (可选) PayloadEncoder，提供时载荷压缩去重后写入 audit_payloads。
     """
     if not audit_case_id: return
 
     try:
-        records_to_add = []
-        for step_log in audit_trail:
-            records_to_add.append(AutoTestAudit(
-                audit_case_id=audit_case_id,
-                step_order=step_log.get("step_order"),
-                action_description=step_log.get("action_description"),
-                request_details=step_log.get("request_details"),
-                response_details=step_log.get("response_details"),
-                step_status=step_log.get("step_status")
-            ))
+        pending_payloads = {}
+        records_to_add = [AutoTestAudit(**row) for row in build_debug_log_rows(audit_case_id, audit_trail, encoder, pending_payloads)]
         if records_to_add:
+            insert_payloads(session, list(pending_payloads.values()))
             session.bulk_save_objects(records_to_add)
             session.commit()
+            if encoder is not None:
+                encoder.mark_stored(pending_payloads)
     except Exception as e:
         print(f"\nERROR: Failed to write debug audit log: {e}")
         session.rollback()
 
-def update_run_summary(session, run_id, end_time, status):
+def set_planned_cases(session, run_id, planned_cases):
+    """记录本次运行计划执行的用例总数，用于计算进度和预计剩余时间。"""
+    try:
+        session.execute(
+            update(AutoProgress).where(AutoProgress.runid == run_id).values(planned_cases=planned_cases)
+        )
+        session.commit()
+    except Exception as e:
+        print(f"\nERROR: Failed to record planned case count: {e}")
+        session.rollback()
+
+def increment_run_progress(session, run_id, total, passed, failed, skipped):
+    """
+    在 auto_progress 上原子地累加计数 (不提交，由调用方与结果写入放在同一个事务中)。
+    多个工作进程并发累加时由行锁保证正确性。
+    """
+    session.execute(
+        update(AutoProgress).where(AutoProgress.runid == run_id).values(
+            total_cases=func.coalesce(AutoProgress.total_cases, 0) + total,
+            passes=func.coalesce(AutoProgress.passes, 0) + passed,
+            failures=func.coalesce(AutoProgress.failures, 0) + failed,
+            skips=func.coalesce(AutoProgress.skips, 0) + skipped,
+            update_time=datetime.datetime.now()
+        )
+    )
+
+def update_run_summary(session, run_id, end_time, status, recount=False):
     """
-    从 auto_case_audit 表中汇总数据，并更新 auto_progress 表。
+    在运行结束时更新 auto_progress 的最终状态。
+    计数已由结果写入器在每次批量写入时增量维护；只有 recount=True 时才从 auto_case_audit 重新汇总。
     :param session: SQLAlchemy session object.
     :param run_id: The unique ID for this test run.
     :param end_time: The timestamp when the session finished.
     :param status: The final status ('PASSED' or 'FAILED').
+    :param recount: 是否全量扫描 auto_case_audit 重新计算计数。
     """
     try:
-        # 1. 从精细结果表中进行聚合查询
-        stats = session.query(
-            func.count(AutoCaseAudit.id).label("total"),
-            func.sum(case((AutoCaseAudit.run_status == 'passed', 1), else_=0)).label("passed"),
-            func.sum(case((AutoCaseAudit.run_status == 'failed', 1), else_=0)).label("failed"),
-            func.sum(case((AutoCaseAudit.run_status == 'skipped', 1), else_=0)).label("skipped")
-        ).filter(AutoCaseAudit.runid == run_id).one()
-
-        # 2. 找到总览记录并更新
         progress_record = session.query(AutoProgress).filter_by(runid=run_id).first()
         if progress_record:
-            progress_record.total_cases = stats.total
-            progress_record.passes = stats.passed or 0
-            progress_record.failures = stats.failed or 0
-            progress_record.skips = stats.skipped or 0
+            if recount:
+                stats = session.query(
+                    func.count(AutoCaseAudit.id).label("total"),
+                    func.sum(case((AutoCaseAudit.run_status == 'passed', 1), else_=0)).label("passed"),
+                    func.sum(case((AutoCaseAudit.run_status == 'failed', 1), else_=0)).label("failed"),
+                    func.sum(case((AutoCaseAudit.run_status == 'skipped', 1), else_=0)).label("skipped")
+                ).filter(AutoCaseAudit.runid == run_id).one()
+                progress_record.total_cases = stats.total
+                progress_record.passes = stats.passed or 0
+                progress_record.failures = stats.failed or 0
+                progress_record.skips = stats.skipped or 0
+            else:
+                progress_record.total_cases = progress_record.total_cases or 0
+                progress_record.passes = progress_record.passes or 0
+                progress_record.failures = progress_record.failures or 0
+                progress_record.skips = progress_record.skips or 0
             progress_record.end_time = end_time
             progress_record.task_status = status
             progress_record.update_time = datetime.datetime.now()
@@ -119,3 +248,249 @@ def update_run_summary(session, run_id, end_time, status):
     except Exception as e:
         print(f"\nERROR: Failed to update run summary: {e}")
         session.rollback()
+
+def sum_phase_timings(case_rows):
+    """
+    按运行和阶段合计一批结果行中各步骤的耗时 (auto_case_audit.phase_timings: {step_order: {阶段: 毫秒}})。
+    :return: {run_id: {阶段: {'steps': 出现该阶段的步骤数, 'total_ms': 合计, 'max_ms': 单个步骤的最大值}}}
+    """
+    totals = {}
+    for row in case_rows:
+        for timings in (row.get("phase_timings") or {}).values():
+            for phase, ms in (timings or {}).items():
+                if not isinstance(ms, (int, float)) or isinstance(ms, bool):
+                    continue
+                item = totals.setdefault(row["runid"], {}).setdefault(phase, {"steps": 0, "total_ms": 0.0, "max_ms": 0.0})
+                item["steps"] += 1
+                item["total_ms"] += ms
+                item["max_ms"] = max(item["max_ms"], ms)
+    return totals
+
+def merge_phase_timings(current, increments):
+    """:return: 把 increments 累加到 current (同 sum_phase_timings 的单个运行的结构) 后的新字典"""
+    merged = {phase: dict(item) for phase, item in (current or {}).items()}
+    for phase, item in increments.items():
+        target = merged.setdefault(phase, {"steps": 0, "total_ms": 0.0, "max_ms": 0.0})
+        target["steps"] = target.get("steps", 0) + item["steps"]
+        target["total_ms"] = round(target.get("total_ms", 0.0) + item["total_ms"], 3)
+        target["max_ms"] = round(max(target.get("max_ms", 0.0), item["max_ms"]), 3)
+    return merged
+
+def increment_phase_timings(session, run_id, increments):
+    """
+    在 auto_progress.phase_timings 上累加一批结果的阶段耗时 (不提交，由调用方与结果写入放在同一个事务中)。
+    先锁定进度行再合并，多个工作进程并发累加时不会互相覆盖。
+    """
+    current = session.execute(
+        select(AutoProgress.phase_timings).where(AutoProgress.runid == run_id).with_for_update()
+    ).scalar_one_or_none()
+    session.execute(
+        update(AutoProgress).where(AutoProgress.runid == run_id).values(
+            phase_timings=merge_phase_timings(current, increments)
+        )
+    )
+
+def get_run_progress(session, run_id):
+    """
+    读取一次运行的实时进度，并计算吞吐量 (cases/sec) 和预计剩余时间。
+    :return: 字典，找不到运行记录时返回 None。
+    """
+    record = session.query(AutoProgress).filter_by(runid=run_id).first()
+    if not record:
+        return None
+
+    completed = record.total_cases or 0
+    throughput = None
+    eta_seconds = None
+    if record.begin_time and completed:
+        elapsed = ((record.end_time or datetime.datetime.now()) - record.begin_time).total_seconds()
+        if elapsed > 0:
+            throughput = completed / elapsed
+    if throughput and record.planned_cases and not record.end_time:
+        eta_seconds = max(record.planned_cases - completed, 0) / throughput
+
+    return {
+        "run_id": record.runid,
+        "status": record.task_status,
+        "planned_cases": record.planned_cases,
+        "total_cases": completed,
+        "passes": record.passes,
+        "failures": record.failures,
+        "skips": record.skips,
+        "begin_time": record.begin_time,
+        "end_time": record.end_time,
+        "update_time": record.update_time,
+        "throughput": throughput,
+        "eta_seconds": eta_seconds,
+        "phase_timings": record.phase_timings,
+    }
+
+def get_case_audits_since(session, run_id, last_id=0, limit=500):
+    """
+    按主键顺序读取某次运行中 id 大于 last_id 的用例结果，用于实时推送。
+    :return: 字典列表 (按 id 升序)。
+    """
+    rows = session.query(
+        AutoCaseAudit.id, AutoCaseAudit.case_id, AutoCaseAudit.data_set_id, AutoCaseAudit.scenario,
+        AutoCaseAudit.issue_key, AutoCaseAudit.run_status, AutoCaseAudit.duration,
+        AutoCaseAudit.error_message, AutoCaseAudit.update_at
+    ).filter(
+        AutoCaseAudit.runid == run_id, AutoCaseAudit.id > last_id
+    ).order_by(AutoCaseAudit.id).limit(limit).all()
+    return [dict(row._mapping) for row in rows]
+
+# =================================================================
+# 缓冲写入器 (Buffered Writer)
+# 测试钩子只把结果放入进程内队列，由后台线程按批次 (数量或时间阈值) 多行插入并提交。
+# =================================================================
+
+_STOP = object()
+
+def _is_transient(error):
+    """连接断开、服务端重启等可以重试的错误；约束冲突、数据错误等重试也不会成功。"""
+    if isinstance(error, (OperationalError, InterfaceError)):
+        return True
+    return isinstance(error, DBAPIError) and error.connection_invalidated
+
+def _describe(error):
+    """数据库错误只保留驱动的错误信息，不输出整批的 SQL 和参数"""
+    return str(getattr(error, 'orig', None) or error).strip().splitlines()[0]
+
+def _count_outcomes(case_rows):
+    counts = {}
+    for row in case_rows:
+        run_counts = counts.setdefault(row["runid"], {"total": 0, "passed": 0, "failed": 0, "skipped": 0})
+        run_counts["total"] += 1
+        if row["run_status"] in ("passed", "failed", "skipped"):
+            run_counts[row["run_status"]] += 1
+    return counts
+
+class BufferedResultWriter:
+    """
+    异步、批量的结果写入器。
+
+    - submit() 只做入队；队列有上限，写库严重落后时才会阻塞调用方 (背压)。
+    - 后台线程在攒够 batch_size 条或距上次提交超过 flush_interval 秒时，
+      用一条多行 INSERT ... RETURNING 写入 auto_case_audit，再批量写入对应的 auto_test_audit，
+      并在同一事务中累加 auto_progress 的实时计数。
+    - compact_debug=True 时，Debug 载荷压缩去重后写入 audit_payloads (与结果行在同一事务中)。
+    - 暂时性错误按退避重试；一批仍然写入失败时逐行重写，只丢弃本身有问题的行 (计入 stats["failed_rows"])。
+    - close() 保证把队列中剩余的结果全部写完。
+    """
+    def __init__(self, session_factory, batch_size=200, flush_interval=2.0, max_queue_size=10000, compact_debug=False,
+                 max_retries=3, retry_delay=0.5):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.payload_encoder = PayloadEncoder() if compact_debug else None
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._thread = threading.Thread(target=self._run, name="result-writer", daemon=True)
+        self.stats = {"rows": 0, "debug_rows": 0, "batches": 0, "retries": 0, "failed_rows": 0}
+        self._thread.start()
+
+    def submit(self, case_row, debug_steps=None):
+        """
+        :param case_row: build_case_audit_row 生成的字典。
+        :param debug_steps: (可选) Debug 模式下的审计轨迹，写入时会关联到该行的主键。
+        """
+        self._queue.put((case_row, debug_steps))
+
+    def close(self, timeout=None):
+        """通知后台线程写完剩余结果并退出。"""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+    def _run(self):
+        batch = []
+        last_flush = time.monotonic()
+        while True:
+            wait = max(self.flush_interval - (time.monotonic() - last_flush), 0.01)
+            try:
+                item = self._queue.get(timeout=wait)
+            except queue.Empty:
+                item = None
+
+            stopping = item is _STOP
+            if item is not None and not stopping:
+                batch.append(item)
+
+            if batch and (stopping or len(batch) >= self.batch_size or time.monotonic() - last_flush >= self.flush_interval):
+                self._flush(batch)
+                batch = []
+            if not batch:
+                last_flush = time.monotonic()
+            if stopping:
+                return
+
+    def _flush(self, batch):
+        """
+        写入一批结果。暂时性错误 (连接断开等) 按退避重试；仍然失败时逐行写入，
+        只有本身有问题的结果行会丢失，丢失的行计入 stats["failed_rows"] 并逐条输出。
+        """
+        error = self._write_with_retry(batch)
+        if error is None:
+            return
+        # 重试后仍是连接类错误时数据库不可用，逐行写入也不会成功
+        if len(batch) == 1 or _is_transient(error):
+            for case_row, _ in batch:
+                self._record_lost(case_row, error)
+            return
+        print(f"\nWARNING: Failed to flush {len(batch)} case audit results ({_describe(error)}); writing them one by one")
+        for item in batch:
+            error = self._write_with_retry([item])
+            if error is not None:
+                self._record_lost(item[0], error)
+
+    def _write_with_retry(self, batch):
+        """:return: 最终仍失败时的异常，成功时为 None"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._write_batch(batch)
+                return None
+            except Exception as e:
+                if attempt == self.max_retries or not _is_transient(e):
+                    return e
+                self.stats["retries"] += 1
+                time.sleep(self.retry_delay * (2 ** attempt))
+
+    def _record_lost(self, case_row, error):
+        self.stats["failed_rows"] += 1
+        print(f"\nERROR: Lost case audit result '{case_row.get('scenario')}' (runid: {case_row.get('runid')}): {_describe(error)}")
+
+    def _write_batch(self, batch):
+        case_rows = [case_row for case_row, _ in batch]
+        with self.session_factory() as session:
+            audit_ids = session.scalars(
+                insert(AutoCaseAudit).returning(AutoCaseAudit.id, sort_by_parameter_order=True),
+                case_rows
+            ).all()
+
+            debug_rows = []
+            pending_payloads = {}
+            for audit_case_id, (_, debug_steps) in zip(audit_ids, batch):
+                if debug_steps:
+                    debug_rows.extend(build_debug_log_rows(audit_case_id, debug_steps, self.payload_encoder, pending_payloads))
+            insert_payloads(session, list(pending_payloads.values()))
+            if debug_rows:
+                session.execute(insert(AutoTestAudit), debug_rows)
+
+            # 与结果行在同一个事务中累加 auto_progress 的计数，保证两者一致
+            for run_id, counts in _count_outcomes(case_rows).items():
+                increment_run_progress(session, run_id, **counts)
+            # 阶段耗时只用于分析，累加失败 (例如尚未执行迁移 011) 时不影响结果写入
+            for run_id, increments in sum_phase_timings(case_rows).items():
+                try:
+                    with session.begin_nested():
+                        increment_phase_timings(session, run_id, increments)
+                except Exception as e:
+                    print(f"\nWARNING: Failed to accumulate phase timings for run '{run_id}': {e}")
+
+            session.commit()
+        if self.payload_encoder is not None:
+            self.payload_encoder.mark_stored(pending_payloads)
+        self.stats["rows"] += len(case_rows)
+        self.stats["debug_rows"] += len(debug_rows)
+        self.stats["batches"] += 1
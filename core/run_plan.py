@@ -0,0 +1,146 @@
+# core/run_plan.py
+
+from sqlalchemy import Integer, column, select, true, values
+
+from core.db_handler import get_test_cases_by_filter, get_case_details_bulk, BULK_QUERY_CHUNK_SIZE
+from models.tables import AutoCaseAudit
+
+# =================================================================
+# 本次运行的用例选择
+# 收集阶段 (tests/test_main.py) 与 xdist 主进程的调度器都通过这里得到
+# 同一份、顺序一致的场景列表
+# =================================================================
+
+RISK_HISTORY_RUNS = 10
+# 没有历史记录的新场景排在最近失败的场景之后、一直通过的场景之前
+NEW_CASE_RISK = 1.0
+
+
+def selection_options(config):
+    """从 pytest 命令行参数中取出用例筛选条件。"""
+    return {
+        "env": config.getoption("--env"),
+        "service": config.getoption("--service"),
+        "module": config.getoption("--module"),
+        "component": config.getoption("--component"),
+        "tags": config.getoption("--tags"),
+        "jira_id": config.getoption("--jira"),
+        "case_id": config.getoption("--id"),
+        "shared_action": config.getoption("--shared-action"),
+    }
+
+
+def plan_test_run(session, config):
+    """
+    选出本次需要运行的测试场景，并批量加载它们的完整定义。
+    :return: ([(case_id, data_set_id, display_name, jira_id), ...], {(case_id, data_set_id): case_details})
+    """
+    rows = get_test_cases_by_filter(session=session, **selection_options(config))
+    case_details = get_case_details_bulk(session, [(row[0], row[1]) for row in rows])
+
+    since_run = config.getoption("--since-run")
+    if config.getoption("--changed-only") or since_run:
+        rows = filter_changed(session, rows, case_details, since_run=since_run)
+        case_details = {(row[0], row[1]): case_details[(row[0], row[1])] for row in rows if (row[0], row[1]) in case_details}
+    if config.getoption("--order") == "risk":
+        rows = order_by_risk(session, rows)
+    return rows, case_details
+
+
+def recent_case_audits(case_pairs, columns, conditions=(), limit=1):
+    """
+    每个 (case_id, data_set_id) 最近 limit 条满足条件的 auto_case_audit 记录。
+    对每个场景做一次 LATERAL 子查询，沿 ix_auto_case_audit_case_data_set 倒序只读取最新的几行，
+    而不是把这些场景的全部历史排序后再取前几名。
+    :return: (wanted, recent)：场景列表的 VALUES 与 LATERAL 子查询 (含 columns 和 id)，
+             以 wanted.join(recent, true()) 连接
+    """
+    wanted = values(column('case_id', Integer), column('data_set_id', Integer), name='wanted').data(list(case_pairs))
+    recent = select(*columns, AutoCaseAudit.id).where(
+        AutoCaseAudit.case_id == wanted.c.case_id,
+        AutoCaseAudit.data_set_id == wanted.c.data_set_id,
+        *conditions
+    ).order_by(AutoCaseAudit.id.desc()).limit(limit).lateral('recent')
+    return wanted, recent
+
+
+def get_recent_statuses(session, case_pairs, runs=RISK_HISTORY_RUNS):
+    """
+    查询每个场景最近 runs 次执行的结果 (不含 skipped)。
+    :return: {(case_id, data_set_id): ['failed', 'passed', ...]} (从新到旧)
+    """
+    pairs = sorted(set(case_pairs))
+    statuses = {}
+    for start in range(0, len(pairs), BULK_QUERY_CHUNK_SIZE):
+        wanted, recent = recent_case_audits(
+            pairs[start:start + BULK_QUERY_CHUNK_SIZE], [AutoCaseAudit.run_status],
+            [AutoCaseAudit.run_status.in_(('passed', 'failed'))], limit=runs
+        )
+        rows = session.execute(
+            select(wanted.c.case_id, wanted.c.data_set_id, recent.c.run_status)
+            .select_from(wanted.join(recent, true()))
+            .order_by(wanted.c.case_id, wanted.c.data_set_id, recent.c.id.desc())
+        ).all()
+        for case_id, data_set_id, run_status in rows:
+            statuses.setdefault((case_id, data_set_id), []).append(run_status)
+    return statuses
+
+
+def get_last_results(session, case_pairs, run_id=None):
+    """
+    查询每个场景最近一次的执行结果和当时的定义哈希；指定 run_id 时只看该次运行。
+    :return: {(case_id, data_set_id): (run_status, definition_hash)}
+    """
+    pairs = sorted(set(case_pairs))
+    conditions = [AutoCaseAudit.runid == run_id] if run_id else []
+    results = {}
+    for start in range(0, len(pairs), BULK_QUERY_CHUNK_SIZE):
+        wanted, recent = recent_case_audits(
+            pairs[start:start + BULK_QUERY_CHUNK_SIZE], [AutoCaseAudit.run_status, AutoCaseAudit.definition_hash],
+            conditions
+        )
+        rows = session.execute(
+            select(wanted.c.case_id, wanted.c.data_set_id, recent.c.run_status, recent.c.definition_hash)
+            .select_from(wanted.join(recent, true()))
+        ).all()
+        for case_id, data_set_id, run_status, last_hash in rows:
+            results[(case_id, data_set_id)] = (run_status, last_hash)
+    return results
+
+
+def filter_changed(session, rows, case_details, since_run=None):
+    """
+    增量选择：跳过定义没有变化、且上一次 (或 since_run 那次运行中) 已通过的场景。
+    没有执行记录、上次未通过或定义哈希不同的场景都会保留。
+    """
+    last_results = get_last_results(session, [(row[0], row[1]) for row in rows], run_id=since_run)
+    selected = []
+    for row in rows:
+        details = case_details.get((row[0], row[1]))
+        last = last_results.get((row[0], row[1]))
+        if details and last and last[0] == 'passed' and last[1] == details["definition_hash"]:
+            continue
+        selected.append(row)
+    print(f"--- Incremental selection: {len(selected)} of {len(rows)} data sets changed or not passed"
+          f"{f' since run {since_run}' if since_run else ''} ---")
+    return selected
+
+
+def risk_score(statuses):
+    """
+    根据最近的执行结果 (从新到旧) 计算风险分：
+    上一次失败 +2，再加上失败率和结果翻转率 (不稳定程度)。
+    """
+    if not statuses:
+        return NEW_CASE_RISK
+    last_failed = 2.0 if statuses[0] == 'failed' else 0.0
+    failure_rate = statuses.count('failed') / len(statuses)
+    flips = sum(1 for newer, older in zip(statuses, statuses[1:]) if newer != older)
+    flip_rate = flips / (len(statuses) - 1) if len(statuses) > 1 else 0.0
+    return last_failed + failure_rate + flip_rate
+
+
+def order_by_risk(session, rows):
+    """按风险分从高到低排序场景；分数相同的保持原有顺序。"""
+    history = get_recent_statuses(session, [(row[0], row[1]) for row in rows])
+    return sorted(rows, key=lambda row: -risk_score(history.get((row[0], row[1]))))
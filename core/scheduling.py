@@ -0,0 +1,141 @@
+# core/scheduling.py
+
+import heapq
+import statistics
+
+from sqlalchemy import func, select, true
+from xdist.scheduler import LoadScheduling
+
+from core.db_handler import BULK_QUERY_CHUNK_SIZE
+from core.run_plan import plan_test_run, recent_case_audits
+from models.tables import AutoCaseAudit
+
+# =================================================================
+# 基于历史耗时的 xdist 调度 (LPT: Longest Processing Time first)
+# - 从 auto_case_audit 读取每个 (case_id, data_set_id) 最近几次运行的平均耗时
+# - 没有历史记录的场景使用已知耗时的中位数作为预测值
+# - 待执行队列按预测耗时从长到短排序，每个 worker 每次只领取少量用例，
+#   这样最耗时的场景最先开始，不会排在某个 worker 的队尾拖长整个运行
+# =================================================================
+
+HISTORY_RUNS = 5
+DEFAULT_DURATION = 1.0
+
+
+def get_recent_durations(session, case_pairs, runs=HISTORY_RUNS):
+    """
+    查询每个场景最近 runs 次执行 (不含 skipped) 的平均耗时。
+    :return: {(case_id, data_set_id): 平均耗时 (秒)}
+    """
+    pairs = sorted(set(case_pairs))
+    durations = {}
+    for start in range(0, len(pairs), BULK_QUERY_CHUNK_SIZE):
+        wanted, recent = recent_case_audits(
+            pairs[start:start + BULK_QUERY_CHUNK_SIZE], [AutoCaseAudit.duration],
+            [AutoCaseAudit.run_status != 'skipped', AutoCaseAudit.duration != None], limit=runs
+        )
+        rows = session.execute(
+            select(wanted.c.case_id, wanted.c.data_set_id, func.avg(recent.c.duration))
+            .select_from(wanted.join(recent, true()))
+            .group_by(wanted.c.case_id, wanted.c.data_set_id)
+        ).all()
+        for case_id, data_set_id, avg_duration in rows:
+            durations[(case_id, data_set_id)] = float(avg_duration)
+    return durations
+
+
+def predict_durations(case_pairs, history):
+    """按场景顺序返回预测耗时；没有历史的场景取已知耗时的中位数。"""
+    default = statistics.median(history.values()) if history else DEFAULT_DURATION
+    return [history.get(pair, default) for pair in case_pairs]
+
+
+def lpt_makespan(durations, workers):
+    """按 LPT 策略把耗时分配给 workers 个 worker，返回最忙 worker 的总耗时。"""
+    if not durations or workers < 1:
+        return 0.0
+    loads = [0.0] * workers
+    for duration in sorted(durations, reverse=True):
+        heapq.heapreplace(loads, loads[0] + duration)
+    return max(loads)
+
+
+class LPTScheduling(LoadScheduling):
+    """
+    按预测耗时从长到短分发用例的 xdist 调度器。
+    同时记录每个 worker 的实际耗时，会话结束时用于对比预测与实际的 makespan。
+    """
+    def __init__(self, config, log=None):
+        super().__init__(config, log)
+        self.predicted = []
+        self.history_hits = 0
+        self.worker_count = 0
+        self.node_durations = {}
+
+    def schedule(self):
+        assert self.collection_is_completed
+
+        # 初次分发之后再被调用 (例如新增节点) 时沿用默认行为
+        if self.collection is not None:
+            super().schedule()
+            return
+
+        if not self._check_nodes_have_same_collection():
+            self.log("**Different tests collected, aborting run**")
+            return
+
+        self.collection = next(iter(self.node2collection.values()))
+        if not self.collection:
+            return
+
+        self.worker_count = len(self.nodes)
+        self.predicted = self._predict(len(self.collection))
+        self.pending[:] = sorted(range(len(self.collection)), key=lambda index: -self.predicted[index])
+        # 每次只补充一个用例，让空闲的 worker 总是领取剩余中最耗时的那个
+        self.maxschedchunk = 1
+
+        # 初始分发：轮流给每个 worker 两个用例 (最耗时的用例分散到不同 worker)
+        for _ in range(2):
+            for node in self.nodes:
+                self._send_tests(node, 1)
+
+        if not self.pending:
+            for node in self.nodes:
+                node.shutdown()
+
+    def mark_test_complete(self, node, item_index, duration=0):
+        worker_id = node.gateway.id
+        self.node_durations[worker_id] = self.node_durations.get(worker_id, 0.0) + duration
+        super().mark_test_complete(node, item_index, duration)
+
+    def _predict(self, collection_size):
+        """主进程按与工作进程相同的条件和顺序选择场景，并查询其历史耗时。"""
+        session_factory = getattr(self.config, 'db_session_factory', None)
+        # 主进程已导出快照时直接使用其中的测试计划，只需查询历史耗时
+        run_plan = getattr(self.config, 'run_plan', None)
+        try:
+            with session_factory() as session:
+                rows = run_plan[0] if run_plan else plan_test_run(session, self.config)[0]
+                case_pairs = [(row[0], row[1]) for row in rows]
+                history = get_recent_durations(session, case_pairs)
+        except Exception as e:
+            self.log(f"duration history unavailable: {e}")
+            return [DEFAULT_DURATION] * collection_size
+
+        # 收集顺序由 get_test_cases_by_filter 固定，参数化后的用例与查询结果逐一对应
+        if len(case_pairs) != collection_size:
+            self.log("collection does not match selected cases, using default durations")
+            return [DEFAULT_DURATION] * collection_size
+        self.history_hits = sum(1 for pair in case_pairs if pair in history)
+        return predict_durations(case_pairs, history)
+
+    def makespan_report(self):
+        """返回预测与实际的 makespan 以及各 worker 的实际耗时。"""
+        return {
+            "workers": self.worker_count,
+            "cases": len(self.predicted),
+            "history_hits": self.history_hits,
+            "predicted_makespan": lpt_makespan(self.predicted, self.worker_count),
+            "actual_makespan": max(self.node_durations.values(), default=0.0),
+            "worker_durations": dict(self.node_durations),
+        }
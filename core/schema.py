@@ -0,0 +1,260 @@
+# core/schema.py
+
+import datetime
+import os
+import re
+
+from sqlalchemy import inspect, select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from models.tables import Base, SchemaMigration
+
+# =================================================================
+# 数据库结构管理
+# - models/tables.py 是表结构的唯一来源：新库由 create_all 建表，
+#   已有库通过 database/migrations 下按编号排序的 SQL 脚本升级
+# - schema_migrations 记录已执行的脚本，upgrade 只执行尚未执行的脚本 (脚本本身也写成可重复执行)
+# - 结果表可选地转换为按月的范围分区，过期数据按分区整体删除
+# =================================================================
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database', 'migrations')
+_MIGRATION_FILE = re.compile(r'^(\d{3})_[\w-]+\.sql$')
+
+# 分区的结果表及其分区键 (都是插入时由数据库填充的时间)
+PARTITIONED_TABLES = (
+    ('auto_case_audit', 'update_at'),
+    ('auto_test_audit', 'created_at'),
+)
+# 转换分区时分区键为空的旧行的取值：Debug 步骤日志跟随所属的场景结果，保留期内一起删除
+_LEGACY_PARTITION_KEY = {
+    'auto_test_audit': '(SELECT c.update_at FROM auto_case_audit c WHERE c.id = audit_case_id)',
+}
+
+
+def list_migrations(directory=MIGRATIONS_DIR):
+    """:return: 按编号排序的 [(version, file_name, path)]"""
+    migrations = []
+    for file_name in sorted(os.listdir(directory)):
+        match = _MIGRATION_FILE.match(file_name)
+        if match:
+            migrations.append((match.group(1), file_name, os.path.join(directory, file_name)))
+    return migrations
+
+
+def applied_migrations(conn):
+    """:return: 已执行的脚本编号集合；schema_migrations 不存在时为空集合"""
+    if not inspect(conn).has_table(SchemaMigration.__tablename__):
+        return set()
+    return set(conn.scalars(select(SchemaMigration.version)))
+
+
+def upgrade(engine, directory=MIGRATIONS_DIR, log=print):
+    """
+    创建缺失的表 (按 models/tables.py)，然后依次执行尚未执行的迁移脚本，每个脚本一个事务。
+    :return: 本次执行的脚本文件名列表
+    """
+    with engine.begin() as conn:
+        Base.metadata.create_all(conn)
+    applied = []
+    for version, file_name, path in list_migrations(directory):
+        with engine.begin() as conn:
+            if version in applied_migrations(conn):
+                continue
+            with open(path, encoding='utf-8') as f:
+                conn.exec_driver_sql(f.read())
+            conn.execute(SchemaMigration.__table__.insert().values(version=version, name=file_name))
+        log(f"--- Applied migration {file_name} ---")
+        applied.append(file_name)
+    return applied
+
+
+def check_drift(engine, directory=MIGRATIONS_DIR):
+    """
+    对比数据库与 models/tables.py：缺失的表、列、索引，以及未执行的迁移脚本。
+    :return: 问题描述列表，为空表示一致
+    """
+    problems = []
+    with engine.connect() as conn:
+        inspector = inspect(conn)
+        existing_tables = set(inspector.get_table_names())
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                problems.append(f"missing table {table.name}")
+                continue
+            columns = {column['name'] for column in inspector.get_columns(table.name)}
+            problems.extend(f"missing column {table.name}.{column.name}"
+                            for column in table.columns if column.name not in columns)
+            indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+            problems.extend(f"missing index {index.name} on {table.name}"
+                            for index in table.indexes if index.name not in indexes)
+        applied = applied_migrations(conn)
+    problems.extend(f"pending migration {file_name}"
+                    for version, file_name, _ in list_migrations(directory) if version not in applied)
+    return problems
+
+
+def dump_schema_sql():
+    """按 models/tables.py 生成 PostgreSQL 建表语句 (database/create.sql 的内容)。"""
+    dialect = postgresql.dialect()
+    statements = []
+    for table in Base.metadata.sorted_tables:
+        statements.append(str(CreateTable(table).compile(dialect=dialect)).strip() + ';')
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            statements.append(str(CreateIndex(index).compile(dialect=dialect)).strip() + ';')
+    return '\n\n'.join(statements) + '\n'
+
+# =================================================================
+# 结果表的按月分区与保留期
+# - partition_tables 把 auto_case_audit / auto_test_audit 转换为按月范围分区 (一次性，需停写)，
+#   主键变为 (id, 分区键)，分区表之间不再有外键
+# - maintain_partitions 预建未来的分区，并整体删除超过保留期的分区 (DROP 而不是 DELETE，不产生膨胀)；
+#   之后删除 audit_payloads 中不再被任何 auto_test_audit 行引用的载荷 (--debug-storage compressed)
+# - 落在没有对应分区的时间范围内的行进入 <表名>_default，预建分区时会被移入新分区
+# =================================================================
+
+def _month_start(value):
+    return datetime.date(value.year, value.month, 1)
+
+
+def _add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def _partition_name(table, month):
+    return f"{table}_p{month:%Y%m}"
+
+
+def is_partitioned(conn, table):
+    return conn.execute(
+        text("SELECT c.relkind = 'p' FROM pg_class c WHERE c.oid = to_regclass(:table)"), {"table": table}
+    ).scalar() or False
+
+
+def _table_indexes(table):
+    return sorted(Base.metadata.tables[table].indexes, key=lambda index: index.name)
+
+
+def _create_month_partition(conn, table, column, month):
+    """创建 [month, 下月) 的分区；默认分区中已有的该月数据先移入新分区，否则 ATTACH 会失败。"""
+    name = _partition_name(table, month)
+    if conn.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar():
+        return False
+    lower, upper = f"'{month}'", f"'{_add_months(month, 1)}'"
+    conn.execute(text(f'CREATE TABLE "{name}" (LIKE "{table}" INCLUDING DEFAULTS)'))
+    conn.execute(text(
+        f'WITH moved AS (DELETE FROM "{table}_default" WHERE "{column}" >= {lower} AND "{column}" < {upper} RETURNING *) '
+        f'INSERT INTO "{name}" SELECT * FROM moved'
+    ))
+    conn.execute(text(f'ALTER TABLE "{table}" ATTACH PARTITION "{name}" FOR VALUES FROM ({lower}) TO ({upper})'))
+    return True
+
+
+def partition_tables(engine, months_ahead=2, log=print):
+    """
+    把尚未分区的结果表转换为按月范围分区，已有数据按分区键复制到对应的分区。
+    转换期间持有排他锁，请在没有运行中的测试时执行。
+    """
+    for table, column in PARTITIONED_TABLES:
+        with engine.begin() as conn:
+            if is_partitioned(conn, table):
+                log(f"--- {table} is already partitioned ---")
+                continue
+            legacy = f"{table}_unpartitioned"
+            fallback = _LEGACY_PARTITION_KEY.get(table, 'now()')
+            conn.execute(text(f'LOCK TABLE "{table}" IN ACCESS EXCLUSIVE MODE'))
+            first = conn.execute(text(
+                f'SELECT min(COALESCE("{column}", {fallback})) FROM "{table}"'
+            )).scalar()
+            sequence = conn.execute(text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": table}).scalar()
+            columns = [row[0] for row in conn.execute(text(
+                "SELECT attname FROM pg_attribute WHERE attrelid = to_regclass(:table) AND attnum > 0 "
+                "AND NOT attisdropped ORDER BY attnum"
+            ), {"table": table})]
+
+            conn.execute(text(f'ALTER TABLE "{table}" RENAME TO "{legacy}"'))
+            conn.execute(text(
+                f'CREATE TABLE "{table}" (LIKE "{legacy}" INCLUDING DEFAULTS) PARTITION BY RANGE ("{column}")'
+            ))
+            conn.execute(text(f'ALTER TABLE "{table}" ALTER COLUMN "{column}" SET NOT NULL'))
+            conn.execute(text(f'CREATE TABLE "{table}_default" PARTITION OF "{table}" DEFAULT'))
+            current = _month_start(datetime.date.today())
+            month = _month_start(first) if first else current
+            month = min(month, current)
+            while month <= _add_months(current, months_ahead):
+                _create_month_partition(conn, table, column, month)
+                month = _add_months(month, 1)
+
+            column_list = ', '.join(f'"{name}"' for name in columns)
+            select_list = ', '.join(
+                f'COALESCE("{name}", {fallback}, now())' if name == column else f'"{name}"' for name in columns
+            )
+            copied = conn.execute(text(
+                f'INSERT INTO "{table}" ({column_list}) SELECT {select_list} FROM "{legacy}"'
+            )).rowcount
+            if sequence:
+                conn.execute(text(f'ALTER SEQUENCE {sequence} OWNED BY "{table}".id'))
+            # CASCADE 同时删除 auto_test_audit 指向旧表的外键
+            conn.execute(text(f'DROP TABLE "{legacy}" CASCADE'))
+            conn.execute(text(f'ALTER TABLE "{table}" ADD PRIMARY KEY (id, "{column}")'))
+            for index in _table_indexes(table):
+                index.create(conn)
+            log(f"--- Partitioned {table} by month on {column} ({copied} rows copied) ---")
+
+
+def maintain_partitions(engine, months_ahead=2, retention_months=None, log=print):
+    """
+    预建当前月之后 months_ahead 个月的分区；指定 retention_months 时删除
+    上界早于 (当前月 - retention_months) 的分区，并清理不再被引用的 audit_payloads。未分区的表跳过。
+    :return: (新建的分区名列表, 删除的分区名列表)
+    """
+    created, dropped = [], []
+    current = _month_start(datetime.date.today())
+    for table, column in PARTITIONED_TABLES:
+        with engine.begin() as conn:
+            if not is_partitioned(conn, table):
+                log(f"--- {table} is not partitioned, skipped ---")
+                continue
+            for offset in range(months_ahead + 1):
+                month = _add_months(current, offset)
+                if _create_month_partition(conn, table, column, month):
+                    created.append(_partition_name(table, month))
+            if retention_months is None:
+                continue
+            cutoff = _add_months(current, -retention_months)
+            partitions = conn.execute(text(
+                "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = to_regclass(:table) ORDER BY c.relname"
+            ), {"table": table}).scalars().all()
+            for name in partitions:
+                match = re.fullmatch(rf'{table}_p(\d{{4}})(\d{{2}})', name)
+                if match and _add_months(datetime.date(int(match.group(1)), int(match.group(2)), 1), 1) <= cutoff:
+                    conn.execute(text(f'DROP TABLE "{name}"'))
+                    dropped.append(name)
+    pruned = None
+    if retention_months is not None:
+        with engine.begin() as conn:
+            pruned = prune_audit_payloads(conn, _add_months(current, -retention_months))
+    for name in created:
+        log(f"--- Created partition {name} ---")
+    for name in dropped:
+        log(f"--- Dropped expired partition {name} ---")
+    if pruned is not None:
+        log(f"--- Pruned {pruned} unreferenced audit payloads ---")
+    return created, dropped
+
+
+def prune_audit_payloads(conn, cutoff):
+    """
+    删除 cutoff 之前写入、且没有任何 auto_test_audit 行 (request_hash / response_hash) 引用的载荷。
+    载荷与引用它的审计行在同一事务中写入；只清理保留期之前的载荷，不影响运行中的测试刚写入的内容。
+    :return: 删除的行数；audit_payloads 表不存在时返回 None
+    """
+    if conn.execute(text("SELECT to_regclass('audit_payloads')")).scalar() is None:
+        return None
+    return conn.execute(text(
+        "DELETE FROM audit_payloads p WHERE p.created_at < :cutoff "
+        "AND NOT EXISTS (SELECT 1 FROM auto_test_audit a WHERE a.request_hash = p.hash) "
+        "AND NOT EXISTS (SELECT 1 FROM auto_test_audit a WHERE a.response_hash = p.hash)"
+    ), {"cutoff": cutoff}).rowcount
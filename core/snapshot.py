@@ -0,0 +1,113 @@
+# core/snapshot.py
+
+import datetime
+import json
+import os
+import sqlite3
+
+# =================================================================
+# 测试定义快照 (本地 SQLite 文件)
+# - xdist 主进程选出本次的场景并解析出完整定义后导出一次，工作进程直接读取，不再访问框架数据库
+# - 也可以用 --export-snapshot 生成一个冻结的测试套件，之后通过 --snapshot 在没有框架数据库的环境下运行
+# =================================================================
+
+SNAPSHOT_ENV_VAR = 'FRAMEWORK_SNAPSHOT_PATH'
+SNAPSHOT_FORMAT_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE cases (
+    position INTEGER PRIMARY KEY,
+    case_id INTEGER NOT NULL,
+    data_set_id INTEGER NOT NULL UNIQUE,
+    display_name TEXT NOT NULL,
+    jira_id TEXT,
+    details TEXT
+);
+"""
+
+ENVIRONMENT_FIELDS = ('name', 'base_url', 'app_db_connection_string', 'description', 'is_active')
+
+
+def _dumps(value):
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'), default=str)
+
+
+def export_snapshot(path, rows, case_details, environment=None, options=None):
+    """
+    把选中的场景 (保持收集顺序) 及其完整定义写入 path。
+    先写临时文件再原子替换，读取方不会看到写了一半的快照。
+    :param rows: [(case_id, data_set_id, display_name, jira_id), ...]
+    :param case_details: {(case_id, data_set_id): case_details}
+    :param environment: Environment 对象或字典，--snapshot 模式下替代 test_environments 表
+    :param options: 生成快照时使用的筛选条件，仅用于记录
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    if environment is not None and not isinstance(environment, dict):
+        environment = {field: getattr(environment, field, None) for field in ENVIRONMENT_FIELDS}
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(_SCHEMA)
+        conn.executemany("INSERT INTO meta (key, value) VALUES (?, ?)", [
+            ('format_version', _dumps(SNAPSHOT_FORMAT_VERSION)),
+            ('created_at', _dumps(datetime.datetime.now().isoformat())),
+            ('environment', _dumps(environment)),
+            ('options', _dumps(options or {})),
+        ])
+        conn.executemany(
+            "INSERT INTO cases (position, case_id, data_set_id, display_name, jira_id, details) VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                (position, row[0], row[1], row[2], row[3], _dumps(case_details.get((row[0], row[1]))))
+                for position, row in enumerate(rows)
+            )
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+    return path
+
+
+class Snapshot:
+    """只读打开的快照文件。"""
+    def __init__(self, path):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"快照文件不存在: {path}")
+        self.path = path
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            self.meta = {key: json.loads(value) for key, value in conn.execute("SELECT key, value FROM meta")}
+            if self.meta.get('format_version') != SNAPSHOT_FORMAT_VERSION:
+                raise ValueError(f"不支持的快照格式版本: {self.meta.get('format_version')}")
+            self._records = conn.execute(
+                "SELECT case_id, data_set_id, display_name, jira_id, details FROM cases ORDER BY position"
+            ).fetchall()
+        finally:
+            conn.close()
+
+    @property
+    def environment(self):
+        return self.meta.get('environment')
+
+    def rows(self):
+        return [(case_id, data_set_id, display_name, jira_id) for case_id, data_set_id, display_name, jira_id, _ in self._records]
+
+    def case_details(self):
+        return {
+            (case_id, data_set_id): json.loads(details)
+            for case_id, data_set_id, _, _, details in self._records if details
+        }
+
+
+def load_snapshot(path):
+    """
+    读取快照。
+    :return: (rows, case_details, environment)，与 run_plan.plan_test_run 的结果格式一致
+    """
+    snapshot = Snapshot(path)
+    return snapshot.rows(), snapshot.case_details(), snapshot.environment
@@ -0,0 +1,231 @@
+# core/step_analysis.py
+
+from typing import Any, Dict, List
+
+from utils.jsonpath_cache import SimplePath, compile_jsonpath
+from utils.placeholder_parser import collect_references
+
+# =================================================================
+# 步骤静态分析
+# 在执行前分析合并后的步骤：每一步引用了哪些步骤的响应、哪些提取变量和动态变量，
+# 以及它自己产出哪些变量。并行调度依赖这些信息构建依赖图。
+# =================================================================
+
+# 会被 ApiClient 解析占位符的步骤字段
+_TEMPLATE_FIELDS = ('api_url_path', 'headers', 'params', 'body', 'validations')
+# 没有副作用的请求方法；其余方法 (以及未填写方法) 的步骤都视为会修改服务端状态
+_SAFE_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+
+
+class StepInfo:
+    """单个步骤的静态引用信息"""
+    __slots__ = ('order', 'step_refs', 'variable_refs', 'dynamic_refs', 'outputs', 'has_db_validation', 'mutating')
+
+    def __init__(self, order, step_refs, variable_refs, dynamic_refs, outputs, has_db_validation, mutating=True):
+        self.order = order
+        self.step_refs = step_refs           # 通过 {{step_N....}} 引用的步骤序号
+        self.variable_refs = variable_refs   # 通过 {{name}} 引用的提取变量名
+        self.dynamic_refs = dynamic_refs     # 引用的动态变量占位符 ({{$randomUser}} 等)
+        self.outputs = outputs               # 本步骤 outputs 产出的变量名
+        self.has_db_validation = has_db_validation
+        self.mutating = mutating             # 非 GET/HEAD/OPTIONS 请求，可能修改服务端状态或设置 cookie
+
+
+def _effective_validations(step, validations_override):
+    override = (validations_override or {}).get(str(step.get('step_order')))
+    return override if override is not None else step.get('validations')
+
+
+def analyze_steps(steps: List[Dict[str, Any]], validations_override: Dict[str, Any] = None) -> List[StepInfo]:
+    """按 step_order 顺序返回每个步骤的 StepInfo。"""
+    infos = []
+    for step in steps:
+        references = {'dynamic': set(), 'dataset': set(), 'step': set()}
+        for field in _TEMPLATE_FIELDS:
+            value = _effective_validations(step, validations_override) if field == 'validations' else step.get(field)
+            collect_references(value, references)
+
+        step_refs, variable_refs = set(), set()
+        for path in references['step']:
+            head = path.split('.', 1)[0]
+            if '.' not in path:
+                variable_refs.add(path)
+            elif head.startswith('step_') and head[5:].isdigit():
+                step_refs.add(int(head[5:]))
+
+        validations = _effective_validations(step, validations_override)
+        outputs = {o.get('variable_name') for o in (step.get('outputs') or []) if o.get('variable_name')}
+        infos.append(StepInfo(
+            order=step.get('step_order'),
+            step_refs=step_refs,
+            variable_refs=variable_refs,
+            dynamic_refs=references['dynamic'],
+            outputs=outputs,
+            has_db_validation=isinstance(validations, dict) and 'dbValidation' in validations,
+            mutating=(step.get('http_method') or '').upper() not in _SAFE_METHODS,
+        ))
+    return infos
+
+
+def build_dependency_graph(infos: List[StepInfo]) -> Dict[Any, set]:
+    """
+    根据静态引用构建步骤依赖图 {step_order: {依赖的 step_order, ...}}。
+
+    规则 (保守)：
+    - 引用 {{step_N...}} 的步骤依赖步骤 N；引用提取变量的步骤依赖最近一个产出该变量的前序步骤；
+    - 使用同一个动态变量的步骤依赖第一个使用它的步骤 (动态值在首次使用时生成)；
+    - 没有任何显式引用，或带有 dbValidation 的步骤，可能依赖前序步骤的副作用 (cookie、数据写入)，
+      因此依赖所有前序步骤；
+    - 会修改状态的步骤 (非 GET/HEAD/OPTIONS) 是屏障：它依赖所有前序步骤，之后的每个步骤都依赖它。
+      例如登录 -> 创建订单 -> 只用登录 token 查询订单列表，查询仍会等待创建完成。
+    """
+    graph = {}
+    previous = []
+    producers = {}
+    first_dynamic_users = {}
+    barriers = set()
+    for info in infos:
+        deps = set()
+        deps.update(order for order in info.step_refs if order in graph)
+        for variable in info.variable_refs:
+            if variable in producers:
+                deps.add(producers[variable])
+        for placeholder in info.dynamic_refs:
+            if placeholder in first_dynamic_users:
+                deps.add(first_dynamic_users[placeholder])
+            else:
+                first_dynamic_users[placeholder] = info.order
+
+        if not (info.step_refs or info.variable_refs) or info.has_db_validation or info.mutating:
+            deps.update(previous)
+        deps.update(barriers)
+
+        graph[info.order] = deps
+        if info.mutating:
+            barriers.add(info.order)
+        for variable in info.outputs:
+            producers[variable] = info.order
+        previous.append(info.order)
+    return graph
+
+
+def response_release_plan(infos: List[StepInfo]) -> Dict[Any, List[Any]]:
+    """
+    根据静态引用计算每个步骤的响应最后一次被读取的时间点。
+    步骤自身的断言和 outputs 总会读取自己的响应；之后只有 {{step_N...}} 引用会再次读取。
+
+    :return: {step_order: [在该步骤完成后即可释放响应的 step_order, ...]}
+    """
+    last_reader = {}
+    for info in infos:
+        for order in info.step_refs:
+            if order in last_reader:
+                last_reader[order] = info.order
+        last_reader[info.order] = info.order
+
+    plan = {info.order: [] for info in infos}
+    for order, reader in last_reader.items():
+        plan[reader].append(order)
+    return plan
+
+
+def response_readers(infos: List[StepInfo]) -> Dict[Any, set]:
+    """
+    并行执行时的响应释放依据：每个步骤的响应会被哪些步骤读取 (包括它自己)。
+    并发的步骤完成顺序不一定是 step_order 顺序，只有这些步骤全部完成后才能释放该响应；
+    顺序执行时使用 response_release_plan 即可。
+
+    :return: {step_order: {读取该步骤响应的 step_order, ...}}
+    """
+    readers = {}
+    for info in infos:
+        for order in info.step_refs:
+            if order in readers:
+                readers[order].add(info.order)
+        readers[info.order] = {info.order}
+    return readers
+
+
+def has_parallelism(graph: Dict[Any, set]) -> bool:
+    """依赖图是否允许至少两个步骤并发 (即不是一条严格的链)。"""
+    previous = []
+    for order, deps in graph.items():
+        if previous and previous[-1] not in deps:
+            return True
+        previous.append(order)
+    return False
+
+
+def _leaf_paths(expected, prefix=()):
+    """部分匹配的期望结构中每个叶子 (以及空容器) 的路径。"""
+    if isinstance(expected, dict) and expected:
+        for key, value in expected.items():
+            yield from _leaf_paths(value, prefix + (key,))
+    elif isinstance(expected, list) and expected:
+        for index, value in enumerate(expected):
+            yield from _leaf_paths(value, prefix + (index,))
+    else:
+        yield prefix
+
+
+def referenced_body_paths(steps: List[Dict[str, Any]], validations_override: Dict[str, Any] = None) -> Dict[Any, Any]:
+    """
+    静态地找出每个步骤的响应体中真正会被用到的路径 (字段名/下标组成的元组)，供流式读取使用。
+    来源包括本步骤的 validations (body、notNull、notExist、dbValidation.expectedFromResponse)、
+    outputs，以及所有步骤中 {{step_N.response.body...}} 形式的引用。
+
+    :return: {step_order: {path, ...}}；需要完整响应体时 (containsText、非简单 JSONPath、
+             引用整个 body 等) 对应的值为 None。
+    """
+    paths = {step.get('step_order'): set() for step in steps}
+
+    def add(order, path):
+        if paths.get(order) is None:
+            return
+        if not path:
+            paths[order] = None
+        else:
+            paths[order].add(path)
+
+    def add_expression(order, expression):
+        compiled = compile_jsonpath(expression) if isinstance(expression, str) else None
+        add(order, compiled.segments if isinstance(compiled, SimplePath) else ())
+
+    for step in steps:
+        order = step.get('step_order')
+        validations = _effective_validations(step, validations_override)
+        if isinstance(validations, dict):
+            if 'containsText' in validations:
+                paths[order] = None
+            if 'body' in validations:
+                for path in _leaf_paths(validations['body']):
+                    add(order, path)
+            for keyword in ('notNull', 'notExist'):
+                for expression in validations.get(keyword) or []:
+                    add_expression(order, expression)
+            db_rules = validations.get('dbValidation')
+            for db_rule in db_rules if isinstance(db_rules, list) else [db_rules]:
+                if isinstance(db_rule, dict):
+                    for expression in (db_rule.get('expectedFromResponse') or {}).values():
+                        add_expression(order, expression)
+
+        for output in step.get('outputs') or []:
+            if output.get('source') == 'response_body':
+                add_expression(order, output.get('json_path'))
+
+        references = {'dynamic': set(), 'dataset': set(), 'step': set()}
+        for field in _TEMPLATE_FIELDS:
+            value = validations if field == 'validations' else step.get(field)
+            collect_references(value, references)
+        for reference in references['step']:
+            parts = reference.split('.')
+            head = parts[0]
+            if len(parts) >= 3 and head.startswith('step_') and head[5:].isdigit() and parts[1:3] == ['response', 'body']:
+                target = int(head[5:])
+                if target not in paths:
+                    continue
+                if len(parts) > 3:
+                    add_expression(target, '.'.join(parts[3:]))
+                else:
+                    add(target, ())
+    return paths
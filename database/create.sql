@@ -1,53 +1,231 @@
--- 1. 环境配置表
+-- database/create.sql
+-- 由 python database/migrate.py dump-schema 按 models/tables.py 生成，请勿手工修改。
+-- 建库/升级请使用 python database/migrate.py upgrade (同时执行 database/migrations 下的脚本)。
+
+CREATE TABLE api_auto_cases (
+	id SERIAL NOT NULL, 
+	name VARCHAR(255) NOT NULL, 
+	description TEXT, 
+	service VARCHAR(100) NOT NULL, 
+	module VARCHAR(100), 
+	component VARCHAR(100), 
+	tags TEXT[], 
+	author VARCHAR(50), 
+	created_at TIMESTAMP WITH TIME ZONE DEFAULT now(), 
+	PRIMARY KEY (id)
+);
+
+CREATE INDEX ix_api_auto_cases_component ON api_auto_cases (component);
+
+CREATE INDEX ix_api_auto_cases_module ON api_auto_cases (module);
+
+CREATE INDEX ix_api_auto_cases_service ON api_auto_cases (service);
+
+CREATE INDEX ix_api_auto_cases_tags ON api_auto_cases (tags);
+
+CREATE TABLE audit_payloads (
+	hash VARCHAR(64) NOT NULL, 
+	codec VARCHAR(10) NOT NULL, 
+	raw_size INTEGER, 
+	data BYTEA NOT NULL, 
+	created_at TIMESTAMP WITH TIME ZONE DEFAULT now(), 
+	PRIMARY KEY (hash)
+);
+
+CREATE TABLE auto_case_audit (
+	id SERIAL NOT NULL, 
+	runid VARCHAR(50) NOT NULL, 
+	case_id INTEGER, 
+	data_set_id INTEGER, 
+	scenario TEXT, 
+	issue_key VARCHAR(50), 
+	run_status VARCHAR(20), 
+	duration REAL, 
+	error_message TEXT, 
+	variables JSONB, 
+	definition_hash VARCHAR(64), 
+	peak_context_bytes BIGINT, 
+	phase_timings JSONB, 
+	update_at TIMESTAMP WITH TIME ZONE DEFAULT now(), 
+	PRIMARY KEY (id)
+);
+
+CREATE INDEX ix_auto_case_audit_case_data_set ON auto_case_audit (case_id, data_set_id, id);
+
+CREATE INDEX ix_auto_case_audit_runid_id ON auto_case_audit (runid, id);
+
+CREATE INDEX ix_auto_case_audit_runid_status ON auto_case_audit (runid, run_status);
+
+CREATE TABLE auto_progress (
+	id SERIAL NOT NULL, 
+	runid VARCHAR(50), 
+	version_id VARCHAR(35), 
+	component VARCHAR(50), 
+	planned_cases INTEGER, 
+	total_cases INTEGER, 
+	passes INTEGER, 
+	failures INTEGER, 
+	skips INTEGER, 
+	begin_time TIMESTAMP WITHOUT TIME ZONE, 
+	end_time TIMESTAMP WITHOUT TIME ZONE, 
+	releaseversion VARCHAR(200), 
+	task_status VARCHAR(25), 
+	run_by VARCHAR(50), 
+	label VARCHAR(1000), 
+	runmode VARCHAR(255), 
+	profile VARCHAR(200), 
+	update_time TIMESTAMP WITHOUT TIME ZONE, 
+	run_args JSONB, 
+	priority INTEGER, 
+	owner VARCHAR(200), 
+	heartbeat_at TIMESTAMP WITHOUT TIME ZONE, 
+	phase_timings JSONB, 
+	PRIMARY KEY (id)
+);
+
+CREATE INDEX ix_auto_progress_runid ON auto_progress (runid);
+
+CREATE INDEX ix_auto_progress_task_status ON auto_progress (task_status, update_time);
+
+CREATE TABLE load_step_stats (
+	id SERIAL NOT NULL, 
+	runid VARCHAR(50) NOT NULL, 
+	case_id INTEGER, 
+	step_order INTEGER, 
+	action_description TEXT, 
+	executions INTEGER, 
+	requests INTEGER, 
+	errors INTEGER, 
+	error_rate REAL, 
+	throughput REAL, 
+	latency_min REAL, 
+	latency_mean REAL, 
+	latency_p50 REAL, 
+	latency_p95 REAL, 
+	latency_p99 REAL, 
+	latency_max REAL, 
+	histogram JSONB, 
+	error_messages JSONB, 
+	PRIMARY KEY (id)
+);
+
+CREATE INDEX ix_load_step_stats_runid ON load_step_stats (runid, case_id, step_order);
+
+CREATE TABLE load_test_runs (
+	id SERIAL NOT NULL, 
+	runid VARCHAR(50) NOT NULL, 
+	profile VARCHAR(200), 
+	filters JSONB, 
+	scenarios INTEGER, 
+	arrival_rate REAL, 
+	ramp_up REAL, 
+	duration REAL, 
+	max_in_flight INTEGER, 
+	iterations INTEGER, 
+	failed_iterations INTEGER, 
+	dropped_iterations INTEGER, 
+	interrupted_iterations INTEGER, 
+	throughput REAL, 
+	iteration_p50 REAL, 
+	iteration_p95 REAL, 
+	iteration_p99 REAL, 
+	begin_time TIMESTAMP WITHOUT TIME ZONE, 
+	end_time TIMESTAMP WITHOUT TIME ZONE, 
+	PRIMARY KEY (id)
+);
+
+CREATE UNIQUE INDEX ix_load_test_runs_runid ON load_test_runs (runid);
+
+CREATE TABLE schema_migrations (
+	version VARCHAR(20) NOT NULL, 
+	name VARCHAR(255) NOT NULL, 
+	applied_at TIMESTAMP WITH TIME ZONE DEFAULT now(), 
+	PRIMARY KEY (version)
+);
+
+CREATE TABLE shared_actions (
+	id SERIAL NOT NULL, 
+	name VARCHAR(100) NOT NULL, 
+	description TEXT, 
+	api_url_path VARCHAR(500) NOT NULL, 
+	http_method VARCHAR(10) NOT NULL, 
+	headers JSONB, 
+	params JSONB, 
+	body JSONB, 
+	validations JSONB, 
+	outputs JSONB, 
+	cacheable BOOLEAN DEFAULT 'false' NOT NULL, 
+	cache_ttl INTEGER, 
+	PRIMARY KEY (id)
+);
+
+CREATE UNIQUE INDEX ix_shared_actions_name ON shared_actions (name);
+
 CREATE TABLE test_environments (
-    id SERIAL PRIMARY KEY,
-    name VARCHAR(50) UNIQUE NOT NULL, -- 环境名 (e.g., 'dev', 'staging', 'prod')
-    base_url VARCHAR(255) NOT NULL,
-    description TEXT,
-    is_active BOOLEAN DEFAULT true
-);
-
--- 2. 测试用例主表
-CREATE TABLE test_cases (
-    id SERIAL PRIMARY KEY,
-    name VARCHAR(255) NOT NULL,
-    description TEXT,
-    component VARCHAR(100), -- 所属组件/模块
-    label VARCHAR(100),     -- 标签 (e.g., 'P0', 'smoke', 'regression')
-    author VARCHAR(50),
-    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
-);
-
--- 3. API 请求步骤表（核心）
-CREATE TABLE test_steps (
-    id SERIAL PRIMARY KEY,
-    case_id INTEGER REFERENCES test_cases(id) ON DELETE CASCADE,
-    step_order INTEGER NOT NULL, -- 集成测试中的执行顺序
-    description TEXT,
-    api_url_path VARCHAR(500) NOT NULL,
-    http_method VARCHAR(10) NOT NULL, -- GET, POST, PUT, DELETE etc.
-    headers JSONB, -- 请求头 (e.g., {"Content-Type": "application/json"})
-    params JSONB,  -- URL查询参数
-    body JSONB,    -- 请求体, 支持动态参数 "body": {"userId": "{{step_1.response.body.id}}"}
-    UNIQUE (case_id, step_order)
-);
-
--- 4. 断言规则表
-CREATE TABLE test_assertions (
-    id SERIAL PRIMARY KEY,
-    step_id INTEGER REFERENCES test_steps(id) ON DELETE CASCADE,
-    rule_type VARCHAR(50) NOT NULL, -- 'status_code', 'json_path_equals', 'contains_text', 'header_equals'
-    expected_value TEXT NOT NULL,
-    json_path TEXT, -- 仅当 rule_type 为 json_path_* 时使用
-    description TEXT
-);
-
--- 5. 动态参数提取表 (用于集成测试)
-CREATE TABLE test_step_outputs (
-    id SERIAL PRIMARY KEY,
-    step_id INTEGER REFERENCES test_steps(id) ON DELETE CASCADE,
-    variable_name VARCHAR(100) NOT NULL, -- 提取后存储的变量名 (e.g., 'user_token')
-    source VARCHAR(50) NOT NULL, -- 'response_body', 'response_headers'
-    json_path TEXT NOT NULL, -- 从源中提取值的 JSON Path
-    UNIQUE (step_id, variable_name)
-);
\ No newline at end of file
+	id SERIAL NOT NULL, 
+	name VARCHAR(50) NOT NULL, 
+	base_url VARCHAR(255) NOT NULL, 
+	app_db_connection_string TEXT, 
+	description TEXT, 
+	is_active BOOLEAN, 
+	PRIMARY KEY (id), 
+	UNIQUE (name)
+);
+
+CREATE TABLE api_actions (
+	id SERIAL NOT NULL, 
+	case_id INTEGER NOT NULL, 
+	step_order INTEGER NOT NULL, 
+	description TEXT, 
+	shared_action_ref VARCHAR(100), 
+	api_url_path VARCHAR(500), 
+	http_method VARCHAR(10), 
+	headers JSONB, 
+	params JSONB, 
+	body JSONB, 
+	validations JSONB, 
+	outputs JSONB, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(case_id) REFERENCES api_auto_cases (id), 
+	FOREIGN KEY(shared_action_ref) REFERENCES shared_actions (name)
+);
+
+CREATE INDEX ix_api_actions_case_id ON api_actions (case_id);
+
+CREATE TABLE auto_test_audit (
+	id SERIAL NOT NULL, 
+	audit_case_id INTEGER NOT NULL, 
+	step_order INTEGER, 
+	action_description TEXT, 
+	request_details JSONB, 
+	response_details JSONB, 
+	request_hash VARCHAR(64), 
+	response_hash VARCHAR(64), 
+	step_status VARCHAR(20), 
+	attempts INTEGER, 
+	time_to_consistency REAL, 
+	created_at TIMESTAMP WITH TIME ZONE DEFAULT now(), 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(audit_case_id) REFERENCES auto_case_audit (id)
+);
+
+CREATE INDEX ix_auto_test_audit_audit_case_id ON auto_test_audit (audit_case_id, step_order);
+
+CREATE TABLE case_data_sets (
+	id SERIAL NOT NULL, 
+	case_id INTEGER NOT NULL, 
+	data_set_name VARCHAR(255) NOT NULL, 
+	variables JSONB NOT NULL, 
+	validations_override JSONB, 
+	environments TEXT[], 
+	jira_id VARCHAR(50), 
+	tags TEXT[], 
+	is_active BOOLEAN, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(case_id) REFERENCES api_auto_cases (id), 
+	UNIQUE (jira_id)
+);
+
+CREATE INDEX ix_case_data_sets_case_id ON case_data_sets (case_id);
+
+CREATE INDEX ix_case_data_sets_environments ON case_data_sets (environments);
@@ -1,59 +1,56 @@
+-- database/insert.sql
+-- 示例数据：一个环境 + 一个两步的集成用例 (管理员登录后查询用户信息) + 一个数据集。
+-- 先执行 python database/migrate.py upgrade 建表，再执行: psql -d <db> -f database/insert.sql
 DO $$
 DECLARE
     -- 声明变量来存储新创建记录的 ID
     new_case_id INT;
-    step_1_id INT;
-    step_2_id INT;
 BEGIN
 
     -- =================================================================
-    -- 1. 插入测试用例 (Test Case)
+    -- 1. 测试环境 (Environment)
     -- =================================================================
-    INSERT INTO test_cases (name, description, component, label, author)
+    INSERT INTO test_environments (name, base_url, description, is_active)
+    VALUES ('dev', 'http://localhost:8080', 'Local development environment', true)
+    ON CONFLICT (name) DO NOTHING;
+
+
+    -- =================================================================
+    -- 2. 测试用例模板 (Test Case)
+    -- =================================================================
+    INSERT INTO api_auto_cases (name, description, service, module, component, tags, author)
     VALUES (
         'Admin Login and Query User Info',
         'A full integration test for admin login and then querying user data.',
-        'User Authentication',
-        'Smoke',
+        'User Management',
+        'Authentication',
+        'Login',
+        ARRAY['P0', 'smoke'],
         'Test Architect'
     ) RETURNING id INTO new_case_id; -- 将新生成的用例ID存入变量 new_case_id
 
 
     -- =================================================================
-    -- 2. 插入步骤1：用户登录 (Login)
+    -- 3. 步骤1：用户登录，提取 token 供后续步骤使用
     -- =================================================================
-    INSERT INTO test_steps (case_id, step_order, description, api_url_path, http_method, headers, body)
+    INSERT INTO api_actions (case_id, step_order, description, api_url_path, http_method, headers, body, validations, outputs)
     VALUES (
         new_case_id,
         1, -- 这是第 1 步
         'Admin user login to get access token',
         '/dar/user/login',
         'POST',
-        '{"Content-Type": "application/json"}', -- Headers in JSONB format
-        '{"username": "admin", "password": "admin123"}' -- Body in JSONB format
-    ) RETURNING id INTO step_1_id; -- 将新生成的步骤ID存入变量 step_1_id
-
-
-    -- -----------------------------------------------------------------
-    -- 3. 为步骤1添加断言 (Assertions)
-    -- -----------------------------------------------------------------
-    INSERT INTO test_assertions (step_id, rule_type, expected_value, description)
-    VALUES
-        (step_1_id, 'status_code_equals', '200', 'Verify login is successful (HTTP 200)');
-
-
-    -- -----------------------------------------------------------------
-    -- 4. 为步骤1添加输出提取规则 (Outputs)
-    -- -----------------------------------------------------------------
-    INSERT INTO test_step_outputs (step_id, variable_name, source, json_path)
-    VALUES
-        (step_1_id, 'admin_token', 'response_body', 'data.token'); -- 从响应体中提取 access_token 字段，并将其存为变量 'admin_token'
+        '{"Content-Type": "application/json"}',
+        '{"username": "{{@username}}", "password": "{{@password}}"}',
+        '{"expectedStatusCode": 200, "notNull": ["$.data.token"]}',
+        '[{"variable_name": "admin_token", "source": "response_body", "json_path": "data.token"}]'
+    );
 
 
     -- =================================================================
-    -- 5. 插入步骤2：查询用户信息 (Query User)
+    -- 4. 步骤2：使用 token 查询用户信息
     -- =================================================================
-    INSERT INTO test_steps (case_id, step_order, description, api_url_path, http_method, headers, body)
+    INSERT INTO api_actions (case_id, step_order, description, api_url_path, http_method, headers, body, validations)
     VALUES (
         new_case_id,
         2, -- 这是第 2 步
@@ -61,15 +58,22 @@ BEGIN
         '/dar/user/queryUser',
         'POST',
         '{"Content-Type": "application/json", "Authorization": "Bearer {{admin_token}}"}',
-        '{"username": "admin"}'
-    ) RETURNING id INTO step_2_id; -- 将新生成的步骤ID存入变量 step_2_id
+        '{"username": "{{@username}}"}',
+        '{"expectedStatusCode": 200, "body": {"data": [{"username": "admin"}]}}'
+    );
+
 
+    -- =================================================================
+    -- 5. 数据集 (Data Set)
+    -- =================================================================
+    INSERT INTO case_data_sets (case_id, data_set_name, variables, environments, jira_id, is_active)
+    VALUES (
+        new_case_id,
+        'Admin account',
+        '{"username": "admin", "password": "admin123"}',
+        ARRAY['dev'],
+        'PROJ-1',
+        true
+    );
 
-    -- -----------------------------------------------------------------
-    -- 6. 为步骤2添加断言 (Assertions)
-    -- -----------------------------------------------------------------
-    INSERT INTO test_assertions (step_id, rule_type, expected_value, json_path, description)
-    VALUES
-        (step_2_id, 'status_code_equals', '200', NULL, 'Verify query is successful (HTTP 200)'), -- 为 json_path 添加了 NULL
-        (step_2_id, 'json_path_equals', 'admin', 'data[0].username', 'Verify the username in response is "admin"');
-END $$;
\ No newline at end of file
+END $$;
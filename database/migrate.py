@@ -0,0 +1,78 @@
+# database/migrate.py
+"""
+框架数据库的结构管理 (使用 .env / DB_* 环境变量连接)。
+
+  upgrade                          创建缺失的表并执行尚未执行的 database/migrations 脚本
+  check                            对比数据库与 models/tables.py，有差异时以非零状态退出
+  dump-schema [-o FILE]            按 models/tables.py 生成建表 SQL (默认写入 database/create.sql)
+  partition [--months-ahead N]     把 auto_case_audit / auto_test_audit 转换为按月分区 (一次性，需停写)
+  maintain [--retention-months N]  预建未来的分区并删除超过保留期的分区 (适合放入每日定时任务)
+
+用法: python database/migrate.py upgrade
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+
+from core import schema
+
+DEFAULT_SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'create.sql')
+
+_SCHEMA_HEADER = """-- database/create.sql
+-- 由 python database/migrate.py dump-schema 按 models/tables.py 生成，请勿手工修改。
+-- 建库/升级请使用 python database/migrate.py upgrade (同时执行 database/migrations 下的脚本)。
+
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("upgrade", help="创建缺失的表并执行未执行的迁移脚本")
+    commands.add_parser("check", help="检查数据库与模型的差异")
+    dump = commands.add_parser("dump-schema", help="生成建表 SQL")
+    dump.add_argument("-o", "--output", default=DEFAULT_SCHEMA_FILE, help="输出文件，'-' 表示标准输出")
+    partition = commands.add_parser("partition", help="把结果表转换为按月分区")
+    partition.add_argument("--months-ahead", type=int, default=2, help="预建未来几个月的分区")
+    maintain = commands.add_parser("maintain", help="维护分区")
+    maintain.add_argument("--months-ahead", type=int, default=2, help="预建未来几个月的分区")
+    maintain.add_argument("--retention-months", type=int, default=None,
+                          help="保留最近几个月的结果，更早的分区整体删除 (默认不删除)")
+    args = parser.parse_args()
+
+    if args.command == "dump-schema":
+        sql = _SCHEMA_HEADER + schema.dump_schema_sql()
+        if args.output == "-":
+            sys.stdout.write(sql)
+        else:
+            with open(args.output, "w", encoding="utf-8") as f:
+                f.write(sql)
+            print(f"--- Schema written to {args.output} ---")
+        return
+
+    load_dotenv()
+    from core.db_handler import get_db_engine
+    engine = get_db_engine()
+    if args.command == "upgrade":
+        applied = schema.upgrade(engine)
+        print(f"--- Database is up to date ({len(applied)} migrations applied) ---")
+    elif args.command == "check":
+        problems = schema.check_drift(engine)
+        for problem in problems:
+            print(f"DRIFT: {problem}")
+        if problems:
+            sys.exit(1)
+        print("--- Database matches models/tables.py ---")
+    elif args.command == "partition":
+        schema.partition_tables(engine, months_ahead=args.months_ahead)
+    elif args.command == "maintain":
+        schema.maintain_partitions(engine, months_ahead=args.months_ahead, retention_months=args.retention_months)
+
+
+if __name__ == '__main__':
+    main()
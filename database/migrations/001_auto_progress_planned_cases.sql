@@ -0,0 +1,2 @@
+-- 001: 记录每次运行计划执行的用例数，用于实时进度与预计剩余时间
+ALTER TABLE auto_progress ADD COLUMN IF NOT EXISTS planned_cases INTEGER;
@@ -0,0 +1,3 @@
+-- 002: TaaS 持久化队列 —— 保存排队运行的命令行参数与调度优先级
+ALTER TABLE auto_progress ADD COLUMN IF NOT EXISTS run_args JSONB;
+ALTER TABLE auto_progress ADD COLUMN IF NOT EXISTS priority INTEGER;
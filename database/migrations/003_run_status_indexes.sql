@@ -0,0 +1,5 @@
+-- 003: 状态查询与实时推送所需的索引
+-- GET /runs/{run_id} 按 runid 查 auto_progress
+CREATE INDEX IF NOT EXISTS ix_auto_progress_runid ON auto_progress (runid);
+-- /runs/{run_id}/events 按 (runid, id) 增量读取新写入的用例结果
+CREATE INDEX IF NOT EXISTS ix_auto_case_audit_runid_id ON auto_case_audit (runid, id);
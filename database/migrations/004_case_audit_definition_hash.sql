@@ -0,0 +1,2 @@
+-- 004: 记录每次执行时合并后场景定义的内容哈希，供 --changed-only / --since-run 增量选择
+ALTER TABLE auto_case_audit ADD COLUMN IF NOT EXISTS definition_hash VARCHAR(64);
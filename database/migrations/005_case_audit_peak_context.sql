@@ -0,0 +1,2 @@
+-- 005: 记录每个场景执行期间上下文中同时持有的步骤响应的峰值大小 (字节)
+ALTER TABLE auto_case_audit ADD COLUMN IF NOT EXISTS peak_context_bytes BIGINT;
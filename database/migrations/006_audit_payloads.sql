@@ -0,0 +1,14 @@
+-- 006: Debug 步骤载荷的压缩去重存储 (--debug-storage compressed)
+CREATE TABLE IF NOT EXISTS audit_payloads (
+    hash VARCHAR(64) PRIMARY KEY,
+    codec VARCHAR(10) NOT NULL,
+    raw_size INTEGER,
+    data BYTEA NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+);
+
+ALTER TABLE auto_test_audit ADD COLUMN IF NOT EXISTS request_hash VARCHAR(64);
+ALTER TABLE auto_test_audit ADD COLUMN IF NOT EXISTS response_hash VARCHAR(64);
+
+-- 载荷已经过 zstd 压缩，跳过 TOAST 的 pglz 二次压缩尝试
+ALTER TABLE audit_payloads ALTER COLUMN data SET STORAGE EXTERNAL;
@@ -0,0 +1,20 @@
+-- 007: 结果表上框架自身查询所需的索引 (与 models/tables.py 中的声明保持一致)
+-- 大表上创建索引会阻塞写入，请在没有运行中的测试时执行
+-- auto_test_audit 的分区键；旧行保持 NULL，转换为分区表时取所属场景结果的 update_at
+ALTER TABLE auto_test_audit ADD COLUMN IF NOT EXISTS created_at TIMESTAMP WITH TIME ZONE;
+ALTER TABLE auto_test_audit ALTER COLUMN created_at SET DEFAULT now();
+
+-- JobScheduler 启动时按 task_status 恢复排队/运行中的任务
+CREATE INDEX IF NOT EXISTS ix_auto_progress_task_status ON auto_progress (task_status, update_time);
+-- update_run_summary(recount=True) 按状态汇总一次运行
+CREATE INDEX IF NOT EXISTS ix_auto_case_audit_runid_status ON auto_case_audit (runid, run_status);
+-- 风险排序 / 增量选择 / 耗时预测按 (case_id, data_set_id) 取最近几次结果
+CREATE INDEX IF NOT EXISTS ix_auto_case_audit_case_data_set ON auto_case_audit (case_id, data_set_id, id);
+-- 按场景读取 Debug 步骤日志，删除场景结果时的外键检查
+CREATE INDEX IF NOT EXISTS ix_auto_test_audit_audit_case_id ON auto_test_audit (audit_case_id, step_order);
+-- 加载用例详情时按 case_id 批量读取步骤和数据集
+CREATE INDEX IF NOT EXISTS ix_api_actions_case_id ON api_actions (case_id);
+CREATE INDEX IF NOT EXISTS ix_case_data_sets_case_id ON case_data_sets (case_id);
+
+-- 单列 runid 索引已被 (runid, id) 覆盖
+DROP INDEX IF EXISTS ix_auto_case_audit_runid;
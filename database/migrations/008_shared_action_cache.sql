@@ -0,0 +1,3 @@
+-- 008: 可缓存的共享动作 (结果在用例之间复用，见 core/action_cache.py)
+ALTER TABLE shared_actions ADD COLUMN IF NOT EXISTS cacheable BOOLEAN NOT NULL DEFAULT false;
+ALTER TABLE shared_actions ADD COLUMN IF NOT EXISTS cache_ttl INTEGER;
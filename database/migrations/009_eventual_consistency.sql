@@ -0,0 +1,3 @@
+-- 009: 最终一致性断言 (validations 中的 eventually 块，见 core/eventually.py) 的尝试次数和收敛时间
+ALTER TABLE auto_test_audit ADD COLUMN IF NOT EXISTS attempts INTEGER;
+ALTER TABLE auto_test_audit ADD COLUMN IF NOT EXISTS time_to_consistency REAL;
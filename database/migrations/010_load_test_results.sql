@@ -0,0 +1,45 @@
+-- 010: 压测模式 (run.py --load，见 core/load_runner.py) 的运行记录和每个步骤的延迟/吞吐量/错误率
+CREATE TABLE IF NOT EXISTS load_test_runs (
+    id SERIAL PRIMARY KEY,
+    runid VARCHAR(50) NOT NULL,
+    profile VARCHAR(200),
+    filters JSONB,
+    scenarios INTEGER,
+    arrival_rate REAL,
+    ramp_up REAL,
+    duration REAL,
+    max_in_flight INTEGER,
+    iterations INTEGER,
+    failed_iterations INTEGER,
+    dropped_iterations INTEGER,
+    interrupted_iterations INTEGER,
+    throughput REAL,
+    iteration_p50 REAL,
+    iteration_p95 REAL,
+    iteration_p99 REAL,
+    begin_time TIMESTAMP WITHOUT TIME ZONE,
+    end_time TIMESTAMP WITHOUT TIME ZONE
+);
+CREATE UNIQUE INDEX IF NOT EXISTS ix_load_test_runs_runid ON load_test_runs (runid);
+
+CREATE TABLE IF NOT EXISTS load_step_stats (
+    id SERIAL PRIMARY KEY,
+    runid VARCHAR(50) NOT NULL,
+    case_id INTEGER,
+    step_order INTEGER,
+    action_description TEXT,
+    executions INTEGER,
+    requests INTEGER,
+    errors INTEGER,
+    error_rate REAL,
+    throughput REAL,
+    latency_min REAL,
+    latency_mean REAL,
+    latency_p50 REAL,
+    latency_p95 REAL,
+    latency_p99 REAL,
+    latency_max REAL,
+    histogram JSONB,
+    error_messages JSONB
+);
+CREATE INDEX IF NOT EXISTS ix_load_step_stats_runid ON load_step_stats (runid, case_id, step_order);
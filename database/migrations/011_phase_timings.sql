@@ -0,0 +1,4 @@
+-- 011: 步骤的阶段耗时 (解析、连接、首字节、下载、解码、各断言关键字、提取、报告，见 core/phase_timer.py)
+-- auto_case_audit 每行记录该场景每个步骤的耗时，auto_progress 记录按阶段的累计值 (结果写入器每次批量写入时累加)
+ALTER TABLE auto_case_audit ADD COLUMN IF NOT EXISTS phase_timings JSONB;
+ALTER TABLE auto_progress ADD COLUMN IF NOT EXISTS phase_timings JSONB;
@@ -0,0 +1,3 @@
+-- 012: TaaS 运行的所属实例与心跳 —— 多个服务进程或副本共用数据库时，启动只中断所属实例已不在的运行
+ALTER TABLE auto_progress ADD COLUMN IF NOT EXISTS owner VARCHAR(200);
+ALTER TABLE auto_progress ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMP;
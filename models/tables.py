@@ -1,8 +1,8 @@
 # models/tables.py
 
 from sqlalchemy import (
-    Column, Integer, String, Text, Boolean,
-    ForeignKey, TIMESTAMP, func, REAL
+    Column, Integer, BigInteger, String, Text, Boolean, LargeBinary,
+    ForeignKey, TIMESTAMP, func, REAL, Index
 )
 from sqlalchemy.dialects.postgresql import JSONB, ARRAY
 from sqlalchemy.orm import declarative_base, relationship
@@ -33,7 +33,7 @@ class ApiAction(Base):
     """测试流程中的具体动作步骤表 (烹饪流程)"""
     __tablename__ = 'api_actions'
     id = Column(Integer, primary_key=True)
-    case_id = Column(Integer, ForeignKey('api_auto_cases.id'), nullable=False)
+    case_id = Column(Integer, ForeignKey('api_auto_cases.id'), nullable=False, index=True)
     step_order = Column(Integer, nullable=False)
     description = Column(Text)
     shared_action_ref = Column(String(100), ForeignKey('shared_actions.name'))
@@ -59,12 +59,15 @@ class SharedAction(Base):
     body = Column(JSONB)
     validations = Column(JSONB)
     outputs = Column(JSONB)
+    # 结果可在用例之间复用 (例如登录取 token)：相同的解析后请求在 cache_ttl 秒内只执行一次
+    cacheable = Column(Boolean, nullable=False, server_default='false')
+    cache_ttl = Column(Integer)  # 为空时使用 core.action_cache.DEFAULT_TTL
 
 class CaseDataSet(Base):
     """参数化用例的数据集表 (点餐单)"""
     __tablename__ = 'case_data_sets'
     id = Column(Integer, primary_key=True)
-    case_id = Column(Integer, ForeignKey('api_auto_cases.id'), nullable=False)
+    case_id = Column(Integer, ForeignKey('api_auto_cases.id'), nullable=False, index=True)
     data_set_name = Column(String(255), nullable=False)
     variables = Column(JSONB, nullable=False)
     validations_override = Column(JSONB, nullable=True)
@@ -96,9 +99,10 @@ class AutoProgress(Base):
     """测试运行的概要信息表"""
     __tablename__ = 'auto_progress'
     id = Column(Integer, primary_key=True)
-    runid = Column(String(50))
+    runid = Column(String(50), index=True)
     version_id = Column(String(35))
     component = Column(String(50))
+    planned_cases = Column(Integer)
     total_cases = Column(Integer)
     passes = Column(Integer)
     failures = Column(Integer)
@@ -112,12 +116,21 @@ class AutoProgress(Base):
     runmode = Column(String(255))
     profile = Column(String(200))
     update_time = Column(TIMESTAMP)
+    run_args = Column(JSONB)     # TaaS 排队运行的完整命令行，服务重启后据此恢复
+    priority = Column(Integer)   # TaaS 调度优先级，数值越小越先执行
+    owner = Column(String(200))  # 执行该运行的 TaaS 实例 (主机:进程号:实例 ID)
+    heartbeat_at = Column(TIMESTAMP)  # 所属实例最近一次心跳，超时的 RUNNING 任务视为已中断
+    phase_timings = Column(JSONB)  # 按阶段累加的步骤耗时 {阶段: {steps, total_ms, max_ms}}，结果写入器每批累加 (core.phase_timer)
+
+    __table_args__ = (
+        Index('ix_auto_progress_task_status', 'task_status', 'update_time'),  # JobScheduler 恢复排队/运行中的任务
+    )
 
 class AutoCaseAudit(Base):
     """单个测试场景的详细结果审计表"""
     __tablename__ = 'auto_case_audit'
     id = Column(Integer, primary_key=True)
-    runid = Column(String(50), nullable=False, index=True)
+    runid = Column(String(50), nullable=False)
     case_id = Column(Integer)
     data_set_id = Column(Integer)
     scenario = Column(Text)
@@ -126,9 +139,21 @@ class AutoCaseAudit(Base):
     duration = Column(REAL)
     error_message = Column(Text)
     variables = Column(JSONB)
+    definition_hash = Column(String(64))  # 本次执行时合并后场景定义的 sha256，用于增量选择
+    peak_context_bytes = Column(BigInteger)  # 执行期间上下文中同时持有的步骤响应的峰值大小
+    phase_timings = Column(JSONB)  # 每个步骤的阶段耗时 {step_order: {阶段: 毫秒}} (core.phase_timer)
     update_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
     debug_logs = relationship("AutoTestAudit", back_populates="case_audit", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # 按运行增量读取结果 (/runs/{run_id}/events)，也覆盖只按 runid 的过滤
+        Index('ix_auto_case_audit_runid_id', 'runid', 'id'),
+        # update_run_summary(recount=True) 按状态汇总一次运行
+        Index('ix_auto_case_audit_runid_status', 'runid', 'run_status'),
+        # 风险排序、增量选择、耗时预测按场景取最近几次结果
+        Index('ix_auto_case_audit_case_data_set', 'case_id', 'data_set_id', 'id'),
+    )
+
 class AutoTestAudit(Base):
     """Debug模式下每个步骤的详细交互日志表"""
     __tablename__ = 'auto_test_audit'
@@ -138,5 +163,89 @@ class AutoTestAudit(Base):
     action_description = Column(Text)
     request_details = Column(JSONB)
     response_details = Column(JSONB)
+    # --debug-storage compressed 时载荷存放在 audit_payloads 中，这里只记录其哈希
+    request_hash = Column(String(64))
+    response_hash = Column(String(64))
     step_status = Column(String(20))
+    # 配置了 eventually 的步骤：断言评估次数和从第一次评估到通过的秒数 (未收敛时为空)
+    attempts = Column(Integer)
+    time_to_consistency = Column(REAL)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())  # 分区键 (database/migrate.py partition)
     case_audit = relationship("AutoCaseAudit", back_populates="debug_logs")
+
+    __table_args__ = (
+        Index('ix_auto_test_audit_audit_case_id', 'audit_case_id', 'step_order'),
+    )
+
+class AuditPayload(Base):
+    """按内容去重、压缩存储的 Debug 审计载荷 (请求/响应详情)"""
+    __tablename__ = 'audit_payloads'
+    hash = Column(String(64), primary_key=True)  # 规范化 JSON 的 sha256
+    codec = Column(String(10), nullable=False)   # zstd 或 zlib
+    raw_size = Column(Integer)
+    data = Column(LargeBinary, nullable=False)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+
+class LoadTestRun(Base):
+    """压测模式 (run.py --load) 的一次运行"""
+    __tablename__ = 'load_test_runs'
+    id = Column(Integer, primary_key=True)
+    runid = Column(String(50), nullable=False)
+    profile = Column(String(200))        # 环境名，与 auto_progress.profile 一致
+    filters = Column(JSONB)              # 场景筛选条件
+    scenarios = Column(Integer)          # 参与轮询的场景 (数据集) 数
+    arrival_rate = Column(REAL)          # 稳定阶段每秒开始的迭代数
+    ramp_up = Column(REAL)
+    duration = Column(REAL)
+    max_in_flight = Column(Integer)
+    iterations = Column(Integer)         # 执行完成的迭代数 (含失败)
+    failed_iterations = Column(Integer)
+    dropped_iterations = Column(Integer)  # 在途迭代已满而未启动的到达
+    interrupted_iterations = Column(Integer)  # 结束时超过等待期限被取消的迭代
+    throughput = Column(REAL)            # 每秒完成的迭代数
+    iteration_p50 = Column(REAL)         # 完整场景耗时的分位数 (毫秒)
+    iteration_p95 = Column(REAL)
+    iteration_p99 = Column(REAL)
+    begin_time = Column(TIMESTAMP)
+    end_time = Column(TIMESTAMP)
+
+    __table_args__ = (
+        Index('ix_load_test_runs_runid', 'runid', unique=True),
+    )
+
+class LoadStepStat(Base):
+    """压测中每个 (用例, 步骤) 的请求延迟、吞吐量和错误率"""
+    __tablename__ = 'load_step_stats'
+    id = Column(Integer, primary_key=True)
+    runid = Column(String(50), nullable=False)
+    case_id = Column(Integer)
+    step_order = Column(Integer)
+    action_description = Column(Text)
+    executions = Column(Integer)         # 步骤执行次数
+    requests = Column(Integer)           # 实际发出的请求数 (eventually 重试各计一次，命中动作缓存不计)
+    errors = Column(Integer)             # 失败的步骤执行次数 (断言失败或请求异常)
+    error_rate = Column(REAL)            # errors / executions
+    throughput = Column(REAL)            # 每秒请求数
+    latency_min = Column(REAL)           # 请求延迟 (毫秒)
+    latency_mean = Column(REAL)
+    latency_p50 = Column(REAL)
+    latency_p95 = Column(REAL)
+    latency_p99 = Column(REAL)
+    latency_max = Column(REAL)
+    histogram = Column(JSONB)            # {桶上界 (毫秒): 请求数}，对数分桶
+    error_messages = Column(JSONB)       # {错误信息: 次数}
+
+    __table_args__ = (
+        Index('ix_load_step_stats_runid', 'runid', 'case_id', 'step_order'),
+    )
+
+# =================================================================
+# 4. 框架元数据表 (Framework Metadata Tables)
+# =================================================================
+
+class SchemaMigration(Base):
+    """已执行的 database/migrations 脚本 (由 database/migrate.py 维护)"""
+    __tablename__ = 'schema_migrations'
+    version = Column(String(20), primary_key=True)  # 脚本编号，如 '007'
+    name = Column(String(255), nullable=False)
+    applied_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
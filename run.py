@@ -57,8 +57,80 @@ def main():
     parser.add_argument("--tags", type=str, help="按标签筛选，多个用逗号隔开 (e.g., P0,smoke)")
     parser.add_argument("--jira", type=str, help="按Jira ID筛选")
     parser.add_argument("--id", type=int, help="按用例模板ID(case_id)执行其所有数据集")
+    parser.add_argument("--shared-action", type=str, help="只运行引用了指定共享动作的用例，多个用逗号隔开 (e.g., user_login)")
+    parser.add_argument("--changed-only", action="store_true",
+                        help="增量运行: 跳过合并后定义未变化且上一次已通过的场景")
+    parser.add_argument("--since-run", type=str,
+                        help="增量运行: 与指定 run_id 的结果比较，跳过定义未变化且在该次运行中已通过的场景")
+
+    parser.add_argument(
+        "--engine",
+        type=str,
+        choices=["sync", "async"],
+        default="sync",
+        help="执行引擎: sync (默认，每个进程顺序执行用例) 或 async (单进程内用 asyncio 并发执行所有数据集)。"
+    )
+    parser.add_argument("--concurrency", type=int, default=100, help="async 引擎下同时在途的数据集数量上限 (默认: 100)")
+
+    parser.add_argument("--step-parallelism", type=int, default=1,
+                        help="用例内并发执行互不依赖步骤的线程数 (默认 1，即严格按 step_order 顺序执行)。\n"
+                             "依赖关系由步骤中的占位符与 outputs 静态分析得出。")
+
+    parser.add_argument("--order", type=str, choices=["default", "risk"], default="default",
+                        help="用例执行顺序: default (按 case_id/data_set_id) 或\n"
+                             "risk (根据 auto_case_audit 历史，最近失败和不稳定的场景优先执行)。")
+    parser.add_argument("--max-failures", type=int, default=None,
+                        help="失败数达到该值后停止运行 (pytest --maxfail)，auto_progress 仍会正常收尾。")
+
+    parser.add_argument("--schedule", type=str, choices=["load", "duration"], default="load",
+                        help="并行执行时的用例分发策略: load (默认，xdist 按顺序分发) 或\n"
+                             "duration (按历史耗时从长到短分发，缩短整体运行时间)。")
+
+    parser.add_argument("--http-pool-size", type=int, help="每个进程缓存的主机连接池数量")
+    parser.add_argument("--http-pool-maxsize", type=int, help="每个主机保留的最大连接数")
+    parser.add_argument("--http-pool-block", action="store_true", help="严格限制每个主机的并发连接数")
+    parser.add_argument("--no-keep-alive", action="store_true", help="每个请求后关闭连接 (禁用连接复用)")
+
+    parser.add_argument("--app-db-pool-size", type=int, help="每个进程常驻的应用数据库连接数 (dbValidation，默认 5)")
+    parser.add_argument("--no-prepared-statements", action="store_true",
+                        help="不在应用数据库上 PREPARE 校验查询 (例如经过 transaction 模式的 PgBouncer 时)")
+    parser.add_argument("--batch-db-validations", action="store_true",
+                        help="把一个步骤的多条 dbValidation 查询合并为一次往返 (PostgreSQL，仅绑定参数的查询)")
+    parser.add_argument("--bind-db-params", action="store_true",
+                        help="dbValidation 查询默认以绑定参数执行 (规则中的 bindParams 优先)，而不是把值拼进 SQL")
+
+    parser.add_argument("--stream-responses", action="store_true",
+                        help="流式读取 JSON 响应，只保留断言、outputs 和后续步骤引用到的字段 (需要安装 ijson)。")
+    parser.add_argument("--report-level", type=str, choices=["full", "failures", "summary"], default="full",
+                        help="Allure 报告级别: full (默认，所有步骤都带请求/响应等附件)、\n"
+                             "failures (附件先缓存，只有失败的用例才序列化并写入) 或 summary (只有步骤结构，不写附件)。")
+    parser.add_argument("--max-attachment-size", type=int, help="allure 附件的大小上限 (字符数)，超过时截断")
+    parser.add_argument("--max-audit-body-size", type=int, help="审计日志中单个响应体的大小上限 (字符数)，超过时只保留预览")
+    parser.add_argument("--keep-step-responses", action="store_true",
+                        help="在整个用例期间保留所有步骤的响应 (默认在最后一次被引用后释放，便于排查问题时关闭)")
+
+    parser.add_argument("--action-cache", type=str, choices=["worker", "shared", "off"], default="worker",
+                        help="可缓存共享动作 (shared_actions.cacheable，例如登录) 的结果复用: worker (默认，每个进程一份)、\n"
+                             "shared (并行时所有进程共享一个本地缓存文件) 或 off (每个用例都重新执行)。")
+
+    parser.add_argument("--snapshot", type=str,
+                        help="从快照文件运行冻结的测试套件 (用例定义和环境配置都来自快照)。\n"
+                             "框架数据库可用时照常记录结果，不可用时只生成 Allure 报告。")
+    parser.add_argument("--export-snapshot", type=str,
+                        help="按当前筛选条件把场景及环境配置导出到快照文件后退出，不执行用例。")
+
+    parser.add_argument("--load", action="store_true",
+                        help="压测模式: 把筛选出的场景当作虚拟用户按到达率反复执行 (不运行 pytest、不生成 Allure 报告)，\n"
+                             "每个步骤的延迟分位数、吞吐量和错误率写入 load_test_runs / load_step_stats。")
+    parser.add_argument("--arrival-rate", type=float, default=1.0, help="(--load) 稳定阶段每秒开始的迭代数 (默认: 1)")
+    parser.add_argument("--ramp-up", type=float, default=0.0, help="(--load) 到达率从 0 线性增加到 --arrival-rate 的秒数 (默认: 0)")
+    parser.add_argument("--duration", type=float, default=60.0, help="(--load) 稳定阶段的秒数，不含 ramp-up (默认: 60)")
+    parser.add_argument("--max-in-flight", type=int, default=1000,
+                        help="(--load) 同时在途的迭代上限，超过时新的到达计为 dropped (默认: 1000)")
 
     parser.add_argument("--debug-mode", action="store_true", help="开启Debug模式，会将详细审计日志写入数据库")
+    parser.add_argument("--debug-storage", type=str, choices=["jsonb", "compressed"], default="jsonb",
+                        help="Debug 步骤载荷的存储方式: jsonb (默认) 或 compressed (zstd 压缩并按内容去重，存入 audit_payloads)")
     parser.add_argument("--run-id", type=str, help="由TaaS服务生成的唯一运行ID (通常由API服务内部使用)")
 
     args = parser.parse_args()
@@ -69,11 +141,21 @@ def main():
 
     print(f"\n--- Final environment for this run: {final_env} ---")
     print(f"--- (Source: {'Command-line' if args.env else ('Environment Variable' if env_from_os else 'Hardcoded Default')}) ---")
+    if args.engine == 'async' and final_parallel:
+        print(f"--- Async engine runs in a single process; ignoring parallel setting '{final_parallel}' ---")
+        final_parallel = None
     if final_parallel:
         print(f"--- Parallel execution enabled with {final_parallel} workers ---")
+    if args.engine == 'async':
+        print(f"--- Async engine enabled with concurrency {args.concurrency} ---")
+
+    if args.load:
+        sys.exit(run_load_mode(args, final_env))
 
     # 4. 准备 pytest 的参数列表
-    report_dir = 'reports/allure-results'
+    # 指定了 run_id (TaaS 触发的运行) 时每个运行使用独立的目录，并发的运行不会互相清理结果
+    run_report_root = os.path.join('reports', 'runs', args.run_id) if args.run_id else 'reports'
+    report_dir = os.path.join(run_report_root, 'allure-results')
     pytest_args = ['tests/test_main.py', '-v', '--alluredir', report_dir]
 
     # 将所有解析到的参数正确地传递给 pytest
@@ -85,8 +167,36 @@ def main():
     if args.tags: pytest_args.append(f"--tags={args.tags}")
     if args.jira: pytest_args.append(f"--jira={args.jira}")
     if args.id: pytest_args.append(f"--id={args.id}")
+    if args.shared_action: pytest_args.append(f"--shared-action={args.shared_action}")
+    if args.changed_only: pytest_args.append("--changed-only")
+    if args.since_run: pytest_args.append(f"--since-run={args.since_run}")
+
+    if args.engine != 'sync': pytest_args.extend([f"--engine={args.engine}", f"--concurrency={args.concurrency}"])
+
+    if args.order != 'default': pytest_args.append(f"--order={args.order}")
+    if args.max_failures: pytest_args.append(f"--maxfail={args.max_failures}")
+    if final_parallel and args.schedule == 'duration': pytest_args.append("--duration-schedule")
+    if args.step_parallelism > 1: pytest_args.append(f"--step-parallelism={args.step_parallelism}")
+    if args.http_pool_size: pytest_args.append(f"--http-pool-size={args.http_pool_size}")
+    if args.http_pool_maxsize: pytest_args.append(f"--http-pool-maxsize={args.http_pool_maxsize}")
+    if args.http_pool_block: pytest_args.append("--http-pool-block")
+    if args.no_keep_alive: pytest_args.append("--no-keep-alive")
+    if args.app_db_pool_size: pytest_args.append(f"--app-db-pool-size={args.app_db_pool_size}")
+    if args.no_prepared_statements: pytest_args.append("--no-prepared-statements")
+    if args.batch_db_validations: pytest_args.append("--batch-db-validations")
+    if args.bind_db_params: pytest_args.append("--bind-db-params")
+    if args.stream_responses: pytest_args.append("--stream-responses")
+    if args.report_level != 'full': pytest_args.append(f"--report-level={args.report_level}")
+    if args.max_attachment_size: pytest_args.append(f"--max-attachment-size={args.max_attachment_size}")
+    if args.max_audit_body_size: pytest_args.append(f"--max-audit-body-size={args.max_audit_body_size}")
+    if args.keep_step_responses: pytest_args.append("--keep-step-responses")
+    if args.action_cache != 'worker': pytest_args.append(f"--action-cache={args.action_cache}")
+
+    if args.snapshot: pytest_args.append(f"--snapshot={args.snapshot}")
+    if args.export_snapshot: pytest_args.append(f"--export-snapshot={args.export_snapshot}")
 
     if args.debug_mode: pytest_args.append("--debug-mode")
+    if args.debug_storage != 'jsonb': pytest_args.append(f"--debug-storage={args.debug_storage}")
     if args.run_id: pytest_args.append(f"--run-id={args.run_id}")
 
     # 5. 运行 pytest 并生成报告
@@ -97,9 +207,32 @@ def main():
     exit_code = pytest.main(pytest_args)
 
     print("\n测试执行完成. 正在生成 Allure 报告...")
-    os.system(f'allure generate {report_dir} -o reports/allure-report --clean')
+    os.system(f'allure generate {report_dir} -o {os.path.join(run_report_root, "allure-report")} --clean')
 
     sys.exit(exit_code)
 
+def run_load_mode(args, env):
+    """--load：使用与功能测试相同的筛选条件选出场景，按到达率施加负载。"""
+    import uuid
+    from core.load_runner import LoadProfile, run_load_test
+
+    ignored = [flag for flag, value in (("--parallel", args.parallel), ("--changed-only", args.changed_only),
+                                        ("--since-run", args.since_run), ("--snapshot", args.snapshot)) if value]
+    if ignored:
+        print(f"--- Load mode ignores {', '.join(ignored)} ---")
+    profile = LoadProfile(arrival_rate=args.arrival_rate, duration=args.duration, ramp_up=args.ramp_up,
+                          max_in_flight=args.max_in_flight)
+    selection = {
+        "service": args.service, "module": args.module, "component": args.component, "tags": args.tags,
+        "jira_id": args.jira, "case_id": args.id, "shared_action": args.shared_action,
+    }
+    app_db_options = {
+        "pool_size": args.app_db_pool_size, "prepare": not args.no_prepared_statements,
+        "batch": args.batch_db_validations, "bind_params": args.bind_db_params,
+    }
+    return run_load_test(env, profile, selection, run_id=args.run_id or str(uuid.uuid4()),
+                         action_cache=args.action_cache, app_db_options=app_db_options,
+                         max_audit_bytes=args.max_audit_body_size)
+
 if __name__ == '__main__':
     main()
@@ -4,12 +4,25 @@ import pytest
 import uuid
 import datetime
 import os
-from sqlalchemy import create_engine
+import shutil
+import tempfile
+from sqlalchemy import text
 
 from core import db_handler
 from core import result_writer
 from models.tables import Environment
 from core.api_client import ApiClient
+from core.reporter import REPORT_LEVELS, create_reporter
+from core import http_pool
+from core import run_plan
+from core import snapshot
+from core import action_cache as action_cache_module
+from core import app_db
+from core import phase_timer
+from core.run_plan import plan_test_run
+
+# --snapshot 模式下框架数据库不可用时，由主进程设置，通知工作进程不记录结果
+RESULTS_DISABLED_ENV_VAR = 'FRAMEWORK_RESULTS_DISABLED'
 
 # =================================================================
 # 1. Pytest 钩子函数 (Hooks)
@@ -37,12 +50,29 @@ def pytest_sessionstart(session):
         # 在主进程中设置环境变量，让工作进程能够访问
         import os
         os.environ['FRAMEWORK_RUN_ID'] = session.config.run_id
+        _prepare_shared_action_cache(session.config)
 
-        try:
-            # 初始化会话工厂并附加到 config 对象
-            session.config.db_session_factory = db_handler.initialize_session()
-            print("--- Framework DB session factory initialized successfully. ---")
+        snapshot_path = session.config.getoption("--snapshot")
+        if snapshot_path:
+            _start_from_snapshot(session.config, snapshot_path)
+        else:
+            try:
+                # 初始化会话工厂并附加到 config 对象
+                session.config.db_session_factory = db_handler.initialize_session()
+                print("--- Framework DB session factory initialized successfully. ---")
+                export_path = session.config.getoption("--export-snapshot")
+                if export_path:
+                    _export_frozen_suite(session.config, export_path)
+                elif session.config.getoption("numprocesses", default=None):
+                    _export_worker_snapshot(session.config)
+            except pytest.exit.Exception:
+                raise
+            except Exception as e:
+                pytest.exit(f"数据库初始化或测试计划导出失败: {e}", returncode=2)
 
+        if session.config.db_session_factory is None:
+            return
+        try:
             # 创建初始的总览记录
             env_info = {
                 "env": session.config.getoption("--env"),
@@ -51,15 +81,215 @@ def pytest_sessionstart(session):
             }
             with session.config.db_session_factory() as db_sess:
                 result_writer.create_run_progress(db_sess, session.config.run_id, env_info)
+            session.config.run_recorded = True
 
         except Exception as e:
             pytest.exit(f"数据库初始化或初始记录创建失败: {e}", returncode=2)
 
+def _plan_with_environment(config):
+    """(主进程) 选出本次运行的场景并加载完整定义和环境配置"""
+    env_name = config.getoption("--env")
+    with config.db_session_factory() as db_sess:
+        rows, case_details = plan_test_run(db_sess, config)
+        environment = db_sess.query(Environment).filter(
+            Environment.name == env_name, Environment.is_active == True
+        ).first()
+        environment = {field: getattr(environment, field) for field in snapshot.ENVIRONMENT_FIELDS} if environment else None
+    return rows, case_details, environment
+
+def _export_worker_snapshot(config):
+    """(xdist 主进程) 只查询一次框架数据库，把测试计划写入快照，工作进程从快照收集用例"""
+    rows, case_details, environment = _plan_with_environment(config)
+    # 快照中含有应用数据库的连接串 (包括凭据)：写入本次运行私有的临时目录 (0700)，路径不可预测
+    config.worker_snapshot_dir = tempfile.mkdtemp(prefix=f"framework_snapshot_{config.run_id}_")
+    path = os.path.join(config.worker_snapshot_dir, "snapshot.sqlite")
+    snapshot.export_snapshot(path, rows, case_details, environment, options=run_plan.selection_options(config))
+    config.run_plan = (rows, case_details)
+    os.environ[snapshot.SNAPSHOT_ENV_VAR] = path
+    print(f"--- Exported {len(rows)} planned cases to worker snapshot {path} ---")
+
+def _export_frozen_suite(config, path):
+    """--export-snapshot：导出冻结的测试套件后直接退出，不执行用例"""
+    rows, case_details, environment = _plan_with_environment(config)
+    if environment is None:
+        raise ValueError(f"在 test_environments 表中未找到名为 '{config.getoption('--env')}' 的活动环境配置")
+    snapshot.export_snapshot(path, rows, case_details, environment, options=run_plan.selection_options(config))
+    config.db_session_factory = None
+    pytest.exit(f"已导出 {len(rows)} 个场景到快照 {path}", returncode=0)
+
+def _start_from_snapshot(config, path):
+    """--snapshot：从冻结的测试套件运行，框架数据库只在可用时用于记录结果"""
+    try:
+        frozen = snapshot.Snapshot(path)
+    except Exception as e:
+        pytest.exit(f"无法读取快照 {path}: {e}", returncode=2)
+    config.run_plan = (frozen.rows(), frozen.case_details())
+    os.environ[snapshot.SNAPSHOT_ENV_VAR] = os.path.abspath(path)
+    print(f"--- Running frozen suite from snapshot {path} ({len(config.run_plan[0])} cases, "
+          f"created at {frozen.meta.get('created_at')}) ---")
+    try:
+        config.db_session_factory = db_handler.initialize_session()
+        with config.db_session_factory() as db_sess:
+            db_sess.execute(text("SELECT 1"))
+    except Exception as e:
+        # 没有框架数据库时不记录结果，工作进程通过环境变量得知
+        config.db_session_factory = None
+        os.environ[RESULTS_DISABLED_ENV_VAR] = '1'
+        print(f"--- Framework DB unavailable ({e}); results will not be recorded ---")
+
+def _prepare_shared_action_cache(config):
+    """(主进程) --action-cache shared：为本次运行创建一个所有工作进程共享的本地缓存文件"""
+    if config.getoption("--action-cache") != "shared":
+        return
+    # 缓存中有登录响应、token 和 cookie：放在本次运行私有的临时目录 (0700) 中，
+    # 其他用户既不能读取，也不能预先创建同名文件注入伪造的缓存条目
+    config.action_cache_dir = tempfile.mkdtemp(prefix=f"framework_action_cache_{config.run_id}_")
+    path = os.path.join(config.action_cache_dir, "action_cache.sqlite")
+    os.environ[action_cache_module.CACHE_ENV_VAR] = path
+
+def _remove_shared_action_cache(config):
+    directory = getattr(config, 'action_cache_dir', None)
+    if not directory:
+        return
+    cache = getattr(config, 'action_cache', None)
+    if cache is not None:
+        cache.close()
+    shutil.rmtree(directory, ignore_errors=True)
+
+def _results_enabled(config):
+    return not os.environ.get(RESULTS_DISABLED_ENV_VAR)
+
+def _remove_worker_snapshot(config):
+    directory = getattr(config, 'worker_snapshot_dir', None)
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+
+def _record_planned_cases(config, planned_cases):
+    """(主进程) 把计划执行的用例数写入 auto_progress，供实时进度计算 ETA"""
+    session_factory = getattr(config, 'db_session_factory', None)
+    run_id = getattr(config, 'run_id', None)
+    if not session_factory or not run_id or getattr(config, 'planned_cases', None) is not None:
+        return
+    config.planned_cases = planned_cases
+    with session_factory() as db_sess:
+        result_writer.set_planned_cases(db_sess, run_id, planned_cases)
+
+def pytest_collection_finish(session):
+    """(单进程模式) 收集完成后记录计划执行的用例数"""
+    if is_master_process(session):
+        _record_planned_cases(session.config, len(session.items))
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_xdist_node_collection_finished(node, ids):
+    """(xdist 主进程) 第一个工作进程收集完成后记录计划执行的用例数"""
+    _record_planned_cases(node.config, len(ids))
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node, error):
+    """(xdist 主进程) 收集每个工作进程回传的连接池统计"""
+    stats = getattr(node, 'workeroutput', {}).get('http_pool_stats')
+    if stats:
+        node.config.http_pool_stats_by_worker = getattr(node.config, 'http_pool_stats_by_worker', []) + [stats]
+    db_stats = getattr(node, 'workeroutput', {}).get('app_db_stats')
+    if db_stats:
+        node.config.app_db_stats_by_worker = getattr(node.config, 'app_db_stats_by_worker', []) + [db_stats]
+    cache_stats = getattr(node, 'workeroutput', {}).get('action_cache_stats')
+    if cache_stats:
+        node.config.action_cache_stats_by_worker = getattr(node.config, 'action_cache_stats_by_worker', []) + [cache_stats]
+    writer_stats = getattr(node, 'workeroutput', {}).get('result_writer_stats')
+    if writer_stats:
+        node.config.result_writer_stats_by_worker = getattr(node.config, 'result_writer_stats_by_worker', []) + [writer_stats]
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_xdist_make_scheduler(config, log):
+    """(xdist 主进程) --duration-schedule 时按历史耗时从长到短分发用例"""
+    if not config.getoption("--duration-schedule"):
+        return None
+    from core.scheduling import LPTScheduling
+    config.duration_scheduler = LPTScheduling(config, log)
+    return config.duration_scheduler
+
+def _report_makespan(session):
+    scheduler = getattr(session.config, 'duration_scheduler', None)
+    if scheduler is None or not scheduler.predicted:
+        return
+    report = scheduler.makespan_report()
+    print(f"--- Duration schedule: {report['cases']} cases on {report['workers']} workers "
+          f"({report['history_hits']} with history) ---")
+    print(f"--- Makespan predicted: {report['predicted_makespan']:.2f}s, actual: {report['actual_makespan']:.2f}s ---")
+    for worker_id, busy in sorted(report['worker_durations'].items()):
+        print(f"---   {worker_id}: {busy:.2f}s ---")
+
+def _report_http_pool_stats(session, local_stats):
+    if hasattr(session.config, 'http_pool_stats_by_worker'):
+        stats = http_pool.merge_pool_statistics(session.config.http_pool_stats_by_worker)
+    else:
+        stats = local_stats
+    for pool_key, item in stats.items():
+        print(f"--- HTTP pool [{pool_key}]: {item['requests']} requests over {item['connections']} connections "
+              f"(reuse ratio: {item['reuse_ratio']:.1%}) ---")
+
+def _report_app_db_stats(session):
+    if hasattr(session.config, 'app_db_stats_by_worker'):
+        stats = app_db.merge_statistics(session.config.app_db_stats_by_worker)
+    else:
+        database = getattr(session.config, 'app_db', None)
+        stats = database.stats if database is not None else None
+    if stats and stats['queries']:
+        print(f"--- App DB validations: {stats['queries']} queries in {stats['round_trips']} round trips "
+              f"({stats['prepared']} statements prepared, {stats['prepared_executions']} prepared executions) ---")
+
+def _report_action_cache_stats(session):
+    if hasattr(session.config, 'action_cache_stats_by_worker'):
+        stats = action_cache_module.merge_cache_stats(session.config.action_cache_stats_by_worker)
+    else:
+        cache = getattr(session.config, 'action_cache', None)
+        stats = cache.stats if cache is not None else None
+    if stats and (stats['hits'] or stats['stores']):
+        print(f"--- Shared action cache: {stats['hits']} hits, {stats['misses']} misses, "
+              f"{stats['stores']} stores, {stats['invalidations']} invalidations ---")
+
+def _release_process_resources(config):
+    """关闭本进程的 HTTP 连接池、应用数据库连接池和共享动作缓存 (统计数据仍然保留)。"""
+    http_pool.close_all_pools()
+    app_db.dispose_all_engines()
+    cache = getattr(config, 'action_cache', None)
+    if cache is not None:
+        cache.close()
+
 def pytest_sessionfinish(session, exitstatus):
     """在会话结束时，只让主进程负责汇总和更新最终报告"""
+    # 每个进程 (包括 xdist 工作进程) 先写完自己缓冲的结果，主进程再汇总
+    _drain_result_writer(session.config)
+
+    # 连接池统计在关闭连接池之前取出；之后每个进程 (包括单进程运行时的主进程) 都释放自己持有的资源
+    http_pool_stats = http_pool.pool_statistics()
+    _release_process_resources(session.config)
+
+    if not is_master_process(session):
+        # 工作进程把统计交给主进程汇总
+        output = session.config.workeroutput
+        output['http_pool_stats'] = http_pool_stats
+        for key, attribute in (('app_db_stats', 'app_db'), ('action_cache_stats', 'action_cache'),
+                               ('result_writer_stats', 'result_writer')):
+            component = getattr(session.config, attribute, None)
+            if component is not None:
+                output[key] = component.stats
+
     if is_master_process(session):
         end_time = datetime.datetime.now()
         print(f"\n--- Test session finished at {end_time} ---")
+        _report_http_pool_stats(session, http_pool_stats)
+        _report_app_db_stats(session)
+        _report_action_cache_stats(session)
+        _report_makespan(session)
+        _remove_worker_snapshot(session.config)
+        _remove_shared_action_cache(session.config)
+        lost_rows = _report_lost_results(session)
+
+        # 没有创建运行记录 (--export-snapshot，或 --snapshot 模式下没有框架数据库) 时无需汇总
+        if not getattr(session.config, 'run_recorded', False):
+            return
 
         # 确保数据库会话工厂可用
         session_factory = getattr(session.config, 'db_session_factory', None)
@@ -76,25 +306,102 @@ def pytest_sessionfinish(session, exitstatus):
                     session=db_sess,
                     run_id=session.config.run_id,
                     end_time=end_time,
-                    status="FAILED" if exitstatus != 0 else "PASSED"
+                    status="FAILED" if exitstatus != 0 or lost_rows else "PASSED",
+                    # 有结果写入失败时增量计数不再可信，从 auto_case_audit 重新汇总
+                    recount=lost_rows > 0
                 )
         except Exception as e:
             print(f"\nERROR: Failed to update run summary in sessionfinish: {e}")
 
+        _report_phase_timings(session, session_factory)
+        _report_early_stop(session, exitstatus, session_factory)
+
+def _report_lost_results(session):
+    """
+    (主进程) 汇总所有进程中未能写入数据库的结果行。有丢失时醒目地输出，并让本次运行以非零状态退出。
+    :return: 丢失的行数
+    """
+    stats_list = list(getattr(session.config, 'result_writer_stats_by_worker', []))
+    writer = getattr(session.config, 'result_writer', None)
+    if writer is not None:
+        stats_list.append(writer.stats)
+    lost_rows = sum(stats.get('failed_rows', 0) for stats in stats_list)
+    if lost_rows:
+        print(f"\n{'!' * 70}\nERROR: {lost_rows} case results could not be written to the database "
+              f"(see the 'Lost case audit result' errors above); the recorded run is incomplete\n{'!' * 70}")
+        if session.exitstatus == pytest.ExitCode.OK:
+            session.exitstatus = pytest.ExitCode.INTERNAL_ERROR
+    return lost_rows
+
+def _report_phase_timings(session, session_factory):
+    """(主进程) 输出本次运行按阶段汇总的步骤耗时，区分被测服务与框架自身"""
+    try:
+        with session_factory() as db_sess:
+            progress = result_writer.get_run_progress(db_sess, session.config.run_id)
+    except Exception as e:
+        print(f"\nERROR: Failed to read phase timings: {e}")
+        return
+    summary = (progress or {}).get('phase_timings')
+    if summary:
+        for line in phase_timer.format_phase_totals({phase: item['total_ms'] for phase, item in summary.items()}):
+            print(line)
+
+def _report_early_stop(session, exitstatus, session_factory):
+    """(主进程) --maxfail 提前结束时，说明计划中的用例实际执行了多少"""
+    maxfail = session.config.getoption("maxfail")
+    # 单进程时由 session.shouldfail 标记；xdist 主进程在所有 worker 停止后以 INTERRUPTED 结束
+    if not maxfail or not (session.shouldfail or exitstatus == pytest.ExitCode.INTERRUPTED):
+        return
+    try:
+        with session_factory() as db_sess:
+            progress = result_writer.get_run_progress(db_sess, session.config.run_id)
+    except Exception as e:
+        print(f"\nERROR: Failed to read run progress after early stop: {e}")
+        return
+    if progress:
+        print(f"--- Run stopped early after {progress['failures']} failures (--maxfail={maxfail}): "
+              f"{progress['total_cases']} of {progress['planned_cases']} planned cases executed ---")
+
+def _get_result_writer(config, session_factory):
+    """获取 (或首次创建) 本进程的缓冲结果写入器"""
+    writer = getattr(config, 'result_writer', None)
+    if writer is None:
+        writer = result_writer.BufferedResultWriter(
+            session_factory,
+            batch_size=config.getoption("--result-batch-size"),
+            flush_interval=config.getoption("--result-flush-interval"),
+            max_queue_size=config.getoption("--result-queue-size"),
+            compact_debug=config.getoption("--debug-storage") == "compressed",
+        )
+        config.result_writer = writer
+    return writer
+
+def _drain_result_writer(config):
+    """等待本进程缓冲的所有结果写入数据库"""
+    writer = getattr(config, 'result_writer', None)
+    if writer is not None:
+        writer.close()
+        stats = writer.stats
+        print(f"--- Result writer drained: {stats['rows']} case rows, {stats['debug_rows']} debug rows "
+              f"in {stats['batches']} batches ({stats['retries']} retries, {stats['failed_rows']} failed) ---")
+
 @pytest.hookimpl(tryfirst=True, hookwrapper=True)
 def pytest_runtest_makereport(item, call):
     """
-    在每个测试执行后，由工作进程负责写入单条用例审计，并在Debug模式下写入详细步骤。
+    在每个测试执行后，由工作进程负责提交单条用例审计，并在Debug模式下附带详细步骤。
     """
     outcome = yield
     report = outcome.get_result()
 
     if report.when == 'call':
+        # async 引擎下测试函数只是回放结果，使用真实的执行耗时
+        report.duration = getattr(item, 'async_duration', report.duration)
         try:
             run_data = item.callspec.params.get('test_case_run_data')
             if not run_data: return
 
             case_id, data_set_id, display_name, jira_id = run_data
+            if not _results_enabled(item.config): return
 
             # 获取run_id：优先从config，然后从环境变量，最后从命令行参数
             run_id = getattr(item.config, 'run_id', None)
@@ -116,20 +423,21 @@ def pytest_runtest_makereport(item, call):
             if run_id and client_instance and session_factory:
                 # 获取本次使用的、已解析的变量
                 variables = client_instance.resolved_data_set_variables
+                case_details = (getattr(item.config, 'prefetched_case_details', None) or {}).get((case_id, data_set_id))
+                case_row = result_writer.build_case_audit_row(
+                    run_id, case_id, data_set_id, jira_id, display_name, variables, report,
+                    definition_hash=case_details.get('definition_hash') if case_details else None,
+                    peak_context_bytes=getattr(client_instance, 'peak_context_bytes', None),
+                    # 阶段耗时不依赖 Debug 模式，每个场景都记录
+                    phase_timings=phase_timer.step_timings(client_instance.audit_trail)
+                )
 
-                with session_factory() as db_sess:
-                    # 写入单条用例审计，并获取其ID
-                    audit_case_id = result_writer.write_case_audit(
-                        db_sess, run_id, case_id, data_set_id, jira_id,
-                        display_name, variables, report
-                    )
-
-                    # 如果是Debug模式，则写入详细步骤
-                    is_debug = item.config.getoption("--debug-mode")
-                    if is_debug and audit_case_id and client_instance.audit_trail:
-                        result_writer.write_debug_log(
-                            db_sess, audit_case_id, client_instance.audit_trail
-                        )
+                # 如果是Debug模式，则连同详细步骤一起写入
+                is_debug = item.config.getoption("--debug-mode")
+                debug_steps = client_instance.audit_trail if is_debug else None
+
+                # 只入队，由后台线程批量写库，不阻塞测试执行
+                _get_result_writer(item.config, session_factory).submit(case_row, debug_steps)
         except Exception as e:
             print(f"\nERROR: Failed to write result for item {item.name}: {e}")
 
@@ -144,7 +452,76 @@ def pytest_addoption(parser):
     parser.addoption("--id", action="store", default=None)
     parser.addoption("--run-id", action="store", default=None)
 
+    # 增量选择
+    parser.addoption("--shared-action", action="store", default=None,
+                     help="只运行引用了指定共享动作的用例 (多个名称用逗号隔开)")
+    parser.addoption("--changed-only", action="store_true", default=False,
+                     help="跳过定义未变化且上一次已通过的场景")
+    parser.addoption("--since-run", action="store", default=None,
+                     help="与指定 run_id 的结果比较，跳过定义未变化且在该次运行中已通过的场景")
+
     parser.addoption("--debug-mode", action="store_true", default=False)
+    parser.addoption("--debug-storage", action="store", default="jsonb", choices=["jsonb", "compressed"],
+                     help="Debug 步骤载荷的存储方式: jsonb (auto_test_audit 中的 JSONB 列) 或 compressed (压缩去重后存入 audit_payloads)")
+
+    # 测试定义快照
+    parser.addoption("--snapshot", action="store", default=None,
+                     help="从快照文件运行冻结的测试套件，不读取框架数据库中的用例和环境配置")
+    parser.addoption("--export-snapshot", action="store", default=None,
+                     help="把按当前筛选条件选出的场景及环境配置导出到快照文件后退出，不执行用例")
+
+    # 结果批量写入
+    parser.addoption("--result-batch-size", action="store", type=int, default=200, help="每批写入的用例结果条数")
+    parser.addoption("--result-flush-interval", action="store", type=float, default=2.0, help="结果最长缓冲时间 (秒)")
+    parser.addoption("--result-queue-size", action="store", type=int, default=10000, help="结果缓冲队列上限，写满后阻塞测试 (背压)")
+    parser.addoption("--engine", action="store", default="sync", choices=["sync", "async"],
+                     help="执行引擎: sync (每个用例顺序执行) 或 async (单进程内并发执行所有数据集)")
+    parser.addoption("--concurrency", action="store", type=int, default=100,
+                     help="async 引擎下同时在途的数据集数量上限")
+
+    parser.addoption("--step-parallelism", action="store", type=int, default=1,
+                     help="用例内并发执行互不依赖步骤的线程数 (1 表示严格按 step_order 顺序执行)")
+
+    parser.addoption("--order", action="store", default="default", choices=["default", "risk"],
+                     help="用例执行顺序: default (按 case_id/data_set_id) 或 risk (最近失败、不稳定的场景优先)")
+    parser.addoption("--duration-schedule", action="store_true", default=False,
+                     help="(-n 并行时) 按 auto_case_audit 中的历史耗时从长到短分发用例")
+
+    # 共享 HTTP 连接池 (每个工作进程一份，按 base_url 区分)
+    parser.addoption("--http-pool-size", action="store", type=int, default=None, help="缓存的主机连接池数量")
+    parser.addoption("--http-pool-maxsize", action="store", type=int, default=None, help="每个主机保留的最大连接数")
+    parser.addoption("--http-pool-block", action="store_true", default=False, help="严格限制每个主机的并发连接数")
+    parser.addoption("--no-keep-alive", action="store_true", default=False, help="每个请求后关闭连接 (禁用连接复用)")
+
+    # 被测应用数据库 (dbValidation) 的连接池与查询方式
+    parser.addoption("--app-db-pool-size", action="store", type=int, default=None, help="每个进程常驻的应用数据库连接数")
+    parser.addoption("--no-prepared-statements", action="store_true", default=False,
+                     help="不在应用数据库上 PREPARE 校验查询 (例如经过 transaction 模式的 PgBouncer 时)")
+    parser.addoption("--batch-db-validations", action="store_true", default=False,
+                     help="把一个步骤的多条 dbValidation 查询合并为一次往返 (PostgreSQL，仅绑定参数的查询)")
+    parser.addoption("--bind-db-params", action="store_true", default=False,
+                     help="dbValidation 查询默认以绑定参数执行 (规则中的 bindParams 优先)，而不是把值拼进 SQL")
+
+    # 大响应处理
+    parser.addoption("--stream-responses", action="store_true", default=False,
+                     help="流式读取 JSON 响应，只保留断言、outputs 和后续步骤引用到的字段 (需要安装 ijson)")
+    parser.addoption("--report-level", action="store", default="full", choices=REPORT_LEVELS,
+                     help="allure 报告级别: full (全部附件)、failures (只为失败的用例写入附件) 或 summary (不写附件)")
+    parser.addoption("--max-attachment-size", action="store", type=int, default=None,
+                     help="allure 附件的大小上限 (字符数)，超过时截断")
+    parser.addoption("--max-audit-body-size", action="store", type=int, default=None,
+                     help="审计轨迹 (--debug-mode 写入数据库) 中单个响应体的大小上限 (字符数)，超过时只保留预览")
+    parser.addoption("--keep-step-responses", action="store_true", default=False,
+                     help="在整个用例期间保留所有步骤的响应 (默认在最后一次被引用后释放)")
+
+    # 可缓存共享动作 (shared_actions.cacheable) 的结果复用
+    parser.addoption("--action-cache", action="store", default="worker", choices=["worker", "shared", "off"],
+                     help="可缓存共享动作的结果缓存: worker (每个进程一份)、shared (本次运行的所有进程共享本地文件) 或 off")
+
+def pytest_configure(config):
+    """校验互相冲突的命令行参数"""
+    if config.getoption("--engine") == "async" and config.getoption("numprocesses", default=None):
+        raise pytest.UsageError("--engine async 在单进程内并发执行，不能与 -n (pytest-xdist) 同时使用")
 
 # =================================================================
 # 3. Pytest 夹具 (Fixtures)
@@ -165,18 +542,24 @@ def db_session_factory(request):
     return factory
 
 @pytest.fixture(scope="session")
-def test_environment(request, db_session_factory):
-    """根据 --env 参数，从数据库中加载完整的 Environment 配置对象。"""
+def test_environment(request):
+    """根据 --env 参数加载完整的 Environment 配置对象；使用快照时直接取快照中的环境配置。"""
     env_name = request.config.getoption("--env")
-    with db_session_factory() as session:
-        env_config = session.query(Environment).filter(
-            Environment.name == env_name, Environment.is_active == True
-        ).first()
+    snapshot_path = os.environ.get(snapshot.SNAPSHOT_ENV_VAR)
+    frozen_env = snapshot.Snapshot(snapshot_path).environment if snapshot_path else None
+    if frozen_env:
+        env_config = Environment(**frozen_env)
+    else:
+        db_session_factory = request.getfixturevalue('db_session_factory')
+        with db_session_factory() as session:
+            env_config = session.query(Environment).filter(
+                Environment.name == env_name, Environment.is_active == True
+            ).first()
 
     if not env_config:
         pytest.fail(f"在 test_environments 表中未找到名为 '{env_name}' 的活动环境配置")
 
-    print(f"--- Running tests against Environment: '{env_name}' ---")
+    print(f"--- Running tests against Environment: '{env_config.name}' ---")
     return env_config
 
 @pytest.fixture(scope="session")
@@ -186,29 +569,98 @@ def base_url(test_environment):
     return test_environment.base_url
 
 @pytest.fixture(scope="session")
-def app_db_connection(test_environment):
-    """根据当前测试环境，创建并提供一个到被测应用数据库的连接。"""
+def app_db_connection(request, test_environment):
+    """根据当前测试环境，提供被测应用数据库的连接池 (core.app_db.AppDatabase)，每次校验从池中借出连接。"""
     conn_string = test_environment.app_db_connection_string
     if not conn_string:
         yield None
         return
 
-    engine, connection = None, None
+    config = request.config
     try:
-        engine = create_engine(conn_string)
-        connection = engine.connect()
+        engine = app_db.get_app_db_engine(conn_string, pool_size=config.getoption("--app-db-pool-size"))
+        # 先借出一次连接，连接失败时立即报错而不是在第一个校验中失败
+        with engine.connect():
+            pass
         print(f"--- Successfully connected to application DB for env '{test_environment.name}' ---")
-        yield connection
     except Exception as e:
         pytest.fail(f"无法连接到应用程序数据库: {e}", pytrace=False)
-    finally:
-        if connection: connection.close()
-        if engine: engine.dispose()
-        print("\n--- Application DB connection closed. ---")
+    database = app_db.AppDatabase(
+        engine, prepare=not config.getoption("--no-prepared-statements"),
+        batch=config.getoption("--batch-db-validations"), bind_params=config.getoption("--bind-db-params")
+    )
+    config.app_db = database
+    yield database
+    app_db.dispose_all_engines()
+    print("\n--- Application DB connection pool closed. ---")
+
+@pytest.fixture(scope="session")
+def async_case_results(request, base_url, app_db_connection):
+    """
+    --engine async 时，在第一个用例执行前并发执行本次会话中所有已选中的数据集，
+    之后每个用例只需回放对应的结果。sync 引擎下返回 None。
+    """
+    if request.config.getoption("--engine") != "async":
+        return None
+
+    from core.async_engine import run_cases_concurrently
+
+    prefetched = getattr(request.config, 'prefetched_case_details', None) or {}
+    cases = {}
+    for item in request.session.items:
+        callspec = getattr(item, 'callspec', None)
+        run_data = callspec.params.get('test_case_run_data') if callspec else None
+        if not run_data: continue
+        key = (run_data[0], run_data[1])
+        if prefetched.get(key):
+            cases[key] = prefetched[key]
+
+    return run_cases_concurrently(
+        base_url, cases, concurrency=request.config.getoption("--concurrency"), app_db_conn=app_db_connection,
+        max_audit_bytes=request.config.getoption("--max-audit-body-size"),
+        release_responses=not request.config.getoption("--keep-step-responses"),
+        audit_response_bodies=request.config.getoption("--debug-mode"),
+        action_cache=request.getfixturevalue('action_cache')
+    )
+
+@pytest.fixture(scope="session")
+def http_pool_options(request):
+    """共享连接池的配置，来自命令行参数"""
+    config = request.config
+    return {
+        "pool_connections": config.getoption("--http-pool-size"),
+        "pool_maxsize": config.getoption("--http-pool-maxsize"),
+        "pool_block": config.getoption("--http-pool-block"),
+        "keep_alive": not config.getoption("--no-keep-alive"),
+    }
+
+@pytest.fixture(scope="session")
+def action_cache(request):
+    """本进程的共享动作结果缓存；shared 模式下打开主进程创建的缓存文件，off 时为 None"""
+    mode = request.config.getoption("--action-cache")
+    if mode == "off":
+        return None
+    path = os.environ.get(action_cache_module.CACHE_ENV_VAR) if mode == "shared" else None
+    cache = action_cache_module.ActionCache(path)
+    request.config.action_cache = cache
+    return cache
 
 @pytest.fixture
-def api_client(base_url):
+def api_client(request, base_url, http_pool_options, action_cache):
     """
     一个函数级别的 fixture，为每个测试用例创建一个独立的 ApiClient 实例。
+    每个实例有独立的 Session (cookie、审计轨迹互不影响)，但共享本进程内 base_url 对应的连接池。
     """
-    return ApiClient(base_url)
+    config = request.config
+    return ApiClient(
+        base_url,
+        reporter=create_reporter(config.getoption("--report-level"), max_attachment_bytes=config.getoption("--max-attachment-size")),
+        session=http_pool.create_pooled_session(base_url, **http_pool_options),
+        max_step_workers=config.getoption("--step-parallelism"),
+        stream_responses=config.getoption("--stream-responses"),
+        max_audit_bytes=config.getoption("--max-audit-body-size"),
+        release_responses=not config.getoption("--keep-step-responses"),
+        # 只有 Debug 模式会把审计轨迹写入数据库，其余情况下不必在整个用例期间持有响应体
+        audit_response_bodies=config.getoption("--debug-mode"),
+        action_cache=action_cache
+    )
@@ -1,8 +1,11 @@
 # tests/test_main.py
 
+import os
 import pytest
 import allure
-from core.db_handler import get_test_cases_by_filter, get_case_details
+from core.db_handler import get_case_details
+from core.run_plan import plan_test_run
+from core.snapshot import SNAPSHOT_ENV_VAR, load_snapshot
 from core.api_client import ApiClient
 
 def pytest_generate_tests(metafunc):
@@ -10,30 +13,31 @@ def pytest_generate_tests(metafunc):
     在测试收集阶段，从数据库动态加载所有需要运行的测试场景。
     """
     if "test_case_run_data" in metafunc.fixturenames:
-        session_factory = getattr(metafunc.config, 'db_session_factory', None)
-        if not session_factory:
-            # 在工作进程中，尝试重新初始化数据库会话工厂
-            try:
-                from core import db_handler
-                session_factory = db_handler.initialize_session()
-                metafunc.config.db_session_factory = session_factory
-            except Exception:
-                pytest.skip("数据库会话工厂不可用，跳过测试收集")
-                return
-
         env = metafunc.config.getoption("--env")
-        service = metafunc.config.getoption("--service")
-        module = metafunc.config.getoption("--module")
-        component = metafunc.config.getoption("--component")
-        tags = metafunc.config.getoption("--tags")
-        jira_id = metafunc.config.getoption("--jira")
-        case_id = metafunc.config.getoption("--id")
+        snapshot_path = os.environ.get(SNAPSHOT_ENV_VAR)
+        run_plan = getattr(metafunc.config, 'run_plan', None)
+
+        if run_plan is not None:
+            # 主进程已选出测试计划 (导出快照或 --snapshot 模式)
+            test_cases_to_run, metafunc.config.prefetched_case_details = run_plan
+        elif snapshot_path:
+            # xdist 工作进程：从主进程导出的快照收集用例，不访问框架数据库
+            test_cases_to_run, metafunc.config.prefetched_case_details, _ = load_snapshot(snapshot_path)
+        else:
+            session_factory = getattr(metafunc.config, 'db_session_factory', None)
+            if not session_factory:
+                # 在工作进程中，尝试重新初始化数据库会话工厂
+                try:
+                    from core import db_handler
+                    session_factory = db_handler.initialize_session()
+                    metafunc.config.db_session_factory = session_factory
+                except Exception:
+                    pytest.skip("数据库会话工厂不可用，跳过测试收集")
+                    return
 
-        with session_factory() as session:
-            test_cases_to_run = get_test_cases_by_filter(
-                session=session, env=env, service=service, module=module,
-                component=component, tags=tags, jira_id=jira_id, case_id=case_id
-            )
+            with session_factory() as session:
+                # 在收集阶段一次性批量加载所有场景的完整定义，执行阶段不再访问框架数据库
+                test_cases_to_run, metafunc.config.prefetched_case_details = plan_test_run(session, metafunc.config)
 
         if not test_cases_to_run:
             pytest.skip(f"在环境 '{env}' 下没有根据筛选条件找到任何测试用例")
@@ -49,17 +53,30 @@ class TestApi:
     """
     所有数据驱动的API测试都通过这个类来执行。
     """
-    def test_run_case(self, test_case_run_data, api_client, app_db_connection, db_session_factory):
+    def test_run_case(self, request, test_case_run_data, api_client, app_db_connection, async_case_results):
         """
         这是一个测试模板方法，会被 pytest_generate_tests 多次调用。
         """
         case_id, data_set_id, case_display_name, jira_id = test_case_run_data
 
         with allure.step(f"Executing Case: {case_display_name}"):
-            with db_session_factory() as session:
-                full_case_details = get_case_details(session, case_id, data_set_id)
+            prefetched = getattr(request.config, 'prefetched_case_details', None)
+            if prefetched is not None:
+                full_case_details = prefetched.get((case_id, data_set_id))
+            else:
+                # 兜底：没有预加载结果时（例如收集阶段被跳过），退回到逐条查询
+                db_session_factory = request.getfixturevalue('db_session_factory')
+                with db_session_factory() as session:
+                    full_case_details = get_case_details(session, case_id, data_set_id)
 
             if not full_case_details:
                 pytest.fail(f"无法找到 Case ID: {case_id} / DataSet ID: {data_set_id} 的详细信息")
 
+            # async 引擎：该数据集已在会话开始时并发执行完毕，这里回放其报告与审计结果
+            if async_case_results is not None and (case_id, data_set_id) in async_case_results:
+                outcome = async_case_results[(case_id, data_set_id)]
+                request.node.async_duration = outcome.duration
+                outcome.replay(api_client)
+                return
+
             api_client.execute_steps(full_case_details, app_db_conn=app_db_connection)
@@ -0,0 +1,144 @@
+# tests/unit/test_action_cache.py
+
+import pytest
+
+from core import action_cache
+from core.action_cache import DEFAULT_TTL, ActionCache, cache_key, merge_cache_stats
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def make_cache(request, tmp_path):
+    """同一组测试分别在进程内缓存和 SQLite 文件缓存上运行，两者行为应完全一致。"""
+    caches = []
+
+    def make(clock, name='cache.sqlite'):
+        cache = ActionCache(str(tmp_path / name) if request.param == 'sqlite' else None, clock=clock)
+        caches.append(cache)
+        return cache
+    yield make
+    for cache in caches:
+        cache.close()
+
+
+ENTRY = {'response': {'status_code': 200, 'body': {'token': 'abc'}}, 'variables': {'token': 'abc'}, 'cookies': {}}
+
+
+def test_put_get_round_trip(make_cache):
+    clock = FakeClock()
+    cache = make_cache(clock)
+    assert cache.get('k') is None
+    cache.put('k', ENTRY, ttl=60)
+    entry = cache.get('k')
+    assert entry == dict(ENTRY, stored_at=1000.0, expires_at=1060.0)
+    assert cache.stats == {"hits": 1, "misses": 1, "stores": 1, "invalidations": 0}
+
+
+def test_returned_entries_are_independent_copies(make_cache):
+    cache = make_cache(FakeClock())
+    cache.put('k', ENTRY)
+    cache.get('k')['response']['body']['token'] = 'changed'
+    assert cache.get('k')['response']['body']['token'] == 'abc'
+
+
+def test_entries_expire_after_ttl(make_cache):
+    clock = FakeClock()
+    cache = make_cache(clock)
+    cache.put('short', ENTRY, ttl=10)
+    cache.put('default', ENTRY)
+    clock.now += 9.9
+    assert cache.get('short') is not None
+    clock.now += 0.1
+    assert cache.get('short') is None
+    assert cache.get('default')['expires_at'] == 1000.0 + DEFAULT_TTL
+    clock.now = 1000.0 + DEFAULT_TTL
+    assert cache.get('default') is None
+
+
+def test_put_replaces_and_restarts_ttl(make_cache):
+    clock = FakeClock()
+    cache = make_cache(clock)
+    cache.put('k', ENTRY, ttl=10)
+    clock.now += 5
+    cache.put('k', dict(ENTRY, variables={'token': 'new'}), ttl=10)
+    clock.now += 8
+    assert cache.get('k')['variables'] == {'token': 'new'}
+
+
+def test_invalidate(make_cache):
+    cache = make_cache(FakeClock())
+    cache.put('k', ENTRY)
+    cache.invalidate('k')
+    cache.invalidate('missing')
+    assert cache.get('k') is None
+    assert cache.stats["invalidations"] == 1
+
+
+def test_sqlite_cache_is_shared_between_instances(tmp_path):
+    clock = FakeClock()
+    writer = ActionCache(str(tmp_path / 'shared.sqlite'), clock=clock)
+    reader = ActionCache(str(tmp_path / 'shared.sqlite'), clock=clock)
+    try:
+        writer.put('k', ENTRY)
+        assert reader.get('k')['variables'] == {'token': 'abc'}
+        reader.invalidate('k')
+        assert writer.get('k') is None
+    finally:
+        writer.close()
+        reader.close()
+
+
+def test_in_memory_eviction_drops_expired_then_oldest(monkeypatch):
+    monkeypatch.setattr(action_cache, 'MAX_ENTRIES', 3)
+    clock = FakeClock()
+    cache = ActionCache(clock=clock)
+    cache.put('expiring', ENTRY, ttl=1)
+    cache.put('a', ENTRY)
+    cache.put('b', ENTRY)
+    clock.now += 2
+    cache.put('c', ENTRY)
+    # 超过上限时先清理过期条目，不淘汰仍然有效的条目
+    assert list(cache._entries) == ['a', 'b', 'c']
+    cache.put('a', ENTRY)
+    cache.put('d', ENTRY)
+    # 重新写入的条目排到最后，淘汰最早写入的 b
+    assert list(cache._entries) == ['c', 'a', 'd']
+
+
+# =================================================================
+# 缓存键 (cache_key)
+# =================================================================
+
+STEP = {'shared_action_ref': 'login', 'outputs': [{'variable_name': 'token', 'json_path': '$.token'}]}
+REQUEST = {'method': 'POST', 'url': 'http://x/login', 'json': {'user': 'alice'}}
+
+
+def test_key_depends_on_request_validations_and_outputs():
+    key = cache_key(STEP, REQUEST, {'expectedStatusCode': 200})
+    assert key == cache_key(dict(STEP), dict(REQUEST), {'expectedStatusCode': 200})
+    assert key != cache_key(STEP, dict(REQUEST, json={'user': 'bob'}), {'expectedStatusCode': 200})
+    assert key != cache_key(STEP, REQUEST, {'expectedStatusCode': 201})
+    assert key != cache_key(dict(STEP, outputs=[]), REQUEST, {'expectedStatusCode': 200})
+    assert key != cache_key(dict(STEP, shared_action_ref='other'), REQUEST, {'expectedStatusCode': 200})
+
+
+def test_key_includes_streamed_body_paths():
+    full = cache_key(STEP, REQUEST, None)
+    subset = cache_key(STEP, REQUEST, None, body_paths={('token',), ('data', 0)})
+    assert full != subset
+    # 路径集合的顺序不影响键
+    assert subset == cache_key(STEP, REQUEST, None, body_paths=[('data', 0), ('token',)])
+    assert subset != cache_key(STEP, REQUEST, None, body_paths={('token',)})
+    assert full != cache_key(STEP, REQUEST, None, body_paths=set())
+
+
+def test_merge_cache_stats():
+    merged = merge_cache_stats([{"hits": 1, "misses": 2}, {"hits": 3, "stores": 1, "invalidations": 1}])
+    assert merged == {"hits": 4, "misses": 2, "stores": 1, "invalidations": 1}
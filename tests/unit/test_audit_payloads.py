@@ -0,0 +1,105 @@
+# tests/unit/test_audit_payloads.py
+
+import zlib
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from core import audit_payloads
+from core.audit_payloads import PayloadEncoder, decode_payload, load_payloads
+from models.tables import AuditPayload
+
+RESPONSE = {'status_code': 200, 'headers': {'content-type': 'application/json'},
+            'body': {'items': [{'id': i, 'name': f'item {i}', 'note': '中文'} for i in range(50)]}}
+
+
+@pytest.fixture(params=['zstd', 'zlib'])
+def codec(request, monkeypatch):
+    """分别在 zstd 和未安装 zstandard 时的 zlib 退回路径下运行。"""
+    if request.param == 'zstd':
+        pytest.importorskip('zstandard')
+    else:
+        monkeypatch.setattr(audit_payloads, 'zstandard', None)
+    return request.param
+
+
+def test_round_trip(codec):
+    pending = {}
+    digest = PayloadEncoder().encode(RESPONSE, pending)
+    row = pending[digest]
+    assert row['codec'] == codec
+    assert len(row['data']) < row['raw_size']
+    assert decode_payload(row['codec'], row['data']) == RESPONSE
+    # 数据库驱动返回 memoryview 时同样可以解码
+    assert decode_payload(row['codec'], memoryview(row['data'])) == RESPONSE
+
+
+def test_round_trip_through_audit_payloads_table(codec):
+    engine = create_engine('sqlite://')
+    AuditPayload.__table__.create(engine)
+    pending = {}
+    encoder = PayloadEncoder()
+    request_hash = encoder.encode({'method': 'GET', 'url': '/items'}, pending)
+    response_hash = encoder.encode(RESPONSE, pending)
+    with Session(engine) as session:
+        session.execute(AuditPayload.__table__.insert(), list(pending.values()))
+        payloads = load_payloads(session, [request_hash, response_hash, None])
+    assert payloads == {request_hash: {'method': 'GET', 'url': '/items'}, response_hash: RESPONSE}
+
+
+def test_zlib_rows_are_readable_without_zstandard(monkeypatch):
+    data = zlib.compress(b'{"a":1}')
+    monkeypatch.setattr(audit_payloads, 'zstandard', None)
+    assert decode_payload('zlib', data) == {'a': 1}
+    with pytest.raises(RuntimeError, match='zstandard'):
+        decode_payload('zstd', b'')
+    with pytest.raises(ValueError, match='未知的审计载荷编码'):
+        decode_payload('lz4', b'')
+
+
+def test_hash_is_independent_of_key_order():
+    encoder = PayloadEncoder()
+    assert encoder.encode({'a': 1, 'b': [1, 2]}, {}) == encoder.encode({'b': [1, 2], 'a': 1}, {})
+    assert encoder.encode({'a': 1}, {}) != encoder.encode({'a': 2}, {})
+
+
+def test_none_is_not_stored():
+    pending = {}
+    assert PayloadEncoder().encode(None, pending) is None
+    assert pending == {}
+
+
+def test_same_payload_is_compressed_once_per_batch():
+    encoder = PayloadEncoder()
+    pending = {}
+    digests = {encoder.encode(dict(RESPONSE), pending) for _ in range(5)}
+    assert len(digests) == 1 and list(pending) == list(digests)
+    assert encoder.stats["payloads"] == 5
+    assert encoder.stats["new_payloads"] == 1
+
+
+def test_stored_payloads_are_skipped_in_later_batches():
+    encoder = PayloadEncoder()
+    first = {}
+    digest = encoder.encode(RESPONSE, first)
+    # 事务提交前不算已写入：下一批次 (例如上一批回滚后重试) 仍然要插入
+    retry = {}
+    assert encoder.encode(RESPONSE, retry) == digest and digest in retry
+    encoder.mark_stored(first)
+    later = {}
+    assert encoder.encode(RESPONSE, later) == digest
+    assert later == {}
+
+
+def test_known_hashes_are_evicted_least_recently_used():
+    encoder = PayloadEncoder(known_cache_size=2)
+    digests = [encoder.encode({'n': n}, {}) for n in range(3)]
+    encoder.mark_stored(digests[:2])
+    # 命中 0 后它成为最近使用的，再写入 2 时淘汰 1
+    assert encoder.encode({'n': 0}, {}) == digests[0]
+    encoder.mark_stored([digests[2]])
+    assert list(encoder._known) == [digests[0], digests[2]]
+    pending = {}
+    encoder.encode({'n': 1}, pending)
+    assert digests[1] in pending
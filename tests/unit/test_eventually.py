@@ -0,0 +1,136 @@
+# tests/unit/test_eventually.py
+
+import pytest
+
+from core import eventually
+from core.eventually import EventualCheck, EventuallyPolicy, parse_policy, record_convergence
+
+
+class FakeClock:
+    def __init__(self, now=100.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def _isolated(monkeypatch):
+    # 每个测试使用独立的收敛记录，退避不带抖动
+    monkeypatch.setattr(eventually, '_learned', {})
+    monkeypatch.setattr(eventually.random, 'uniform', lambda low, high: 1.0)
+
+
+def _policy(**overrides):
+    values = dict(timeout=30.0, initial_delay=0.2, max_delay=5.0, factor=2.0, mode='request')
+    values.update(overrides)
+    return EventuallyPolicy(**values)
+
+
+# =================================================================
+# 规则解析 (parse_policy)
+# =================================================================
+
+@pytest.mark.parametrize('validations', [None, [], {}, {'body': {}}, {'eventually': None}, {'retry': False}])
+def test_no_policy(validations):
+    assert parse_policy(validations) is None
+
+
+def test_defaults_and_aliases():
+    assert parse_policy({'eventually': True}) == EventuallyPolicy(30.0, 0.2, 5.0, 2.0, 'request')
+    assert parse_policy({'retry': {'timeout': 3, 'mode': 'db'}}) == EventuallyPolicy(3.0, 0.2, 5.0, 2.0, 'db')
+
+
+def test_factor_below_one_is_raised_to_one():
+    assert parse_policy({'eventually': {'factor': 0.5}}).factor == 1.0
+
+
+@pytest.mark.parametrize('validations, message', [
+    ({'eventually': {'mode': 'poll'}}, "'eventually.mode' must be one of"),
+    ({'eventually': 5}, "'eventually' must be an object, but got int"),
+    ({'retry': ['request']}, "'eventually' must be an object, but got list"),
+])
+def test_invalid_blocks(validations, message):
+    with pytest.raises(ValueError, match=message):
+        parse_policy(validations)
+
+
+# =================================================================
+# 退避 (EventualCheck.next_delay)
+# =================================================================
+
+def test_exponential_backoff_is_capped_by_max_delay():
+    clock = FakeClock()
+    check = EventualCheck(_policy(initial_delay=1.0, max_delay=5.0, factor=2.0), 'k', clock=clock)
+    delays = [check.next_delay() for _ in range(6)]
+    assert delays == [1.0, 2.0, 4.0, 5.0, 5.0, 5.0]
+    assert check.attempts == 7
+    assert check.waited == pytest.approx(22.0)
+
+
+def test_jitter_is_applied_to_backoff(monkeypatch):
+    monkeypatch.setattr(eventually.random, 'uniform', lambda low, high: high)
+    check = EventualCheck(_policy(initial_delay=1.0), 'k', clock=FakeClock())
+    assert check.next_delay() == pytest.approx(1.15)
+
+
+def test_delay_is_truncated_to_deadline():
+    clock = FakeClock()
+    check = EventualCheck(_policy(timeout=3.0, initial_delay=2.0), 'k', clock=clock)
+    assert check.next_delay() == 2.0
+    clock.now += 2.5
+    assert check.next_delay() == pytest.approx(0.5)
+    clock.now += 0.5
+    assert check.next_delay() is None
+    assert check.attempts == 3
+
+
+def test_learned_convergence_sets_the_first_delay():
+    record_convergence('k', 3.0)
+    check = EventualCheck(_policy(initial_delay=0.2), 'k', clock=FakeClock())
+    # 第一次等待取历史收敛时间的 80%，之后回到 initialDelay 开始的指数退避
+    assert check.next_delay() == pytest.approx(2.4)
+    assert check.next_delay() == pytest.approx(0.2)
+    assert check.next_delay() == pytest.approx(0.4)
+
+
+def test_learned_delay_is_capped_by_max_delay():
+    record_convergence('k', 60.0)
+    check = EventualCheck(_policy(max_delay=5.0), 'k', clock=FakeClock())
+    assert check.next_delay() == 5.0
+
+
+def test_learned_delay_shorter_than_initial_delay_is_ignored():
+    record_convergence('k', 0.1)
+    check = EventualCheck(_policy(initial_delay=1.0), 'k', clock=FakeClock())
+    assert check.next_delay() == 1.0
+
+
+# =================================================================
+# 收敛记录 (record_convergence / finish)
+# =================================================================
+
+def test_record_convergence_uses_moving_average():
+    record_convergence('k', 2.0)
+    record_convergence('k', 12.0)
+    assert eventually.learned_convergence('k') == pytest.approx(2.0 + eventually.LEARNING_RATE * 10.0)
+    assert eventually.learned_convergence('other') is None
+
+
+def test_finish_records_time_to_consistency():
+    clock = FakeClock()
+    check = EventualCheck(_policy(), 'k', clock=clock)
+    check.next_delay()
+    clock.now += 1.5
+    check.finish(True)
+    assert check.time_to_consistency == pytest.approx(1.5)
+    assert eventually.learned_convergence('k') == pytest.approx(1.5)
+    assert check.summary() == {"mode": "request", "attempts": 2, "converged": True,
+                               "time_to_consistency": 1.5, "waited": 0.2, "timeout": 30.0}
+
+
+def test_failed_check_is_not_learned():
+    check = EventualCheck(_policy(), 'k', clock=FakeClock())
+    check.finish(False)
+    assert check.converged is False and check.time_to_consistency is None
+    assert eventually.learned_convergence('k') is None
@@ -0,0 +1,45 @@
+# tests/unit/test_job_scheduler.py
+
+import pytest
+
+from core.job_scheduler import DEFAULT_PRIORITY, JobScheduler, priority_for_tags
+
+
+@pytest.mark.parametrize('tags, priority', [
+    ('P0', 0),
+    ('smoke, p1', 1),
+    ('P2,P0,regression', 0),
+    ('P10,P3', 3),
+    ('smoke,regression', DEFAULT_PRIORITY),
+    ('', DEFAULT_PRIORITY),
+    (None, DEFAULT_PRIORITY),
+    ('P,PX,Pone', DEFAULT_PRIORITY),
+])
+def test_priority_for_tags(tags, priority):
+    assert priority_for_tags(tags) == priority
+
+
+def _scheduler(tmp_path):
+    # 不调用 start()：只验证队列顺序，不启动调度线程也不访问数据库
+    return JobScheduler(session_factory=None, project_root=str(tmp_path))
+
+
+def test_queue_orders_by_priority_then_submission(tmp_path):
+    scheduler = _scheduler(tmp_path)
+    for run_id, tags in [('a', 'smoke'), ('b', 'P1'), ('c', 'P0'), ('d', None), ('e', 'P1,regression')]:
+        scheduler.submit(run_id, priority_for_tags(tags))
+
+    assert scheduler.queue_snapshot() == {"queued": ['c', 'b', 'e', 'a', 'd'], "running": []}
+    assert [scheduler._next_run_id() for _ in range(5)] == ['c', 'b', 'e', 'a', 'd']
+    assert scheduler.queue_snapshot() == {"queued": [], "running": ['c', 'b', 'e', 'a', 'd']}
+
+
+def test_dequeued_runs_are_skipped(tmp_path):
+    scheduler = _scheduler(tmp_path)
+    scheduler.submit('low', 5)
+    scheduler.submit('high', 0)
+    # cancel() 对排队中的运行只是移出 _queued_ids，堆中的条目在出队时被跳过
+    scheduler._queued_ids.discard('high')
+
+    assert scheduler.queue_snapshot()["queued"] == ['low']
+    assert scheduler._next_run_id() == 'low'
@@ -0,0 +1,80 @@
+# tests/unit/test_json_match.py
+
+import pytest
+
+from utils.json_match import partial_match_failure
+
+
+def _legacy_failure(actual, expected, path='body'):
+    """逐层递归比较的原始实现，用于确认错误信息与之完全一致。"""
+    if isinstance(expected, dict):
+        if not isinstance(actual, dict):
+            return f"Type mismatch at path '{path}': expected dict, got {type(actual).__name__}"
+        for key, value in expected.items():
+            if key not in actual:
+                return f"Missing key at path '{path}.{key}'"
+            failure = _legacy_failure(actual[key], value, f"{path}.{key}")
+            if failure:
+                return failure
+        return None
+    if isinstance(expected, list):
+        if not isinstance(actual, list):
+            return f"Type mismatch at path '{path}': expected list, got {type(actual).__name__}"
+        if len(actual) < len(expected):
+            return f"Length mismatch at path '{path}': expected at least {len(expected)}, got {len(actual)}"
+        for index, (actual_item, expected_item) in enumerate(zip(actual, expected)):
+            failure = _legacy_failure(actual_item, expected_item, f"{path}[{index}]")
+            if failure:
+                return failure
+        return None
+    if actual != expected:
+        return f"Value mismatch at path '{path}': expected '{expected}', got '{actual}'"
+    return None
+
+
+ACTUAL = {
+    'code': 0,
+    'data': {
+        'user': {'id': 7, 'name': 'alice', 'roles': ['admin', 'dev']},
+        'items': [{'id': 1, 'tags': ['a']}, {'id': 2, 'tags': ['b', 'c']}, {'id': 3, 'tags': []}],
+    },
+    'extra': 'ignored',
+}
+
+
+@pytest.mark.parametrize('expected', [
+    {},
+    {'code': 0},
+    {'data': {'user': {'name': 'alice'}}},
+    {'data': {'user': {'roles': ['admin']}}},
+    {'data': {'items': [{'id': 1}, {'tags': ['b']}]}},
+    ACTUAL,
+])
+def test_subset_matches(expected):
+    assert partial_match_failure(ACTUAL, expected) is None
+
+
+@pytest.mark.parametrize('expected, message', [
+    ({'data': {'user': {'email': 'x'}}}, "Missing key at path 'body.data.user.email'"),
+    ({'data': {'user': {'name': 'bob'}}}, "Value mismatch at path 'body.data.user.name': expected 'bob', got 'alice'"),
+    ({'data': {'user': {'roles': ['admin', 'dev', 'ops']}}},
+     "Length mismatch at path 'body.data.user.roles': expected at least 3, got 2"),
+    ({'data': {'items': [{'id': 1}, {'tags': ['b', 'x']}]}},
+     "Value mismatch at path 'body.data.items[1].tags[1]': expected 'x', got 'c'"),
+    ({'data': {'user': []}}, "Type mismatch at path 'body.data.user': expected list, got dict"),
+    ({'code': {'value': 0}}, "Type mismatch at path 'body.code': expected dict, got int"),
+])
+def test_first_mismatch_is_explained(expected, message):
+    assert partial_match_failure(ACTUAL, expected) == message
+    assert _legacy_failure(ACTUAL, expected) == message
+
+
+def test_first_mismatch_follows_expected_key_order():
+    expected = {'extra': 'other', 'code': 1}
+    assert partial_match_failure(ACTUAL, expected) == _legacy_failure(ACTUAL, expected)
+    assert partial_match_failure(ACTUAL, expected).startswith("Value mismatch at path 'body.extra'")
+
+
+def test_custom_root_is_used_in_message():
+    assert partial_match_failure({'a': 1}, {'a': 2}, root='row[0]') == \
+        "Value mismatch at path 'row[0].a': expected '2', got '1'"
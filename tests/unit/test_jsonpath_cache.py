@@ -0,0 +1,74 @@
+# tests/unit/test_jsonpath_cache.py
+
+import pytest
+from jsonpath_ng import parse
+
+from utils.jsonpath_cache import ParsedPath, SimplePath, compile_jsonpath, find_values
+
+DATA = {
+    'data': {
+        'id': 42,
+        'items': [{'id': 1, 'name': 'a'}, {'id': 2, 'name': None}],
+        'empty': [],
+    },
+    'token': 'abc',
+    'nullable': None,
+}
+
+
+@pytest.mark.parametrize('expression, segments', [
+    ('$', ()),
+    ('$.token', ('token',)),
+    ('$.data.items[1].name', ('data', 'items', 1, 'name')),
+    ('data.items[0].id', ('data', 'items', 0, 'id')),
+    ('$.data.items[0]', ('data', 'items', 0)),
+])
+def test_simple_paths_use_fast_path(expression, segments):
+    compiled = compile_jsonpath(expression)
+    assert isinstance(compiled, SimplePath)
+    assert compiled.segments == segments
+
+
+@pytest.mark.parametrize('expression', [
+    '$.data.items[*].id', '$..id', '$.data.items[-1]', '$.data.*', '$.data.items[0:1]',
+])
+def test_complex_paths_fall_back_to_jsonpath_ng(expression):
+    assert isinstance(compile_jsonpath(expression), ParsedPath)
+
+
+@pytest.mark.parametrize('expression', [
+    '$', '$.token', '$.nullable', '$.data.id', '$.data.items[1].name', '$.data.items[5].id',
+    '$.data.empty[0]', '$.missing.key', '$.token.length', '$.data.items.id', 'data.items[0].name',
+])
+def test_fast_path_matches_jsonpath_ng(expression):
+    assert isinstance(compile_jsonpath(expression), SimplePath)
+    expected = [match.value for match in parse(expression).find(DATA)]
+    assert find_values(expression, DATA) == expected
+
+
+INDEXED = [
+    {'code': 'abc'}, {'code': ''}, {'code': None}, {'code': []}, {'code': [1, 2]},
+    {'code': {0: 'int key'}}, {'code': {'0': 'str key'}}, {'code': True},
+]
+
+
+@pytest.mark.parametrize('data', INDEXED, ids=repr)
+@pytest.mark.parametrize('expression', ['$.code[0]', '$.code[1]', '$.code[5]', '$.code[0].x'])
+def test_index_on_non_list_matches_jsonpath_ng(expression, data):
+    # 对字符串取下标时 jsonpath_ng 返回单个字符；快速路径退回到完整解析，notNull/notExist 的结果不变
+    try:
+        expected = [match.value for match in parse(expression).find(data)]
+    except Exception as error:
+        with pytest.raises(type(error)):
+            find_values(expression, data)
+        return
+    assert find_values(expression, data) == expected
+
+
+def test_index_on_string_returns_character():
+    assert find_values('$.code[0]', {'code': 'abc'}) == ['a']
+    assert find_values('$.token[2]', DATA) == ['c']
+
+
+def test_compiled_expressions_are_cached():
+    assert compile_jsonpath('$.data.items[0].id') is compile_jsonpath('$.data.items[0].id')
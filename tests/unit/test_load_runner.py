@@ -0,0 +1,118 @@
+# tests/unit/test_load_runner.py
+
+import pytest
+
+from core.load_runner import (
+    HISTOGRAM_GROWTH, HISTOGRAM_MIN_MS, MAX_ERROR_KINDS, LatencyHistogram, LoadProfile, StepStats, arrival_offset,
+)
+
+
+# =================================================================
+# 到达时刻 (arrival_offset)
+# =================================================================
+
+def test_offsets_without_ramp_are_evenly_spaced():
+    profile = LoadProfile(arrival_rate=4)
+    assert [arrival_offset(index, profile) for index in range(5)] == [0.0, 0.25, 0.5, 0.75, 1.0]
+
+
+def test_offsets_during_ramp_follow_linear_rate_increase():
+    profile = LoadProfile(arrival_rate=10, ramp_up=2)
+    # ramp_up 内共到达 rate * ramp_up / 2 = 10 次，累计到达数 N(t) = 2.5 t²
+    assert arrival_offset(0, profile) == 0.0
+    assert arrival_offset(10, profile) == pytest.approx(2.0)
+    for index in range(1, 10):
+        t = arrival_offset(index, profile)
+        assert 0 < t < 2
+        assert 2.5 * t * t == pytest.approx(index)
+
+
+def test_offsets_after_ramp_use_the_full_rate():
+    profile = LoadProfile(arrival_rate=10, ramp_up=2)
+    assert arrival_offset(15, profile) == pytest.approx(2.5)
+    assert arrival_offset(30, profile) - arrival_offset(29, profile) == pytest.approx(0.1)
+
+
+def test_offsets_are_monotonic_across_the_ramp_boundary():
+    profile = LoadProfile(arrival_rate=7, ramp_up=3)
+    offsets = [arrival_offset(index, profile) for index in range(40)]
+    assert offsets == sorted(offsets)
+
+
+# =================================================================
+# 延迟直方图 (LatencyHistogram)
+# =================================================================
+
+def test_empty_histogram_has_no_percentiles():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(50) is None
+    assert histogram.mean is None
+    assert histogram.to_dict() == {}
+
+
+def test_percentiles_are_clamped_to_observed_range():
+    histogram = LatencyHistogram()
+    histogram.record(10.0)
+    # 只有一个样本：所在桶的上界大于样本值，结果仍然是样本本身
+    assert histogram.percentile(50) == 10.0
+    assert histogram.percentile(100) == 10.0
+
+    histogram.record(0.01)
+    # 不超过第一个桶上界的样本都进入 0 号桶，结果为该桶的上界
+    assert histogram.percentile(1) == HISTOGRAM_MIN_MS
+    assert histogram.percentile(100) == 10.0
+    assert histogram.min == 0.01 and histogram.max == 10.0
+
+
+def test_percentile_relative_error_is_bounded():
+    histogram = LatencyHistogram()
+    for ms in range(1, 1001):
+        histogram.record(float(ms))
+    for p in (1, 50, 95, 99, 100):
+        exact = float(max(1, p * 10))
+        estimate = histogram.percentile(p)
+        assert exact <= estimate <= exact * HISTOGRAM_GROWTH
+    assert histogram.percentile(50) == pytest.approx(508.9, abs=0.1)
+    assert histogram.mean == pytest.approx(500.5)
+
+
+def test_bucket_bounds():
+    assert LatencyHistogram.upper_bound(0) == HISTOGRAM_MIN_MS
+    assert LatencyHistogram.upper_bound(1) == pytest.approx(HISTOGRAM_MIN_MS * HISTOGRAM_GROWTH)
+
+
+# =================================================================
+# 步骤统计 (StepStats)
+# =================================================================
+
+def test_record_execution_counts_errors():
+    stats = StepStats(1, 1, 'login')
+    stats.record_execution()
+    stats.record_execution(AssertionError("Expected status code '200'\nmore details"))
+    stats.record_execution(AssertionError("Expected status code '200'\nother details"))
+    stats.record_execution(ValueError("   "))
+    assert stats.executions == 4
+    assert stats.errors == 3
+    assert stats.error_rate == 0.75
+    assert stats.error_messages == {"AssertionError: Expected status code '200'": 2, "ValueError: ": 1}
+
+
+def test_error_kinds_are_capped():
+    stats = StepStats(1, 1, None)
+    for index in range(MAX_ERROR_KINDS + 5):
+        stats.record_execution(RuntimeError(f"error {index}"))
+    stats.record_execution(RuntimeError("error 0"))
+    assert len(stats.error_messages) == MAX_ERROR_KINDS + 1
+    assert stats.error_messages["(other)"] == 5
+    assert stats.error_messages["RuntimeError: error 0"] == 2
+    assert stats.errors == MAX_ERROR_KINDS + 6
+
+
+def test_error_messages_are_truncated():
+    stats = StepStats(1, 1, None)
+    stats.record_execution(RuntimeError("x" * 500))
+    assert [len(message) for message in stats.error_messages] == [200]
+
+
+def test_error_rate_without_executions():
+    assert StepStats(1, 1, None).error_rate == 0.0
@@ -0,0 +1,160 @@
+# tests/unit/test_phase_timer.py
+
+import asyncio
+
+import pytest
+
+from core.phase_timer import (
+    HttpxTrace, PhaseTimer, current_timer, format_phase_totals, phase_category, step_timings, timed_phase,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+# =================================================================
+# 独占耗时 (PhaseTimer.phase)
+# =================================================================
+
+def test_nested_phases_record_exclusive_time():
+    clock = FakeClock()
+    timer = PhaseTimer(clock=clock)
+    with timer.phase('assert.body'):
+        clock.advance(0.010)
+        with timer.phase('report'):
+            clock.advance(0.004)
+            with timer.phase('decode'):
+                clock.advance(0.001)
+        clock.advance(0.002)
+    assert timer.take() == {'assert.body': 12.0, 'report': 4.0, 'decode': 1.0}
+
+
+def test_sibling_phases_and_repeats_accumulate():
+    clock = FakeClock()
+    timer = PhaseTimer(clock=clock)
+    with timer.phase('resolve'):
+        clock.advance(0.002)
+        with timer.phase('report'):
+            clock.advance(0.001)
+        with timer.phase('report'):
+            clock.advance(0.003)
+    with timer.phase('resolve'):
+        clock.advance(0.005)
+    assert timer.take() == {'resolve': 7.0, 'report': 4.0}
+    # take() 清空记录，开始下一个步骤
+    assert timer.take() == {}
+
+
+def test_phase_is_recorded_when_body_raises():
+    clock = FakeClock()
+    timer = PhaseTimer(clock=clock)
+    with pytest.raises(ValueError):
+        with timer.phase('extract'):
+            clock.advance(0.003)
+            raise ValueError('boom')
+    assert timer.take() == {'extract': 3.0}
+    assert current_timer() is None
+
+
+def test_current_timer_is_set_inside_phase():
+    timer = PhaseTimer(clock=FakeClock())
+    assert current_timer() is None
+    with timer.phase('resolve'):
+        assert current_timer() is timer
+    assert current_timer() is None
+
+
+def test_timed_phase_without_timer_is_a_no_op():
+    with timed_phase(None, 'resolve'):
+        pass
+
+
+# =================================================================
+# httpx trace (HttpxTrace.apply)
+# =================================================================
+
+def _trace(clock, events):
+    trace = HttpxTrace(clock=clock)
+
+    async def replay():
+        for name, advance in events:
+            await trace(name, {})
+            clock.advance(advance)
+    asyncio.run(replay())
+    return trace
+
+
+def test_apply_splits_total_into_connect_ttfb_download():
+    clock = FakeClock()
+    trace = _trace(clock, [
+        ('connection.connect_tcp.started', 0.010),
+        ('connection.connect_tcp.complete', 0.0),
+        ('connection.start_tls.started', 0.020),
+        ('connection.start_tls.complete', 0.0),
+        ('http11.send_request_headers.started', 0.001),
+        ('http11.send_request_headers.complete', 0.050),
+        ('http11.receive_response_body.started', 0.005),
+        ('http11.receive_response_body.complete', 0.0),
+    ])
+    timer = PhaseTimer(clock=clock)
+    trace.apply(timer, 0.100)
+    assert timer.take() == {'connect': 30.0, 'download': 5.0, 'ttfb': 65.0}
+
+
+def test_apply_on_reused_connection_puts_remainder_in_ttfb():
+    clock = FakeClock()
+    trace = _trace(clock, [('http11.receive_response_body.started', 0.002),
+                           ('http11.receive_response_body.failed', 0.0)])
+    timer = PhaseTimer(clock=clock)
+    trace.apply(timer, 0.010)
+    # 复用连接时不记录 connect；失败的事件同样计时
+    assert timer.take() == {'download': 2.0, 'ttfb': 8.0}
+
+
+def test_apply_without_events_and_negative_remainder():
+    timer = PhaseTimer(clock=FakeClock())
+    HttpxTrace(clock=FakeClock()).apply(timer, 0.004)
+    assert timer.take() == {'download': 0.0, 'ttfb': 4.0}
+
+    clock = FakeClock()
+    trace = _trace(clock, [('connection.connect_tcp.started', 0.010), ('connection.connect_tcp.complete', 0.0)])
+    trace.apply(timer, 0.005)
+    assert timer.take() == {'connect': 10.0, 'download': 0.0, 'ttfb': 0.0}
+
+
+# =================================================================
+# 汇总输出
+# =================================================================
+
+def test_step_timings():
+    trail = [{'step_order': 1, 'timings': {'ttfb': 1.0}}, {'step_order': 2}, {'step_order': 3, 'timings': {}}]
+    assert step_timings(trail) == {'1': {'ttfb': 1.0}}
+    assert step_timings([{'step_order': 1}]) is None
+
+
+@pytest.mark.parametrize('name, category', [
+    ('connect', 'service'), ('ttfb', 'service'), ('download', 'service'),
+    ('wait', 'wait'), ('resolve', 'framework'), ('assert.body', 'framework'),
+])
+def test_phase_category(name, category):
+    assert phase_category(name) == category
+
+
+def test_format_phase_totals():
+    totals = {'ttfb': 60.0, 'connect': 10.0, 'resolve': 5.0, 'assert.body': 15.0, 'wait': 10.0}
+    assert format_phase_totals(totals) == [
+        "--- Target service: 70.0 ms (70.0%) [ttfb 60.0, connect 10.0] ---",
+        "--- Framework: 20.0 ms (20.0%) [assert.body 15.0, resolve 5.0] ---",
+        "--- Eventually waits: 10.0 ms (10.0%) [wait 10.0] ---",
+    ]
+    assert format_phase_totals({}) == []
+    assert format_phase_totals({'ttfb': 0.0}) == []
+    assert format_phase_totals({'resolve': 2.0}) == ["--- Framework: 2.0 ms (100.0%) [resolve 2.0] ---"]
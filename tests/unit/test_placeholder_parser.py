@@ -0,0 +1,74 @@
+# tests/unit/test_placeholder_parser.py
+
+from core.context_manager import TestContext as Context  # 避免被 pytest 当作测试类收集
+from utils.placeholder_parser import resolve_placeholders
+
+
+def test_rendered_structure_shares_no_containers_with_template():
+    template = {
+        'static': {'nested': {'list': [1, {'k': 'v'}]}},
+        'dynamic': {'name': '{{@name}}', 'meta': {'fixed': [1, 2]}},
+        'items': [{'fixed': True}, '{{@name}}'],
+    }
+    rendered = resolve_placeholders(template, Context(), {'name': 'alice'})
+    assert rendered == {
+        'static': {'nested': {'list': [1, {'k': 'v'}]}},
+        'dynamic': {'name': 'alice', 'meta': {'fixed': [1, 2]}},
+        'items': [{'fixed': True}, 'alice'],
+    }
+
+    rendered['static']['nested']['list'][1]['k'] = 'changed'
+    rendered['dynamic']['meta']['fixed'].append(3)
+    rendered['items'][0]['fixed'] = False
+    again = resolve_placeholders(template, Context(), {'name': 'bob'})
+    assert template['static']['nested']['list'][1] == {'k': 'v'}
+    assert template['dynamic'] == {'name': '{{@name}}', 'meta': {'fixed': [1, 2]}}
+    assert again['items'] == [{'fixed': True}, 'bob']
+
+
+def test_fully_static_structure_is_copied():
+    template = {'a': [{'b': 1}]}
+    rendered = resolve_placeholders(template, Context(), {})
+    assert rendered == template and rendered is not template
+    rendered['a'][0]['b'] = 2
+    assert template == {'a': [{'b': 1}]}
+
+
+def test_cache_follows_object_identity():
+    first = {'v': '{{@x}}'}
+    assert resolve_placeholders(first, Context(), {'x': 1}) == {'v': '1'}
+    # 等值但不同的对象各自编译，互不影响
+    second = {'v': '{{@y}}'}
+    assert resolve_placeholders(second, Context(), {'x': 1, 'y': 2}) == {'v': '2'}
+    assert resolve_placeholders(first, Context(), {'x': 3}) == {'v': '3'}
+
+
+def test_dynamic_placeholder_is_generated_once_across_threads():
+    import threading
+
+    for _ in range(50):
+        context = Context()
+        barrier = threading.Barrier(8)
+        values = []
+
+        def render():
+            barrier.wait()
+            values.append(resolve_placeholders({'user': '{{$randomUser}}'}, context, {})['user'])
+
+        threads = [threading.Thread(target=render) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(set(values)) == 1
+        assert context.get_variable('{{$randomUser}}') == values[0]
+
+
+def test_setdefault_variable_keeps_first_value():
+    context = Context()
+    assert context.setdefault_variable('k', lambda: 'first') == 'first'
+    assert context.setdefault_variable('k', lambda: 'second') == 'first'
+    # 生成结果为 None (未知的动态函数) 时不写入
+    assert context.setdefault_variable('unknown', lambda: None) is None
+    assert 'unknown' not in context.storage
+    assert resolve_placeholders('{{$noSuchFunc}}', context, {}) == '{{$noSuchFunc}}'
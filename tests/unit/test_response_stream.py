@@ -0,0 +1,85 @@
+# tests/unit/test_response_stream.py
+
+import io
+import json
+
+import pytest
+
+from core.response_stream import CountingReader, read_json_subset
+from utils.jsonpath_cache import find_values
+
+pytest.importorskip('ijson')
+
+BODY = {
+    'code': 0,
+    'data': {
+        'user': {'id': 7, 'name': 'alice', 'profile': {'city': 'x', 'tags': ['a', 'b']}},
+        'items': [{'id': 1, 'price': 1.5}, {'id': 2, 'price': 2.25}, {'id': 3, 'price': None}],
+    },
+    'blob': 'y' * 1000,
+}
+
+
+def _subset(paths, body=BODY):
+    return read_json_subset(io.BytesIO(json.dumps(body).encode('utf-8')), paths)
+
+
+def test_only_referenced_keys_are_kept():
+    assert _subset([('code',), ('data', 'user', 'name')]) == {'code': 0, 'data': {'user': {'name': 'alice'}}}
+
+
+def test_referenced_subtree_is_captured_whole():
+    assert _subset([('data', 'user', 'profile')]) == {'data': {'user': {'profile': BODY['data']['user']['profile']}}}
+
+
+def test_lists_keep_their_length_with_none_placeholders():
+    subset = _subset([('data', 'items', 1, 'price')])
+    assert subset == {'data': {'items': [None, {'price': 2.25}, None]}}
+    assert len(subset['data']['items']) == len(BODY['data']['items'])
+
+
+def test_empty_path_returns_the_whole_body():
+    assert _subset([()]) == BODY
+    assert _subset([(), ('code',)]) == BODY
+
+
+def test_missing_paths_are_absent_from_the_subset():
+    assert _subset([('data', 'missing'), ('data', 'items', 9)]) == {'data': {'items': [None, None, None]}}
+
+
+def test_type_mismatch_on_path_gives_same_lookup_result():
+    # 路径要求字典但实际是字符串：子集中保留该标量，按路径取值的结果与完整响应一致 (都找不到)
+    subset = _subset([('blob', 'length'), ('data', 'user', 'id', 'x'), ('code',)])
+    for expression in ('$.blob.length', '$.data.user.id.x', '$.code'):
+        assert find_values(expression, subset) == find_values(expression, BODY)
+
+
+def test_floats_are_plain_floats_and_scalars_at_root():
+    assert isinstance(_subset([('data', 'items', 0, 'price')])['data']['items'][0]['price'], float)
+    assert _subset([()], body=[1, 'a', None]) == [1, 'a', None]
+    assert _subset([('x',)], body=[1, 2]) == [None, None]
+
+
+def test_counting_reader_counts_bytes():
+    raw = json.dumps(BODY).encode('utf-8')
+    reader = CountingReader(io.BytesIO(raw))
+    read_json_subset(reader, [('code',)])
+    assert reader.bytes_read == len(raw)
+
+
+def test_subset_of_referenced_paths_satisfies_the_step():
+    from core.step_analysis import referenced_body_paths
+    from utils.json_match import partial_match_failure
+
+    steps = [
+        {'step_order': 1, 'validations': {'body': {'code': 0, 'data': {'items': [{}, {'id': 2}]}},
+                                          'notNull': ['$.data.user.id']},
+         'outputs': [{'variable_name': 'city', 'source': 'response_body', 'json_path': '$.data.user.profile.city'}]},
+        {'step_order': 2, 'body': {'tag': '{{step_1.response.body.data.user.profile.tags[1]}}'}},
+    ]
+    paths = referenced_body_paths(steps)[1]
+    subset = _subset(paths)
+    assert partial_match_failure(subset, steps[0]['validations']['body']) is None
+    for expression in ('$.data.user.id', '$.data.user.profile.city', '$.data.user.profile.tags[1]'):
+        assert find_values(expression, subset) == find_values(expression, BODY)
+    assert 'blob' not in subset
@@ -0,0 +1,102 @@
+# tests/unit/test_run_plan.py
+
+import pytest
+
+from core import run_plan
+from core.run_plan import NEW_CASE_RISK, order_by_risk, risk_score
+
+# 历史查询替换为固定数据，只验证选择与排序逻辑 (session 不会被使用)
+SESSION = None
+
+
+def _row(case_id, data_set_id):
+    return (case_id, data_set_id, f'case {case_id} [{data_set_id}]', None)
+
+
+# =================================================================
+# 风险排序 (risk_score / order_by_risk)
+# =================================================================
+
+@pytest.mark.parametrize('statuses, score', [
+    (None, NEW_CASE_RISK),
+    ([], NEW_CASE_RISK),
+    (['passed'], 0.0),
+    (['failed'], 3.0),
+    (['passed'] * 10, 0.0),
+    (['failed'] * 10, 3.0),
+    (['passed', 'failed'], 0.5 + 1.0),
+    (['failed', 'passed', 'passed', 'passed'], 2.0 + 0.25 + 1 / 3),
+    (['passed', 'failed', 'passed', 'failed'], 0.5 + 1.0),
+    (['failed', 'failed', 'passed', 'passed'], 2.0 + 0.5 + 1 / 3),
+])
+def test_risk_score(statuses, score):
+    assert risk_score(statuses) == pytest.approx(score)
+
+
+def test_recent_failure_outranks_new_and_stable_cases():
+    assert risk_score(['failed', 'passed', 'passed']) > NEW_CASE_RISK > risk_score(['passed', 'passed'])
+    # 不稳定的场景 (翻转多) 排在一直通过的场景之前
+    assert risk_score(['passed', 'failed', 'passed']) > risk_score(['passed', 'passed', 'passed'])
+
+
+def test_order_by_risk(monkeypatch):
+    history = {
+        (1, 1): ['passed', 'passed'],
+        (2, 1): ['failed', 'failed'],
+        (3, 1): ['passed', 'failed', 'passed'],
+        (5, 1): ['passed', 'passed'],
+        (6, 1): ['failed', 'passed'],
+    }
+    monkeypatch.setattr(run_plan, 'get_recent_statuses', lambda session, pairs: history)
+    rows = [_row(1, 1), _row(2, 1), _row(3, 1), _row(4, 1), _row(5, 1), _row(6, 1)]
+    ordered = order_by_risk(SESSION, rows)
+    # 分数: 6 -> 3.5, 2 -> 3.0, 3 -> 1.33, 4 (新) -> 1.0, 1 / 5 -> 0 (保持原有顺序)
+    assert [row[0] for row in ordered] == [6, 2, 3, 4, 1, 5]
+    assert sorted(ordered) == sorted(rows)
+
+
+def test_order_by_risk_without_history_keeps_order(monkeypatch):
+    monkeypatch.setattr(run_plan, 'get_recent_statuses', lambda session, pairs: {})
+    rows = [_row(3, 1), _row(1, 2), _row(2, 1)]
+    assert order_by_risk(SESSION, rows) == rows
+
+
+# =================================================================
+# 增量选择 (filter_changed)
+# =================================================================
+
+DETAILS = {(1, 1): {'definition_hash': 'h1'}, (2, 1): {'definition_hash': 'h2'}, (3, 1): {'definition_hash': 'h3'},
+           (4, 1): {'definition_hash': 'h4'}, (5, 1): {'definition_hash': 'h5'}}
+
+
+@pytest.mark.parametrize('last_results, kept', [
+    # 没有执行记录：全部保留
+    ({}, [1, 2, 3, 4, 5]),
+    # 上次通过且定义未变：跳过
+    ({(1, 1): ('passed', 'h1'), (2, 1): ('passed', 'h2')}, [3, 4, 5]),
+    # 上次未通过，或定义哈希不同 (包括旧记录没有哈希)：保留
+    ({(1, 1): ('failed', 'h1'), (2, 1): ('passed', 'old'), (3, 1): ('passed', None), (4, 1): ('skipped', 'h4'),
+      (5, 1): ('passed', 'h5')}, [1, 2, 3, 4]),
+])
+def test_filter_changed(monkeypatch, last_results, kept):
+    monkeypatch.setattr(run_plan, 'get_last_results', lambda session, pairs, run_id=None: last_results)
+    rows = [_row(case_id, 1) for case_id in range(1, 6)]
+    assert [row[0] for row in run_plan.filter_changed(SESSION, rows, DETAILS)] == kept
+
+
+def test_filter_changed_keeps_cases_without_details(monkeypatch):
+    monkeypatch.setattr(run_plan, 'get_last_results', lambda session, pairs, run_id=None: {(9, 1): ('passed', 'h9')})
+    assert run_plan.filter_changed(SESSION, [_row(9, 1)], DETAILS) == [_row(9, 1)]
+
+
+def test_filter_changed_since_run(monkeypatch, capsys):
+    calls = []
+
+    def last_results(session, pairs, run_id=None):
+        calls.append((sorted(pairs), run_id))
+        return {(1, 1): ('passed', 'h1')}
+    monkeypatch.setattr(run_plan, 'get_last_results', last_results)
+    rows = [_row(1, 1), _row(2, 1)]
+    assert run_plan.filter_changed(SESSION, rows, DETAILS, since_run='run-1') == [_row(2, 1)]
+    assert calls == [([(1, 1), (2, 1)], 'run-1')]
+    assert "1 of 2 data sets changed or not passed since run run-1" in capsys.readouterr().out
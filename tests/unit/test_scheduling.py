@@ -0,0 +1,33 @@
+# tests/unit/test_scheduling.py
+
+import pytest
+
+from core.scheduling import DEFAULT_DURATION, lpt_makespan, predict_durations
+
+
+def test_lpt_places_longest_jobs_first():
+    # LPT: 7 | 6 | 5 之后 4 放到 5 上、3 放到 6 上 -> 负载 7, 9, 9
+    assert lpt_makespan([3, 7, 4, 6, 5], 3) == 9
+
+
+def test_lpt_single_worker_is_total_duration():
+    assert lpt_makespan([1.5, 2.5, 3.0], 1) == pytest.approx(7.0)
+
+
+def test_lpt_more_workers_than_jobs_is_longest_job():
+    assert lpt_makespan([2, 8, 1], 5) == 8
+
+
+@pytest.mark.parametrize('durations, workers', [([], 4), ([1, 2], 0)])
+def test_lpt_degenerate_inputs(durations, workers):
+    assert lpt_makespan(durations, workers) == 0.0
+
+
+def test_predict_uses_median_for_cases_without_history():
+    history = {(1, 1): 2.0, (1, 2): 4.0, (2, 1): 10.0}
+    pairs = [(1, 1), (3, 3), (2, 1)]
+    assert predict_durations(pairs, history) == [2.0, 4.0, 10.0]
+
+
+def test_predict_without_history_uses_default():
+    assert predict_durations([(1, 1), (2, 2)], {}) == [DEFAULT_DURATION, DEFAULT_DURATION]
@@ -0,0 +1,77 @@
+# tests/unit/test_sql_template.py
+
+from core.app_db import BoundQuery, _join
+from core.assertion_engine import AssertionEngine
+from core.context_manager import TestContext as Context  # 避免被 pytest 当作测试类收集
+from utils.placeholder_parser import compile_sql_template
+
+
+def _context():
+    context = Context()
+    context.add_step_response('step_1', {'body': {'id': 7, 'name': "o'neil"}})
+    context.set_variable('token', 'abc')
+    return context
+
+
+def test_placeholders_outside_literals_become_parameters():
+    template = compile_sql_template("SELECT * FROM users WHERE id = {{@user_id}} AND age > {{@age}}")
+    assert template.fragments == ("SELECT * FROM users WHERE id = ", " AND age > ", "")
+    assert len(template.params) == 2
+
+
+def test_literal_with_placeholder_becomes_one_parameter():
+    template = compile_sql_template("SELECT 1 FROM t WHERE name LIKE '%{{@name}}%' AND kind = 'it''s'")
+    assert template.fragments == ("SELECT 1 FROM t WHERE name LIKE ", " AND kind = 'it''s'")
+    assert template.bind(Context(), {'name': 'bob'}) == ['%bob%']
+
+
+def test_query_without_placeholders_has_no_parameters():
+    template = compile_sql_template("SELECT 'a{b}' FROM t")
+    assert template.fragments == ("SELECT 'a{b}' FROM t",)
+    assert template.params == ()
+
+
+def test_bound_values_keep_their_types():
+    template = compile_sql_template(
+        "SELECT * FROM t WHERE id = {{step_1.response.body.id}} AND n = {{@n}} AND f = {{@flag}} AND k = {{token}}"
+    )
+    values = template.bind(_context(), {'n': 3.5, 'flag': True})
+    assert values == [7, 3.5, True, 'abc']
+    assert isinstance(values[0], int)
+
+
+def test_quotes_in_values_are_never_spliced_into_sql():
+    template = compile_sql_template("SELECT * FROM t WHERE name = {{step_1.response.body.name}}")
+    assert template.bind(_context(), {}) == ["o'neil"]
+    assert "o'neil" not in ''.join(template.fragments)
+
+
+def test_unresolved_placeholder_is_bound_as_its_source_text():
+    template = compile_sql_template("SELECT * FROM t WHERE id = {{@missing}}")
+    assert template.bind(Context(), {}) == ['{{@missing}}']
+
+
+def test_same_query_text_for_different_data_sets():
+    template = compile_sql_template("SELECT * FROM t WHERE id = {{@id}}")
+    assert compile_sql_template("SELECT * FROM t WHERE id = {{@id}}") is template
+    assert template.bind(Context(), {'id': 1}) != template.bind(Context(), {'id': 2})
+    assert _join(template.fragments, ['$1']) == "SELECT * FROM t WHERE id = $1"
+
+
+def test_db_query_is_spliced_unless_bind_params_is_enabled():
+    engine = AssertionEngine(log=lambda message: None)
+    rule = {'query': "SELECT * FROM {{@table}} WHERE id = {{@id}}"}
+    data_set_vars = {'table': 'users', 'id': 5}
+
+    spliced = engine._bind_db_query(rule, Context(), data_set_vars)
+    assert spliced == BoundQuery(("SELECT * FROM users WHERE id = 5",), (), prepare=False)
+
+    bound = engine._bind_db_query({**rule, 'bindParams': True}, Context(), data_set_vars)
+    assert bound.fragments == ("SELECT * FROM ", " WHERE id = ", "")
+    assert bound.values == ('users', 5)
+    assert bound.prepare
+
+    # 命令行开启 --bind-db-params 时，规则中显式的 "bindParams": false 仍然优先
+    assert engine._bind_db_query(rule, Context(), data_set_vars, bind_params=True).values == ('users', 5)
+    assert engine._bind_db_query({**rule, 'bindParams': False}, Context(), data_set_vars,
+                                 bind_params=True).prepare is False
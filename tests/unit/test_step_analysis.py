@@ -0,0 +1,128 @@
+# tests/unit/test_step_analysis.py
+
+from core.step_analysis import (
+    analyze_steps, build_dependency_graph, has_parallelism, response_readers, response_release_plan,
+)
+
+
+def _step(order, body=None, outputs=None, validations=None, method='GET'):
+    return {'step_order': order, 'http_method': method, 'api_url_path': '/api', 'body': body,
+            'outputs': outputs or [], 'validations': validations}
+
+
+# =================================================================
+# 依赖图 (build_dependency_graph)
+# =================================================================
+
+def test_step_reference_and_output_variable_create_edges():
+    steps = [
+        _step(1, body={'name': '{{@name}}'}, outputs=[{'variable_name': 'token'}]),
+        _step(2, body={'auth': '{{token}}'}),
+        _step(3, body={'id': '{{step_1.response.body.id}}'}),
+    ]
+    graph = build_dependency_graph(analyze_steps(steps))
+    assert graph == {1: set(), 2: {1}, 3: {1}}
+    assert has_parallelism(graph)
+
+
+def test_step_without_references_depends_on_all_previous_steps():
+    steps = [_step(1), _step(2), _step(3, body={'id': '{{step_1.response.body.id}}'}), _step(4)]
+    graph = build_dependency_graph(analyze_steps(steps))
+    assert graph[2] == {1}
+    assert graph[4] == {1, 2, 3}
+
+
+def test_db_validation_depends_on_all_previous_steps():
+    steps = [
+        _step(1),
+        _step(2, body={'id': '{{step_1.response.body.id}}'}),
+        _step(3, body={'id': '{{step_1.response.body.id}}'}, validations={'dbValidation': {'query': 'SELECT 1'}}),
+    ]
+    graph = build_dependency_graph(analyze_steps(steps))
+    assert graph[3] == {1, 2}
+
+
+def test_shared_dynamic_variable_depends_on_first_user():
+    steps = [
+        _step(1, body={'user': '{{$randomUser}}'}),
+        _step(2, body={'id': '{{step_1.response.body.id}}', 'user': '{{$randomUser}}'}),
+        _step(3, body={'id': '{{step_1.response.body.id}}', 'user': '{{$randomUser}}'}),
+    ]
+    graph = build_dependency_graph(analyze_steps(steps))
+    assert graph == {1: set(), 2: {1}, 3: {1}}
+
+
+def test_validations_override_is_analyzed():
+    steps = [_step(1), _step(2, body={'id': '{{step_1.response.body.id}}'})]
+    override = {'2': {'dbValidation': {'query': 'SELECT 1'}}}
+    infos = analyze_steps(steps, override)
+    assert infos[1].has_db_validation
+    assert not analyze_steps(steps)[1].has_db_validation
+
+
+def test_mutating_step_is_a_barrier():
+    # 登录 -> 创建订单 -> 只用登录 token 查询订单列表：查询必须等创建订单完成
+    steps = [
+        _step(1, method='POST', outputs=[{'variable_name': 'token'}]),
+        _step(2, method='POST', body={'auth': '{{token}}'}),
+        _step(3, body={'auth': '{{token}}'}),
+        _step(4, body={'auth': '{{token}}'}),
+    ]
+    graph = build_dependency_graph(analyze_steps(steps))
+    assert graph == {1: set(), 2: {1}, 3: {1, 2}, 4: {1, 2}}
+    assert has_parallelism(graph)
+
+
+def test_mutating_step_waits_for_earlier_reads():
+    steps = [
+        _step(1, outputs=[{'variable_name': 'token'}]),
+        _step(2, body={'auth': '{{token}}'}),
+        _step(3, method='delete', body={'auth': '{{token}}'}),
+    ]
+    graph = build_dependency_graph(analyze_steps(steps))
+    assert graph[3] == {1, 2}
+
+
+def test_missing_method_is_treated_as_mutating():
+    steps = [_step(1), _step(2, method=None), _step(3, body={'id': '{{step_1.response.body.id}}'})]
+    assert build_dependency_graph(analyze_steps(steps))[3] == {1, 2}
+
+
+def test_chain_has_no_parallelism():
+    steps = [_step(1), _step(2), _step(3)]
+    assert not has_parallelism(build_dependency_graph(analyze_steps(steps)))
+
+
+# =================================================================
+# 响应释放 (response_release_plan / response_readers)
+# =================================================================
+
+def test_release_plan_frees_response_after_last_reader():
+    steps = [
+        _step(1),
+        _step(2, body={'id': '{{step_1.response.body.id}}'}),
+        _step(3, body={'id': '{{step_1.response.body.id}}'}),
+        _step(4, body={'id': '{{step_2.response.body.id}}'}),
+    ]
+    plan = response_release_plan(analyze_steps(steps))
+    assert plan == {1: [], 2: [], 3: [1, 3], 4: [2, 4]}
+
+
+def test_release_plan_ignores_references_to_unknown_steps():
+    steps = [_step(1, body={'id': '{{step_9.response.body.id}}'}), _step(2)]
+    assert response_release_plan(analyze_steps(steps)) == {1: [1], 2: [2]}
+
+
+def test_two_parallel_readers_both_hold_the_response():
+    # 步骤 2、3 都只依赖步骤 1，并行时可能以任意顺序完成：两者都完成后才能释放步骤 1 的响应
+    steps = [
+        _step(1),
+        _step(2, body={'id': '{{step_1.response.body.id}}'}),
+        _step(3, body={'name': '{{step_1.response.body.name}}'}),
+    ]
+    infos = analyze_steps(steps)
+    assert build_dependency_graph(infos) == {1: set(), 2: {1}, 3: {1}}
+    readers = response_readers(infos)
+    assert readers == {1: {1, 2, 3}, 2: {2}, 3: {3}}
+    # 顺序计划只看 step_order 中最后一个读取者，并行时不能单独使用
+    assert response_release_plan(infos)[3] == [1, 3]
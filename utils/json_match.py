@@ -0,0 +1,96 @@
+# utils/json_match.py
+
+from typing import Any, Optional
+
+# =================================================================
+# 部分匹配 (partial match) 断言
+# - 先做不记录路径的快速判断：字典用 dict.items() 的子集比较，列表前缀用一次 == 比较，
+#   都在 C 层完成，只有不完全相等的子树才逐层深入，遇到不匹配立即返回
+# - 匹配成功时不构造任何路径字符串；只有失败时才按期望结构的顺序找出第一个
+#   不匹配的位置，生成与逐层递归比较完全相同的错误信息
+# =================================================================
+
+class _Failure:
+    """一次不匹配：路径片段在失败向上传递时才逐层追加，最后拼进错误信息。"""
+    __slots__ = ('prefix', 'suffix', 'segments')
+
+    def __init__(self, prefix, suffix=''):
+        self.prefix = prefix
+        self.suffix = suffix
+        self.segments = []
+
+    def at(self, segment):
+        self.segments.append(segment)
+        return self
+
+    def render(self, root: str) -> str:
+        return f"{self.prefix}{root}{''.join(reversed(self.segments))}{self.suffix}"
+
+
+def _matches(actual, expected) -> bool:
+    """快速判断 actual 是否部分匹配 expected，不记录任何路径。"""
+    if isinstance(expected, dict):
+        if not isinstance(actual, dict):
+            return False
+        # 期望的所有键值对都原样出现在实际值中 (在 C 层完成，包括嵌套结构完全相等的情况)
+        if expected.items() <= actual.items():
+            return True
+        for key, value in expected.items():
+            if key not in actual:
+                return False
+            if isinstance(value, (dict, list)):
+                if not _matches(actual[key], value):
+                    return False
+            elif not actual[key] == value:
+                return False
+        return True
+    if isinstance(expected, list):
+        if not isinstance(actual, list) or len(actual) < len(expected):
+            return False
+        # 实际列表的前 len(expected) 个元素与期望完全相等时直接通过
+        if actual[:len(expected)] == expected:
+            return True
+        for actual_item, expected_item in zip(actual, expected):
+            if not _matches(actual_item, expected_item):
+                return False
+        return True
+    return actual == expected
+
+
+def _explain(actual, expected) -> Optional[_Failure]:
+    """按期望结构的顺序找出第一个不匹配的位置 (只在快速判断失败后调用)。"""
+    if isinstance(expected, dict):
+        if not isinstance(actual, dict):
+            return _Failure("Type mismatch at path '", f"': expected dict, got {type(actual).__name__}")
+        for key, value in expected.items():
+            if key not in actual:
+                return _Failure("Missing key at path '", "'").at(f".{key}")
+            failure = _explain(actual[key], value)
+            if failure is not None:
+                return failure.at(f".{key}")
+        return None
+    if isinstance(expected, list):
+        if not isinstance(actual, list):
+            return _Failure("Type mismatch at path '", f"': expected list, got {type(actual).__name__}")
+        if len(actual) < len(expected):
+            return _Failure("Length mismatch at path '", f"': expected at least {len(expected)}, got {len(actual)}")
+        for index, (actual_item, expected_item) in enumerate(zip(actual, expected)):
+            # 相同的元素直接跳过，只深入真正不同的那个
+            if actual_item is expected_item or _matches(actual_item, expected_item):
+                continue
+            return _explain(actual_item, expected_item).at(f"[{index}]")
+        return None
+    if actual == expected:
+        return None
+    return _Failure("Value mismatch at path '", f"': expected '{expected}', got '{actual}'")
+
+
+def partial_match_failure(actual: Any, expected: Any, root: str = "body") -> Optional[str]:
+    """
+    部分匹配：actual 可以比 expected 多出键和列表元素。
+    :return: 匹配时返回 None；否则返回第一个不匹配位置的错误信息。
+    """
+    if _matches(actual, expected):
+        return None
+    failure = _explain(actual, expected)
+    return failure.render(root) if failure is not None else None
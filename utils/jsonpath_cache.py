@@ -0,0 +1,116 @@
+# utils/jsonpath_cache.py
+
+import re
+import threading
+from functools import lru_cache
+from typing import Any, List
+from jsonpath_ng import parse
+
+# =================================================================
+# 进程级 JSONPath 表达式缓存
+# context、断言引擎和变量提取共用同一份已编译表达式，避免重复调用基于 PLY 的解析器。
+# =================================================================
+
+JSONPATH_CACHE_SIZE = 2048
+
+# 形如 $.a.b[0]、data.items[2].id 的简单路径：只包含字段名和非负下标
+_SIMPLE_SEGMENT_PATTERN = re.compile(r'\.?([A-Za-z_][A-Za-z0-9_]*)|\[(\d+)\]')
+
+_stats_lock = threading.Lock()
+_stats = {"fast_path_evaluations": 0, "jsonpath_ng_evaluations": 0}
+
+
+class SimplePath:
+    """
+    不经过 jsonpath_ng 的快速路径，直接按字段名/下标逐层取值。
+    下标只在列表上走快速路径；对字符串等其他值取下标时 jsonpath_ng 有自己的语义 (例如取出单个字符)，
+    这时改用完整解析的表达式求值，结果与 jsonpath_ng 保持一致。
+    """
+    __slots__ = ('expression', 'segments', '_parsed')
+
+    def __init__(self, expression: str, segments: tuple):
+        self.expression = expression
+        self.segments = segments
+        self._parsed = None
+
+    def find_values(self, data: Any) -> List[Any]:
+        current = data
+        for segment in self.segments:
+            if isinstance(segment, int):
+                if not isinstance(current, list):
+                    return self._fallback(data)
+                if segment >= len(current):
+                    return []
+            elif not isinstance(current, dict) or segment not in current:
+                return []
+            current = current[segment]
+        return [current]
+
+    def _fallback(self, data: Any) -> List[Any]:
+        if self._parsed is None:
+            self._parsed = ParsedPath(self.expression, parse(self.expression))
+        return self._parsed.find_values(data)
+
+
+class ParsedPath:
+    """jsonpath_ng 解析后的完整表达式 (通配符、递归下降、过滤器等)。"""
+    __slots__ = ('expression', 'parsed')
+
+    def __init__(self, expression: str, parsed):
+        self.expression = expression
+        self.parsed = parsed
+
+    def find_values(self, data: Any) -> List[Any]:
+        return [match.value for match in self.parsed.find(data)]
+
+
+def _parse_simple_path(expression: str):
+    """若表达式是简单的点号/下标路径，返回其分段元组，否则返回 None。"""
+    body = expression[1:] if expression.startswith('$') else expression
+    if not body:
+        return () if expression == '$' else None
+    if not expression.startswith('$') and body[0] in '.[':
+        return None
+
+    segments = []
+    position = 0
+    while position < len(body):
+        match = _SIMPLE_SEGMENT_PATTERN.match(body, position)
+        if not match:
+            return None
+        # 以 $ 开头时，第一个字段必须写成 $.name
+        if match.group(1) is not None and position == 0 and expression.startswith('$') and body[0] != '.':
+            return None
+        # 字段之间必须用 '.' 分隔
+        if match.group(1) is not None and position > 0 and body[position] != '.':
+            return None
+        segments.append(match.group(1) if match.group(1) is not None else int(match.group(2)))
+        position = match.end()
+    return tuple(segments)
+
+
+@lru_cache(maxsize=JSONPATH_CACHE_SIZE)
+def compile_jsonpath(expression: str):
+    """编译 (并缓存) 一个 JSONPath 表达式，简单路径走快速路径。"""
+    segments = _parse_simple_path(expression)
+    if segments is not None:
+        return SimplePath(expression, segments)
+    return ParsedPath(expression, parse(expression))
+
+
+def find_values(expression: str, data: Any) -> List[Any]:
+    """返回 JSONPath 在 data 中匹配到的所有值 (保持 jsonpath_ng 的匹配顺序)。"""
+    compiled = compile_jsonpath(expression)
+    key = "fast_path_evaluations" if isinstance(compiled, SimplePath) else "jsonpath_ng_evaluations"
+    with _stats_lock:
+        _stats[key] += 1
+    return compiled.find_values(data)
+
+
+def jsonpath_cache_stats() -> dict:
+    """返回缓存命中/未命中次数以及快速路径的使用情况。"""
+    info = compile_jsonpath.cache_info()
+    with _stats_lock:
+        stats = dict(_stats)
+    stats.update({"hits": info.hits, "misses": info.misses, "size": info.currsize, "maxsize": info.maxsize})
+    return stats
@@ -0,0 +1,33 @@
+# utils/payload_limits.py
+
+import json
+from typing import Any, Optional
+
+# =================================================================
+# 报告附件与审计记录的大小上限
+# 超过上限的内容被截断，避免一个超大的响应在内存、allure 和数据库中各保存一份
+# =================================================================
+
+
+def truncate_text(text, limit: Optional[int]):
+    """把字符串 (或 bytes) 截断到 limit 个字符，并注明原始长度；limit 为空或 0 表示不限制。"""
+    if not limit or text is None or len(text) <= limit:
+        return text
+    if isinstance(text, bytes):
+        return text[:limit] + f"\n... [truncated, {len(text)} bytes in total]".encode('utf-8')
+    return f"{text[:limit]}\n... [truncated, {len(text)} characters in total]"
+
+
+def cap_json_value(value: Any, limit: Optional[int], size_hint: Optional[int] = None) -> Any:
+    """
+    JSON 值序列化后超过 limit 时，替换为带预览的截断标记 (仍然是合法的 JSON)。
+    :param size_hint: 已知的原始大小 (例如响应字节数)，不超过上限时无需序列化即可判断
+    """
+    if not limit or value is None:
+        return value
+    if size_hint is not None and size_hint <= limit:
+        return value
+    serialized = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, default=str)
+    if len(serialized) <= limit:
+        return value
+    return {"_truncated": True, "original_size": len(serialized), "preview": serialized[:limit]}
@@ -3,6 +3,7 @@
 import re
 import random
 import string
+from functools import lru_cache
 from typing import Any, Dict
 from core.context_manager import TestContext
 
@@ -41,75 +42,285 @@ def _generate_random_int(length: int = 6) -> int:
     return random.randint(start, end)
 
 # =================================================================
-# 2. 核心解析逻辑  首次使用时生成并缓存
+# 2. 模板编译 (Template Compilation)
+# 每个模板字符串只用正则扫描一次，编译成由字面量片段和类型化占位符组成的 token 列表。
+# 渲染阶段只做一次线性拼接，不再有任何正则操作。
+# =================================================================
+
+# 三类占位符的语法与原先三次 re.sub 的匹配规则保持一致:
+#   {{$func(arg)}} 动态变量 / {{@name}} 数据集变量 / {{step_1.response.body.x}} 步骤间变量
+_PLACEHOLDER_PATTERN = re.compile(r'\{\{(?:(\$\w+(?:\(\d*\))?)|@(\w+)|([^@$}][^}]+))\}\}')
+_DYNAMIC_CALL_PATTERN = re.compile(r'(\$\w+)(?:\((\d*)\))?')
+
+_LITERAL, _DYNAMIC, _DATASET, _STEP = range(4)
+
+# 编译结果缓存的上限，超过后按 LRU 淘汰
+TEMPLATE_CACHE_SIZE = 8192
+# 结构 (dict/list) 编译结果按对象身份缓存，超过上限时整体清空
+STRUCTURE_CACHE_SIZE = 4096
+
+
+class CompiledTemplate:
+    """一个已编译的占位符模板：字面量片段与占位符引用交替组成的 token 列表。"""
+    __slots__ = ('source', 'tokens')
+
+    def __init__(self, source: str, tokens: list):
+        self.source = source
+        self.tokens = tokens
+
+    def render(self, context: 'TestContext', data_set_vars: Dict[str, Any]) -> str:
+        """单次线性渲染；无法解析的占位符原样保留。"""
+        parts = []
+        for kind, payload in self.tokens:
+            if kind == _LITERAL:
+                parts.append(payload)
+            elif kind == _DATASET:
+                value = data_set_vars.get(payload[1])
+                parts.append(str(value) if value is not None else payload[0])
+            elif kind == _STEP:
+                value = context.get_value_by_path(payload[1])
+                parts.append(str(value) if value is not None else payload[0])
+            else:
+                parts.append(_render_dynamic(payload, context))
+        return ''.join(parts)
+
+
+def _render_dynamic(payload, context: 'TestContext') -> str:
+    """动态变量 ({{$...}}) 在首次使用时生成，并以完整占位符为键缓存到 context 中。"""
+    placeholder, func_name, arg_str = payload
+
+    memoized_value = context.get_variable(placeholder)
+    if memoized_value is not None:
+        return str(memoized_value)
+
+    def generate():
+        if func_name == '$randomUser': return _generate_random_user()
+        if func_name == '$randomPassword': return _generate_random_password(int(arg_str) if arg_str else 12)
+        if func_name == '$randomPhone': return _generate_random_phone()
+        if func_name in ('$randomInt', '$randomID', '$randomId'): return str(_generate_random_int(int(arg_str) if arg_str else 6))
+        return None
+
+    # 并发步骤可能同时首次使用同一占位符：生成与写入在 context 的锁内完成，返回先写入的值
+    value = context.setdefault_variable(placeholder, generate)
+    if value is not None:
+        return str(value)
+
+    return placeholder
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def compile_template(template: str) -> CompiledTemplate:
+    """把模板字符串编译为 CompiledTemplate，按字符串内容缓存。"""
+    tokens = []
+    position = 0
+    for match in _PLACEHOLDER_PATTERN.finditer(template):
+        if match.start() > position:
+            tokens.append((_LITERAL, template[position:match.start()]))
+        placeholder = match.group(0)
+        dynamic_call, dataset_var, step_path = match.groups()
+        if dynamic_call is not None:
+            func_name, arg_str = _DYNAMIC_CALL_PATTERN.match(dynamic_call).groups()
+            tokens.append((_DYNAMIC, (placeholder, func_name, arg_str)))
+        elif dataset_var is not None:
+            tokens.append((_DATASET, (placeholder, dataset_var)))
+        else:
+            tokens.append((_STEP, (placeholder, step_path)))
+        position = match.end()
+    if position < len(template):
+        tokens.append((_LITERAL, template[position:]))
+    return CompiledTemplate(template, tokens)
+
+
+def collect_references(data_structure: Any, references: Dict[str, set] = None) -> Dict[str, set]:
+    """
+    静态地收集数据结构中引用到的所有占位符 (不做任何解析)。
+    :return: {'dynamic': {'{{$randomUser}}', ...}, 'dataset': {'username', ...}, 'step': {'step_1.response.body.id', 'token', ...}}
+    """
+    if references is None:
+        references = {'dynamic': set(), 'dataset': set(), 'step': set()}
+    if isinstance(data_structure, dict):
+        for value in data_structure.values():
+            collect_references(value, references)
+    elif isinstance(data_structure, list):
+        for item in data_structure:
+            collect_references(item, references)
+    elif isinstance(data_structure, str) and '{{' in data_structure:
+        for kind, payload in compile_template(data_structure).tokens:
+            if kind == _DYNAMIC: references['dynamic'].add(payload[0])
+            elif kind == _DATASET: references['dataset'].add(payload[1])
+            elif kind == _STEP: references['step'].add(payload[1])
+    return references
+
+
+def template_cache_info():
+    """返回模板缓存的命中统计 (functools 的 CacheInfo)。"""
+    return compile_template.cache_info()
+
+# =================================================================
+# 3. 核心解析逻辑  首次使用时生成并缓存
 # =================================================================
 def _resolve_single_string(data: str, context: 'TestContext', data_set_vars: Dict[str, Any]) -> str:
     """
-    以正确的优先级顺序,循环解析单个字符串中的所有占位符,直到没有变化为止。
-    动态变量 ({{$...}}) 会在首次使用时生成并存入 context。
+    解析单个字符串中的所有占位符。
+    若替换后的值本身还包含占位符 (嵌套)，则继续渲染，直到没有变化为止 (最多10轮)。
     """
     if not isinstance(data, str):
         return data
 
     for _ in range(10): # 循环以处理嵌套
-        original_data = data
+        if '{{' not in data:
+            break
+        template = compile_template(data)
+        if len(template.tokens) == 1 and template.tokens[0][0] == _LITERAL:
+            break
+        rendered = template.render(context, data_set_vars)
+        if rendered == data:
+            break
+        data = rendered
 
-        # --- Pass 1: 解析动态变量 ({{$...}}) ---
-        def replace_dynamic_var(match):
-            placeholder = match.group(0) # 完整的占位符, e.g., "{{$randomUser}}"
+    return data
 
-            # 检查上下文中是否已缓存
-            memoized_value = context.get_variable(placeholder)
-            if memoized_value is not None:
-                return str(memoized_value)
 
-            # 如果未缓存,则生成新值
-            func_call_str = match.group(1) # 内部指令, e.g., "$randomUser"
-            func_match = re.match(r'(\$\w+)(?:\((\d*)\))?', func_call_str)
-            if not func_match: return placeholder
-            func_name, arg_str = func_match.groups()
+def _copy_static(data_structure: Any) -> Any:
+    """复制不含占位符的 dict/list 子树 (叶子值共享)，渲染结果不与模板共享任何容器。"""
+    if isinstance(data_structure, dict):
+        return {key: _copy_static(value) for key, value in data_structure.items()}
+    if isinstance(data_structure, list):
+        return [_copy_static(item) for item in data_structure]
+    return data_structure
+
+
+def _compile_structure(data_structure: Any):
+    """
+    为 dict/list/str 构建一个渲染函数，只对真正含有占位符的叶子节点做解析。
+    返回 (renderer, dynamic)：dynamic 为 False 表示整棵子树不含占位符。
+    容器节点总会得到一个 renderer，每次渲染都生成新的容器，修改渲染结果不会影响模板；
+    不含占位符的标量叶子 renderer 为 None，直接沿用原值。
+    """
+    if isinstance(data_structure, str):
+        if '{{' not in data_structure:
+            return None, False
+        return (lambda context, data_set_vars: _resolve_single_string(data_structure, context, data_set_vars)), True
 
-            generated_value = None
-            if func_name == '$randomUser': generated_value = _generate_random_user()
-            elif func_name == '$randomPassword': generated_value = _generate_random_password(int(arg_str) if arg_str else 12)
-            elif func_name == '$randomPhone': generated_value = _generate_random_phone()
-            elif func_name in ('$randomInt', '$randomID', '$randomId'): generated_value = str(_generate_random_int(int(arg_str) if arg_str else 6))
+    if isinstance(data_structure, dict):
+        compiled = [(key, value, *_compile_structure(value)) for key, value in data_structure.items()]
+        if not any(dynamic for _, _, _, dynamic in compiled):
+            return (lambda context, data_set_vars: _copy_static(data_structure)), False
+        items = [(key, value, renderer) for key, value, renderer, _ in compiled]
 
-            if generated_value is not None:
-                # 将新生成的值存入上下文进行缓存
-                context.set_variable(placeholder, generated_value)
-                return str(generated_value)
+        def render_dict(context, data_set_vars):
+            return {key: renderer(context, data_set_vars) if renderer else value for key, value, renderer in items}
+        return render_dict, True
 
-            return placeholder
+    if isinstance(data_structure, list):
+        compiled = [(item, *_compile_structure(item)) for item in data_structure]
+        if not any(dynamic for _, _, dynamic in compiled):
+            return (lambda context, data_set_vars: _copy_static(data_structure)), False
+        items = [(item, renderer) for item, renderer, _ in compiled]
 
-        data = re.sub(r'\{\{(\$\w+(?:\(\d*\))?)\}\}', replace_dynamic_var, data)
+        def render_list(context, data_set_vars):
+            return [renderer(context, data_set_vars) if renderer else item for item, renderer in items]
+        return render_list, True
 
-        # --- Pass 2: 解析数据集变量 ({{@...}}) ---
-        def replace_dataset_var(match):
-            var_name = match.group(1)
-            value = data_set_vars.get(var_name)
-            return str(value) if value is not None else f"{{{{@{var_name}}}}}"
+    return None, False
 
-        data = re.sub(r'\{\{@(\w+)\}\}', replace_dataset_var, data)
 
-        # --- Pass 3: 解析步骤间变量 ({{...}}) ---
-        def replace_step_var(match):
-            path_string = match.group(1)
-            value = context.get_value_by_path(path_string)
-            return str(value) if value is not None else f"{{{{{path_string}}}}}"
+# 按对象身份缓存结构的渲染函数。条目同时持有模板对象本身：被缓存的对象不会被回收，
+# 它的 id 也就不会被新对象复用；命中时再以 `is` 校验，清空后的旧 id 同样不会误命中。
+_structure_cache: Dict[int, tuple] = {}
 
-        data = re.sub(r'\{\{([^@$}][^}]+)\}\}', replace_step_var, data)
 
-        if data == original_data:
-            break
+def _get_structure_renderer(data_structure):
+    cached = _structure_cache.get(id(data_structure))
+    if cached is not None and cached[0] is data_structure:
+        return cached[1]
+    renderer, _ = _compile_structure(data_structure)
+    if len(_structure_cache) >= STRUCTURE_CACHE_SIZE:
+        _structure_cache.clear()
+    _structure_cache[id(data_structure)] = (data_structure, renderer)
+    return renderer
 
-    return data
 
 def resolve_placeholders(data_structure: Any, context: 'TestContext', data_set_vars: Dict[str, Any]) -> Any:
-    """递归地解析数据结构（字典、列表、字符串）中的所有占位符。"""
-    if isinstance(data_structure, dict):
-        return {key: resolve_placeholders(value, context, data_set_vars) for key, value in data_structure.items()}
-    elif isinstance(data_structure, list):
-        return [resolve_placeholders(item, context, data_set_vars) for item in data_structure]
-    else:
-        return _resolve_single_string(data_structure, context, data_set_vars)
+    """
+    递归地解析数据结构（字典、列表、字符串）中的所有占位符。
+    返回的 dict/list 都是新建的容器，不含占位符的标量原样沿用。
+    """
+    if isinstance(data_structure, (dict, list)):
+        return _get_structure_renderer(data_structure)(context, data_set_vars)
+    return _resolve_single_string(data_structure, context, data_set_vars)
+
+# =================================================================
+# 4. SQL 模板 (绑定参数)
+# dbValidation 的查询不再把值拼进 SQL，而是把占位符编译为绑定参数：
+#   - 引号外的占位符 (id = {{@user_id}}) 以原始值绑定，保留数据集/提取变量的类型
+#   - 含占位符的字符串字面量 ('%{{@name}}%') 整体变为一个参数，值为渲染后的字面量内容
+# 同一条查询在不同数据集下的 SQL 文本完全相同，可以复用数据库端的预备语句。
+# =================================================================
+
+_SQL_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_SQL_TEXT, _SQL_VALUE = range(2)
+
+
+class SqlTemplate:
+    """
+    一条已编译的 SQL 模板：fragments 是 SQL 片段，相邻片段之间是一个参数，
+    len(fragments) == len(params) + 1。
+    """
+    __slots__ = ('source', 'fragments', 'params')
+
+    def __init__(self, source: str, fragments: tuple, params: tuple):
+        self.source = source
+        self.fragments = fragments
+        self.params = params
+
+    def bind(self, context: 'TestContext', data_set_vars: Dict[str, Any]) -> list:
+        """:return: 按顺序排列的参数值；无法解析的占位符以原文作为参数值"""
+        values = []
+        for kind, payload in self.params:
+            if kind == _SQL_TEXT:
+                values.append(_resolve_single_string(payload, context, data_set_vars))
+                continue
+            token_kind, token = payload
+            if token_kind == _DATASET:
+                value = data_set_vars.get(token[1])
+            elif token_kind == _STEP:
+                value = context.get_value_by_path(token[1])
+            else:
+                value = _render_dynamic(token, context)
+            if value is None:
+                value = token[0]
+            elif isinstance(value, str) and '{{' in value:
+                value = _resolve_single_string(value, context, data_set_vars)
+            values.append(value)
+        return values
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def compile_sql_template(query: str) -> SqlTemplate:
+    """把 SQL 查询编译为 SqlTemplate，按字符串内容缓存。"""
+    fragments, params = [], []
+    current = []
+    position = 0
+    literals = [(match.start(), match.end()) for match in _SQL_STRING_LITERAL.finditer(query)]
+    for start, end in literals + [(len(query), len(query))]:
+        # 引号外：每个占位符都是一个参数
+        segment = compile_template(query[position:start]) if start > position else None
+        for kind, payload in (segment.tokens if segment else ()):
+            if kind == _LITERAL:
+                current.append(payload)
+            else:
+                fragments.append(''.join(current))
+                current = []
+                params.append((_SQL_VALUE, (kind, payload)))
+        # 字符串字面量：含占位符时整体作为一个参数
+        literal = query[start:end]
+        if '{{' in literal:
+            fragments.append(''.join(current))
+            current = []
+            params.append((_SQL_TEXT, literal[1:-1].replace("''", "'")))
+        else:
+            current.append(literal)
+        position = end
+    fragments.append(''.join(current))
+    return SqlTemplate(query, tuple(fragments), tuple(params))